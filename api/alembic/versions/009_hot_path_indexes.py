@@ -0,0 +1,103 @@
+"""Add composite indexes for hot-path lookups
+
+Revision ID: 009_hot_path_indexes
+Revises: 008_proctoring
+Create Date: 2026-10-17 09:00:00.000000
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+# revision identifiers, used by Alembic.
+revision = '009_hot_path_indexes'
+down_revision = '008_proctoring'
+branch_labels = None
+depends_on = None
+
+
+def _refuse_duplicates(table: str, key: str, hint: str) -> None:
+    """
+    Abort before a unique index if rows already collide on its key
+    
+    Which duplicate is authoritative (latest answer, intended exam
+    content) is for an operator to decide, not this migration.
+    """
+    groups = op.get_bind().execute(sa.text(
+        f"SELECT {key}, COUNT(*) FROM {table} GROUP BY {key} HAVING COUNT(*) > 1"
+    )).fetchall()
+    if groups:
+        sample = ", ".join(f"({', '.join(str(v) for v in row[:-1])})" for row in groups[:10])
+        raise RuntimeError(
+            f"{table} has {len(groups)} duplicate ({key}) groups, e.g. {sample}. "
+            f"Reconcile them ({hint}), then run this migration again."
+        )
+
+
+def upgrade() -> None:
+    # One answer row per question per attempt (autosave upserts on this key)
+    _refuse_duplicates(
+        'student_answers', 'attempt_id, question_id',
+        "the row with the greatest (answer_sequence, last_updated_at, id) holds the latest answer"
+    )
+    op.create_index(
+        'ix_student_answers_attempt_question',
+        'student_answers',
+        ['attempt_id', 'question_id'],
+        unique=True
+    )
+    
+    # Existing-attempt checks filter on all three columns
+    op.create_index(
+        'ix_student_attempts_student_exam_status',
+        'student_attempts',
+        ['student_id', 'exam_id', 'status']
+    )
+    
+    # Attempt listings page by (created_at, id), optionally per exam or student
+    op.create_index(
+        'ix_student_attempts_created_id',
+        'student_attempts',
+        ['created_at', 'id']
+    )
+    op.create_index(
+        'ix_student_attempts_exam_created_id',
+        'student_attempts',
+        ['exam_id', 'created_at', 'id']
+    )
+    op.create_index(
+        'ix_student_attempts_student_created_id',
+        'student_attempts',
+        ['student_id', 'created_at', 'id']
+    )
+    
+    # A question appears at most once in an exam
+    _refuse_duplicates(
+        'exam_questions', 'exam_id, question_id',
+        "keep the row with the intended order_number and marks_override"
+    )
+    op.create_index(
+        'ix_exam_questions_exam_question',
+        'exam_questions',
+        ['exam_id', 'question_id'],
+        unique=True
+    )
+    
+    # question_timings(attempt_id, question_id) is already covered by
+    # ix_question_timings_unique_attempt_question from 008_proctoring
+    
+    # Per-attempt event timeline, read in timestamp order
+    op.create_index(
+        'ix_proctoring_events_attempt_timestamp',
+        'proctoring_events',
+        ['attempt_id', 'event_timestamp']
+    )
+
+
+def downgrade() -> None:
+    op.drop_index('ix_proctoring_events_attempt_timestamp', table_name='proctoring_events')
+    op.drop_index('ix_exam_questions_exam_question', table_name='exam_questions')
+    op.drop_index('ix_student_attempts_student_created_id', table_name='student_attempts')
+    op.drop_index('ix_student_attempts_exam_created_id', table_name='student_attempts')
+    op.drop_index('ix_student_attempts_created_id', table_name='student_attempts')
+    op.drop_index('ix_student_attempts_student_exam_status', table_name='student_attempts')
+    op.drop_index('ix_student_answers_attempt_question', table_name='student_answers')
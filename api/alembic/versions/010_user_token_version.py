@@ -0,0 +1,26 @@
+"""Add users.token_version for access-token revocation
+
+Revision ID: 010_user_token_version
+Revises: 009_hot_path_indexes
+Create Date: 2026-10-17 12:00:00.000000
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+# revision identifiers, used by Alembic.
+revision = '010_user_token_version'
+down_revision = '009_hot_path_indexes'
+branch_labels = None
+depends_on = None
+
+
+def upgrade() -> None:
+    op.add_column(
+        'users',
+        sa.Column('token_version', sa.Integer(), nullable=False, server_default='0')
+    )
+
+
+def downgrade() -> None:
+    op.drop_column('users', 'token_version')
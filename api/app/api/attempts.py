@@ -3,17 +3,23 @@ Student Attempt endpoints
 Manages exam attempt lifecycle: start, answer recording, submit, grading
 """
 from typing import List, Optional
-from fastapi import APIRouter, Depends, HTTPException, status, Request
-from sqlalchemy.orm import Session
-from sqlalchemy import and_, func
+from fastapi import APIRouter, Depends, HTTPException, Query, Request, Response, status
+from sqlalchemy import and_, case, func, insert, literal, select, tuple_, update
+from sqlalchemy.orm import aliased, selectinload
+from sqlalchemy.ext.asyncio import AsyncSession
 from datetime import datetime, timedelta
 import secrets
+import time
 
-from app.core.database import get_db
-from app.api.dependencies import get_current_active_user, require_role, require_any_role
-from app.models.user import User
-from app.models.exam import Exam, ExamQuestion, Question
+from app.core.config import settings
+from app.core.database import UPSERT_INSERTS, get_async_db, get_async_read_db, supports_native_upsert
+from app.core.pagination import NEXT_CURSOR_HEADER, decode_cursor, encode_cursor
+from app.api.dependencies import get_current_principal, require_role, require_any_role
+from app.api.ws_attempts import exam_clock, forget_attempt_clock
+from app.services.principal_cache import Principal
+from app.models.exam import Exam, ExamQuestion, ExamStatus, Question
 from app.models.attempt import StudentAttempt, StudentAnswer, AttemptStatus
+from app.models.user import Role, User, user_roles
 from app.schemas.attempt import (
     AttemptStart,
     AttemptResume,
@@ -29,8 +35,13 @@ from app.schemas.attempt import (
     AnswerResponse,
     AttemptAdminView,
     AttemptStatistics,
+    AttemptProvision,
+    AttemptProvisionResult,
 )
 from app.services.grading import GradingService
+from app.services.answer_log import answer_change_log
+from app.services.checkpoint import checkpoint_service
+from app.services.expiry import expiry_sweeper
 
 router = APIRouter(prefix="/attempts", tags=["Attempts"])
 
@@ -41,17 +52,28 @@ router = APIRouter(prefix="/attempts", tags=["Attempts"])
 async def start_attempt(
     attempt_data: AttemptStart,
     request: Request,
-    db: Session = Depends(get_db),
-    current_user: User = Depends(require_role("student"))
+    db: AsyncSession = Depends(get_async_db),
+    current_user: Principal = Depends(require_role("student"))
 ):
     """
     Start a new exam attempt
     
     Students can only start exams that are published/active
     Prevents duplicate active attempts for the same exam
+    
+    A provisioned (NOT_STARTED) attempt is started in place by one
+    conditional UPDATE; the lookups below only run without one.
     """
+    # Get client IP
+    client_ip = request.client.host if request.client else None
+    
+    provisioned = await _start_provisioned_attempt(db, current_user.id, attempt_data, client_ip)
+    if provisioned is not None:
+        return AttemptResponse.from_orm(provisioned)
+    
     # Verify exam exists and is available
-    exam = db.query(Exam).filter(Exam.id == attempt_data.exam_id).first()
+    result = await db.execute(select(Exam).where(Exam.id == attempt_data.exam_id))
+    exam = result.scalar_one_or_none()
     if not exam:
         raise HTTPException(
             status_code=status.HTTP_404_NOT_FOUND,
@@ -65,13 +87,16 @@ async def start_attempt(
         )
     
     # Check for existing active attempt
-    existing_attempt = db.query(StudentAttempt).filter(
-        and_(
-            StudentAttempt.student_id == current_user.id,
-            StudentAttempt.exam_id == attempt_data.exam_id,
-            StudentAttempt.status == AttemptStatus.IN_PROGRESS
+    result = await db.execute(
+        select(StudentAttempt).where(
+            and_(
+                StudentAttempt.student_id == current_user.id,
+                StudentAttempt.exam_id == attempt_data.exam_id,
+                StudentAttempt.status == AttemptStatus.IN_PROGRESS
+            )
         )
-    ).first()
+    )
+    existing_attempt = result.scalars().first()
     
     if existing_attempt:
         raise HTTPException(
@@ -79,9 +104,6 @@ async def start_attempt(
             detail=f"You already have an active attempt for this exam. Use resume endpoint instead. Attempt ID: {existing_attempt.id}"
         )
     
-    # Get client IP
-    client_ip = request.client.host if request.client else None
-    
     # Generate encryption salt for this attempt
     encryption_salt = secrets.token_urlsafe(16)  # 16 bytes = 128 bits
     
@@ -102,8 +124,10 @@ async def start_attempt(
     )
     
     db.add(new_attempt)
-    db.commit()
-    db.refresh(new_attempt)
+    await db.commit()
+    await db.refresh(new_attempt)
+    exam_clock.track(new_attempt)
+    expiry_sweeper.schedule(new_attempt)
     
     return AttemptResponse.from_orm(new_attempt)
 
@@ -111,8 +135,8 @@ async def start_attempt(
 @router.post("/{attempt_id}/begin", response_model=AttemptResponse)
 async def begin_attempt(
     attempt_id: int,
-    db: Session = Depends(get_db),
-    current_user: User = Depends(require_role("student"))
+    db: AsyncSession = Depends(get_async_db),
+    current_user: Principal = Depends(require_role("student"))
 ):
     """
     Begin an attempt that's in NOT_STARTED status
@@ -120,12 +144,21 @@ async def begin_attempt(
     Transitions from NOT_STARTED to IN_PROGRESS
     Sets start_time and initializes timing
     """
-    attempt = db.query(StudentAttempt).filter(
-        and_(
-            StudentAttempt.id == attempt_id,
-            StudentAttempt.student_id == current_user.id
+    begun = await _begin_provisioned_attempt(db, attempt_id, current_user.id)
+    if begun is not None:
+        response = AttemptResponse.from_orm(begun)
+        response.time_remaining_seconds = begun.get_time_remaining_seconds()
+        return response
+    
+    result = await db.execute(
+        select(StudentAttempt).where(
+            and_(
+                StudentAttempt.id == attempt_id,
+                StudentAttempt.student_id == current_user.id
+            )
         )
-    ).first()
+    )
+    attempt = result.scalar_one_or_none()
     
     if not attempt:
         raise HTTPException(
@@ -145,7 +178,8 @@ async def begin_attempt(
         )
     
     # Verify exam is still available
-    exam = db.query(Exam).filter(Exam.id == attempt.exam_id).first()
+    result = await db.execute(select(Exam).where(Exam.id == attempt.exam_id))
+    exam = result.scalar_one_or_none()
     if not exam:
         raise HTTPException(
             status_code=status.HTTP_404_NOT_FOUND,
@@ -163,8 +197,10 @@ async def begin_attempt(
     attempt.start_time = datetime.utcnow()
     attempt.last_activity_time = datetime.utcnow()
     
-    db.commit()
-    db.refresh(attempt)
+    await db.commit()
+    await db.refresh(attempt)
+    exam_clock.track(attempt)
+    expiry_sweeper.schedule(attempt)
     
     # Build response with calculated time_remaining
     response = AttemptResponse.from_orm(attempt)
@@ -173,56 +209,179 @@ async def begin_attempt(
     return response
 
 
+_EXAM_AVAILABLE = (ExamStatus.PUBLISHED, ExamStatus.ACTIVE)
+
+
+def _exam_available(exam_id):
+    """EXISTS clause: the exam is published or active"""
+    return (
+        select(Exam.id)
+        .where(Exam.id == exam_id, Exam.status.in_(_EXAM_AVAILABLE))
+        .exists()
+    )
+
+
+async def _start_provisioned_attempt(
+    db: AsyncSession,
+    student_id: int,
+    attempt_data: AttemptStart,
+    client_ip: Optional[str]
+) -> Optional[StudentAttempt]:
+    """
+    Start the student's provisioned attempt with one conditional UPDATE
+    
+    The statement carries start_attempt's checks: the exam is available
+    and the student has no attempt of it in progress. Returns None when
+    nothing matched (no provisioned attempt, or a check failed), leaving
+    the caller's full path to start a new attempt or explain the refusal.
+    
+    Without UPDATE .. RETURNING the provisioned row is looked up first and
+    started by id, so the full path never inserts beside it.
+    """
+    now = datetime.utcnow()
+    running = aliased(StudentAttempt)
+    provisioned_id = (
+        select(StudentAttempt.id)
+        .where(
+            StudentAttempt.student_id == student_id,
+            StudentAttempt.exam_id == attempt_data.exam_id,
+            StudentAttempt.status == AttemptStatus.NOT_STARTED
+        )
+        .order_by(StudentAttempt.id)
+        .limit(1)
+    )
+    no_running_attempt = ~select(running.id).where(
+        running.student_id == student_id,
+        running.exam_id == attempt_data.exam_id,
+        running.status == AttemptStatus.IN_PROGRESS
+    ).exists()
+    started = (
+        update(StudentAttempt)
+        .values(
+            status=AttemptStatus.IN_PROGRESS,
+            start_time=now,
+            last_activity_time=now,
+            workstation_id=attempt_data.workstation_id,
+            initial_workstation_id=attempt_data.workstation_id,
+            browser_info=attempt_data.browser_info,
+            ip_address=client_ip
+        )
+        .execution_options(synchronize_session=False)
+    )
+    
+    if db.bind.dialect.update_returning:
+        attempt = await db.scalar(
+            started
+            .where(
+                StudentAttempt.id == provisioned_id.scalar_subquery(),
+                # Re-checked on the row itself, so of two concurrent starts one wins
+                StudentAttempt.status == AttemptStatus.NOT_STARTED,
+                _exam_available(StudentAttempt.exam_id),
+                no_running_attempt
+            )
+            .returning(StudentAttempt)
+        )
+    else:
+        attempt_id = await db.scalar(provisioned_id)
+        if attempt_id is None or not await db.scalar(select(no_running_attempt)):
+            return None
+        
+        result = await db.execute(
+            started.where(
+                StudentAttempt.id == attempt_id,
+                StudentAttempt.status == AttemptStatus.NOT_STARTED,
+                _exam_available(StudentAttempt.exam_id)
+            )
+        )
+        attempt = (
+            await db.get(StudentAttempt, attempt_id, populate_existing=True)
+            if result.rowcount == 1 else None
+        )
+    
+    if attempt is None:
+        return None
+    
+    await db.commit()
+    exam_clock.track(attempt)
+    expiry_sweeper.schedule(attempt)
+    return attempt
+
+
+async def _begin_provisioned_attempt(
+    db: AsyncSession,
+    attempt_id: int,
+    student_id: int
+) -> Optional[StudentAttempt]:
+    """
+    Begin a NOT_STARTED attempt of an available exam with one conditional UPDATE
+    
+    Returns None when nothing matched; begin_attempt's lookups then
+    return an already started attempt or explain the refusal.
+    """
+    if not db.bind.dialect.update_returning:
+        return None
+    
+    now = datetime.utcnow()
+    attempt = await db.scalar(
+        update(StudentAttempt)
+        .where(
+            StudentAttempt.id == attempt_id,
+            StudentAttempt.student_id == student_id,
+            StudentAttempt.status == AttemptStatus.NOT_STARTED,
+            _exam_available(StudentAttempt.exam_id)
+        )
+        .values(status=AttemptStatus.IN_PROGRESS, start_time=now, last_activity_time=now)
+        .returning(StudentAttempt)
+        .execution_options(synchronize_session=False)
+    )
+    if attempt is None:
+        return None
+    
+    await db.commit()
+    exam_clock.track(attempt)
+    expiry_sweeper.schedule(attempt)
+    return attempt
+
+
 @router.get("/me", response_model=List[AttemptListItem])
 async def list_my_attempts(
+    response: Response,
     skip: int = 0,
-    limit: int = 100,
+    limit: int = Query(100, ge=1, le=500),
+    cursor: Optional[str] = None,
     status_filter: Optional[str] = None,
     exam_id: Optional[int] = None,
-    db: Session = Depends(get_db),
-    current_user: User = Depends(require_role("student"))
+    db: AsyncSession = Depends(get_async_db),
+    current_user: Principal = Depends(require_role("student"))
 ):
-    """List all attempts by current student"""
-    query = db.query(StudentAttempt).filter(
-        StudentAttempt.student_id == current_user.id
-    )
+    """
+    List all attempts by current student, newest first
     
+    Pass the `X-Next-Cursor` response header back as `cursor` for the
+    next page; the header is absent on the last page.
+    """
+    filters = [StudentAttempt.student_id == current_user.id]
     if status_filter:
-        query = query.filter(StudentAttempt.status == status_filter)
-    
+        filters.append(StudentAttempt.status == status_filter)
     if exam_id:
-        query = query.filter(StudentAttempt.exam_id == exam_id)
+        filters.append(StudentAttempt.exam_id == exam_id)
     
-    attempts = query.order_by(StudentAttempt.created_at.desc()).offset(skip).limit(limit).all()
-    
-    # Build response with exam info
-    result = []
-    for attempt in attempts:
-        item = AttemptListItem(
-            id=attempt.id,
-            exam_id=attempt.exam_id,
-            status=attempt.status,
-            start_time=attempt.start_time,
-            submit_time=attempt.submit_time,
-            marks_obtained=attempt.marks_obtained,
-            percentage=attempt.percentage,
-            is_passed=attempt.is_passed,
-            exam_title=attempt.exam.title if attempt.exam else None,
-            exam_duration_minutes=attempt.exam.duration_minutes if attempt.exam else None
-        )
-        result.append(item)
-    
-    return result
+    return await _list_attempt_page(db, response, filters, cursor, skip, limit)
 
 
 @router.get("/{attempt_id}", response_model=AttemptWithProgress)
 async def get_attempt(
     attempt_id: int,
-    db: Session = Depends(get_db),
-    current_user: User = Depends(get_current_active_user)
+    db: AsyncSession = Depends(get_async_db),
+    current_user: Principal = Depends(get_current_principal)
 ):
     """Get a specific attempt with progress"""
-    attempt = db.query(StudentAttempt).filter(StudentAttempt.id == attempt_id).first()
+    result = await db.execute(
+        select(StudentAttempt)
+        .options(selectinload(StudentAttempt.exam).selectinload(Exam.exam_questions))
+        .where(StudentAttempt.id == attempt_id)
+    )
+    attempt = result.scalar_one_or_none()
     if not attempt:
         raise HTTPException(
             status_code=status.HTTP_404_NOT_FOUND,
@@ -250,20 +409,23 @@ async def get_attempt(
 async def resume_attempt(
     attempt_id: int,
     resume_data: AttemptResume,
-    db: Session = Depends(get_db),
-    current_user: User = Depends(require_role("student"))
+    db: AsyncSession = Depends(get_async_db),
+    current_user: Principal = Depends(require_role("student"))
 ):
     """
     Resume an in-progress attempt
     
     Allows workstation transfers
     """
-    attempt = db.query(StudentAttempt).filter(
-        and_(
-            StudentAttempt.id == attempt_id,
-            StudentAttempt.student_id == current_user.id
+    result = await db.execute(
+        select(StudentAttempt).where(
+            and_(
+                StudentAttempt.id == attempt_id,
+                StudentAttempt.student_id == current_user.id
+            )
         )
-    ).first()
+    )
+    attempt = result.scalar_one_or_none()
     
     if not attempt:
         raise HTTPException(
@@ -282,11 +444,11 @@ async def resume_attempt(
         # Auto-submit expired attempt
         attempt.status = AttemptStatus.EXPIRED
         attempt.end_time = datetime.utcnow()
-        db.commit()
+        await db.commit()
+        await forget_attempt_clock(attempt.id)
         
-        # Trigger auto-grading
-        grading_service = GradingService(db)
-        grading_service.grade_attempt(attempt)
+        # Trigger auto-grading (sync service, run on the session's connection)
+        await db.run_sync(lambda session: GradingService(session).grade_attempt(attempt))
         
         raise HTTPException(
             status_code=status.HTTP_400_BAD_REQUEST,
@@ -299,8 +461,8 @@ async def resume_attempt(
         attempt.workstation_id = resume_data.workstation_id
     
     attempt.last_activity_time = datetime.utcnow()
-    db.commit()
-    db.refresh(attempt)
+    await db.commit()
+    await db.refresh(attempt)
     
     return AttemptResponse.from_orm(attempt)
 
@@ -308,20 +470,23 @@ async def resume_attempt(
 @router.get("/{attempt_id}/time-status", response_model=AttemptTimeStatus)
 async def get_time_status(
     attempt_id: int,
-    db: Session = Depends(get_db),
-    current_user: User = Depends(require_role("student"))
+    db: AsyncSession = Depends(get_async_db),
+    current_user: Principal = Depends(require_role("student"))
 ):
     """
     Get time remaining for an attempt
     
     Used for client-side timer synchronization
     """
-    attempt = db.query(StudentAttempt).filter(
-        and_(
-            StudentAttempt.id == attempt_id,
-            StudentAttempt.student_id == current_user.id
+    result = await db.execute(
+        select(StudentAttempt).where(
+            and_(
+                StudentAttempt.id == attempt_id,
+                StudentAttempt.student_id == current_user.id
+            )
         )
-    ).first()
+    )
+    attempt = result.scalar_one_or_none()
     
     if not attempt:
         raise HTTPException(
@@ -343,12 +508,26 @@ async def get_time_status(
 
 # ==================== Answer Recording Endpoints ====================
 
+_ANSWER_RETURNING = (
+    StudentAnswer.id,
+    StudentAnswer.question_id,
+    StudentAnswer.answer,
+    StudentAnswer.is_flagged,
+    StudentAnswer.time_spent_seconds,
+    StudentAnswer.answer_sequence,
+    StudentAnswer.is_correct,
+    StudentAnswer.marks_awarded,
+    StudentAnswer.first_answered_at,
+    StudentAnswer.last_updated_at,
+)
+
+
 @router.post("/{attempt_id}/answers", response_model=AnswerResponse)
 async def save_answer(
     attempt_id: int,
     answer_data: AnswerSubmit,
-    db: Session = Depends(get_db),
-    current_user: User = Depends(require_role("student"))
+    db: AsyncSession = Depends(get_async_db),
+    current_user: Principal = Depends(require_role("student"))
 ):
     """
     Save or update an answer for a question
@@ -356,14 +535,158 @@ async def save_answer(
     Supports auto-save (called every 15 seconds from frontend)
     Idempotent - updates existing answer if present
     """
-    # Verify attempt belongs to current user and is in progress
-    attempt = db.query(StudentAttempt).filter(
-        and_(
+    if not supports_native_upsert(db):
+        return await _save_answer_fallback(attempt_id, answer_data, db, current_user)
+    
+    now = datetime.utcnow()
+    student_id = current_user.id  # rollback below expires ORM objects
+    answers = StudentAnswer.__table__
+    attempts = StudentAttempt.__table__
+    
+    # 1. Upsert, guarded in the same statement: the attempt must be the
+    #    student's and in progress, the question must belong to its exam
+    source = (
+        select(
+            literal(attempt_id, answers.c.attempt_id.type),
+            literal(answer_data.question_id, answers.c.question_id.type),
+            literal(answer_data.answer, answers.c.answer.type),
+            literal(bool(answer_data.is_flagged), answers.c.is_flagged.type),
+            literal(answer_data.time_spent_seconds or 0, answers.c.time_spent_seconds.type),
+            literal(1, answers.c.answer_sequence.type),
+            literal(now, answers.c.first_answered_at.type),
+            literal(now, answers.c.last_updated_at.type),
+        )
+        .select_from(attempts)
+        .join(ExamQuestion.__table__, ExamQuestion.exam_id == attempts.c.exam_id)
+        .where(
+            attempts.c.id == attempt_id,
+            attempts.c.student_id == student_id,
+            attempts.c.status == AttemptStatus.IN_PROGRESS,
+            ExamQuestion.question_id == answer_data.question_id
+        )
+    )
+    insert_stmt = UPSERT_INSERTS[db.bind.dialect.name](answers).from_select(
+        [
+            "attempt_id", "question_id", "answer", "is_flagged",
+            "time_spent_seconds", "answer_sequence", "first_answered_at", "last_updated_at",
+        ],
+        source
+    )
+    upsert = insert_stmt.on_conflict_do_update(
+        index_elements=[answers.c.attempt_id, answers.c.question_id],
+        set_={
+            "answer": insert_stmt.excluded.answer,
+            "is_flagged": insert_stmt.excluded.is_flagged,
+            "time_spent_seconds": (
+                answers.c.time_spent_seconds + insert_stmt.excluded.time_spent_seconds
+            ),
+            # Always >= 2 on update, so answer_sequence == 1 means "inserted"
+            "answer_sequence": case(
+                (answers.c.answer_sequence < 1, 2),
+                else_=answers.c.answer_sequence + 1
+            ),
+            "first_answered_at": func.coalesce(
+                answers.c.first_answered_at, insert_stmt.excluded.first_answered_at
+            ),
+            "last_updated_at": insert_stmt.excluded.last_updated_at,
+        }
+    ).returning(*_ANSWER_RETURNING)
+    
+    saved = (await db.execute(upsert)).first()
+    if saved is None:
+        await db.rollback()
+        await _raise_answer_rejected(db, attempt_id, student_id)
+    
+    # 2. Counter by delta (no recount) and activity time; RETURNING gives
+    #    what the expiry and flag checks need
+    attempt = (await db.execute(
+        update(attempts)
+        .where(attempts.c.id == attempt_id)
+        .values(
+            questions_answered=func.coalesce(attempts.c.questions_answered, 0)
+            + (1 if saved.answer_sequence == 1 else 0),
+            last_activity_time=now
+        )
+        .returning(
+            attempts.c.status,
+            attempts.c.start_time,
+            attempts.c.duration_minutes,
+            attempts.c.questions_flagged
+        )
+    )).first()
+    
+    if StudentAttempt(
+        status=attempt.status,
+        start_time=attempt.start_time,
+        duration_minutes=attempt.duration_minutes
+    ).is_expired():
+        await db.rollback()
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail="Attempt time has expired"
+        )
+    
+    # 3. Only when the question's flag state changes
+    flagged = list(attempt.questions_flagged or [])
+    is_flagged = bool(answer_data.is_flagged)
+    if is_flagged != (answer_data.question_id in flagged):
+        if is_flagged:
+            flagged.append(answer_data.question_id)
+        else:
+            flagged.remove(answer_data.question_id)
+        await db.execute(
+            update(attempts).where(attempts.c.id == attempt_id).values(questions_flagged=flagged)
+        )
+    
+    await db.commit()
+    await _log_saved_answer(attempt_id, saved)
+    
+    return AnswerResponse.model_validate(saved)
+
+
+async def _raise_answer_rejected(db: AsyncSession, attempt_id: int, student_id: int) -> None:
+    """Explain why the guarded upsert matched nothing (slow path only)"""
+    attempt = await db.scalar(
+        select(StudentAttempt).where(
             StudentAttempt.id == attempt_id,
-            StudentAttempt.student_id == current_user.id,
+            StudentAttempt.student_id == student_id,
             StudentAttempt.status == AttemptStatus.IN_PROGRESS
         )
-    ).first()
+    )
+    if not attempt:
+        raise HTTPException(
+            status_code=status.HTTP_404_NOT_FOUND,
+            detail="Active attempt not found"
+        )
+    if attempt.is_expired():
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail="Attempt time has expired"
+        )
+    raise HTTPException(
+        status_code=status.HTTP_400_BAD_REQUEST,
+        detail="Question does not belong to this exam"
+    )
+
+
+async def _save_answer_fallback(
+    attempt_id: int,
+    answer_data: AnswerSubmit,
+    db: AsyncSession,
+    current_user: Principal
+) -> AnswerResponse:
+    """Read-then-write save for databases without ON CONFLICT ... RETURNING"""
+    # Verify attempt belongs to current user and is in progress
+    result = await db.execute(
+        select(StudentAttempt).where(
+            and_(
+                StudentAttempt.id == attempt_id,
+                StudentAttempt.student_id == current_user.id,
+                StudentAttempt.status == AttemptStatus.IN_PROGRESS
+            )
+        )
+    )
+    attempt = result.scalar_one_or_none()
     
     if not attempt:
         raise HTTPException(
@@ -379,12 +702,15 @@ async def save_answer(
         )
     
     # Verify question belongs to this exam
-    exam_question = db.query(ExamQuestion).filter(
-        and_(
-            ExamQuestion.exam_id == attempt.exam_id,
-            ExamQuestion.question_id == answer_data.question_id
+    result = await db.execute(
+        select(ExamQuestion).where(
+            and_(
+                ExamQuestion.exam_id == attempt.exam_id,
+                ExamQuestion.question_id == answer_data.question_id
+            )
         )
-    ).first()
+    )
+    exam_question = result.scalars().first()
     
     if not exam_question:
         raise HTTPException(
@@ -393,12 +719,15 @@ async def save_answer(
         )
     
     # Check if answer already exists
-    existing_answer = db.query(StudentAnswer).filter(
-        and_(
-            StudentAnswer.attempt_id == attempt_id,
-            StudentAnswer.question_id == answer_data.question_id
+    result = await db.execute(
+        select(StudentAnswer).where(
+            and_(
+                StudentAnswer.attempt_id == attempt_id,
+                StudentAnswer.question_id == answer_data.question_id
+            )
         )
-    ).first()
+    )
+    existing_answer = result.scalars().first()
     
     if existing_answer:
         # Update existing answer
@@ -422,43 +751,54 @@ async def save_answer(
         db.add(new_answer)
         db_answer = new_answer
         
-        # Update questions_answered count
-        attempt.questions_answered = db.query(StudentAnswer).filter(
-            StudentAnswer.attempt_id == attempt_id
-        ).count() + 1
-    
-    # Update flagged questions list
-    if answer_data.is_flagged:
-        if not attempt.questions_flagged:
-            attempt.questions_flagged = []
-        if answer_data.question_id not in attempt.questions_flagged:
-            attempt.questions_flagged.append(answer_data.question_id)
-    else:
-        if attempt.questions_flagged and answer_data.question_id in attempt.questions_flagged:
-            attempt.questions_flagged.remove(answer_data.question_id)
+        # One more question answered (delta, no recount)
+        attempt.questions_answered = (attempt.questions_answered or 0) + 1
+    
+    # Update flagged questions list (reassigned: in-place JSON edits are not tracked)
+    flagged = list(attempt.questions_flagged or [])
+    if answer_data.is_flagged and answer_data.question_id not in flagged:
+        flagged.append(answer_data.question_id)
+    elif not answer_data.is_flagged and answer_data.question_id in flagged:
+        flagged.remove(answer_data.question_id)
+    attempt.questions_flagged = flagged
     
     # Update last activity
     attempt.last_activity_time = datetime.utcnow()
     
-    db.commit()
-    db.refresh(db_answer)
+    await db.commit()
+    await db.refresh(db_answer)
+    await _log_saved_answer(attempt_id, db_answer)
     
     return AnswerResponse.from_orm(db_answer)
 
 
+async def _log_saved_answer(attempt_id: int, saved) -> None:
+    """Number a saved answer in the change log that reconnecting sockets resync from"""
+    await answer_change_log.record(attempt_id, [{
+        "question_id": saved.question_id,
+        "answer": saved.answer,
+        "is_flagged": saved.is_flagged,
+        "sequence": saved.answer_sequence,
+        "saved_at": saved.last_updated_at.isoformat(),
+    }])
+
+
 @router.get("/{attempt_id}/answers", response_model=List[AnswerResponse])
 async def get_attempt_answers(
     attempt_id: int,
-    db: Session = Depends(get_db),
-    current_user: User = Depends(require_role("student"))
+    db: AsyncSession = Depends(get_async_db),
+    current_user: Principal = Depends(require_role("student"))
 ):
     """Get all answers for an attempt"""
-    attempt = db.query(StudentAttempt).filter(
-        and_(
-            StudentAttempt.id == attempt_id,
-            StudentAttempt.student_id == current_user.id
+    result = await db.execute(
+        select(StudentAttempt).where(
+            and_(
+                StudentAttempt.id == attempt_id,
+                StudentAttempt.student_id == current_user.id
+            )
         )
-    ).first()
+    )
+    attempt = result.scalar_one_or_none()
     
     if not attempt:
         raise HTTPException(
@@ -466,9 +806,10 @@ async def get_attempt_answers(
             detail="Attempt not found"
         )
     
-    answers = db.query(StudentAnswer).filter(
-        StudentAnswer.attempt_id == attempt_id
-    ).all()
+    result = await db.execute(
+        select(StudentAnswer).where(StudentAnswer.attempt_id == attempt_id)
+    )
+    answers = result.scalars().all()
     
     return [AnswerResponse.from_orm(a) for a in answers]
 
@@ -479,21 +820,28 @@ async def get_attempt_answers(
 async def submit_attempt(
     attempt_id: int,
     submit_data: AttemptSubmit,
-    db: Session = Depends(get_db),
-    current_user: User = Depends(require_role("student"))
+    db: AsyncSession = Depends(get_async_db),
+    current_user: Principal = Depends(require_role("student"))
 ):
     """
     Submit attempt for grading
     
     Once submitted, cannot be modified
     Triggers auto-grading for objective questions
+    Answers to 503 (with Retry-After) while checkpoints the candidate was
+    already acked for are still journaled and cannot be written yet
     """
-    attempt = db.query(StudentAttempt).filter(
-        and_(
-            StudentAttempt.id == attempt_id,
-            StudentAttempt.student_id == current_user.id
+    requested_at = time.time()
+    
+    result = await db.execute(
+        select(StudentAttempt).where(
+            and_(
+                StudentAttempt.id == attempt_id,
+                StudentAttempt.student_id == current_user.id
+            )
         )
-    ).first()
+    )
+    attempt = result.scalar_one_or_none()
     
     if not attempt:
         raise HTTPException(
@@ -507,6 +855,17 @@ async def submit_attempt(
             detail=f"Cannot submit attempt with status: {attempt.status}"
         )
     
+    # Journaled checkpoints, on any worker, must reach student_answers before grading
+    settled = await checkpoint_service.settle_journal(
+        requested_at, settings.CHECKPOINT_JOURNAL_SUBMIT_WAIT_SECONDS
+    )
+    if not settled:
+        raise HTTPException(
+            status_code=status.HTTP_503_SERVICE_UNAVAILABLE,
+            detail="Saved answers are still being written, please submit again shortly",
+            headers={"Retry-After": str(settings.CHECKPOINT_JOURNAL_SUBMIT_WAIT_SECONDS)}
+        )
+    
     # Store encrypted answers if provided
     if submit_data.encrypted_answers:
         attempt.encrypted_final_answers = submit_data.encrypted_answers
@@ -521,14 +880,17 @@ async def submit_attempt(
     # Calculate actual time remaining for reference
     attempt.time_remaining_seconds = attempt.get_time_remaining_seconds()
     
-    db.commit()
+    await db.commit()
+    await forget_attempt_clock(attempt_id)
+    checkpoint_service.forget_attempt(attempt_id)
     
-    # Trigger auto-grading
-    grading_service = GradingService(db)
-    result = grading_service.grade_attempt(attempt)
+    # Trigger auto-grading (sync service, run on the session's connection)
+    result = await db.run_sync(
+        lambda session: GradingService(session).grade_attempt(attempt)
+    )
     
     # Refresh to get updated values
-    db.refresh(attempt)
+    await db.refresh(attempt)
     
     return AttemptResult(
         id=attempt.id,
@@ -552,11 +914,21 @@ async def submit_attempt(
 @router.get("/{attempt_id}/result", response_model=AttemptResultDetailed)
 async def get_attempt_result(
     attempt_id: int,
-    db: Session = Depends(get_db),
-    current_user: User = Depends(get_current_active_user)
+    db: AsyncSession = Depends(get_async_db),
+    current_user: Principal = Depends(get_current_principal)
 ):
-    """Get detailed result for a graded attempt"""
-    attempt = db.query(StudentAttempt).filter(StudentAttempt.id == attempt_id).first()
+    """
+    Get detailed result for a graded attempt
+    
+    Read from the primary: the results page opens straight after submit,
+    before a replica may have the grading
+    """
+    result = await db.execute(
+        select(StudentAttempt)
+        .options(selectinload(StudentAttempt.exam).selectinload(Exam.exam_questions))
+        .where(StudentAttempt.id == attempt_id)
+    )
+    attempt = result.scalar_one_or_none()
     if not attempt:
         raise HTTPException(
             status_code=status.HTTP_404_NOT_FOUND,
@@ -577,9 +949,10 @@ async def get_attempt_result(
         )
     
     # Get answers
-    answers = db.query(StudentAnswer).filter(
-        StudentAnswer.attempt_id == attempt_id
-    ).all()
+    result = await db.execute(
+        select(StudentAnswer).where(StudentAnswer.attempt_id == attempt_id)
+    )
+    answers = result.scalars().all()
     
     # Calculate statistics
     correct_count = sum(1 for a in answers if a.is_correct)
@@ -614,60 +987,215 @@ async def get_attempt_result(
 
 @router.get("/", response_model=List[AttemptListItem])
 async def list_all_attempts(
+    response: Response,
     skip: int = 0,
-    limit: int = 100,
+    limit: int = Query(100, ge=1, le=500),
+    cursor: Optional[str] = None,
     exam_id: Optional[int] = None,
     student_id: Optional[int] = None,
     status_filter: Optional[str] = None,
-    db: Session = Depends(get_db),
-    current_user: User = Depends(require_any_role("admin", "hall_in_charge"))
+    db: AsyncSession = Depends(get_async_read_db),
+    current_user: Principal = Depends(require_any_role("admin", "hall_in_charge"))
 ):
-    """List all attempts (admin/hall_in_charge only)"""
-    query = db.query(StudentAttempt)
+    """
+    List all attempts (admin/hall_in_charge only), newest first
     
+    Pass the `X-Next-Cursor` response header back as `cursor` for the
+    next page; the header is absent on the last page.
+    """
+    filters = []
     if exam_id:
-        query = query.filter(StudentAttempt.exam_id == exam_id)
+        filters.append(StudentAttempt.exam_id == exam_id)
     if student_id:
-        query = query.filter(StudentAttempt.student_id == student_id)
+        filters.append(StudentAttempt.student_id == student_id)
     if status_filter:
-        query = query.filter(StudentAttempt.status == status_filter)
+        filters.append(StudentAttempt.status == status_filter)
+    
+    return await _list_attempt_page(db, response, filters, cursor, skip, limit)
+
+
+async def _list_attempt_page(
+    db: AsyncSession,
+    response: Response,
+    filters: list,
+    cursor: Optional[str],
+    skip: int,
+    limit: int
+) -> List[AttemptListItem]:
+    """
+    One page of attempts as a single attempt-exam join projection
+    
+    Keyset pagination on (created_at, id): a cursor seeks straight past
+    the previous page's last row, so deep pages cost the same as the
+    first. The seek compares against the anchor row's stored created_at
+    (exact, whatever the driver's timestamp round-trip does); the token's
+    own timestamp is only used if that row is gone. `skip` (OFFSET) is
+    still honoured when no cursor is given, for existing clients.
+    """
+    query = (
+        select(
+            StudentAttempt.id,
+            StudentAttempt.exam_id,
+            StudentAttempt.status,
+            StudentAttempt.start_time,
+            StudentAttempt.submit_time,
+            StudentAttempt.marks_obtained,
+            StudentAttempt.percentage,
+            StudentAttempt.is_passed,
+            StudentAttempt.created_at,
+            Exam.title.label("exam_title"),
+            Exam.duration_minutes.label("exam_duration_minutes"),
+        )
+        .outerjoin(Exam, Exam.id == StudentAttempt.exam_id)
+        .where(*filters)
+        .order_by(StudentAttempt.created_at.desc(), StudentAttempt.id.desc())
+        .limit(limit + 1)
+    )
+    
+    if cursor:
+        try:
+            cursor_created_at, cursor_id = decode_cursor(cursor)
+        except ValueError:
+            raise HTTPException(
+                status_code=status.HTTP_400_BAD_REQUEST,
+                detail="Invalid pagination cursor"
+            )
+        anchor = aliased(StudentAttempt)
+        anchor_created_at = func.coalesce(
+            select(anchor.created_at).where(anchor.id == cursor_id).scalar_subquery(),
+            cursor_created_at
+        )
+        query = query.where(
+            tuple_(StudentAttempt.created_at, StudentAttempt.id)
+            < tuple_(anchor_created_at, cursor_id)
+        )
+    elif skip:
+        query = query.offset(skip)
+    
+    rows = (await db.execute(query)).all()
+    
+    if len(rows) > limit:
+        rows = rows[:limit]
+        response.headers[NEXT_CURSOR_HEADER] = encode_cursor(rows[-1].created_at, rows[-1].id)
+    
+    return [AttemptListItem.model_validate(row) for row in rows]
+
+
+# Rows per INSERT when provisioning attempts
+_PROVISION_CHUNK_SIZE = 1000
+
+
+@router.post("/provision", response_model=AttemptProvisionResult, status_code=status.HTTP_201_CREATED)
+async def provision_attempts(
+    provision_data: AttemptProvision,
+    db: AsyncSession = Depends(get_async_db),
+    current_user: Principal = Depends(require_any_role("admin", "hall_in_charge"))
+):
+    """
+    Create NOT_STARTED attempts for every registered candidate of an exam at a center
     
-    attempts = query.order_by(StudentAttempt.created_at.desc()).offset(skip).limit(limit).all()
+    Run ahead of a mass start: each candidate's start (or begin) then is a
+    single conditional UPDATE instead of lookups, a salt and an insert.
+    Candidates are the active students of the exam's trade assigned to the
+    center. Those already holding a not-started or in-progress attempt of
+    the exam are skipped, so provisioning again only adds newcomers.
     
-    result = []
-    for attempt in attempts:
-        item = AttemptListItem(
-            id=attempt.id,
-            exam_id=attempt.exam_id,
-            status=attempt.status,
-            start_time=attempt.start_time,
-            submit_time=attempt.submit_time,
-            marks_obtained=attempt.marks_obtained,
-            percentage=attempt.percentage,
-            is_passed=attempt.is_passed,
-            exam_title=attempt.exam.title if attempt.exam else None,
-            exam_duration_minutes=attempt.exam.duration_minutes if attempt.exam else None
+    Hall in-charges can only provision their own center.
+    """
+    if (
+        not current_user.has_role("admin")
+        and current_user.center_id != provision_data.center_id
+    ):
+        raise HTTPException(
+            status_code=status.HTTP_403_FORBIDDEN,
+            detail="You can only provision attempts for your own center"
         )
-        result.append(item)
     
-    return result
+    # Locking the exam row serializes provisioning runs of the exam: a
+    # concurrent run sees this one's attempts and skips those candidates
+    result = await db.execute(
+        select(Exam).where(Exam.id == provision_data.exam_id).with_for_update()
+    )
+    exam = result.scalar_one_or_none()
+    if not exam:
+        raise HTTPException(
+            status_code=status.HTTP_404_NOT_FOUND,
+            detail="Exam not found"
+        )
+    
+    if exam.status not in _EXAM_AVAILABLE:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail="Exam is not available for attempts"
+        )
+    
+    candidates = (
+        select(User.id)
+        .join(user_roles, user_roles.c.user_id == User.id)
+        .join(Role, Role.id == user_roles.c.role_id)
+        .where(
+            Role.name == "student",
+            User.is_active.is_(True),
+            User.trade_id == exam.trade_id,
+            User.center_id == provision_data.center_id
+        )
+    )
+    total_candidates = await db.scalar(select(func.count()).select_from(candidates.subquery()))
+    
+    student_ids = (await db.scalars(
+        candidates
+        .where(
+            ~select(StudentAttempt.id).where(
+                StudentAttempt.student_id == User.id,
+                StudentAttempt.exam_id == exam.id,
+                StudentAttempt.status.in_([AttemptStatus.NOT_STARTED, AttemptStatus.IN_PROGRESS])
+            ).exists()
+        )
+        .order_by(User.id)
+    )).all()
+    
+    rows = [
+        {
+            "student_id": student_id,
+            "exam_id": exam.id,
+            "status": AttemptStatus.NOT_STARTED,
+            "duration_minutes": exam.duration_minutes,
+            "total_marks": exam.total_marks,
+            "encryption_salt": secrets.token_urlsafe(16),
+        }
+        for student_id in student_ids
+    ]
+    for offset in range(0, len(rows), _PROVISION_CHUNK_SIZE):
+        await db.execute(insert(StudentAttempt), rows[offset:offset + _PROVISION_CHUNK_SIZE])
+    await db.commit()
+    
+    return AttemptProvisionResult(
+        exam_id=exam.id,
+        center_id=provision_data.center_id,
+        candidates=total_candidates,
+        created=len(rows)
+    )
 
 
 @router.get("/statistics/{exam_id}", response_model=AttemptStatistics)
 async def get_exam_statistics(
     exam_id: int,
-    db: Session = Depends(get_db),
-    current_user: User = Depends(require_any_role("admin", "hall_in_charge"))
+    db: AsyncSession = Depends(get_async_read_db),
+    current_user: Principal = Depends(require_any_role("admin", "hall_in_charge"))
 ):
     """Get statistics for an exam"""
-    exam = db.query(Exam).filter(Exam.id == exam_id).first()
+    result = await db.execute(select(Exam).where(Exam.id == exam_id))
+    exam = result.scalar_one_or_none()
     if not exam:
         raise HTTPException(
             status_code=status.HTTP_404_NOT_FOUND,
             detail="Exam not found"
         )
     
-    attempts = db.query(StudentAttempt).filter(StudentAttempt.exam_id == exam_id).all()
+    result = await db.execute(
+        select(StudentAttempt).where(StudentAttempt.exam_id == exam_id)
+    )
+    attempts = result.scalars().all()
     
     total_attempts = len(attempts)
     completed_attempts = sum(1 for a in attempts if a.status in [AttemptStatus.SUBMITTED, AttemptStatus.GRADED])
@@ -1,18 +1,31 @@
 """
-Authentication endpoints: login, refresh, me, hall_ticket_login
+Authentication endpoints: login, refresh, me, hall_ticket_login,
+signed hall-ticket QR issuance and scanning
 """
-from datetime import datetime
-from fastapi import APIRouter, Depends, HTTPException, status
-from sqlalchemy.orm import Session
-from app.core.database import get_db
+import time
+from datetime import datetime, timedelta
+from typing import Optional, Tuple
+from fastapi import APIRouter, Depends, Header, HTTPException, Query, Response, status
+from sqlalchemy import select
+from sqlalchemy.orm import selectinload
+from sqlalchemy.ext.asyncio import AsyncSession
+from app.core.database import get_async_db
 from app.core.security import (
-    verify_password,
+    HashingOverloadedError,
+    verify_password_async,
     create_access_token,
     create_refresh_token,
     decode_token
 )
+from app.core.config import settings
+from app.core.hall_ticket import render_hall_ticket_qr, sign_hall_ticket, verify_hall_ticket
+from app.models.attempt import AttemptStatus, StudentAttempt
+from app.models.exam import Exam
 from app.models.user import User
 from app.schemas.auth import (
+    AdmissionStatus,
+    HallTicketQR,
+    HallTicketScanRequest,
     LoginRequest,
     HallTicketLoginRequest,
     LoginResponse,
@@ -20,15 +33,117 @@ from app.schemas.auth import (
     Token,
     User as UserSchema
 )
-from app.api.dependencies import get_current_active_user
+from app.api.dependencies import get_current_active_user, require_any_role
+from app.services.admission import TICKET_HEADER, login_admission
+from app.services.principal_cache import Principal, principal_cache
 
 router = APIRouter(prefix="/auth", tags=["Authentication"])
 
 
-@router.post("/login", response_model=LoginResponse)
+def _user_query():
+    """User select with the relationships needed by the login response"""
+    return select(User).options(selectinload(User.roles), selectinload(User.center))
+
+
+async def _issue_tokens(user: User) -> Tuple[str, str]:
+    """
+    Access token carrying the user's authorization claims, plus a refresh token
+    
+    Publishes the user's token version so every node can verify the claims
+    without reading the database.
+    """
+    principal = Principal.from_user(user)
+    await principal_cache.record_token_version(user.id, principal.token_version)
+    
+    access_token = create_access_token(data=principal.to_claims())
+    refresh_token = create_refresh_token(data={"sub": str(user.id)})
+    return access_token, refresh_token
+
+
+async def _verify_secret(plain: str, hashed: str) -> bool:
+    """
+    Check a password or security answer off the event loop
+    
+    Raises:
+        HTTPException: 503 with Retry-After when the hashing pool is saturated
+    """
+    try:
+        return await verify_password_async(plain, hashed)
+    except HashingOverloadedError as e:
+        raise HTTPException(
+            status_code=status.HTTP_503_SERVICE_UNAVAILABLE,
+            detail="Too many sign-ins in progress, please retry shortly",
+            headers={"Retry-After": str(e.retry_after)},
+        )
+
+
+def _admission_status(ticket: str, position: int, eta_seconds: int) -> AdmissionStatus:
+    return AdmissionStatus(
+        ticket=ticket,
+        position=position,
+        eta_seconds=eta_seconds,
+        retry_after_seconds=min(settings.ADMISSION_POLL_SECONDS, eta_seconds)
+    )
+
+
+async def require_admission(
+    ticket: Optional[str] = Header(None, alias=TICKET_HEADER)
+):
+    """
+    Hold a slot of the cluster-wide login budget for the whole request
+    
+    Over budget, responds 429 with a ticket, queue position and ETA; the
+    client polls GET /auth/queue/{ticket} and retries the login with the
+    ticket in the X-Admission-Ticket header to keep its place.
+    """
+    decision = await login_admission.acquire(ticket)
+    if not decision.admitted:
+        queued = _admission_status(decision.ticket, decision.position, decision.eta_seconds)
+        raise HTTPException(
+            status_code=status.HTTP_429_TOO_MANY_REQUESTS,
+            detail={
+                "message": "Sign-in queue is full, keep your place with the ticket",
+                **queued.model_dump(),
+            },
+            headers={
+                "Retry-After": str(queued.retry_after_seconds),
+                TICKET_HEADER: queued.ticket,
+            },
+        )
+    
+    started = time.monotonic()
+    try:
+        yield
+    finally:
+        await login_admission.release(decision.lease, time.monotonic() - started)
+
+
+@router.get("/queue/{ticket}", response_model=AdmissionStatus)
+async def get_queue_status(ticket: str):
+    """
+    Poll a queued login's position and estimated wait
+    
+    Returns 404 once the ticket has expired (not polled in time) or has
+    been admitted; the client then retries the login without a ticket.
+    """
+    decision = await login_admission.status(ticket)
+    if decision is None:
+        raise HTTPException(
+            status_code=status.HTTP_404_NOT_FOUND,
+            detail="Unknown or expired admission ticket"
+        )
+    
+    return _admission_status(decision.ticket, decision.position, decision.eta_seconds)
+
+
+@router.post(
+    "/login",
+    response_model=LoginResponse,
+    dependencies=[Depends(require_admission)]
+)
 async def login(
     login_data: LoginRequest,
-    db: Session = Depends(get_db)
+    db: AsyncSession = Depends(get_async_db)
 ):
     """
     Authenticate user and return access + refresh tokens
@@ -39,9 +154,12 @@ async def login(
     Returns JWT tokens and user information
     """
     # Find user by username or email
-    user = db.query(User).filter(
-        (User.username == login_data.username) | (User.email == login_data.username)
-    ).first()
+    result = await db.execute(
+        _user_query().where(
+            (User.username == login_data.username) | (User.email == login_data.username)
+        )
+    )
+    user = result.scalar_one_or_none()
     
     # Verify user exists
     if not user:
@@ -52,7 +170,7 @@ async def login(
         )
     
     # Verify password
-    if not verify_password(login_data.password, user.hashed_password):
+    if not await _verify_secret(login_data.password, user.hashed_password):
         raise HTTPException(
             status_code=status.HTTP_401_UNAUTHORIZED,
             detail="Incorrect username or password",
@@ -68,11 +186,10 @@ async def login(
     
     # Update last login timestamp
     user.last_login = datetime.utcnow()
-    db.commit()
+    await db.commit()
     
     # Create tokens
-    access_token = create_access_token(data={"sub": str(user.id)})
-    refresh_token = create_refresh_token(data={"sub": str(user.id)})
+    access_token, refresh_token = await _issue_tokens(user)
     
     return LoginResponse(
         access_token=access_token,
@@ -82,10 +199,14 @@ async def login(
     )
 
 
-@router.post("/hall-ticket-login", response_model=LoginResponse)
+@router.post(
+    "/hall-ticket-login",
+    response_model=LoginResponse,
+    dependencies=[Depends(require_admission)]
+)
 async def hall_ticket_login(
     login_data: HallTicketLoginRequest,
-    db: Session = Depends(get_db)
+    db: AsyncSession = Depends(get_async_db)
 ):
     """
     Authenticate student using hall ticket (center-based exam flow like JEE/NPTEL)
@@ -97,9 +218,10 @@ async def hall_ticket_login(
     Returns JWT tokens and user information
     """
     # Find user by hall ticket number
-    user = db.query(User).filter(
-        User.hall_ticket_number == login_data.hall_ticket_number
-    ).first()
+    result = await db.execute(
+        _user_query().where(User.hall_ticket_number == login_data.hall_ticket_number)
+    )
+    user = result.scalar_one_or_none()
     
     # Verify user exists
     if not user:
@@ -127,7 +249,7 @@ async def hall_ticket_login(
     
     # Verify security answer (case-insensitive comparison)
     if user.security_answer_hash:
-        if not verify_password(
+        if not await _verify_secret(
             login_data.security_answer.strip().lower(),
             user.security_answer_hash
         ):
@@ -153,11 +275,164 @@ async def hall_ticket_login(
     
     # Update last login timestamp
     user.last_login = datetime.utcnow()
-    db.commit()
+    await db.commit()
     
     # Create tokens
-    access_token = create_access_token(data={"sub": str(user.id)})
-    refresh_token = create_refresh_token(data={"sub": str(user.id)})
+    access_token, refresh_token = await _issue_tokens(user)
+    
+    return LoginResponse(
+        access_token=access_token,
+        refresh_token=refresh_token,
+        token_type="bearer",
+        user=UserSchema.from_orm(user)
+    )
+
+
+@router.get("/hall-tickets/{hall_ticket_number}/qr", response_model=HallTicketQR)
+async def get_hall_ticket_qr(
+    hall_ticket_number: str,
+    exam_id: int = Query(...),
+    format: str = Query("json", pattern="^(json|png)$"),
+    db: AsyncSession = Depends(get_async_db),
+    current_user: Principal = Depends(require_any_role("admin", "hall_in_charge"))
+):
+    """
+    Issue the signed QR payload printed on a candidate's hall ticket
+    
+    The payload binds hall ticket number, exam and center and is valid from
+    HALL_TICKET_QR_EARLY_MINUTES before the exam opens until it closes (or
+    HALL_TICKET_QR_VALIDITY_HOURS from now for unscheduled exams).
+    Hall in-charges can only issue tickets for their own center.
+    
+    - **format**: "json" for the payload, "png" for a printable QR image
+    """
+    result = await db.execute(
+        select(User).where(User.hall_ticket_number == hall_ticket_number)
+    )
+    user = result.scalar_one_or_none()
+    if not user:
+        raise HTTPException(
+            status_code=status.HTTP_404_NOT_FOUND,
+            detail="Hall ticket not found"
+        )
+    
+    # Same restriction as the scan: staff only handle their own center
+    if current_user.center_id is not None and current_user.center_id != user.center_id:
+        raise HTTPException(
+            status_code=status.HTTP_403_FORBIDDEN,
+            detail="Hall ticket is for another center"
+        )
+    
+    exam = await db.get(Exam, exam_id)
+    if not exam:
+        raise HTTPException(
+            status_code=status.HTTP_404_NOT_FOUND,
+            detail="Exam not found"
+        )
+    
+    now = datetime.utcnow()
+    valid_from = now
+    if exam.start_time:
+        valid_from = exam.start_time - timedelta(minutes=settings.HALL_TICKET_QR_EARLY_MINUTES)
+    valid_until = exam.end_time or valid_from + timedelta(hours=settings.HALL_TICKET_QR_VALIDITY_HOURS)
+    
+    qr_payload = sign_hall_ticket(
+        hall_ticket_number, exam.id, user.center_id, valid_from, valid_until
+    )
+    if format == "png":
+        return Response(content=render_hall_ticket_qr(qr_payload), media_type="image/png")
+    
+    return HallTicketQR(
+        hall_ticket_number=hall_ticket_number,
+        exam_id=exam.id,
+        center_id=user.center_id,
+        valid_from=valid_from,
+        valid_until=valid_until,
+        qr_payload=qr_payload
+    )
+
+
+@router.post("/hall-ticket-scan", response_model=LoginResponse)
+async def hall_ticket_scan(
+    scan_data: HallTicketScanRequest,
+    db: AsyncSession = Depends(get_async_db),
+    current_user: Principal = Depends(require_any_role("hall_auth", "hall_in_charge", "admin"))
+):
+    """
+    Sign a candidate in from a scanned hall-ticket QR code
+    
+    Fast path for hall authenticators: the HMAC signature and validity
+    window are checked instead of the security answer, so no password hash
+    is computed. /hall-ticket-login remains the fallback for candidates
+    without a readable QR code.
+    
+    Returns JWT tokens and user information for the candidate
+    """
+    try:
+        claims = verify_hall_ticket(scan_data.qr_payload)
+    except ValueError as e:
+        raise HTTPException(
+            status_code=status.HTTP_401_UNAUTHORIZED,
+            detail=str(e)
+        )
+    
+    # Staff can only admit candidates reporting to their own center
+    if current_user.center_id is not None and current_user.center_id != claims.center_id:
+        raise HTTPException(
+            status_code=status.HTTP_403_FORBIDDEN,
+            detail="Hall ticket is for another center"
+        )
+    
+    result = await db.execute(
+        _user_query().where(User.hall_ticket_number == claims.hall_ticket_number)
+    )
+    user = result.scalar_one_or_none()
+    if not user:
+        raise HTTPException(
+            status_code=status.HTTP_401_UNAUTHORIZED,
+            detail="Invalid hall ticket number"
+        )
+    
+    # A ticket issued before the candidate was moved to another center
+    if user.center_id != claims.center_id:
+        raise HTTPException(
+            status_code=status.HTTP_403_FORBIDDEN,
+            detail="Hall ticket was issued for a different center"
+        )
+    
+    if not user.is_active:
+        raise HTTPException(
+            status_code=status.HTTP_403_FORBIDDEN,
+            detail="Student account is inactive. Please contact administrator."
+        )
+    
+    if not user.has_role("student"):
+        raise HTTPException(
+            status_code=status.HTTP_403_FORBIDDEN,
+            detail="Hall ticket login is only for students"
+        )
+    
+    # The ticket only admits to the exam it was issued for: the candidate
+    # must hold a provisioned or running attempt of it
+    attempt_id = await db.scalar(
+        select(StudentAttempt.id).where(
+            StudentAttempt.student_id == user.id,
+            StudentAttempt.exam_id == claims.exam_id,
+            StudentAttempt.status.in_([AttemptStatus.NOT_STARTED, AttemptStatus.IN_PROGRESS])
+        ).limit(1)
+    )
+    if attempt_id is None:
+        raise HTTPException(
+            status_code=status.HTTP_403_FORBIDDEN,
+            detail="Hall ticket is not for a current exam of this candidate"
+        )
+    
+    # Update last login timestamp
+    user.last_login = datetime.utcnow()
+    await db.commit()
+    
+    # Create tokens
+    access_token, refresh_token = await _issue_tokens(user)
     
     return LoginResponse(
         access_token=access_token,
@@ -170,7 +445,7 @@ async def hall_ticket_login(
 @router.post("/refresh", response_model=Token)
 async def refresh_token(
     token_data: RefreshTokenRequest,
-    db: Session = Depends(get_db)
+    db: AsyncSession = Depends(get_async_db)
 ):
     """
     Refresh access token using refresh token
@@ -206,7 +481,8 @@ async def refresh_token(
         )
     
     # Verify user exists and is active
-    user = db.query(User).filter(User.id == int(user_id)).first()
+    result = await db.execute(_user_query().where(User.id == int(user_id)))
+    user = result.scalar_one_or_none()
     if not user or not user.is_active:
         raise HTTPException(
             status_code=status.HTTP_401_UNAUTHORIZED,
@@ -215,8 +491,7 @@ async def refresh_token(
         )
     
     # Create new tokens
-    new_access_token = create_access_token(data={"sub": str(user.id)})
-    new_refresh_token = create_refresh_token(data={"sub": str(user.id)})
+    new_access_token, new_refresh_token = await _issue_tokens(user)
     
     return Token(
         access_token=new_access_token,
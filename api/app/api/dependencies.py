@@ -4,24 +4,77 @@ Authentication and authorization dependencies
 from typing import Optional
 from fastapi import Depends, HTTPException, status
 from fastapi.security import HTTPBearer, HTTPAuthorizationCredentials
-from sqlalchemy.orm import Session
+from sqlalchemy.orm import selectinload
 from sqlalchemy.ext.asyncio import AsyncSession
 from sqlalchemy import select
-from app.core.database import get_db
+from app.core.database import get_async_db
 from app.core.security import decode_token
 from app.models.user import User
 from app.schemas.auth import TokenPayload
+from app.services.principal_cache import Principal, principal_cache
 
 # HTTP Bearer token scheme
 security = HTTPBearer()
 
 
-async def get_current_user(
+async def _load_user(db: AsyncSession, user_id: int) -> Optional[User]:
+    """
+    Load a user with roles and center eager-loaded
+
+    Lazy loads are not allowed on an AsyncSession; roles and center are
+    needed for the User response schema.
+    """
+    result = await db.execute(
+        select(User)
+        .options(selectinload(User.roles), selectinload(User.center))
+        .where(User.id == user_id)
+    )
+    return result.scalar_one_or_none()
+
+
+class TokenRevokedError(Exception):
+    """Access token predates the user's current token version"""
+
+
+async def _resolve_principal(
+    db: AsyncSession,
+    user_id: int,
+    payload: dict
+) -> Optional[Principal]:
+    """
+    Authorize from verified token claims when possible
+    
+    Tokens carrying claims are checked against the Redis token-version map
+    only. Without a Redis entry (or for tokens issued without claims) the
+    principal comes from the principal cache.
+    
+    Raises:
+        TokenRevokedError: If the token's version is no longer current
+    """
+    claimed = Principal.from_claims(payload)
+    if claimed is not None:
+        current_version = await principal_cache.get_token_version(user_id)
+        if current_version is not None:
+            if claimed.token_version != current_version:
+                raise TokenRevokedError()
+            return claimed
+    
+    principal = await principal_cache.get(db, user_id)
+    if principal is not None and claimed is not None:
+        if claimed.token_version != principal.token_version:
+            raise TokenRevokedError()
+    return principal
+
+
+async def get_current_principal(
     credentials: HTTPAuthorizationCredentials = Depends(security),
-    db: Session = Depends(get_db)
-) -> User:
+    db: AsyncSession = Depends(get_async_db)
+) -> Principal:
     """
-    Dependency to get the current authenticated user from JWT token
+    Dependency to get the current authenticated principal from JWT token
+    
+    Served from token claims or the principal cache; the database is only
+    read on a cache miss.
     
     Raises:
         HTTPException: If token is invalid or user not found
@@ -55,21 +108,50 @@ async def get_current_user(
             headers={"WWW-Authenticate": "Bearer"},
         )
     
-    # Fetch user from database
-    user = db.query(User).filter(User.id == int(user_id)).first()
-    if user is None:
+    try:
+        principal = await _resolve_principal(db, int(user_id), payload)
+    except TokenRevokedError:
+        raise HTTPException(
+            status_code=status.HTTP_401_UNAUTHORIZED,
+            detail="Token has been revoked",
+            headers={"WWW-Authenticate": "Bearer"},
+        )
+    
+    if principal is None:
         raise HTTPException(
             status_code=status.HTTP_404_NOT_FOUND,
             detail="User not found"
         )
     
     # Check if user is active
-    if not user.is_active:
+    if not principal.is_active:
         raise HTTPException(
             status_code=status.HTTP_403_FORBIDDEN,
             detail="Inactive user"
         )
     
+    return principal
+
+
+async def get_current_user(
+    principal: Principal = Depends(get_current_principal),
+    db: AsyncSession = Depends(get_async_db)
+) -> User:
+    """
+    Dependency to get the current user's full row (profile, roles, center)
+    
+    Only for endpoints that need more than the principal carries.
+    
+    Raises:
+        HTTPException: If token is invalid or user not found
+    """
+    user = await _load_user(db, principal.id)
+    if user is None:
+        raise HTTPException(
+            status_code=status.HTTP_404_NOT_FOUND,
+            detail="User not found"
+        )
+    
     return user
 
 
@@ -97,9 +179,12 @@ class RoleChecker:
     def __init__(self, required_roles: list[str]):
         self.required_roles = required_roles
     
-    async def __call__(self, user: User = Depends(get_current_active_user)):
+    async def __call__(
+        self,
+        principal: Principal = Depends(get_current_principal)
+    ) -> Principal:
         """Check if user has any of the required roles"""
-        user_roles = user.get_role_names()
+        user_roles = principal.get_role_names()
         
         # Check if user has any of the required roles
         if not any(role in user_roles for role in self.required_roles):
@@ -108,7 +193,7 @@ class RoleChecker:
                 detail=f"User does not have required role. Required: {self.required_roles}"
             )
         
-        return user
+        return principal
 
 
 def require_role(role_name: str):
@@ -131,10 +216,10 @@ def require_any_role(*role_names: str):
     return RoleChecker(list(role_names))
 
 
-def get_current_user_ws(
+async def get_current_user_ws(
     token: str,
-    db: Session
-) -> Optional[User]:
+    db: AsyncSession
+) -> Optional[Principal]:
     """
     Get current user from JWT token for WebSocket connections
     
@@ -143,7 +228,7 @@ def get_current_user_ws(
         db: Database session
         
     Returns:
-        User if valid, None otherwise
+        Principal if valid, None otherwise
     """
     try:
         # Decode token
@@ -161,17 +246,17 @@ def get_current_user_ws(
         if user_id is None:
             return None
         
-        # Fetch user from database (synchronous)
-        user = db.query(User).filter(User.id == int(user_id)).first()
+        # Claims or cache: reconnect storms should not stampede the database
+        principal = await _resolve_principal(db, int(user_id), payload)
         
-        if user is None:
+        if principal is None:
             return None
         
         # Check if user is active
-        if not user.is_active:
+        if not principal.is_active:
             return None
         
-        return user
+        return principal
         
     except Exception:
         return None
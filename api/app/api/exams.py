@@ -8,8 +8,8 @@ from sqlalchemy import or_
 import csv
 import io
 from app.core.database import get_db
-from app.api.dependencies import get_current_active_user, require_any_role
-from app.models.user import User
+from app.api.dependencies import get_current_principal, require_any_role
+from app.services.principal_cache import Principal
 from app.models.exam import (
     Exam, Question, QuestionBank, Trade, ExamQuestion,
     QuestionType, DifficultyLevel
@@ -41,7 +41,7 @@ router = APIRouter(prefix="/exams", tags=["Exams"])
 async def create_trade(
     trade: TradeCreate,
     db: Session = Depends(get_db),
-    current_user: User = Depends(require_any_role("admin", "hall_in_charge"))
+    current_user: Principal = Depends(require_any_role("admin", "hall_in_charge"))
 ):
     """
     Create a new trade/course
@@ -70,7 +70,7 @@ async def list_trades(
     limit: int = 100,
     active_only: bool = True,
     db: Session = Depends(get_db),
-    current_user: User = Depends(get_current_active_user)
+    current_user: Principal = Depends(get_current_principal)
 ):
     """
     List all trades
@@ -88,7 +88,7 @@ async def list_trades(
 async def get_trade(
     trade_id: int,
     db: Session = Depends(get_db),
-    current_user: User = Depends(get_current_active_user)
+    current_user: Principal = Depends(get_current_principal)
 ):
     """Get a specific trade by ID"""
     trade = db.query(Trade).filter(Trade.id == trade_id).first()
@@ -105,7 +105,7 @@ async def update_trade(
     trade_id: int,
     trade_update: TradeUpdate,
     db: Session = Depends(get_db),
-    current_user: User = Depends(require_any_role("admin", "hall_in_charge"))
+    current_user: Principal = Depends(require_any_role("admin", "hall_in_charge"))
 ):
     """Update a trade"""
     db_trade = db.query(Trade).filter(Trade.id == trade_id).first()
@@ -128,7 +128,7 @@ async def update_trade(
 async def delete_trade(
     trade_id: int,
     db: Session = Depends(get_db),
-    current_user: User = Depends(require_any_role("admin"))
+    current_user: Principal = Depends(require_any_role("admin"))
 ):
     """Delete a trade (admin only)"""
     db_trade = db.query(Trade).filter(Trade.id == trade_id).first()
@@ -149,7 +149,7 @@ async def delete_trade(
 async def create_question_bank(
     qbank: QuestionBankCreate,
     db: Session = Depends(get_db),
-    current_user: User = Depends(require_any_role("admin", "hall_in_charge"))
+    current_user: Principal = Depends(require_any_role("admin", "hall_in_charge"))
 ):
     """Create a new question bank"""
     # Verify trade exists
@@ -174,7 +174,7 @@ async def list_question_banks(
     limit: int = 100,
     trade_id: Optional[int] = None,
     db: Session = Depends(get_db),
-    current_user: User = Depends(get_current_active_user)
+    current_user: Principal = Depends(get_current_principal)
 ):
     """List all question banks"""
     query = db.query(QuestionBank)
@@ -192,7 +192,7 @@ async def list_question_banks(
 async def create_question(
     question: QuestionCreate,
     db: Session = Depends(get_db),
-    current_user: User = Depends(require_any_role("admin", "hall_in_charge"))
+    current_user: Principal = Depends(require_any_role("admin", "hall_in_charge"))
 ):
     """Create a new question"""
     # Verify question bank exists
@@ -219,7 +219,7 @@ async def list_questions(
     difficulty: Optional[DifficultyLevel] = None,
     question_type: Optional[QuestionType] = None,
     db: Session = Depends(get_db),
-    current_user: User = Depends(get_current_active_user)
+    current_user: Principal = Depends(get_current_principal)
 ):
     """List questions with filters"""
     query = db.query(Question)
@@ -239,7 +239,7 @@ async def list_questions(
 async def get_question(
     question_id: int,
     db: Session = Depends(get_db),
-    current_user: User = Depends(get_current_active_user)
+    current_user: Principal = Depends(get_current_principal)
 ):
     """Get a specific question"""
     question = db.query(Question).filter(Question.id == question_id).first()
@@ -256,7 +256,7 @@ async def update_question(
     question_id: int,
     question_update: QuestionUpdate,
     db: Session = Depends(get_db),
-    current_user: User = Depends(require_any_role("admin", "hall_in_charge"))
+    current_user: Principal = Depends(require_any_role("admin", "hall_in_charge"))
 ):
     """Update a question"""
     db_question = db.query(Question).filter(Question.id == question_id).first()
@@ -278,7 +278,7 @@ async def update_question(
 async def delete_question(
     question_id: int,
     db: Session = Depends(get_db),
-    current_user: User = Depends(require_any_role("admin", "hall_in_charge"))
+    current_user: Principal = Depends(require_any_role("admin", "hall_in_charge"))
 ):
     """Delete a question"""
     db_question = db.query(Question).filter(Question.id == question_id).first()
@@ -300,7 +300,7 @@ async def import_questions_csv(
     qbank_id: int,
     file: UploadFile = File(...),
     db: Session = Depends(get_db),
-    current_user: User = Depends(require_any_role("admin", "hall_in_charge"))
+    current_user: Principal = Depends(require_any_role("admin", "hall_in_charge"))
 ):
     """
     Import questions from CSV file
@@ -387,7 +387,7 @@ async def import_questions_csv(
 async def create_exam(
     exam: ExamCreate,
     db: Session = Depends(get_db),
-    current_user: User = Depends(require_any_role("admin", "hall_in_charge"))
+    current_user: Principal = Depends(require_any_role("admin", "hall_in_charge"))
 ):
     """Create a new exam"""
     # Verify trade exists
@@ -429,7 +429,7 @@ async def list_exams(
     trade_id: Optional[int] = None,
     status_filter: Optional[str] = None,
     db: Session = Depends(get_db),
-    current_user: User = Depends(get_current_active_user)
+    current_user: Principal = Depends(get_current_principal)
 ):
     """List all exams"""
     query = db.query(Exam)
@@ -447,7 +447,7 @@ async def list_exams(
 async def get_exam(
     exam_id: int,
     db: Session = Depends(get_db),
-    current_user: User = Depends(get_current_active_user)
+    current_user: Principal = Depends(get_current_principal)
 ):
     """Get a specific exam with questions"""
     from sqlalchemy.orm import joinedload
@@ -479,7 +479,7 @@ async def update_exam(
     exam_id: int,
     exam_update: ExamUpdate,
     db: Session = Depends(get_db),
-    current_user: User = Depends(require_any_role("admin", "hall_in_charge"))
+    current_user: Principal = Depends(require_any_role("admin", "hall_in_charge"))
 ):
     """Update an exam"""
     db_exam = db.query(Exam).filter(Exam.id == exam_id).first()
@@ -501,7 +501,7 @@ async def update_exam(
 async def delete_exam(
     exam_id: int,
     db: Session = Depends(get_db),
-    current_user: User = Depends(require_any_role("admin"))
+    current_user: Principal = Depends(require_any_role("admin"))
 ):
     """Delete an exam"""
     db_exam = db.query(Exam).filter(Exam.id == exam_id).first()
@@ -520,7 +520,7 @@ async def delete_exam(
 async def export_exam_qti(
     exam_id: int,
     db: Session = Depends(get_db),
-    current_user: User = Depends(require_any_role("admin", "hall_in_charge"))
+    current_user: Principal = Depends(require_any_role("admin", "hall_in_charge"))
 ):
     """Export exam in QTI-like JSON format"""
     exam = db.query(Exam).filter(Exam.id == exam_id).first()
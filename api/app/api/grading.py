@@ -5,11 +5,12 @@ Supports CRUD operations for rubrics and manual grading workflows
 from typing import List, Optional
 from fastapi import APIRouter, Depends, HTTPException, status, Query
 from sqlalchemy.orm import Session
-from sqlalchemy import and_, func, desc
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy import and_, func, desc, select
 
-from app.core.database import get_db
-from app.api.dependencies import get_current_active_user, require_role, require_any_role
-from app.models.user import User
+from app.core.database import get_db, get_async_read_db
+from app.api.dependencies import get_current_principal, require_role, require_any_role
+from app.services.principal_cache import Principal
 from app.models.rubric import (
     Rubric, RubricCriterion, RubricLevel, QuestionRubric,
     GradingFeedback, CriterionScore, RubricType, ScoringMethod
@@ -35,7 +36,7 @@ router = APIRouter(prefix="/rubrics", tags=["Rubrics & Grading"])
 async def create_rubric(
     rubric_data: RubricCreate,
     db: Session = Depends(get_db),
-    current_user: User = Depends(require_any_role(["admin", "instructor"]))
+    current_user: Principal = Depends(require_any_role(["admin", "instructor"]))
 ):
     """
     Create a new grading rubric with criteria and levels
@@ -94,7 +95,7 @@ async def list_rubrics(
     is_active: Optional[bool] = None,
     search: Optional[str] = None,
     db: Session = Depends(get_db),
-    current_user: User = Depends(require_any_role(["admin", "instructor", "hall_in_charge"]))
+    current_user: Principal = Depends(require_any_role(["admin", "instructor", "hall_in_charge"]))
 ):
     """List all rubrics with optional filtering"""
     query = db.query(
@@ -141,7 +142,7 @@ async def list_rubrics(
 async def get_rubric(
     rubric_id: int,
     db: Session = Depends(get_db),
-    current_user: User = Depends(get_current_active_user)
+    current_user: Principal = Depends(get_current_principal)
 ):
     """Get rubric details with criteria and levels"""
     rubric = db.query(Rubric).filter(Rubric.id == rubric_id).first()
@@ -160,7 +161,7 @@ async def update_rubric(
     rubric_id: int,
     rubric_data: RubricUpdate,
     db: Session = Depends(get_db),
-    current_user: User = Depends(require_any_role(["admin", "instructor"]))
+    current_user: Principal = Depends(require_any_role(["admin", "instructor"]))
 ):
     """Update rubric (title, description, active status only)"""
     rubric = db.query(Rubric).filter(Rubric.id == rubric_id).first()
@@ -196,7 +197,7 @@ async def update_rubric(
 async def delete_rubric(
     rubric_id: int,
     db: Session = Depends(get_db),
-    current_user: User = Depends(require_any_role(["admin", "instructor"]))
+    current_user: Principal = Depends(require_any_role(["admin", "instructor"]))
 ):
     """Delete a rubric (only if not used in grading)"""
     rubric = db.query(Rubric).filter(Rubric.id == rubric_id).first()
@@ -235,7 +236,7 @@ async def delete_rubric(
 async def assign_rubric_to_question(
     assignment: QuestionRubricAssign,
     db: Session = Depends(get_db),
-    current_user: User = Depends(require_any_role(["admin", "instructor"]))
+    current_user: Principal = Depends(require_any_role(["admin", "instructor"]))
 ):
     """Assign a rubric to a question"""
     # Verify question exists
@@ -288,7 +289,7 @@ async def assign_rubric_to_question(
 async def submit_grading_feedback(
     grading: GradingFeedbackCreate,
     db: Session = Depends(get_db),
-    current_user: User = Depends(require_any_role(["admin", "instructor", "hall_in_charge"]))
+    current_user: Principal = Depends(require_any_role(["admin", "instructor", "hall_in_charge"]))
 ):
     """
     Submit grading feedback using a rubric
@@ -360,7 +361,7 @@ async def submit_grading_feedback(
 async def get_grading_feedback(
     feedback_id: int,
     db: Session = Depends(get_db),
-    current_user: User = Depends(get_current_active_user)
+    current_user: Principal = Depends(get_current_principal)
 ):
     """Get grading feedback details"""
     feedback = db.query(GradingFeedback).filter(GradingFeedback.id == feedback_id).first()
@@ -378,7 +379,7 @@ async def get_grading_feedback(
 async def get_answer_feedback(
     answer_id: int,
     db: Session = Depends(get_db),
-    current_user: User = Depends(get_current_active_user)
+    current_user: Principal = Depends(get_current_principal)
 ):
     """Get grading feedback for a specific answer"""
     feedback = db.query(GradingFeedback).filter(
@@ -395,7 +396,7 @@ async def get_answer_feedback(
 async def get_grading_progress(
     attempt_id: int,
     db: Session = Depends(get_db),
-    current_user: User = Depends(require_any_role(["admin", "instructor", "hall_in_charge"]))
+    current_user: Principal = Depends(require_any_role(["admin", "instructor", "hall_in_charge"]))
 ):
     """Get grading progress for an attempt"""
     attempt = db.query(StudentAttempt).filter(StudentAttempt.id == attempt_id).first()
@@ -475,8 +476,8 @@ def _build_feedback_response(feedback: GradingFeedback, db: Session) -> GradingF
 @router.get("/analytics/question/{question_id}")
 async def get_question_analytics(
     question_id: int,
-    db: Session = Depends(get_db),
-    current_user: User = Depends(require_any_role(["admin", "instructor", "hall_in_charge"]))
+    db: AsyncSession = Depends(get_async_read_db),
+    current_user: Principal = Depends(require_any_role(["admin", "instructor", "hall_in_charge"]))
 ):
     """
     Get detailed analytics for a question
@@ -487,8 +488,9 @@ async def get_question_analytics(
     - Score distribution
     - Average score and standard deviation
     """
-    analytics = AnalyticsService(db)
-    stats = analytics.get_question_statistics(question_id)
+    stats = await db.run_sync(
+        lambda session: AnalyticsService(session).get_question_statistics(question_id)
+    )
     
     return stats
 
@@ -496,8 +498,8 @@ async def get_question_analytics(
 @router.get("/analytics/exam/{exam_id}")
 async def get_exam_analytics(
     exam_id: int,
-    db: Session = Depends(get_db),
-    current_user: User = Depends(require_any_role(["admin", "instructor", "hall_in_charge"]))
+    db: AsyncSession = Depends(get_async_read_db),
+    current_user: Principal = Depends(require_any_role(["admin", "instructor", "hall_in_charge"]))
 ):
     """
     Get comprehensive analytics for an exam
@@ -508,8 +510,9 @@ async def get_exam_analytics(
     - Percentiles (10th, 25th, 50th, 75th, 90th)
     - Score distribution by grade
     """
-    analytics = AnalyticsService(db)
-    stats = analytics.get_exam_statistics(exam_id)
+    stats = await db.run_sync(
+        lambda session: AnalyticsService(session).get_exam_statistics(exam_id)
+    )
     
     return stats
 
@@ -517,8 +520,8 @@ async def get_exam_analytics(
 @router.get("/analytics/attempt/{attempt_id}")
 async def get_attempt_analytics(
     attempt_id: int,
-    db: Session = Depends(get_db),
-    current_user: User = Depends(get_current_active_user)
+    db: AsyncSession = Depends(get_async_read_db),
+    current_user: Principal = Depends(get_current_principal)
 ):
     """
     Get analytics for a specific attempt
@@ -529,7 +532,7 @@ async def get_attempt_analytics(
     - Comparison to exam average
     """
     # Check authorization - student can only view their own
-    attempt = db.query(StudentAttempt).filter(StudentAttempt.id == attempt_id).first()
+    attempt = await db.scalar(select(StudentAttempt).where(StudentAttempt.id == attempt_id))
     if not attempt:
         raise HTTPException(status_code=404, detail="Attempt not found")
     
@@ -537,7 +540,8 @@ async def get_attempt_analytics(
         if attempt.student_id != current_user.id:
             raise HTTPException(status_code=403, detail="Not authorized to view this attempt")
     
-    analytics = AnalyticsService(db)
-    stats = analytics.get_attempt_analytics(attempt_id)
+    stats = await db.run_sync(
+        lambda session: AnalyticsService(session).get_attempt_analytics(attempt_id)
+    )
     
     return stats
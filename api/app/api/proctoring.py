@@ -4,12 +4,12 @@ Proctoring API endpoints for logging and monitoring exam activities
 from datetime import datetime
 from typing import List, Optional
 from fastapi import APIRouter, Depends, HTTPException, status, Request
-from sqlalchemy.orm import Session
-from sqlalchemy import func, and_
+from sqlalchemy import func, and_, select
+from sqlalchemy.ext.asyncio import AsyncSession
 
-from app.core.database import get_db
-from app.api.dependencies import get_current_user
-from app.models.user import User
+from app.core.database import get_async_db
+from app.api.dependencies import get_current_principal
+from app.services.principal_cache import Principal
 from app.models.attempt import StudentAttempt, AttemptStatus
 from app.models.proctoring import ProctoringEvent, QuestionTiming
 from app.schemas.proctoring import (
@@ -29,8 +29,8 @@ router = APIRouter(prefix="/proctoring", tags=["proctoring"])
 async def log_proctoring_event(
     event_data: ProctoringEventCreate,
     request: Request,
-    db: Session = Depends(get_db),
-    current_user: User = Depends(get_current_user)
+    db: AsyncSession = Depends(get_async_db),
+    current_user: Principal = Depends(get_current_principal)
 ):
     """
     Log a proctoring event during an exam.
@@ -47,12 +47,15 @@ async def log_proctoring_event(
     - developer_tools_attempt: F12 or dev tools access attempted
     """
     # Verify the attempt belongs to the current user
-    attempt = db.query(StudentAttempt).filter(
-        and_(
-            StudentAttempt.id == event_data.attempt_id,
-            StudentAttempt.student_id == current_user.id
+    result = await db.execute(
+        select(StudentAttempt).where(
+            and_(
+                StudentAttempt.id == event_data.attempt_id,
+                StudentAttempt.student_id == current_user.id
+            )
         )
-    ).first()
+    )
+    attempt = result.scalar_one_or_none()
     
     if not attempt:
         raise HTTPException(
@@ -80,8 +83,8 @@ async def log_proctoring_event(
     )
     
     db.add(event)
-    db.commit()
-    db.refresh(event)
+    await db.commit()
+    await db.refresh(event)
     
     return event
 
@@ -89,20 +92,23 @@ async def log_proctoring_event(
 @router.post("/question-timing", response_model=QuestionTimingResponse)
 async def update_question_timing(
     timing_data: QuestionTimingUpdate,
-    db: Session = Depends(get_db),
-    current_user: User = Depends(get_current_user)
+    db: AsyncSession = Depends(get_async_db),
+    current_user: Principal = Depends(get_current_principal)
 ):
     """
     Update or create question timing data.
     Tracks how long a student spends on each question.
     """
     # Verify the attempt belongs to the current user
-    attempt = db.query(StudentAttempt).filter(
-        and_(
-            StudentAttempt.id == timing_data.attempt_id,
-            StudentAttempt.student_id == current_user.id
+    result = await db.execute(
+        select(StudentAttempt).where(
+            and_(
+                StudentAttempt.id == timing_data.attempt_id,
+                StudentAttempt.student_id == current_user.id
+            )
         )
-    ).first()
+    )
+    attempt = result.scalar_one_or_none()
     
     if not attempt:
         raise HTTPException(
@@ -111,12 +117,15 @@ async def update_question_timing(
         )
     
     # Find existing timing record or create new one
-    timing = db.query(QuestionTiming).filter(
-        and_(
-            QuestionTiming.attempt_id == timing_data.attempt_id,
-            QuestionTiming.question_id == timing_data.question_id
+    result = await db.execute(
+        select(QuestionTiming).where(
+            and_(
+                QuestionTiming.attempt_id == timing_data.attempt_id,
+                QuestionTiming.question_id == timing_data.question_id
+            )
         )
-    ).first()
+    )
+    timing = result.scalar_one_or_none()
     
     if timing:
         # Update existing record
@@ -144,8 +153,8 @@ async def update_question_timing(
         )
         db.add(timing)
     
-    db.commit()
-    db.refresh(timing)
+    await db.commit()
+    await db.refresh(timing)
     
     return timing
 
@@ -157,15 +166,16 @@ async def get_attempt_events(
     severity: Optional[str] = None,
     skip: int = 0,
     limit: int = 100,
-    db: Session = Depends(get_db),
-    current_user: User = Depends(get_current_user)
+    db: AsyncSession = Depends(get_async_db),
+    current_user: Principal = Depends(get_current_principal)
 ):
     """
     Get all proctoring events for an exam attempt.
     Admin/Grader can view any attempt, students can only view their own.
     """
     # Check access permissions
-    attempt = db.query(StudentAttempt).filter(StudentAttempt.id == attempt_id).first()
+    result = await db.execute(select(StudentAttempt).where(StudentAttempt.id == attempt_id))
+    attempt = result.scalar_one_or_none()
     
     if not attempt:
         raise HTTPException(
@@ -181,16 +191,19 @@ async def get_attempt_events(
         )
     
     # Build query with filters
-    query = db.query(ProctoringEvent).filter(ProctoringEvent.attempt_id == attempt_id)
+    query = select(ProctoringEvent).where(ProctoringEvent.attempt_id == attempt_id)
     
     if event_type:
-        query = query.filter(ProctoringEvent.event_type == event_type)
+        query = query.where(ProctoringEvent.event_type == event_type)
     
     if severity:
-        query = query.filter(ProctoringEvent.severity == severity)
+        query = query.where(ProctoringEvent.severity == severity)
     
     # Order by timestamp descending (most recent first)
-    events = query.order_by(ProctoringEvent.event_timestamp.desc()).offset(skip).limit(limit).all()
+    result = await db.execute(
+        query.order_by(ProctoringEvent.event_timestamp.desc()).offset(skip).limit(limit)
+    )
+    events = result.scalars().all()
     
     return events
 
@@ -198,15 +211,16 @@ async def get_attempt_events(
 @router.get("/attempt/{attempt_id}/violations", response_model=ViolationSummary)
 async def get_attempt_violations(
     attempt_id: int,
-    db: Session = Depends(get_db),
-    current_user: User = Depends(get_current_user)
+    db: AsyncSession = Depends(get_async_db),
+    current_user: Principal = Depends(get_current_principal)
 ):
     """
     Get a summary of violations for an exam attempt.
     Useful for admin dashboard to quickly identify suspicious activity.
     """
     # Check access permissions
-    attempt = db.query(StudentAttempt).filter(StudentAttempt.id == attempt_id).first()
+    result = await db.execute(select(StudentAttempt).where(StudentAttempt.id == attempt_id))
+    attempt = result.scalar_one_or_none()
     
     if not attempt:
         raise HTTPException(
@@ -222,27 +236,33 @@ async def get_attempt_violations(
         )
     
     # Count violations by severity
-    violation_counts = db.query(
-        ProctoringEvent.severity,
-        func.count(ProctoringEvent.id).label("count")
-    ).filter(
-        ProctoringEvent.attempt_id == attempt_id
-    ).group_by(
-        ProctoringEvent.severity
-    ).all()
+    result = await db.execute(
+        select(
+            ProctoringEvent.severity,
+            func.count(ProctoringEvent.id).label("count")
+        ).where(
+            ProctoringEvent.attempt_id == attempt_id
+        ).group_by(
+            ProctoringEvent.severity
+        )
+    )
+    violation_counts = result.all()
     
     # Count specific violation types
-    event_type_counts = db.query(
-        ProctoringEvent.event_type,
-        func.count(ProctoringEvent.id).label("count")
-    ).filter(
-        and_(
-            ProctoringEvent.attempt_id == attempt_id,
-            ProctoringEvent.severity.in_(["warning", "violation"])
+    result = await db.execute(
+        select(
+            ProctoringEvent.event_type,
+            func.count(ProctoringEvent.id).label("count")
+        ).where(
+            and_(
+                ProctoringEvent.attempt_id == attempt_id,
+                ProctoringEvent.severity.in_(["warning", "violation"])
+            )
+        ).group_by(
+            ProctoringEvent.event_type
         )
-    ).group_by(
-        ProctoringEvent.event_type
-    ).all()
+    )
+    event_type_counts = result.all()
     
     # Convert to dictionaries
     severity_summary = {row.severity: row.count for row in violation_counts}
@@ -252,12 +272,15 @@ async def get_attempt_violations(
     total_violations = severity_summary.get("violation", 0) + severity_summary.get("warning", 0)
     
     # Get most recent violation
-    recent_violation = db.query(ProctoringEvent).filter(
-        and_(
-            ProctoringEvent.attempt_id == attempt_id,
-            ProctoringEvent.severity.in_(["warning", "violation"])
-        )
-    ).order_by(ProctoringEvent.event_timestamp.desc()).first()
+    result = await db.execute(
+        select(ProctoringEvent).where(
+            and_(
+                ProctoringEvent.attempt_id == attempt_id,
+                ProctoringEvent.severity.in_(["warning", "violation"])
+            )
+        ).order_by(ProctoringEvent.event_timestamp.desc()).limit(1)
+    )
+    recent_violation = result.scalar_one_or_none()
     
     return ViolationSummary(
         attempt_id=attempt_id,
@@ -275,15 +298,16 @@ async def get_attempt_violations(
 @router.get("/attempt/{attempt_id}/question-timings", response_model=List[QuestionTimingResponse])
 async def get_attempt_question_timings(
     attempt_id: int,
-    db: Session = Depends(get_db),
-    current_user: User = Depends(get_current_user)
+    db: AsyncSession = Depends(get_async_db),
+    current_user: Principal = Depends(get_current_principal)
 ):
     """
     Get question timing data for an exam attempt.
     Shows how long the student spent on each question.
     """
     # Check access permissions
-    attempt = db.query(StudentAttempt).filter(StudentAttempt.id == attempt_id).first()
+    result = await db.execute(select(StudentAttempt).where(StudentAttempt.id == attempt_id))
+    attempt = result.scalar_one_or_none()
     
     if not attempt:
         raise HTTPException(
@@ -298,8 +322,11 @@ async def get_attempt_question_timings(
             detail="Access denied"
         )
     
-    timings = db.query(QuestionTiming).filter(
-        QuestionTiming.attempt_id == attempt_id
-    ).order_by(QuestionTiming.total_time_seconds.desc()).all()
+    result = await db.execute(
+        select(QuestionTiming).where(
+            QuestionTiming.attempt_id == attempt_id
+        ).order_by(QuestionTiming.total_time_seconds.desc())
+    )
+    timings = result.scalars().all()
     
     return timings
@@ -9,8 +9,9 @@ from typing import Optional
 
 from app.core.database import get_db
 from app.api.dependencies import get_current_user, require_role
-from app.api.ws_attempts import manager as connection_manager
+from app.api.ws_attempts import cluster_connections as connection_manager
 from app.models.user import User
+from app.services.principal_cache import Principal
 from app.models.transfer import Transfer, TransferStatus
 from app.models.audit_log import AuditLog
 from app.schemas.transfer import (
@@ -69,13 +70,17 @@ async def request_transfer(
         raise HTTPException(status_code=status.HTTP_500_INTERNAL_SERVER_ERROR, detail=str(e))
 
 
-@router.post("/{transfer_id}/approve", response_model=TransferResponse)
+@router.post(
+    "/{transfer_id}/approve",
+    response_model=TransferResponse,
+    dependencies=[Depends(require_role("hall_in_charge"))]
+)
 async def approve_transfer(
     transfer_id: int,
     approval_data: TransferApproval,
     request: Request,
     db: Session = Depends(get_db),
-    current_user: User = Depends(require_role("hall_in_charge"))
+    current_user: User = Depends(get_current_user)
 ):
     """
     Approve or reject a transfer request
@@ -245,7 +250,7 @@ async def get_transfer(
 async def get_transfer_audit_log(
     transfer_id: int,
     db: Session = Depends(get_db),
-    current_user: User = Depends(require_role("hall_in_charge"))
+    current_user: Principal = Depends(require_role("hall_in_charge"))
 ):
     """
     Get audit log for a transfer
@@ -2,26 +2,42 @@
 WebSocket API for Real-time Exam Attempts
 Handles WebSocket connections, checkpointing, and real-time updates
 """
-from fastapi import APIRouter, WebSocket, WebSocketDisconnect, Depends, Query, status
-from sqlalchemy.ext.asyncio import AsyncSession
-from sqlalchemy.orm import Session
+from fastapi import APIRouter, WebSocket, WebSocketDisconnect, Depends, HTTPException, Query, status
+from sqlalchemy.ext.asyncio import async_sessionmaker
 from sqlalchemy import select
-from typing import Optional
+from typing import Optional, Set
 import uuid
 import json
 import logging
 
-from app.api.dependencies import get_current_user_ws, get_db
-from app.models.user import User
+from app.api.dependencies import get_current_user_ws, require_any_role
+from app.core.database import get_async_session_factory
+from app.services.principal_cache import Principal
 from app.models.attempt import StudentAttempt, AttemptStatus
 from app.core.websocket import ConnectionManager
+from app.core.exam_clock import ExamClock, TIME_EXPIRED_MESSAGE
 from app.core.config import settings
+from app.services.answer_log import answer_change_log
 from app.services.checkpoint import checkpoint_service
-from app.services.redis import redis_service, get_attempt_channel
+from app.services.presence import presence_registry
+from app.services.redis import (
+    redis_service,
+    get_center_channel,
+    get_center_channel_pattern,
+    get_exam_channel,
+    get_exam_channel_pattern,
+    get_worker_channel,
+    parse_channel_id
+)
 from app.schemas.websocket import (
+    BroadcastRequest,
+    BroadcastResult,
+    AttemptPresence,
     CheckpointRequest,
+    BatchCheckpointRequest,
     PongMessage,
     create_checkpoint_ack,
+    create_batch_checkpoint_ack,
     create_checkpoint_error,
     create_time_update,
     create_notification,
@@ -31,48 +47,80 @@ from app.schemas.websocket import (
 
 logger = logging.getLogger(__name__)
 
+# Relayed-message field naming the worker that already delivered it locally
+ORIGIN_FIELD = "_origin"
+
 router = APIRouter(prefix="/ws", tags=["websocket"])
 
 # Global connection manager
 manager = ConnectionManager(
     heartbeat_interval=settings.WS_HEARTBEAT_INTERVAL,
     heartbeat_timeout=settings.WS_HEARTBEAT_TIMEOUT,
-    max_connections_per_user=settings.WS_MAX_CONNECTIONS_PER_USER
+    max_connections_per_user=settings.WS_MAX_CONNECTIONS_PER_USER,
+    heartbeat_slots=settings.WS_HEARTBEAT_SLOTS,
+    send_queue_size=settings.WS_SEND_QUEUE_SIZE,
+    max_send_lag=settings.WS_MAX_SEND_LAG_SECONDS
 )
 
+# Deadline index and time_update ticker for this node's sockets
+exam_clock = ExamClock(manager, interval_seconds=settings.WS_TIME_UPDATE_INTERVAL)
+
 
 @router.websocket("/attempts/{attempt_id}")
 async def websocket_attempt_endpoint(
     websocket: WebSocket,
     attempt_id: int,
     token: str = Query(...),
-    db: Session = Depends(get_db)
+    since: Optional[int] = Query(None),
+    session_factory: async_sessionmaker = Depends(get_async_session_factory)
 ):
     """
     WebSocket endpoint for real-time exam attempt
     
     Supports:
     - Real-time answer checkpointing
-    - Time synchronization
+    - Time synchronization (time_update pushed every WS_TIME_UPDATE_INTERVAL
+      seconds and time_expired at the deadline; time_sync answers from memory)
     - Heartbeat monitoring
     - Event notifications
     
     Authentication: JWT token via query parameter
+    
+    Reconnect resync: a client that passes `since` (the highest
+    change_sequence from its acks) gets the answers saved after it in the
+    `connected` message's `resync`, instead of re-fetching every answer.
+    `resync.complete` false means the log could not prove it has all of
+    them and the client must fetch GET /attempts/{id}/answers.
+    
+    Holds no database session between messages: every message (or
+    write-behind flush) opens its own short-lived session, so idle
+    sockets never pin a pooled connection. Replies (acks, errors,
+    time_sync) go through the connection's send queue like every push,
+    so a slow client never stalls this receive loop.
     """
     connection_id = str(uuid.uuid4())
-    current_user: Optional[User] = None
+    current_user: Optional[Principal] = None
+    attempt: Optional[StudentAttempt] = None
+    claimed = False
+    # (release, channel or pattern, handler) of each relay reference held
+    relays = []
     
     try:
-        # Authenticate user (custom dependency for WebSocket)
-        current_user = get_current_user_ws(token, db)
+        async with session_factory() as db:
+            # Authenticate user (custom dependency for WebSocket)
+            current_user = await get_current_user_ws(token, db)
+            
+            if current_user:
+                # Validate attempt ownership
+                result = await db.execute(
+                    select(StudentAttempt).where(StudentAttempt.id == attempt_id)
+                )
+                attempt = result.scalar_one_or_none()
         
         if not current_user:
             await websocket.close(code=status.WS_1008_POLICY_VIOLATION, reason="Authentication failed")
             return
         
-        # Validate attempt ownership
-        attempt = db.query(StudentAttempt).filter(StudentAttempt.id == attempt_id).first()
-        
         if not attempt:
             await websocket.close(code=status.WS_1008_POLICY_VIOLATION, reason="Attempt not found")
             return
@@ -89,19 +137,33 @@ async def websocket_attempt_endpoint(
             )
             return
         
+        # Count the socket against the user's limit across every worker
+        claimed = await presence_registry.claim(
+            user_id=current_user.id,
+            attempt_id=attempt_id,
+            connection_id=connection_id,
+            limit=settings.WS_MAX_CONNECTIONS_PER_USER
+        )
+        if not claimed:
+            logger.warning(f"User {current_user.id} exceeded the cluster-wide connection limit")
+            await websocket.close(code=status.WS_1008_POLICY_VIOLATION, reason="Connection limit exceeded")
+            return
+        
         # Connect WebSocket
         connected = await manager.connect(
             websocket=websocket,
             attempt_id=attempt_id,
             user_id=current_user.id,
-            connection_id=connection_id
+            connection_id=connection_id,
+            exam_id=attempt.exam_id,
+            center_id=current_user.center_id
         )
         
         if not connected:
             return
         
         # Send connection confirmation
-        await websocket.send_json({
+        connected_message = {
             "type": "connected",
             "connection_id": connection_id,
             "attempt_id": attempt_id,
@@ -109,19 +171,28 @@ async def websocket_attempt_endpoint(
             "time_remaining_seconds": attempt.get_time_remaining_seconds(),
             "heartbeat_interval": settings.WS_HEARTBEAT_INTERVAL,
             "checkpoint_debounce": settings.WS_CHECKPOINT_DEBOUNCE_SECONDS
-        })
+        }
+        if since is not None:
+            connected_message["resync"] = await _answers_since(attempt_id, since)
+        await manager.send_personal_message(connected_message, connection_id)
+        exam_clock.track(attempt)
         
         logger.info(
             f"WebSocket connection established: user={current_user.id}, "
             f"attempt={attempt_id}, connection={connection_id}"
         )
         
-        # Subscribe to Redis channel for this attempt
-        channel = get_attempt_channel(attempt_id)
-        await redis_service.subscribe(
-            channel,
-            lambda ch, msg: _handle_redis_message(ch, msg, connection_id)
-        )
+        # Hold a reference on the worker's relays; the first socket on this
+        # worker subscribes, later ones only count
+        worker_channel = get_worker_channel(presence_registry.worker_id)
+        if await redis_service.subscribe(worker_channel, _relay_worker_message):
+            relays.append((redis_service.unsubscribe, worker_channel, _relay_worker_message))
+        for pattern, handler in (
+            (get_exam_channel_pattern(), _relay_exam_message),
+            (get_center_channel_pattern(), _relay_center_message),
+        ):
+            if await redis_service.psubscribe(pattern, handler):
+                relays.append((redis_service.punsubscribe, pattern, handler))
         
         # Message loop
         try:
@@ -137,27 +208,28 @@ async def websocket_attempt_endpoint(
                 
                 elif message_type == "checkpoint":
                     # Answer checkpoint
-                    await _handle_checkpoint(
-                        data, attempt_id, connection_id, db, websocket
-                    )
+                    await _handle_checkpoint(data, attempt_id, connection_id, session_factory)
+                
+                elif message_type == "batch_checkpoint":
+                    # Offline queue replay after reconnect
+                    await _handle_batch_checkpoint(data, attempt_id, connection_id, session_factory)
                 
                 elif message_type == "time_sync":
                     # Time synchronization request
-                    await _handle_time_sync(attempt_id, db, websocket)
+                    await _handle_time_sync(attempt_id, connection_id, session_factory)
                 
                 elif message_type == "flag":
                     # Flag question for review
-                    await _handle_flag_question(
-                        data, attempt_id, db, websocket
-                    )
+                    await _handle_flag_question(data, attempt_id, connection_id, session_factory)
                 
                 else:
                     logger.warning(f"Unknown message type: {message_type}")
-                    await websocket.send_json(
+                    await manager.send_personal_message(
                         create_error(
                             f"Unknown message type: {message_type}",
                             "UNKNOWN_MESSAGE_TYPE"
-                        )
+                        ),
+                        connection_id
                     )
         
         except WebSocketDisconnect:
@@ -165,28 +237,42 @@ async def websocket_attempt_endpoint(
         
         except Exception as e:
             logger.error(f"WebSocket error for {connection_id}: {e}", exc_info=True)
-            await websocket.send_json(
-                create_error(str(e), "WEBSOCKET_ERROR")
+            await manager.send_personal_message(
+                create_error(str(e), "WEBSOCKET_ERROR"),
+                connection_id
             )
     
     finally:
         # Clean up connection
         await manager.disconnect(connection_id)
+        if claimed:
+            presence_registry.release(connection_id)
         
-        # Unsubscribe from Redis
-        if attempt_id:
-            channel = get_attempt_channel(attempt_id)
-            await redis_service.unsubscribe(channel)
+        # Release this socket's references on the relays
+        for release, name, handler in relays:
+            await release(name, handler)
         
         logger.info(f"WebSocket cleanup complete: {connection_id}")
 
 
+async def _answers_since(attempt_id: int, since: int) -> dict:
+    """Resync payload for a reconnecting client: answers saved after `since`"""
+    delta = await answer_change_log.replay(attempt_id, since)
+    if delta is None:
+        return {"since": since, "complete": False, "change_sequence": None, "answers": []}
+    
+    logger.debug(
+        f"Resync for attempt {attempt_id}: {len(delta['answers'])} answers "
+        f"between {since} and {delta['change_sequence']}"
+    )
+    return {"since": since, "complete": True, **delta}
+
+
 async def _handle_checkpoint(
     data: dict,
     attempt_id: int,
     connection_id: str,
-    db: AsyncSession,
-    websocket: WebSocket
+    session_factory: async_sessionmaker
 ) -> None:
     """Handle answer checkpoint from client"""
     try:
@@ -194,20 +280,22 @@ async def _handle_checkpoint(
         checkpoint = CheckpointRequest(**data)
         
         # Process checkpoint with debouncing
-        result = await checkpoint_service.process_checkpoint(
-            db=db,
-            attempt_id=attempt_id,
-            checkpoint=checkpoint
-        )
+        async with session_factory() as db:
+            result = await checkpoint_service.process_checkpoint(
+                db=db,
+                attempt_id=attempt_id,
+                checkpoint=checkpoint
+            )
         
         if result["success"]:
             # Send acknowledgment
             response = create_checkpoint_ack(
                 question_id=checkpoint.question_id,
                 sequence=result.get("sequence", checkpoint.sequence),
-                time_remaining_seconds=result["time_remaining_seconds"]
+                time_remaining_seconds=result["time_remaining_seconds"],
+                change_sequence=result.get("change_sequence")
             )
-            await websocket.send_json(response)
+            await manager.send_personal_message(response, connection_id)
             
             # Broadcast to other connections for same attempt (multi-device sync)
             await manager.broadcast_to_attempt(
@@ -232,7 +320,7 @@ async def _handle_checkpoint(
                 error=result.get("error", "Unknown error"),
                 error_code=result.get("error_code", "CHECKPOINT_FAILED")
             )
-            await websocket.send_json(error_response)
+            await manager.send_personal_message(error_response, connection_id)
             
             logger.warning(
                 f"Checkpoint failed: attempt={attempt_id}, "
@@ -242,34 +330,105 @@ async def _handle_checkpoint(
     
     except Exception as e:
         logger.error(f"Error handling checkpoint: {e}", exc_info=True)
-        await websocket.send_json(
+        await manager.send_personal_message(
             create_checkpoint_error(
                 question_id=data.get("question_id", 0),
                 error=str(e),
                 error_code="CHECKPOINT_PROCESSING_ERROR"
+            ),
+            connection_id
+        )
+
+
+async def _handle_batch_checkpoint(
+    data: dict,
+    attempt_id: int,
+    connection_id: str,
+    session_factory: async_sessionmaker
+) -> None:
+    """Handle a batch of queued checkpoints in one round trip"""
+    try:
+        batch = BatchCheckpointRequest(**data)
+        
+        async with session_factory() as db:
+            result = await checkpoint_service.process_batch(
+                db=db,
+                attempt_id=attempt_id,
+                checkpoints=batch.answers
+            )
+        
+        if not result["success"]:
+            await manager.send_personal_message(
+                create_error(
+                    result.get("error", "Unknown error"),
+                    result.get("error_code", "CHECKPOINT_FAILED")
+                ),
+                connection_id
+            )
+            return
+        
+        await manager.send_personal_message(
+            create_batch_checkpoint_ack(
+                results=result["results"],
+                time_remaining_seconds=result["time_remaining_seconds"],
+                change_sequence=result.get("change_sequence")
+            ),
+            connection_id
+        )
+        
+        if result["saved_count"]:
+            await manager.broadcast_to_attempt(
+                message=create_notification(
+                    "Answers Saved",
+                    f"{result['saved_count']} queued answers saved",
+                    severity="success"
+                ),
+                attempt_id=attempt_id,
+                exclude_connection=connection_id
             )
+        
+        logger.debug(
+            f"Batch checkpoint saved: attempt={attempt_id}, "
+            f"received={len(batch.answers)}, saved={result['saved_count']}"
+        )
+    
+    except Exception as e:
+        logger.error(f"Error handling batch checkpoint: {e}", exc_info=True)
+        await manager.send_personal_message(
+            create_error(str(e), "CHECKPOINT_PROCESSING_ERROR"),
+            connection_id
         )
 
 
 async def _handle_time_sync(
     attempt_id: int,
-    db: AsyncSession,
-    websocket: WebSocket
+    connection_id: str,
+    session_factory: async_sessionmaker
 ) -> None:
     """Handle time synchronization request"""
     try:
-        # Get latest attempt data
-        result = await db.execute(
-            select(StudentAttempt).where(StudentAttempt.id == attempt_id)
-        )
-        attempt = result.scalar_one_or_none()
+        # Running attempts are answered from the deadline index
+        response = exam_clock.time_update(attempt_id)
+        if response is not None and not response["is_expired"]:
+            await manager.send_personal_message(response, connection_id)
+            return
+        
+        # Not started, paused or expired: read the attempt
+        async with session_factory() as db:
+            result = await db.execute(
+                select(StudentAttempt).where(StudentAttempt.id == attempt_id)
+            )
+            attempt = result.scalar_one_or_none()
         
         if not attempt:
-            await websocket.send_json(
-                create_error("Attempt not found", "ATTEMPT_NOT_FOUND")
+            await manager.send_personal_message(
+                create_error("Attempt not found", "ATTEMPT_NOT_FOUND"),
+                connection_id
             )
             return
         
+        exam_clock.track(attempt)
+        
         # Calculate time info
         time_remaining = attempt.get_time_remaining_seconds()
         elapsed = (attempt.duration_minutes * 60) - time_remaining
@@ -281,29 +440,28 @@ async def _handle_time_sync(
             elapsed_seconds=elapsed,
             is_expired=is_expired
         )
-        await websocket.send_json(response)
+        await manager.send_personal_message(response, connection_id)
         
         # If expired, send expiry event
         if is_expired:
-            await websocket.send_json(
-                create_exam_event(
-                    "time_expired",
-                    {"message": "Exam time has expired. Please submit your exam."}
-                )
+            await manager.send_personal_message(
+                create_exam_event("time_expired", {"message": TIME_EXPIRED_MESSAGE}),
+                connection_id
             )
     
     except Exception as e:
         logger.error(f"Error handling time sync: {e}", exc_info=True)
-        await websocket.send_json(
-            create_error(str(e), "TIME_SYNC_ERROR")
+        await manager.send_personal_message(
+            create_error(str(e), "TIME_SYNC_ERROR"),
+            connection_id
         )
 
 
 async def _handle_flag_question(
     data: dict,
     attempt_id: int,
-    db: AsyncSession,
-    websocket: WebSocket
+    connection_id: str,
+    session_factory: async_sessionmaker
 ) -> None:
     """Handle question flag/unflag"""
     try:
@@ -311,63 +469,247 @@ async def _handle_flag_question(
         is_flagged = data.get("is_flagged", True)
         
         if not question_id:
-            await websocket.send_json(
-                create_error("question_id required", "INVALID_REQUEST")
+            await manager.send_personal_message(
+                create_error("question_id required", "INVALID_REQUEST"),
+                connection_id
             )
             return
         
         # Update attempt's flagged questions
-        result = await db.execute(
-            select(StudentAttempt).where(StudentAttempt.id == attempt_id)
-        )
-        attempt = result.scalar_one_or_none()
-        
-        if not attempt:
-            await websocket.send_json(
-                create_error("Attempt not found", "ATTEMPT_NOT_FOUND")
+        async with session_factory() as db:
+            result = await db.execute(
+                select(StudentAttempt).where(StudentAttempt.id == attempt_id)
             )
-            return
+            attempt = result.scalar_one_or_none()
         
-        flagged = attempt.questions_flagged or []
+            if not attempt:
+                await manager.send_personal_message(
+                    create_error("Attempt not found", "ATTEMPT_NOT_FOUND"),
+                    connection_id
+                )
+                return
         
-        if is_flagged:
-            if question_id not in flagged:
-                flagged.append(question_id)
-        else:
-            if question_id in flagged:
-                flagged.remove(question_id)
+            flagged = list(attempt.questions_flagged or [])
         
-        attempt.questions_flagged = flagged
-        await db.commit()
+            if is_flagged:
+                if question_id not in flagged:
+                    flagged.append(question_id)
+            else:
+                if question_id in flagged:
+                    flagged.remove(question_id)
+        
+            attempt.questions_flagged = flagged
+            await db.commit()
         
         # Send confirmation
-        await websocket.send_json(
+        await manager.send_personal_message(
             create_notification(
                 "Question Flagged" if is_flagged else "Flag Removed",
                 f"Question {question_id} {'flagged for review' if is_flagged else 'unflagged'}",
                 severity="info"
-            )
+            ),
+            connection_id
         )
     
     except Exception as e:
         logger.error(f"Error handling flag question: {e}", exc_info=True)
-        await websocket.send_json(
-            create_error(str(e), "FLAG_ERROR")
+        await manager.send_personal_message(
+            create_error(str(e), "FLAG_ERROR"),
+            connection_id
         )
 
 
-async def _handle_redis_message(
-    channel: str,
+async def send_to_attempt(
     message: dict,
-    connection_id: str
-) -> None:
-    """Handle message from Redis pub/sub"""
-    try:
-        # Forward message to WebSocket client
-        await manager.send_personal_message(message, connection_id)
-        logger.debug(f"Forwarded Redis message to {connection_id}: {message.get('type')}")
-    except Exception as e:
-        logger.error(f"Error handling Redis message: {e}")
+    attempt_id: int,
+    exclude_connection: Optional[str] = None
+) -> int:
+    """
+    Deliver a message to every socket of an attempt, wherever it is held
+    
+    Sockets on this worker are written directly; every other worker that
+    holds one (per presence_registry) gets the message on its own channel,
+    so workers without the attempt never see it.
+    
+    Returns:
+        Number of connections the message was queued for on this worker
+    """
+    count = await manager.broadcast_to_attempt(message, attempt_id, exclude_connection)
+    await _publish_to_attempt_workers(
+        attempt_id,
+        {"attempt_id": attempt_id, "exclude_connection": exclude_connection, "message": message}
+    )
+    return count
+
+
+async def forget_attempt_clock(attempt_id: int) -> None:
+    """
+    Drop an attempt from the exam clock of every worker holding its sockets
+    
+    For changes that stop the clock (submit, expiry, transfer snapshot),
+    which are usually made on a worker other than the one pushing time.
+    """
+    exam_clock.forget(attempt_id)
+    await _publish_to_attempt_workers(attempt_id, {"attempt_id": attempt_id, "forget_clock": True})
+
+
+async def _publish_to_attempt_workers(attempt_id: int, payload: dict) -> None:
+    """Publish on the channel of every other worker holding a socket of the attempt"""
+    local = presence_registry.worker_id
+    remote: Set[str] = await presence_registry.get_attempt_workers(attempt_id) - {local}
+    for worker_id in remote:
+        await redis_service.publish(get_worker_channel(worker_id), payload)
+
+
+class ClusterConnections:
+    """
+    ConnectionManager stand-in for services that notify an attempt
+    (e.g. TransferService): broadcast_to_attempt reaches every worker,
+    and forget_clock stops every worker's time pushes for the attempt
+    """
+    
+    async def broadcast_to_attempt(
+        self,
+        message: dict,
+        attempt_id: int,
+        exclude_connection: Optional[str] = None
+    ) -> int:
+        return await send_to_attempt(message, attempt_id, exclude_connection)
+    
+    async def forget_clock(self, attempt_id: int) -> None:
+        await forget_attempt_clock(attempt_id)
+
+
+cluster_connections = ClusterConnections()
+
+
+async def _relay_worker_message(channel: str, message: dict) -> None:
+    """Deliver a message routed to this worker to the attempt's local sockets"""
+    attempt_id = message["attempt_id"]
+    if message.get("forget_clock"):
+        exam_clock.forget(attempt_id)
+        return
+    
+    count = await manager.broadcast_to_attempt(
+        message["message"], attempt_id, message.get("exclude_connection")
+    )
+    logger.debug(f"Relayed {message['message'].get('type')} for attempt {attempt_id} to {count} connections")
+
+
+async def _relay_exam_message(channel: str, message: dict) -> None:
+    """Forward an exam:{id} message to every socket of that exam on this node"""
+    if message.pop(ORIGIN_FIELD, None) == presence_registry.worker_id:
+        return
+    report = await manager.broadcast_to_exam(message, parse_channel_id(channel))
+    logger.info(
+        f"Relayed {message.get('type')} from {channel}: "
+        f"{report.delivered}/{report.targets} delivered, p99 {report.p99_seconds * 1000:.1f}ms"
+    )
+
+
+async def _relay_center_message(channel: str, message: dict) -> None:
+    """Forward a center:{id} message to every socket of that center on this node"""
+    exam_id = message.pop("exam_id", None)
+    if message.pop(ORIGIN_FIELD, None) == presence_registry.worker_id:
+        return
+    report = await manager.broadcast_to_center(message, parse_channel_id(channel), exam_id)
+    logger.info(
+        f"Relayed {message.get('type')} from {channel}: "
+        f"{report.delivered}/{report.targets} delivered, p99 {report.p99_seconds * 1000:.1f}ms"
+    )
+
+
+@router.post("/broadcast/exams/{exam_id}", response_model=BroadcastResult)
+async def broadcast_exam_notification(
+    exam_id: int,
+    broadcast: BroadcastRequest,
+    current_user: Principal = Depends(require_any_role("admin"))
+):
+    """
+    Push a notification to every connected candidate of an exam
+    
+    Delivered on this worker directly and on other workers through the
+    exam channel. The counts and p99 fan-out time are for this worker.
+    
+    Requires: Admin role
+    """
+    message = create_notification(
+        broadcast.title, broadcast.message, broadcast.severity, broadcast.action
+    )
+    report = await manager.broadcast_to_exam(message, exam_id)
+    nodes = await redis_service.publish(
+        get_exam_channel(exam_id), {**message, ORIGIN_FIELD: presence_registry.worker_id}
+    )
+    return BroadcastResult(**report.to_dict(), nodes_notified=max(nodes - 1, 0))
+
+
+@router.post("/broadcast/centers/{center_id}", response_model=BroadcastResult)
+async def broadcast_center_notification(
+    center_id: int,
+    broadcast: BroadcastRequest,
+    current_user: Principal = Depends(require_any_role("admin", "hall_in_charge"))
+):
+    """
+    Push a notification to every connected candidate at a center
+    
+    Set exam_id to reach only that exam's candidates. Hall in-charges can
+    only broadcast to their own center.
+    
+    Requires: Admin or hall in-charge role
+    """
+    if (
+        not current_user.has_role("admin")
+        and current_user.center_id is not None
+        and current_user.center_id != center_id
+    ):
+        raise HTTPException(
+            status_code=status.HTTP_403_FORBIDDEN,
+            detail="Cannot broadcast to another center"
+        )
+    
+    message = create_notification(
+        broadcast.title, broadcast.message, broadcast.severity, broadcast.action
+    )
+    report = await manager.broadcast_to_center(message, center_id, broadcast.exam_id)
+    nodes = await redis_service.publish(
+        get_center_channel(center_id),
+        {**message, "exam_id": broadcast.exam_id, ORIGIN_FIELD: presence_registry.worker_id}
+    )
+    return BroadcastResult(**report.to_dict(), nodes_notified=max(nodes - 1, 0))
+
+
+@router.get("/presence/attempts/{attempt_id}", response_model=AttemptPresence)
+async def get_attempt_presence(
+    attempt_id: int,
+    current_user: Principal = Depends(require_any_role("admin", "hall_in_charge"))
+):
+    """
+    Whether a candidate's attempt has a live socket anywhere in the cluster
+    
+    Requires: Admin or hall in-charge role
+    """
+    workers = await presence_registry.get_attempt_workers(attempt_id)
+    return AttemptPresence(
+        attempt_id=attempt_id,
+        connected=bool(workers),
+        workers=sorted(workers)
+    )
+
+
+@router.get("/stats")
+async def get_realtime_stats(
+    current_user: Principal = Depends(require_any_role("admin", "hall_in_charge"))
+):
+    """
+    Connection and checkpoint pipeline metrics for this node
+    
+    Includes write-behind flush lag and batch sizes
+    """
+    return {
+        "active_attempts": len(manager.active_connections),
+        "active_connections": len(manager.connection_to_attempt),
+        "checkpoints": await checkpoint_service.get_stats()
+    }
 
 
 # Admin endpoint to broadcast to specific attempt
@@ -376,7 +718,7 @@ async def websocket_admin_broadcast(
     websocket: WebSocket,
     attempt_id: int,
     token: str = Query(...),
-    db: Session = Depends(get_db)
+    session_factory: async_sessionmaker = Depends(get_async_session_factory)
 ):
     """
     Admin WebSocket for broadcasting messages to students
@@ -385,7 +727,8 @@ async def websocket_admin_broadcast(
     """
     try:
         # Authenticate admin
-        current_user = get_current_user_ws(token, db)
+        async with session_factory() as db:
+            current_user = await get_current_user_ws(token, db)
         
         if not current_user or current_user.role not in ["admin", "staff"]:
             await websocket.close(code=status.WS_1008_POLICY_VIOLATION, reason="Unauthorized")
@@ -399,8 +742,8 @@ async def websocket_admin_broadcast(
         while True:
             data = await websocket.receive_json()
             
-            # Broadcast to all attempt connections
-            count = await manager.broadcast_to_attempt(data, attempt_id)
+            # Broadcast to all attempt connections, on whichever workers hold them
+            count = await send_to_attempt(data, attempt_id)
             
             # Send confirmation
             await websocket.send_json({
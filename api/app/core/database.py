@@ -1,12 +1,37 @@
 """
 Database configuration and session management
 """
-from sqlalchemy import create_engine
+import logging
+import time
+from typing import Awaitable, Callable, Optional
+from fastapi import Request
+from sqlalchemy import create_engine, text
+from sqlalchemy.dialects.postgresql import insert as postgresql_insert
+from sqlalchemy.dialects.sqlite import insert as sqlite_insert
+from sqlalchemy.ext.asyncio import create_async_engine, async_sessionmaker, AsyncSession
 from sqlalchemy.ext.declarative import declarative_base
 from sqlalchemy.orm import sessionmaker
 from app.core.config import settings
+from app.core.metrics import instrument_engine
 
-# Create database engine
+logger = logging.getLogger(__name__)
+
+
+def get_async_database_url(url: str) -> str:
+    """
+    Map a synchronous database URL onto its asyncio driver
+    
+    postgresql:// -> postgresql+asyncpg://, sqlite:// -> sqlite+aiosqlite://
+    """
+    scheme, sep, rest = url.partition("://")
+    if scheme in ("postgresql", "postgres", "postgresql+psycopg2"):
+        return f"postgresql+asyncpg{sep}{rest}"
+    if scheme == "sqlite":
+        return f"sqlite+aiosqlite{sep}{rest}"
+    return url
+
+
+# Create database engine (sync: scripts, Alembic, tests, sync routers)
 engine = create_engine(
     settings.DATABASE_URL,
     pool_pre_ping=True,
@@ -17,6 +42,55 @@ engine = create_engine(
 # Create session factory
 SessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=engine)
 
+
+def _create_async_engine(url: str):
+    """
+    Async engine for request handlers running on the event loop
+    (aiosqlite uses NullPool, which takes no pool sizing arguments)
+    """
+    return create_async_engine(
+        get_async_database_url(url),
+        pool_pre_ping=True,
+        **({} if url.startswith("sqlite") else {
+            "pool_size": 10,
+            "max_overflow": 20,
+        }),
+    )
+
+
+def _create_async_sessionmaker(bind) -> async_sessionmaker:
+    """
+    Async session factory
+    expire_on_commit=False so ORM objects stay readable after commit
+    without an implicit (and forbidden) lazy refresh on the event loop
+    """
+    return async_sessionmaker(
+        bind=bind,
+        class_=AsyncSession,
+        autoflush=False,
+        expire_on_commit=False,
+    )
+
+
+async_engine = _create_async_engine(settings.DATABASE_URL)
+AsyncSessionLocal = _create_async_sessionmaker(async_engine)
+
+# Read replica (optional); None means every read goes to the primary
+async_replica_engine = (
+    _create_async_engine(settings.DATABASE_REPLICA_URL)
+    if settings.DATABASE_REPLICA_URL else None
+)
+AsyncReplicaSessionLocal = (
+    _create_async_sessionmaker(async_replica_engine)
+    if async_replica_engine is not None else None
+)
+
+# Pool checkout-wait and in-use metrics
+instrument_engine(engine, "sync")
+instrument_engine(async_engine.sync_engine, "primary")
+if async_replica_engine is not None:
+    instrument_engine(async_replica_engine.sync_engine, "replica")
+
 # Base class for models
 Base = declarative_base()
 
@@ -31,3 +105,150 @@ def get_db():
         yield db
     finally:
         db.close()
+
+
+async def get_async_db():
+    """
+    Dependency that provides an async database session.
+    Queries are awaited, so a slow query no longer blocks the event loop.
+    """
+    async with AsyncSessionLocal() as db:
+        yield db
+
+
+# Dialects with INSERT ... ON CONFLICT DO UPDATE (same API in both modules)
+UPSERT_INSERTS = {"postgresql": postgresql_insert, "sqlite": sqlite_insert}
+
+
+def supports_native_upsert(db: AsyncSession) -> bool:
+    """ON CONFLICT DO UPDATE with RETURNING (Postgres, SQLite >= 3.35)"""
+    dialect = db.bind.dialect
+    return (
+        dialect.name in UPSERT_INSERTS
+        and dialect.insert_returning
+        and dialect.update_returning
+    )
+
+
+def get_async_session_factory() -> async_sessionmaker:
+    """
+    Dependency that provides the async session factory itself.
+    For long-lived handlers (WebSockets) that open a short session per
+    message instead of holding a pooled connection for hours.
+    """
+    return AsyncSessionLocal
+
+
+# Header a client sends to read its own just-written data
+READ_CONSISTENCY_HEADER = "X-Read-Consistency"
+
+# Zero on a primary or a caught-up standby, else seconds since the last replayed commit
+_POSTGRES_REPLICATION_LAG = text(
+    "SELECT CASE "
+    "WHEN NOT pg_is_in_recovery() THEN 0 "
+    "WHEN pg_last_wal_receive_lsn() = pg_last_wal_replay_lsn() THEN 0 "
+    "ELSE EXTRACT(EPOCH FROM now() - pg_last_xact_replay_timestamp()) END"
+)
+
+
+async def query_replication_lag(db: AsyncSession) -> Optional[float]:
+    """
+    Measure how far a replica is behind its primary, in seconds
+    
+    Databases without streaming replication (SQLite stand-ins) report 0.
+    """
+    if db.bind.dialect.name != "postgresql":
+        return 0.0
+    
+    lag = await db.scalar(_POSTGRES_REPLICATION_LAG)
+    return float(lag) if lag is not None else None
+
+
+class ReplicaRouter:
+    """
+    Chooses the session factory for read-only endpoints
+    
+    Reads go to the replica unless no replica is configured, the client
+    asks for read-your-writes (`X-Read-Consistency: primary`), or the
+    replica's measured lag exceeds `max_lag_seconds` (or cannot be
+    measured). Lag is measured at most once per `lag_check_seconds`.
+    """
+    
+    def __init__(
+        self,
+        primary_factory: async_sessionmaker,
+        replica_factory: Optional[async_sessionmaker] = None,
+        max_lag_seconds: float = 2.0,
+        lag_check_seconds: float = 1.0,
+        lag_probe: Callable[[AsyncSession], Awaitable[Optional[float]]] = query_replication_lag
+    ):
+        self.primary_factory = primary_factory
+        self.replica_factory = replica_factory
+        self.max_lag_seconds = max_lag_seconds
+        self.lag_check_seconds = lag_check_seconds
+        self.lag_probe = lag_probe
+        
+        self._lag: Optional[float] = None
+        self._lag_checked_at: Optional[float] = None
+        self._stats = {"replica_reads": 0, "primary_reads": 0, "lag_fallbacks": 0}
+    
+    async def get_lag_seconds(self) -> Optional[float]:
+        """Replica lag in seconds (cached), or None if it could not be measured"""
+        now = time.monotonic()
+        if self._lag_checked_at is not None and now - self._lag_checked_at < self.lag_check_seconds:
+            return self._lag
+        
+        try:
+            async with self.replica_factory() as db:
+                self._lag = await self.lag_probe(db)
+        except Exception as e:
+            logger.warning(f"Replica lag check failed, reading from primary: {e}")
+            self._lag = None
+        
+        self._lag_checked_at = now
+        return self._lag
+    
+    async def choose(self, request: Optional[Request] = None) -> async_sessionmaker:
+        """Pick the replica or primary session factory for this request"""
+        if self.replica_factory is None:
+            return self.primary_factory
+        
+        if request is not None and request.headers.get(READ_CONSISTENCY_HEADER, "").lower() == "primary":
+            self._stats["primary_reads"] += 1
+            return self.primary_factory
+        
+        lag = await self.get_lag_seconds()
+        if lag is None or lag > self.max_lag_seconds:
+            self._stats["lag_fallbacks"] += 1
+            self._stats["primary_reads"] += 1
+            return self.primary_factory
+        
+        self._stats["replica_reads"] += 1
+        return self.replica_factory
+    
+    def get_stats(self) -> dict:
+        """Routing counters and last measured lag"""
+        return {
+            **self._stats,
+            "replica_configured": self.replica_factory is not None,
+            "last_lag_seconds": self._lag,
+        }
+
+
+replica_router = ReplicaRouter(
+    primary_factory=AsyncSessionLocal,
+    replica_factory=AsyncReplicaSessionLocal,
+    max_lag_seconds=settings.REPLICA_MAX_LAG_SECONDS,
+    lag_check_seconds=settings.REPLICA_LAG_CHECK_SECONDS
+)
+
+
+async def get_async_read_db(request: Request):
+    """
+    Dependency for read-only endpoints.
+    Yields a replica session while the replica is fresh enough,
+    otherwise (or with `X-Read-Consistency: primary`) a primary session.
+    """
+    factory = await replica_router.choose(request)
+    async with factory() as db:
+        yield db
@@ -0,0 +1,239 @@
+"""
+Exam Clock
+In-memory deadline index of running attempts and one ticker per node that
+pushes remaining time to their sockets, so clients do not poll the database
+"""
+from typing import Dict, List, Optional, Tuple
+from collections import defaultdict
+from datetime import timezone
+import asyncio
+import heapq
+import logging
+import math
+import time
+
+from app.core.metrics import WS_CLOCK_TICK_DURATION
+from app.core.websocket import ConnectionManager, ConnectionInfo, encode_frame
+from app.models.attempt import StudentAttempt, AttemptStatus
+from app.schemas.websocket import create_exam_event, create_time_update
+
+logger = logging.getLogger(__name__)
+
+TIME_EXPIRED_MESSAGE = "Exam time has expired. Please submit your exam."
+
+
+class ExamClock:
+    """
+    Remaining time of running attempts, answered from memory and pushed
+    
+    The deadline index maps attempt_id -> (deadline as a Unix timestamp,
+    duration_seconds). It is filled when an attempt is started or begun
+    through this node and whenever one of its sockets connects here (a
+    resume), so time queries never touch the database. Only attempts whose
+    clock runs from start_time are indexed; paused or transferred attempts
+    (frozen time_remaining_seconds) are left to the database path.
+    
+    One ticker task per node wakes every interval_seconds and queues a
+    time_update for every indexed attempt with sockets on this node,
+    encoding one frame per distinct remaining time. It also keeps a heap of
+    deadlines and wakes at the earliest, so time_expired goes out at the
+    deadline rather than at the next tick or client poll. Attempts without
+    sockets here are dropped from the index on the next tick.
+    """
+    
+    def __init__(self, manager: ConnectionManager, interval_seconds: float = 15):
+        """
+        Initialize exam clock
+        
+        Args:
+            manager: Connection manager whose sockets receive the pushes
+            interval_seconds: Seconds between pushed time updates
+        """
+        self.manager = manager
+        self.interval_seconds = interval_seconds
+        
+        # Deadline index: {attempt_id: (deadline, duration_seconds)}
+        self._deadlines: Dict[int, Tuple[float, int]] = {}
+        # Min-heap of (deadline, attempt_id); entries no longer in the index are skipped
+        self._heap: List[Tuple[float, int]] = []
+        
+        self._ticker_task: Optional[asyncio.Task] = None
+        self._wakeup: Optional[asyncio.Event] = None
+        self._wake_at = math.inf
+    
+    def track(self, attempt: StudentAttempt) -> None:
+        """Index (or re-index) an attempt's deadline; drops attempts whose clock is not running"""
+        if (
+            attempt.status != AttemptStatus.IN_PROGRESS
+            or attempt.start_time is None
+            or attempt.time_remaining_seconds is not None
+        ):
+            self.forget(attempt.id)
+            return
+        
+        duration_seconds = attempt.duration_minutes * 60
+        started_at = attempt.start_time.replace(tzinfo=timezone.utc).timestamp()
+        entry = (started_at + duration_seconds, duration_seconds)
+        if self._deadlines.get(attempt.id) == entry:
+            return
+        
+        self._deadlines[attempt.id] = entry
+        heapq.heappush(self._heap, (entry[0], attempt.id))
+        self._ensure_ticker()
+        if entry[0] < self._wake_at and self._wakeup is not None:
+            # Due before the ticker's next wake-up
+            self._wakeup.set()
+    
+    def forget(self, attempt_id: int) -> None:
+        """Drop an attempt from the index (e.g. after submit)"""
+        self._deadlines.pop(attempt_id, None)
+    
+    def time_update(self, attempt_id: int) -> Optional[dict]:
+        """
+        Current time_update message for an indexed attempt
+        
+        Returns:
+            time_update message, or None if the attempt is not indexed
+        """
+        entry = self._deadlines.get(attempt_id)
+        if entry is None:
+            return None
+        return _time_update(*entry, time.time())
+    
+    async def close(self) -> None:
+        """Stop the ticker (shutdown)"""
+        if self._ticker_task is not None and not self._ticker_task.done():
+            self._ticker_task.cancel()
+        self._ticker_task = None
+    
+    async def push(self, now: Optional[float] = None) -> int:
+        """
+        Queue a time_update for every indexed attempt with sockets on this node
+        
+        Returns:
+            Number of sockets the update was queued for
+        """
+        now = time.time() if now is None else now
+        groups: Dict[Tuple[int, int], List[ConnectionInfo]] = defaultdict(list)
+        
+        for attempt_id, (deadline, duration_seconds) in list(self._deadlines.items()):
+            connections = self.manager.active_connections.get(attempt_id)
+            if not connections:
+                self.forget(attempt_id)
+                continue
+            remaining = _remaining(deadline, now)
+            groups[(remaining, duration_seconds)].extend(connections.values())
+        
+        queued = 0
+        for (remaining, duration_seconds), targets in groups.items():
+            report = await self.manager.fan_out(
+                encode_frame(create_time_update(
+                    time_remaining_seconds=remaining,
+                    elapsed_seconds=duration_seconds - remaining
+                )),
+                targets,
+                kind="time_update",
+                key="time_update"
+            )
+            queued += report.delivered
+        return queued
+    
+    async def expire_due(self, now: Optional[float] = None) -> List[int]:
+        """
+        Send the final time_update and time_expired to attempts past their deadline
+        
+        Returns:
+            Attempt ids that expired
+        """
+        now = time.time() if now is None else now
+        expired = []
+        
+        while self._heap and self._heap[0][0] <= now:
+            deadline, attempt_id = heapq.heappop(self._heap)
+            entry = self._deadlines.get(attempt_id)
+            if entry is None or entry[0] != deadline:
+                continue
+            
+            del self._deadlines[attempt_id]
+            expired.append(attempt_id)
+            
+            targets = list(self.manager.active_connections.get(attempt_id, {}).values())
+            if not targets:
+                continue
+            await self.manager.fan_out(
+                encode_frame(_time_update(deadline, entry[1], now)),
+                targets,
+                kind="time_update",
+                key="time_update"
+            )
+            await self.manager.fan_out(
+                encode_frame(create_exam_event("time_expired", {"message": TIME_EXPIRED_MESSAGE})),
+                targets,
+                kind="time_expired"
+            )
+        
+        return expired
+    
+    def _ensure_ticker(self) -> None:
+        """Start the ticker task unless it is already running on this loop"""
+        task = self._ticker_task
+        if task is not None and not task.done() and task.get_loop() is asyncio.get_running_loop():
+            return
+        self._wakeup = asyncio.Event()
+        self._ticker_task = asyncio.create_task(self._ticker())
+    
+    async def _ticker(self) -> None:
+        """
+        Push time updates every interval and expire attempts at their deadline
+        
+        Pushes are scheduled from a fixed start time, so a slow round delays
+        the next one without shifting the ones after it.
+        """
+        loop = asyncio.get_running_loop()
+        this_task = asyncio.current_task()
+        wakeup = self._wakeup
+        next_push = time.time() + self.interval_seconds
+        
+        try:
+            while self._deadlines:
+                self._wake_at = min(next_push, self._heap[0][0]) if self._heap else next_push
+                wakeup.clear()
+                try:
+                    await asyncio.wait_for(wakeup.wait(), max(0.0, self._wake_at - time.time()))
+                except asyncio.TimeoutError:
+                    pass
+                
+                now = time.time()
+                if self._heap and self._heap[0][0] <= now:
+                    started = loop.time()
+                    await self.expire_due(now)
+                    WS_CLOCK_TICK_DURATION.labels(kind="expiry").observe(loop.time() - started)
+                
+                if now >= next_push:
+                    while next_push <= now:
+                        next_push += self.interval_seconds
+                    started = loop.time()
+                    await self.push(now)
+                    WS_CLOCK_TICK_DURATION.labels(kind="push").observe(loop.time() - started)
+        except asyncio.CancelledError:
+            logger.debug("Exam clock ticker cancelled")
+        except Exception as e:
+            logger.error(f"Exam clock ticker error: {e}")
+        finally:
+            self._wake_at = math.inf
+            if self._ticker_task is this_task:
+                self._ticker_task = None
+
+
+def _remaining(deadline: float, now: float) -> int:
+    # Rounds like StudentAttempt.get_time_remaining_seconds (whole seconds elapsed)
+    return max(0, math.ceil(deadline - now))
+
+
+def _time_update(deadline: float, duration_seconds: int, now: float) -> dict:
+    remaining = _remaining(deadline, now)
+    return create_time_update(
+        time_remaining_seconds=remaining,
+        elapsed_seconds=duration_seconds - remaining,
+        is_expired=now > deadline
+    )
@@ -0,0 +1,134 @@
+"""
+Signed hall-ticket QR payloads
+HMAC-SHA256 over hall ticket number, exam and center with a validity
+window, so a scanner can admit a candidate without hashing a secret
+"""
+import base64
+import hashlib
+import hmac
+import io
+import json
+from datetime import datetime, timezone
+from typing import Optional
+
+import qrcode
+
+from app.core.config import settings
+
+# Payload version prefix; bump when the claim layout changes
+QR_PAYLOAD_PREFIX = "HT1"
+
+
+class HallTicketClaims:
+    """Verified contents of a hall-ticket QR payload"""
+    
+    __slots__ = ("hall_ticket_number", "exam_id", "center_id", "valid_from", "valid_until")
+    
+    def __init__(
+        self,
+        hall_ticket_number: str,
+        exam_id: int,
+        center_id: Optional[int],
+        valid_from: datetime,
+        valid_until: datetime
+    ):
+        self.hall_ticket_number = hall_ticket_number
+        self.exam_id = exam_id
+        self.center_id = center_id
+        self.valid_from = valid_from
+        self.valid_until = valid_until
+
+
+def _signing_key() -> bytes:
+    """Dedicated key, or one derived from SECRET_KEY so JWT and QR keys differ"""
+    if settings.HALL_TICKET_QR_SECRET:
+        return settings.HALL_TICKET_QR_SECRET.encode()
+    return hashlib.sha256(b"hall-ticket-qr:" + settings.SECRET_KEY.encode()).digest()
+
+
+def _b64encode(data: bytes) -> str:
+    return base64.urlsafe_b64encode(data).decode().rstrip("=")
+
+
+def _b64decode(data: str) -> bytes:
+    return base64.urlsafe_b64decode(data + "=" * (-len(data) % 4))
+
+
+def _signature(body: str) -> bytes:
+    return hmac.new(_signing_key(), f"{QR_PAYLOAD_PREFIX}.{body}".encode(), hashlib.sha256).digest()
+
+
+def sign_hall_ticket(
+    hall_ticket_number: str,
+    exam_id: int,
+    center_id: Optional[int],
+    valid_from: datetime,
+    valid_until: datetime
+) -> str:
+    """
+    Create the QR payload for one candidate's hall ticket
+    
+    Args:
+        hall_ticket_number: Candidate's hall ticket number
+        exam_id: Exam the ticket admits to
+        center_id: Center the candidate must report to
+        valid_from: Earliest scan time (UTC)
+        valid_until: Latest scan time (UTC)
+    
+    Returns:
+        Compact "HT1.<claims>.<signature>" string
+    """
+    claims = {
+        "h": hall_ticket_number,
+        "e": exam_id,
+        "c": center_id,
+        "nbf": int(valid_from.replace(tzinfo=timezone.utc).timestamp()),
+        "exp": int(valid_until.replace(tzinfo=timezone.utc).timestamp()),
+    }
+    body = _b64encode(json.dumps(claims, separators=(",", ":")).encode())
+    return f"{QR_PAYLOAD_PREFIX}.{body}.{_b64encode(_signature(body))}"
+
+
+def verify_hall_ticket(payload: str, now: Optional[datetime] = None) -> HallTicketClaims:
+    """
+    Verify a scanned QR payload's signature and validity window
+    
+    Raises:
+        ValueError: If the payload is malformed, forged or outside its window
+    """
+    try:
+        prefix, body, signature = payload.strip().split(".")
+        if prefix != QR_PAYLOAD_PREFIX:
+            raise ValueError(f"Unsupported hall ticket payload version: {prefix}")
+        
+        if not hmac.compare_digest(_b64decode(signature), _signature(body)):
+            raise ValueError("Invalid hall ticket signature")
+        
+        claims = json.loads(_b64decode(body))
+        valid_from = datetime.utcfromtimestamp(claims["nbf"])
+        valid_until = datetime.utcfromtimestamp(claims["exp"])
+        result = HallTicketClaims(
+            hall_ticket_number=str(claims["h"]),
+            exam_id=int(claims["e"]),
+            center_id=claims["c"],
+            valid_from=valid_from,
+            valid_until=valid_until
+        )
+    except (ValueError, TypeError, KeyError) as e:
+        raise ValueError(f"Invalid hall ticket payload: {e}") from e
+    
+    now = now or datetime.utcnow()
+    if now < result.valid_from:
+        raise ValueError("Hall ticket is not valid yet")
+    if now > result.valid_until:
+        raise ValueError("Hall ticket has expired")
+    
+    return result
+
+
+def render_hall_ticket_qr(payload: str) -> bytes:
+    """Render a payload as a PNG QR code for printing on the hall ticket"""
+    image = qrcode.make(payload, error_correction=qrcode.constants.ERROR_CORRECT_M)
+    buffer = io.BytesIO()
+    image.save(buffer, format="PNG")
+    return buffer.getvalue()
@@ -0,0 +1,257 @@
+"""
+Prometheus metrics
+Instruments HTTP routes, the SQLAlchemy pools, WebSocket connections,
+checkpoint flushes, Redis pub/sub delivery, the principal cache,
+the password-hashing pool, login admission and the expiry sweeper;
+exposed on /metrics
+"""
+import time
+from typing import Optional
+
+from prometheus_client import Counter, Gauge, Histogram
+from sqlalchemy import event
+from sqlalchemy.engine import Engine
+from starlette.routing import Match
+from starlette.types import ASGIApp, Message, Receive, Scope, Send
+
+# Label for requests that match no route (keeps label cardinality bounded)
+UNMATCHED_ROUTE = "<unmatched>"
+
+HTTP_REQUEST_DURATION = Histogram(
+    "http_request_duration_seconds",
+    "HTTP request latency by route template",
+    ["method", "route", "status"],
+    buckets=(0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0),
+)
+
+DB_POOL_CHECKOUT_WAIT = Histogram(
+    "db_pool_checkout_wait_seconds",
+    "Time spent waiting for a pooled database connection",
+    ["engine"],
+    buckets=(0.0005, 0.001, 0.005, 0.01, 0.05, 0.1, 0.5, 1.0, 5.0, 30.0),
+)
+
+DB_POOL_IN_USE = Gauge(
+    "db_pool_connections_in_use",
+    "Database connections currently checked out of the pool",
+    ["engine"],
+)
+
+WS_ACTIVE_CONNECTIONS = Gauge(
+    "ws_active_connections",
+    "Open exam WebSocket connections on this node",
+)
+
+WS_SEND_FAILURES = Counter(
+    "ws_send_failures_total",
+    "WebSocket sends that failed and dropped the connection",
+    ["kind"],
+)
+
+WS_HEARTBEAT_SWEEP_DURATION = Histogram(
+    "ws_heartbeat_sweep_seconds",
+    "Time to sweep one heartbeat timer-wheel slot (stale checks and batched pings)",
+    buckets=(0.001, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5),
+)
+
+WS_CLOCK_TICK_DURATION = Histogram(
+    "ws_clock_tick_seconds",
+    "Time to queue one round of pushed time updates (or deadline expiries) on this node",
+    ["kind"],
+    buckets=(0.001, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5),
+)
+
+WS_BROADCAST_FANOUT_DURATION = Histogram(
+    "ws_broadcast_fanout_seconds",
+    "Time to write one broadcast to every target socket on this node",
+    ["scope"],
+    buckets=(0.001, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0),
+)
+
+WS_SEND_QUEUE_LAG = Histogram(
+    "ws_send_queue_lag_seconds",
+    "Time an outbound WebSocket frame (other than a heartbeat ping) waited in its send queue",
+    buckets=(0.001, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 15.0),
+)
+
+WS_SEND_QUEUE_DROPS = Counter(
+    "ws_send_queue_drops_total",
+    "Droppable WebSocket frames replaced by a newer copy (coalesced) or dropped when a queue was full (overflow)",
+    ["reason"],
+)
+
+WS_SLOW_CONSUMER_EVICTIONS = Counter(
+    "ws_slow_consumer_evictions_total",
+    "WebSocket connections closed because their send queue overflowed or lagged",
+    ["reason"],
+)
+
+WS_PRESENCE_CLAIMS = Counter(
+    "ws_presence_claims_total",
+    "Cluster-wide WebSocket connection claims (claimed, rejected, bypassed)",
+    ["outcome"],
+)
+
+CHECKPOINT_FLUSH_DURATION = Histogram(
+    "checkpoint_flush_duration_seconds",
+    "Time to write one checkpoint batch (buffer flush or journal drain)",
+    buckets=(0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0),
+)
+
+CHECKPOINT_FLUSH_LAG = Histogram(
+    "checkpoint_flush_lag_seconds",
+    "Age of the oldest checkpoint in a batch when the batch is written",
+    buckets=(0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0),
+)
+
+HTTP_REQUEST_DB_QUERIES = Histogram(
+    "http_request_db_queries",
+    "SQL statements executed per HTTP request, by route template",
+    ["method", "route"],
+    buckets=(1, 2, 3, 5, 8, 13, 21, 34, 55, 89),
+)
+
+REDIS_PUBSUB_HANDLER_LAG = Histogram(
+    "redis_pubsub_handler_lag_seconds",
+    "Time from PUBLISH until the subscriber's handler runs",
+    ["channel"],
+    buckets=(0.001, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 5.0),
+)
+
+PRINCIPAL_CACHE_LOOKUPS = Counter(
+    "principal_cache_lookups_total",
+    "Principal lookups by the tier that answered (local, redis, database)",
+    ["tier"],
+)
+
+PASSWORD_HASH_QUEUE_DEPTH = Gauge(
+    "password_hash_queue_depth",
+    "Password verifications waiting for a hashing worker",
+)
+
+PASSWORD_HASH_WAIT = Histogram(
+    "password_hash_wait_seconds",
+    "Time a password verification waited for a hashing worker",
+    buckets=(0.001, 0.01, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0),
+)
+
+PASSWORD_HASH_REJECTIONS = Counter(
+    "password_hash_rejections_total",
+    "Password verifications refused because the hashing queue was full",
+)
+
+ADMISSION_DECISIONS = Counter(
+    "admission_decisions_total",
+    "Admission-control outcomes for queued endpoints (admitted, queued, bypassed)",
+    ["outcome"],
+)
+
+
+ATTEMPTS_AUTO_SUBMITTED = Counter(
+    "attempts_auto_submitted_total",
+    "Attempts the expiry sweeper submitted and graded after their deadline",
+)
+
+EXPIRY_SWEEP_DURATION = Histogram(
+    "expiry_sweep_seconds",
+    "Time to submit and grade one batch of expired attempts",
+    buckets=(0.01, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0),
+)
+
+
+def channel_label(channel: str) -> str:
+    """Collapse `attempt:42` style channel names to their prefix"""
+    return channel.split(":", 1)[0]
+
+
+def route_template(scope: Scope) -> str:
+    """Path template of the route that handles this request"""
+    app = scope.get("app")
+    routes = getattr(getattr(app, "router", None), "routes", [])
+    partial: Optional[str] = None
+    for route in routes:
+        match, _ = route.matches(scope)
+        if match == Match.FULL:
+            return route.path
+        if match == Match.PARTIAL and partial is None:
+            partial = route.path
+    return partial or UNMATCHED_ROUTE
+
+
+def instrument_engine(engine: Engine, name: str) -> None:
+    """
+    Record pool checkout wait and in-use connections for an engine
+    
+    In-use connections follow the pool's checkout/checkin events. Pool
+    events have no "checkout requested" hook, so the wait is timed around
+    the pool's connect(); the wrapper is reapplied when dispose() swaps
+    in a fresh pool.
+    
+    Args:
+        engine: Sync engine (pass `async_engine.sync_engine` for async engines)
+        name: Value of the `engine` label, e.g. "primary" or "replica"
+    """
+    in_use = DB_POOL_IN_USE.labels(engine=name)
+    wait = DB_POOL_CHECKOUT_WAIT.labels(engine=name)
+    
+    @event.listens_for(engine, "checkout")
+    def _on_checkout(dbapi_connection, connection_record, connection_proxy):
+        in_use.inc()
+    
+    @event.listens_for(engine, "checkin")
+    def _on_checkin(dbapi_connection, connection_record):
+        in_use.dec()
+    
+    def _time_connect(pool) -> None:
+        connect = pool.connect
+        
+        def timed_connect():
+            started = time.perf_counter()
+            try:
+                return connect()
+            finally:
+                wait.observe(time.perf_counter() - started)
+        
+        pool.connect = timed_connect
+    
+    @event.listens_for(engine, "engine_disposed")
+    def _on_disposed(disposed_engine):
+        _time_connect(disposed_engine.pool)
+    
+    _time_connect(engine.pool)
+
+
+class PrometheusMiddleware:
+    """
+    ASGI middleware observing HTTP latency per route template
+    
+    Labels use the matched path template (`/api/v1/attempts/{attempt_id}`),
+    never the raw path, so per-attempt URLs do not explode cardinality.
+    WebSocket and lifespan traffic pass straight through.
+    """
+    
+    def __init__(self, app: ASGIApp):
+        self.app = app
+    
+    async def __call__(self, scope: Scope, receive: Receive, send: Send) -> None:
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+        
+        status_code = 500
+        
+        async def send_wrapper(message: Message) -> None:
+            nonlocal status_code
+            if message["type"] == "http.response.start":
+                status_code = message["status"]
+            await send(message)
+        
+        started = time.perf_counter()
+        try:
+            await self.app(scope, receive, send_wrapper)
+        finally:
+            HTTP_REQUEST_DURATION.labels(
+                method=scope["method"],
+                route=route_template(scope),
+                status=str(status_code),
+            ).observe(time.perf_counter() - started)
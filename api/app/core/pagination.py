@@ -0,0 +1,32 @@
+"""
+Keyset pagination helpers
+Opaque continuation tokens for listings ordered by (created_at, id)
+"""
+import base64
+import json
+from datetime import datetime
+from typing import Tuple
+
+# Response header carrying the token for the next page (absent on the last page)
+NEXT_CURSOR_HEADER = "X-Next-Cursor"
+
+
+def encode_cursor(created_at: datetime, row_id: int) -> str:
+    """Encode the (created_at, id) of the last row on a page as an opaque token"""
+    payload = json.dumps([created_at.isoformat(), row_id], separators=(",", ":"))
+    return base64.urlsafe_b64encode(payload.encode()).decode().rstrip("=")
+
+
+def decode_cursor(token: str) -> Tuple[datetime, int]:
+    """
+    Decode a continuation token back into (created_at, id)
+
+    Raises:
+        ValueError: If the token is malformed
+    """
+    try:
+        padded = token + "=" * (-len(token) % 4)
+        created_at, row_id = json.loads(base64.urlsafe_b64decode(padded.encode()))
+        return datetime.fromisoformat(created_at), int(row_id)
+    except (ValueError, TypeError) as e:
+        raise ValueError(f"Invalid cursor: {token}") from e
@@ -0,0 +1,166 @@
+"""
+Per-request SQL query budget
+Counts statements per HTTP request through SQLAlchemy engine events and
+flags likely N+1 patterns (one statement shape repeated many times)
+"""
+import logging
+import re
+from collections import Counter
+from contextlib import contextmanager
+from contextvars import ContextVar
+from typing import Iterator, List, Optional, Tuple
+
+from sqlalchemy import event
+from sqlalchemy.engine import Engine
+from starlette.types import ASGIApp, Receive, Scope, Send
+
+from app.core.config import settings
+from app.core.metrics import HTTP_REQUEST_DB_QUERIES, route_template
+
+logger = logging.getLogger(__name__)
+
+_WHITESPACE = re.compile(r"\s+")
+_STRING_LITERAL = re.compile(r"'(?:[^']|'')*'")
+_NUMBER_LITERAL = re.compile(r"\b\d+(?:\.\d+)?\b")
+_PARAM_LIST = re.compile(r"\(\s*(?:\?|%s|\$\d+|%\(\w+\)s|:\w+)(?:\s*,\s*(?:\?|%s|\$\d+|%\(\w+\)s|:\w+))*\s*\)")
+
+
+def statement_shape(statement: str) -> str:
+    """
+    Normalize a SQL statement so repeats of the same query compare equal
+    
+    Literals become `?` and expanded IN lists collapse to `(?...)`, so
+    `WHERE id IN (?, ?, ?)` and `WHERE id IN (?)` share one shape.
+    """
+    shape = _WHITESPACE.sub(" ", statement).strip()
+    shape = _PARAM_LIST.sub("(?...)", shape)
+    shape = _STRING_LITERAL.sub("?", shape)
+    return _NUMBER_LITERAL.sub("?", shape)
+
+
+class QueryTracker:
+    """SQL statements executed within one request (or one test block)"""
+    
+    def __init__(self):
+        self.count = 0
+        # Raw statement text; normalized only when a report asks for shapes,
+        # so the per-statement hook stays a dict increment
+        self.statements: Counter = Counter()
+    
+    def record(self, statement: str) -> None:
+        """Count one executed statement"""
+        self.count += 1
+        self.statements[statement] += 1
+    
+    def shapes(self) -> Counter:
+        """Statement counts grouped by normalized shape"""
+        shapes: Counter = Counter()
+        for statement, count in self.statements.items():
+            shapes[statement_shape(statement)] += count
+        return shapes
+    
+    def repeated(self, threshold: int = 2, limit: int = 5) -> List[Tuple[str, int]]:
+        """Most repeated statement shapes executed at least `threshold` times"""
+        return [
+            (shape, count) for shape, count in self.shapes().most_common(limit)
+            if count >= threshold
+        ]
+    
+    def summary(self, limit: int = 5) -> str:
+        """Human-readable count plus the top repeated shapes"""
+        lines = [f"{self.count} queries"]
+        for shape, count in self.repeated(limit=limit):
+            lines.append(f"  {count}x {shape[:300]}")
+        return "\n".join(lines)
+
+
+_current_tracker: ContextVar[Optional[QueryTracker]] = ContextVar("query_tracker", default=None)
+
+# Every tracker opened by capture_queries(), whichever thread or task runs the query
+_captures: List[QueryTracker] = []
+
+
+@event.listens_for(Engine, "before_cursor_execute")
+def _record_statement(conn, cursor, statement, parameters, context, executemany):
+    tracker = _current_tracker.get()
+    if tracker is not None:
+        tracker.record(statement)
+    for capture in _captures:
+        capture.record(statement)
+
+
+@contextmanager
+def track_queries() -> Iterator[QueryTracker]:
+    """
+    Count statements issued from the current context
+    
+    The tracker follows the request through awaited code, AsyncSession
+    greenlets and threadpool-run sync endpoints (they copy the context).
+    """
+    tracker = QueryTracker()
+    token = _current_tracker.set(tracker)
+    try:
+        yield tracker
+    finally:
+        _current_tracker.reset(token)
+
+
+@contextmanager
+def capture_queries() -> Iterator[QueryTracker]:
+    """
+    Count every statement on every engine until the block exits
+    
+    For tests and scripts: unlike track_queries() it also sees queries run
+    on other threads, such as the app behind a TestClient.
+    """
+    tracker = QueryTracker()
+    _captures.append(tracker)
+    try:
+        yield tracker
+    finally:
+        _captures.remove(tracker)
+
+
+class QueryBudgetMiddleware:
+    """
+    ASGI middleware counting SQL statements per HTTP request
+    
+    Logs a warning with the top repeated statement shapes when a request
+    issues more than QUERY_BUDGET_MAX_QUERIES statements, or repeats one
+    shape QUERY_BUDGET_REPEAT_THRESHOLD times (a likely N+1), and records
+    the count per route in `http_request_db_queries`.
+    """
+    
+    def __init__(
+        self,
+        app: ASGIApp,
+        max_queries: int = settings.QUERY_BUDGET_MAX_QUERIES,
+        repeat_threshold: int = settings.QUERY_BUDGET_REPEAT_THRESHOLD
+    ):
+        self.app = app
+        self.max_queries = max_queries
+        self.repeat_threshold = repeat_threshold
+    
+    async def __call__(self, scope: Scope, receive: Receive, send: Send) -> None:
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+        
+        with track_queries() as tracker:
+            try:
+                await self.app(scope, receive, send)
+            finally:
+                self._report(scope, tracker)
+    
+    def _report(self, scope: Scope, tracker: QueryTracker) -> None:
+        """Export the count and warn about requests over budget"""
+        route = route_template(scope)
+        HTTP_REQUEST_DB_QUERIES.labels(method=scope["method"], route=route).observe(tracker.count)
+        
+        over_budget = tracker.count > self.max_queries
+        repeats = tracker.repeated(threshold=self.repeat_threshold)
+        if over_budget or repeats:
+            reason = "over query budget" if over_budget else "repeated statements (possible N+1)"
+            logger.warning(
+                f"{scope['method']} {route}: {reason}, {tracker.summary()}"
+            )
@@ -1,11 +1,19 @@
 """
 Security utilities for password hashing and JWT tokens
 """
+import asyncio
+import math
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
 from datetime import datetime, timedelta
-from typing import Optional, Dict, Any
+from typing import Optional, Dict, Any, Callable
 from jose import JWTError, jwt
 from passlib.context import CryptContext
 from app.core.config import settings
+from app.core.metrics import (
+    PASSWORD_HASH_QUEUE_DEPTH, PASSWORD_HASH_REJECTIONS, PASSWORD_HASH_WAIT
+)
 
 # Password hashing context
 pwd_context = CryptContext(
@@ -24,6 +32,107 @@ def get_password_hash(password: str) -> str:
     return pwd_context.hash(password)
 
 
+class HashingOverloadedError(Exception):
+    """The password-hashing queue is full"""
+    
+    def __init__(self, retry_after: int):
+        super().__init__(f"Password hashing queue is full, retry after {retry_after}s")
+        self.retry_after = retry_after
+
+
+class PasswordHashExecutor:
+    """
+    Bounded thread pool for password verification
+    
+    bcrypt releases the GIL while hashing, so the workers hash in parallel
+    and the event loop keeps serving other requests. Once max_queue
+    verifications are waiting, further ones are refused instead of
+    queueing behind a backlog that would blow up tail latency.
+    """
+    
+    def __init__(self, max_workers: int, max_queue: int):
+        self.max_workers = max_workers
+        self.max_queue = max_queue
+        self._executor = ThreadPoolExecutor(
+            max_workers=max_workers, thread_name_prefix="password-hash"
+        )
+        self._lock = threading.Lock()
+        self._waiting = 0
+        # Moving average of one verification, for Retry-After estimates
+        self._average_seconds = 0.25
+    
+    @property
+    def queue_depth(self) -> int:
+        """Verifications submitted but not yet started"""
+        return self._waiting
+    
+    def retry_after(self) -> int:
+        """Seconds until the current backlog should have drained"""
+        backlog = self._waiting * self._average_seconds / self.max_workers
+        return max(1, math.ceil(backlog))
+    
+    async def run(self, fn: Callable[..., Any], *args: Any) -> Any:
+        """
+        Run fn(*args) on a hashing worker
+        
+        Raises:
+            HashingOverloadedError: If max_queue verifications are already waiting
+        """
+        with self._lock:
+            if self._waiting >= self.max_queue:
+                PASSWORD_HASH_REJECTIONS.inc()
+                raise HashingOverloadedError(self.retry_after())
+            self._waiting += 1
+        PASSWORD_HASH_QUEUE_DEPTH.inc()
+        
+        submitted_at = time.perf_counter()
+        state = {"started": False}
+        
+        def timed_call():
+            started_at = time.perf_counter()
+            if not self._leave_queue(state):
+                return None
+            PASSWORD_HASH_WAIT.observe(started_at - submitted_at)
+            try:
+                return fn(*args)
+            finally:
+                elapsed = time.perf_counter() - started_at
+                self._average_seconds = 0.9 * self._average_seconds + 0.1 * elapsed
+        
+        try:
+            return await asyncio.get_running_loop().run_in_executor(self._executor, timed_call)
+        finally:
+            # Cancelled before a worker picked it up
+            self._leave_queue(state)
+    
+    def _leave_queue(self, state: dict) -> bool:
+        """Count a submission out of the queue exactly once"""
+        with self._lock:
+            if state["started"]:
+                return False
+            state["started"] = True
+            self._waiting -= 1
+        PASSWORD_HASH_QUEUE_DEPTH.dec()
+        return True
+
+
+# Shared by login and hall-ticket login
+password_hash_executor = PasswordHashExecutor(
+    max_workers=settings.PASSWORD_HASH_WORKERS,
+    max_queue=settings.PASSWORD_HASH_MAX_QUEUE
+)
+
+
+async def verify_password_async(plain_password: str, hashed_password: str) -> bool:
+    """
+    Verify a password on the bounded hashing pool
+    
+    Raises:
+        HashingOverloadedError: If the hashing queue is full
+    """
+    return await password_hash_executor.run(verify_password, plain_password, hashed_password)
+
+
 def create_access_token(
     data: Dict[str, Any],
     expires_delta: Optional[timedelta] = None
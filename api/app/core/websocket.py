@@ -2,28 +2,117 @@
 WebSocket Connection Manager
 Manages WebSocket connections, heartbeats, and connection lifecycle
 """
-from typing import Dict, Set, Optional, List
+from typing import Deque, Dict, Set, Optional, List, Iterable
 from fastapi import WebSocket, WebSocketDisconnect
 from datetime import datetime, timedelta
 import asyncio
 import json
 import logging
-from collections import defaultdict
+import math
+import time
+from collections import defaultdict, deque
+
+from app.core.metrics import (
+    WS_ACTIVE_CONNECTIONS,
+    WS_BROADCAST_FANOUT_DURATION,
+    WS_HEARTBEAT_SWEEP_DURATION,
+    WS_SEND_FAILURES,
+    WS_SEND_QUEUE_DROPS,
+    WS_SEND_QUEUE_LAG,
+    WS_SLOW_CONSUMER_EVICTIONS,
+)
 
 logger = logging.getLogger(__name__)
 
+# Message types where only the latest pending copy matters: a newer one
+# replaces a queued one with the same coalesce key, and under backpressure
+# they are dropped before anything else
+DROPPABLE_MESSAGE_TYPES = frozenset({"ping", "time_update", "notification"})
+
+# Outcomes of ConnectionManager.enqueue
+QUEUED = "queued"
+COALESCED = "coalesced"
+DROPPED = "dropped"
+EVICTED = "evicted"
+
+
+def encode_frame(message: dict) -> str:
+    """Serialize a message the way WebSocket.send_json does"""
+    return json.dumps(message, separators=(",", ":"), ensure_ascii=False)
+
+
+def coalesce_key(message: dict) -> Optional[str]:
+    """Key under which a droppable message replaces an older pending one, else None"""
+    message_type = message.get("type")
+    if message_type not in DROPPABLE_MESSAGE_TYPES:
+        return None
+    if message_type == "notification":
+        # Different notices must not overwrite each other, repeats may
+        return f"notification:{message.get('title')}"
+    return message_type
+
+
+class BroadcastReport:
+    """Delivery outcome of one fan-out"""
+    
+    __slots__ = ("targets", "delivered", "dropped", "failed", "duration_seconds", "p99_seconds")
+    
+    def __init__(
+        self,
+        targets: int,
+        delivered: int,
+        dropped: int,
+        failed: int,
+        duration_seconds: float,
+        p99_seconds: float
+    ):
+        self.targets = targets
+        self.delivered = delivered
+        self.dropped = dropped
+        self.failed = failed
+        self.duration_seconds = duration_seconds
+        self.p99_seconds = p99_seconds
+    
+    def to_dict(self) -> dict:
+        """Convert to dictionary"""
+        return {
+            "targets": self.targets,
+            "delivered": self.delivered,
+            "dropped": self.dropped,
+            "failed": self.failed,
+            "duration_ms": round(self.duration_seconds * 1000, 3),
+            "p99_ms": round(self.p99_seconds * 1000, 3),
+        }
+
 
 class ConnectionManager:
     """
     Manages WebSocket connections for exam attempts
     Supports multiple connections per user, heartbeat monitoring, and broadcasting
+    
+    Heartbeats run on one scheduler task per manager, driving a hashed timer
+    wheel: heartbeat_interval is split into heartbeat_slots ticks and each
+    connection is hashed into the slot just behind the cursor when it
+    connects. Every tick sweeps one slot, dropping its stale connections and
+    pinging the rest as one batch, so each connection is checked once per
+    interval and pings are spread evenly instead of one timer per socket.
+    
+    Nothing here awaits a socket write on behalf of a producer. Every
+    connection owns a bounded outbound queue, drained by a writer task that
+    exists only while the queue is non-empty. Broadcasts serialize the frame
+    once and queue it for each target. A connection whose queue overflows
+    with undroppable messages, or whose oldest unsent message is older than
+    max_send_lag seconds, is evicted as a slow consumer.
     """
     
     def __init__(
         self,
         heartbeat_interval: int = 30,
         heartbeat_timeout: int = 60,
-        max_connections_per_user: int = 3
+        max_connections_per_user: int = 3,
+        heartbeat_slots: int = 30,
+        send_queue_size: int = 256,
+        max_send_lag: float = 15.0
     ):
         """
         Initialize connection manager
@@ -32,6 +121,10 @@ class ConnectionManager:
             heartbeat_interval: Seconds between heartbeat pings
             heartbeat_timeout: Seconds before marking connection as stale
             max_connections_per_user: Maximum simultaneous connections per user
+            heartbeat_slots: Timer-wheel slots (ticks) per heartbeat interval
+            send_queue_size: Outbound messages queued per connection
+            max_send_lag: Seconds a queued message may wait before the
+                connection is evicted as a slow consumer
         """
         # Connection storage: {attempt_id: {connection_id: ConnectionInfo}}
         self.active_connections: Dict[int, Dict[str, "ConnectionInfo"]] = defaultdict(dict)
@@ -39,6 +132,10 @@ class ConnectionManager:
         # User tracking: {user_id: Set[attempt_id]}
         self.user_attempts: Dict[int, Set[int]] = defaultdict(set)
         
+        # Exam and center tracking: {exam_id/center_id: Set[attempt_id]}
+        self.exam_attempts: Dict[int, Set[int]] = defaultdict(set)
+        self.center_attempts: Dict[int, Set[int]] = defaultdict(set)
+        
         # Reverse lookup: {connection_id: attempt_id}
         self.connection_to_attempt: Dict[str, int] = {}
         
@@ -46,16 +143,27 @@ class ConnectionManager:
         self.heartbeat_interval = heartbeat_interval
         self.heartbeat_timeout = heartbeat_timeout
         self.max_connections_per_user = max_connections_per_user
+        self.send_queue_size = send_queue_size
+        self.max_send_lag = max_send_lag
+        
+        # Closes of evicted sockets, which may themselves stall
+        self._closing_tasks: Set[asyncio.Task] = set()
         
-        # Background task tracking
-        self._heartbeat_tasks: Dict[str, asyncio.Task] = {}
+        # Timer wheel: one revolution per heartbeat interval, so a connection
+        # stays in its slot for its whole lifetime
+        self.heartbeat_slots = max(1, heartbeat_slots)
+        self._wheel: List[Set[str]] = [set() for _ in range(self.heartbeat_slots)]
+        self._cursor = 0  # Next slot to sweep
+        self._heartbeat_task: Optional[asyncio.Task] = None
         
     async def connect(
         self,
         websocket: WebSocket,
         attempt_id: int,
         user_id: int,
-        connection_id: str
+        connection_id: str,
+        exam_id: Optional[int] = None,
+        center_id: Optional[int] = None
     ) -> bool:
         """
         Accept and register a new WebSocket connection
@@ -65,11 +173,14 @@ class ConnectionManager:
             attempt_id: Student attempt ID
             user_id: User ID
             connection_id: Unique connection identifier
+            exam_id: Exam of the attempt, for exam-wide broadcasts
+            center_id: Candidate's center, for center-wide broadcasts
             
         Returns:
             True if connection accepted, False if rejected
         """
-        # Check connection limit
+        # Check connection limit on this worker (callers check the cluster-wide
+        # one first through presence_registry)
         user_connection_count = sum(
             len(conns) for aid in self.user_attempts.get(user_id, set())
             for conns in [self.active_connections.get(aid, {})]
@@ -92,18 +203,26 @@ class ConnectionManager:
             attempt_id=attempt_id,
             user_id=user_id,
             connection_id=connection_id,
-            connected_at=datetime.utcnow()
+            connected_at=datetime.utcnow(),
+            exam_id=exam_id,
+            center_id=center_id
         )
         
         # Register connection
         self.active_connections[attempt_id][connection_id] = conn_info
         self.user_attempts[user_id].add(attempt_id)
+        if exam_id is not None:
+            self.exam_attempts[exam_id].add(attempt_id)
+        if center_id is not None:
+            self.center_attempts[center_id].add(attempt_id)
         self.connection_to_attempt[connection_id] = attempt_id
+        WS_ACTIVE_CONNECTIONS.inc()
         
-        # Start heartbeat monitoring
-        self._heartbeat_tasks[connection_id] = asyncio.create_task(
-            self._heartbeat_monitor(connection_id)
-        )
+        # Schedule heartbeats: the slot just behind the cursor comes round
+        # again after one full interval
+        conn_info.heartbeat_slot = (self._cursor - 1) % self.heartbeat_slots
+        self._wheel[conn_info.heartbeat_slot].add(connection_id)
+        self._ensure_heartbeat_scheduler()
         
         logger.info(
             f"WebSocket connected: attempt_id={attempt_id}, "
@@ -119,6 +238,10 @@ class ConnectionManager:
         Args:
             connection_id: Connection to remove
         """
+        self._unregister(connection_id)
+    
+    def _unregister(self, connection_id: str) -> None:
+        """Forget a connection and discard its unsent messages"""
         attempt_id = self.connection_to_attempt.get(connection_id)
         if not attempt_id:
             return
@@ -128,23 +251,34 @@ class ConnectionManager:
         if not conn_info:
             return
         
-        # Cancel heartbeat task
-        if connection_id in self._heartbeat_tasks:
-            self._heartbeat_tasks[connection_id].cancel()
-            del self._heartbeat_tasks[connection_id]
+        # Unschedule heartbeats and stop the writer
+        self._wheel[conn_info.heartbeat_slot].discard(connection_id)
+        conn_info.closed = True
+        conn_info.outbox.clear()
+        conn_info.pending_keys.clear()
+        writer = conn_info.writer_task
+        if writer is not None and writer is not asyncio.current_task():
+            writer.cancel()
         
         # Remove from tracking
         del self.active_connections[attempt_id][connection_id]
         if not self.active_connections[attempt_id]:
             del self.active_connections[attempt_id]
         
-        del self.connection_to_attempt[connection_id]
+            # Clean up user/exam/center tracking once the attempt has no
+            # connections left; another tab of the attempt may still be open
+            for index, key in (
+                (self.user_attempts, conn_info.user_id),
+                (self.exam_attempts, conn_info.exam_id),
+                (self.center_attempts, conn_info.center_id)
+            ):
+                if key in index:
+                    index[key].discard(attempt_id)
+                    if not index[key]:
+                        del index[key]
         
-        # Clean up user tracking
-        if conn_info.user_id in self.user_attempts:
-            self.user_attempts[conn_info.user_id].discard(attempt_id)
-            if not self.user_attempts[conn_info.user_id]:
-                del self.user_attempts[conn_info.user_id]
+        del self.connection_to_attempt[connection_id]
+        WS_ACTIVE_CONNECTIONS.dec()
         
         logger.info(
             f"WebSocket disconnected: attempt_id={attempt_id}, "
@@ -157,14 +291,14 @@ class ConnectionManager:
         connection_id: str
     ) -> bool:
         """
-        Send a message to a specific connection
+        Queue a message for a specific connection
         
         Args:
             message: Message dictionary
             connection_id: Target connection
             
         Returns:
-            True if sent successfully, False otherwise
+            True if queued, False if the connection is gone or was evicted
         """
         attempt_id = self.connection_to_attempt.get(connection_id)
         if not attempt_id:
@@ -174,14 +308,8 @@ class ConnectionManager:
         if not conn_info:
             return False
         
-        try:
-            await conn_info.websocket.send_json(message)
-            conn_info.update_last_activity()
-            return True
-        except Exception as e:
-            logger.error(f"Error sending message to {connection_id}: {e}")
-            await self.disconnect(connection_id)
-            return False
+        outcome = self.enqueue(conn_info, encode_frame(message), "message", coalesce_key(message))
+        return outcome in (QUEUED, COALESCED)
     
     async def broadcast_to_attempt(
         self,
@@ -200,22 +328,19 @@ class ConnectionManager:
         Returns:
             Number of connections that received the message
         """
-        connections = self.active_connections.get(attempt_id, {})
-        sent_count = 0
-        
-        for conn_id, conn_info in list(connections.items()):
-            if conn_id == exclude_connection:
-                continue
-            
-            try:
-                await conn_info.websocket.send_json(message)
-                conn_info.update_last_activity()
-                sent_count += 1
-            except Exception as e:
-                logger.error(f"Error broadcasting to {conn_id}: {e}")
-                await self.disconnect(conn_id)
+        targets = [
+            conn_info
+            for conn_id, conn_info in self.active_connections.get(attempt_id, {}).items()
+            if conn_id != exclude_connection
+        ]
+        if not targets:
+            return 0
         
-        return sent_count
+        report = await self.fan_out(
+            encode_frame(message), targets, kind="broadcast", key=coalesce_key(message)
+        )
+        WS_BROADCAST_FANOUT_DURATION.labels(scope="attempt").observe(report.duration_seconds)
+        return report.delivered
     
     async def broadcast_to_user(
         self,
@@ -241,6 +366,214 @@ class ConnectionManager:
         
         return sent_count
     
+    async def broadcast_to_exam(
+        self,
+        message: dict,
+        exam_id: int
+    ) -> BroadcastReport:
+        """
+        Broadcast a message to all connections for attempts of an exam
+        
+        Args:
+            message: Message to broadcast
+            exam_id: Target exam ID
+            
+        Returns:
+            Delivery counts and fan-out timing
+        """
+        report = await self.fan_out(
+            encode_frame(message),
+            self._connections_for(self.exam_attempts.get(exam_id, ())),
+            kind="broadcast",
+            key=coalesce_key(message)
+        )
+        WS_BROADCAST_FANOUT_DURATION.labels(scope="exam").observe(report.duration_seconds)
+        return report
+    
+    async def broadcast_to_center(
+        self,
+        message: dict,
+        center_id: int,
+        exam_id: Optional[int] = None
+    ) -> BroadcastReport:
+        """
+        Broadcast a message to all connections of candidates at a center
+        
+        Args:
+            message: Message to broadcast
+            center_id: Target center ID
+            exam_id: Only attempts of this exam, if given
+            
+        Returns:
+            Delivery counts and fan-out timing
+        """
+        attempt_ids = self.center_attempts.get(center_id, set())
+        if exam_id is not None:
+            attempt_ids = attempt_ids & self.exam_attempts.get(exam_id, set())
+        
+        report = await self.fan_out(
+            encode_frame(message),
+            self._connections_for(attempt_ids),
+            kind="broadcast",
+            key=coalesce_key(message)
+        )
+        WS_BROADCAST_FANOUT_DURATION.labels(scope="center").observe(report.duration_seconds)
+        return report
+    
+    async def fan_out(
+        self,
+        frame: str,
+        targets: List["ConnectionInfo"],
+        kind: str,
+        key: Optional[str] = None
+    ) -> BroadcastReport:
+        """
+        Queue one pre-serialized frame for many connections
+        
+        Args:
+            frame: Serialized message (see encode_frame)
+            targets: Connections to write to
+            kind: Send-failure metric label
+            key: Coalesce key if the message is droppable (see coalesce_key)
+            
+        Returns:
+            Delivery counts; delivered means accepted into the socket's send
+            queue (time on the wire is in ws_send_queue_lag_seconds), and p99
+            is the time until 99% of sockets had the frame queued
+        """
+        started = time.perf_counter()
+        latencies: List[float] = []
+        dropped = failed = 0
+        
+        for conn_info in targets:
+            outcome = self.enqueue(conn_info, frame, kind, key)
+            if outcome == DROPPED:
+                dropped += 1
+            elif outcome == EVICTED:
+                failed += 1
+            else:
+                latencies.append(time.perf_counter() - started)
+        
+        p99 = latencies[max(0, math.ceil(len(latencies) * 0.99) - 1)] if latencies else 0.0
+        return BroadcastReport(
+            targets=len(targets),
+            delivered=len(latencies),
+            dropped=dropped,
+            failed=failed,
+            duration_seconds=time.perf_counter() - started,
+            p99_seconds=p99
+        )
+    
+    def enqueue(
+        self,
+        conn_info: "ConnectionInfo",
+        frame: str,
+        kind: str,
+        key: Optional[str] = None
+    ) -> str:
+        """
+        Queue a frame for a connection without waiting on the network
+        
+        A droppable frame (key set) replaces a pending frame with the same
+        key, and is dropped if the queue is full. An undroppable frame makes
+        room by dropping the oldest droppable one; if there is none, or the
+        connection already lags more than max_send_lag, it is evicted.
+        
+        Returns:
+            QUEUED, COALESCED, DROPPED or EVICTED
+        """
+        if conn_info.closed:
+            return EVICTED
+        
+        now = time.monotonic()
+        if key is not None:
+            entry = conn_info.pending_keys.get(key)
+            if entry is not None:
+                entry[0] = frame
+                WS_SEND_QUEUE_DROPS.labels(reason="coalesced").inc()
+                return COALESCED
+        
+        if conn_info.send_lag(now) > self.max_send_lag:
+            self._evict(conn_info, "lag")
+            return EVICTED
+        
+        if len(conn_info.outbox) >= self.send_queue_size:
+            if key is not None:
+                WS_SEND_QUEUE_DROPS.labels(reason="overflow").inc()
+                return DROPPED
+            if not conn_info.drop_oldest_droppable():
+                self._evict(conn_info, "overflow")
+                return EVICTED
+            WS_SEND_QUEUE_DROPS.labels(reason="overflow").inc()
+        
+        entry = [frame, key, kind, now]
+        conn_info.outbox.append(entry)
+        if key is not None:
+            conn_info.pending_keys[key] = entry
+        
+        if conn_info.writer_task is None:
+            conn_info.writer_task = asyncio.create_task(self._write_queued(conn_info))
+        return QUEUED
+    
+    async def _write_queued(self, conn_info: "ConnectionInfo") -> None:
+        """Writer task: drain a connection's queue, then exit"""
+        try:
+            while conn_info.outbox:
+                entry = conn_info.outbox.popleft()
+                frame, key, kind, enqueued_at = entry
+                if key is not None and conn_info.pending_keys.get(key) is entry:
+                    del conn_info.pending_keys[key]
+                
+                conn_info.inflight_since = enqueued_at
+                try:
+                    await conn_info.websocket.send_text(frame)
+                except asyncio.CancelledError:
+                    raise
+                except Exception as e:
+                    logger.error(f"Error sending {kind} to {conn_info.connection_id}: {e}")
+                    WS_SEND_FAILURES.labels(kind=kind).inc()
+                    self._unregister(conn_info.connection_id)
+                    return
+                finally:
+                    conn_info.inflight_since = None
+                
+                # Pings are most of the frames and carry no latency anyone waits on
+                if kind != "heartbeat":
+                    WS_SEND_QUEUE_LAG.observe(time.monotonic() - enqueued_at)
+                    conn_info.update_last_activity()
+        finally:
+            conn_info.writer_task = None
+    
+    def _evict(self, conn_info: "ConnectionInfo", reason: str) -> None:
+        """Drop a slow consumer and close its socket in the background"""
+        logger.warning(
+            f"Evicting slow WebSocket consumer {conn_info.connection_id} ({reason}): "
+            f"{len(conn_info.outbox)} queued, lag {conn_info.send_lag(time.monotonic()):.1f}s"
+        )
+        WS_SLOW_CONSUMER_EVICTIONS.labels(reason=reason).inc()
+        self._unregister(conn_info.connection_id)
+        
+        task = asyncio.create_task(self._close_evicted(conn_info.websocket))
+        self._closing_tasks.add(task)
+        task.add_done_callback(self._closing_tasks.discard)
+    
+    async def _close_evicted(self, websocket: WebSocket) -> None:
+        try:
+            await asyncio.wait_for(
+                websocket.close(code=1013, reason="Client too slow"),
+                timeout=self.heartbeat_timeout
+            )
+        except Exception as e:
+            logger.debug(f"Closing evicted WebSocket failed: {e}")
+    
+    def _connections_for(self, attempt_ids: Iterable[int]) -> List["ConnectionInfo"]:
+        """Open connections of the given attempts"""
+        return [
+            conn_info
+            for attempt_id in attempt_ids
+            for conn_info in self.active_connections.get(attempt_id, {}).values()
+        ]
+    
     def get_active_connections_for_attempt(self, attempt_id: int) -> List[str]:
         """Get list of active connection IDs for an attempt"""
         return list(self.active_connections.get(attempt_id, {}).keys())
@@ -253,55 +586,88 @@ class ConnectionManager:
         return connection_ids
     
     def is_attempt_connected(self, attempt_id: int) -> bool:
-        """Check if an attempt has any active connections"""
+        """Check if an attempt has any active connections on this worker (see presence_registry)"""
         return attempt_id in self.active_connections and \
                len(self.active_connections[attempt_id]) > 0
     
-    async def _heartbeat_monitor(self, connection_id: str) -> None:
+    def _ensure_heartbeat_scheduler(self) -> None:
+        """Start the scheduler task unless it is already running on this loop"""
+        task = self._heartbeat_task
+        if task is not None and not task.done() and task.get_loop() is asyncio.get_running_loop():
+            return
+        self._heartbeat_task = asyncio.create_task(self._heartbeat_scheduler())
+    
+    async def _heartbeat_scheduler(self) -> None:
         """
-        Monitor connection health via heartbeat
+        Sweep one wheel slot per tick until no connections remain
         
-        Args:
-            connection_id: Connection to monitor
+        Ticks are scheduled from a fixed start time, so a slow sweep delays
+        the next tick without shifting the ones after it.
         """
+        loop = asyncio.get_running_loop()
+        this_task = asyncio.current_task()
+        tick = self.heartbeat_interval / self.heartbeat_slots
+        next_tick = loop.time() + tick
+        
         try:
-            while True:
-                await asyncio.sleep(self.heartbeat_interval)
+            while self.connection_to_attempt:
+                await asyncio.sleep(max(0.0, next_tick - loop.time()))
+                next_tick += tick
                 
-                attempt_id = self.connection_to_attempt.get(connection_id)
-                if not attempt_id:
-                    break
+                slot = self._cursor
+                self._cursor = (slot + 1) % self.heartbeat_slots
+                if self._wheel[slot]:
+                    started = loop.time()
+                    await self._sweep_slot(slot)
+                    WS_HEARTBEAT_SWEEP_DURATION.observe(loop.time() - started)
+        except asyncio.CancelledError:
+            logger.debug("Heartbeat scheduler cancelled")
+        except Exception as e:
+            logger.error(f"Heartbeat scheduler error: {e}")
+        finally:
+            if self._heartbeat_task is this_task:
+                self._heartbeat_task = None
                 
-                conn_info = self.active_connections.get(attempt_id, {}).get(connection_id)
-                if not conn_info:
-                    break
+    async def _sweep_slot(self, slot: int) -> None:
+        """Drop stale and lagging connections in a slot and queue pings for the rest"""
+        now = datetime.utcnow()
+        monotonic_now = time.monotonic()
+        targets = []
                 
-                # Check if connection is stale
-                time_since_activity = datetime.utcnow() - conn_info.last_activity
-                if time_since_activity.total_seconds() > self.heartbeat_timeout:
-                    logger.warning(
-                        f"Connection {connection_id} timed out "
-                        f"(last activity: {time_since_activity.total_seconds()}s ago)"
-                    )
-                    await self.disconnect(connection_id)
-                    break
+        for connection_id in list(self._wheel[slot]):
+            attempt_id = self.connection_to_attempt.get(connection_id)
+            conn_info = self.active_connections.get(attempt_id, {}).get(connection_id)
+            if conn_info is None:
+                self._wheel[slot].discard(connection_id)
+                continue
                 
-                # Send heartbeat ping
-                try:
-                    await conn_info.websocket.send_json({
-                        "type": "ping",
-                        "timestamp": datetime.utcnow().isoformat()
-                    })
-                except Exception as e:
-                    logger.error(f"Heartbeat failed for {connection_id}: {e}")
-                    await self.disconnect(connection_id)
-                    break
+            # Check if connection is stale
+            idle_seconds = (now - conn_info.last_activity).total_seconds()
+            if idle_seconds > self.heartbeat_timeout:
+                logger.warning(
+                    f"Connection {connection_id} timed out "
+                    f"(last activity: {idle_seconds}s ago)"
+                )
+                await self.disconnect(connection_id)
+                continue
                     
-        except asyncio.CancelledError:
-            logger.debug(f"Heartbeat monitor cancelled for {connection_id}")
-        except Exception as e:
-            logger.error(f"Heartbeat monitor error for {connection_id}: {e}")
-            await self.disconnect(connection_id)
+            # Evict consumers whose writer has been stuck too long
+            if conn_info.send_lag(monotonic_now) > self.max_send_lag:
+                self._evict(conn_info, "lag")
+                continue
+            
+            targets.append(conn_info)
+        
+        if not targets:
+            return
+        
+        # Queue heartbeat pings as one batch
+        await self.fan_out(
+            encode_frame({"type": "ping", "timestamp": now.isoformat()}),
+            targets,
+            kind="heartbeat",
+            key="ping"
+        )
 
 
 class ConnectionInfo:
@@ -313,15 +679,45 @@ class ConnectionInfo:
         attempt_id: int,
         user_id: int,
         connection_id: str,
-        connected_at: datetime
+        connected_at: datetime,
+        exam_id: Optional[int] = None,
+        center_id: Optional[int] = None
     ):
         self.websocket = websocket
         self.attempt_id = attempt_id
+        self.exam_id = exam_id
+        self.center_id = center_id
         self.user_id = user_id
         self.connection_id = connection_id
         self.connected_at = connected_at
         self.last_activity = connected_at
         self.message_count = 0
+        self.heartbeat_slot = 0  # Timer-wheel slot, set by ConnectionManager
+        
+        # Outbound queue of [frame, coalesce key, kind, enqueued_at] entries,
+        # owned by ConnectionManager
+        self.outbox: Deque[list] = deque()
+        self.pending_keys: Dict[str, list] = {}
+        self.writer_task: Optional[asyncio.Task] = None
+        self.inflight_since: Optional[float] = None  # enqueued_at of the frame being written
+        self.closed = False
+    
+    def send_lag(self, now: float) -> float:
+        """Seconds the oldest unsent frame has been waiting (monotonic clock)"""
+        if self.inflight_since is not None:
+            return now - self.inflight_since
+        if self.outbox:
+            return now - self.outbox[0][3]
+        return 0.0
+    
+    def drop_oldest_droppable(self) -> bool:
+        """Remove the oldest queued droppable frame; False if there is none"""
+        for index, entry in enumerate(self.outbox):
+            if entry[1] is not None:
+                del self.outbox[index]
+                del self.pending_keys[entry[1]]
+                return True
+        return False
     
     def update_last_activity(self) -> None:
         """Update last activity timestamp"""
@@ -3,13 +3,22 @@ FastAPI Main Application Entry Point
 """
 from fastapi import FastAPI
 from fastapi.middleware.cors import CORSMiddleware
-from fastapi.responses import JSONResponse
+from fastapi.responses import JSONResponse, Response
+from prometheus_client import CONTENT_TYPE_LATEST, generate_latest
 from contextlib import asynccontextmanager
 import logging
 
 from app.core.config import settings
+from app.core.metrics import PrometheusMiddleware
+from app.core.pagination import NEXT_CURSOR_HEADER
+from app.core.query_budget import QueryBudgetMiddleware
 from app.api import auth, exams, attempts, ws_attempts, transfers, proctoring
+from app.services.admission import TICKET_HEADER
 from app.services.redis import redis_service
+from app.services.checkpoint import checkpoint_service
+from app.services.presence import presence_registry
+from app.services.expiry import expiry_sweeper
+from app.services.principal_cache import principal_cache
 
 logger = logging.getLogger(__name__)
 
@@ -30,11 +39,42 @@ async def lifespan(app: FastAPI):
     except Exception as e:
         logger.error(f"Failed to connect to Redis: {e}")
     
+    # Drop cached principals when another node invalidates them
+    try:
+        await principal_cache.start()
+    except Exception as e:
+        logger.error(f"Failed to subscribe to principal invalidations: {e}")
+    
+    # Replay checkpoints journaled but not yet written before the last shutdown
+    checkpoint_service.start()
+    
+    # Auto-submit attempts abandoned past their deadline
+    expiry_sweeper.start()
+    
     yield
     
     # Shutdown
     logger.info("Shutting down application...")
     
+    # Stop sweeping before buffered checkpoints are flushed
+    await expiry_sweeper.close()
+    
+    # Write out buffered checkpoints before the process exits
+    try:
+        flushed = await checkpoint_service.flush_pending()
+        logger.info(f"Flushed {flushed} pending checkpoints")
+    except Exception as e:
+        logger.error(f"Error flushing pending checkpoints: {e}")
+    
+    # Stop counting this worker's sockets towards cluster-wide limits
+    try:
+        await presence_registry.close()
+    except Exception as e:
+        logger.error(f"Error releasing WebSocket presence: {e}")
+    
+    # Stop pushing time updates
+    await ws_attempts.exam_clock.close()
+    
     # Disconnect from Redis
     try:
         await redis_service.disconnect()
@@ -59,8 +99,15 @@ app.add_middleware(
     allow_credentials=True,
     allow_methods=["*"],
     allow_headers=["*"],
+    expose_headers=[NEXT_CURSOR_HEADER, TICKET_HEADER, "Retry-After"],
 )
 
+# Per-route latency histograms
+app.add_middleware(PrometheusMiddleware)
+
+# Per-request SQL statement counting (N+1 detection)
+app.add_middleware(QueryBudgetMiddleware)
+
 # Include routers
 app.include_router(auth.router, prefix=settings.API_V1_PREFIX)
 app.include_router(exams.router, prefix=settings.API_V1_PREFIX)
@@ -82,6 +129,12 @@ async def health_check():
     )
 
 
+@app.get("/metrics", include_in_schema=False)
+async def metrics():
+    """Prometheus scrape endpoint"""
+    return Response(content=generate_latest(), media_type=CONTENT_TYPE_LATEST)
+
+
 @app.get("/")
 async def root():
     """Root endpoint"""
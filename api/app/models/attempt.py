@@ -4,7 +4,7 @@ Tracks student exam attempts and their answers
 """
 from sqlalchemy import (
     Column, Integer, String, Float, DateTime, ForeignKey,
-    Boolean, Text, Enum as SQLEnum, JSON
+    Boolean, Text, Enum as SQLEnum, JSON, Index
 )
 from sqlalchemy.orm import relationship
 from sqlalchemy.sql import func
@@ -29,6 +29,14 @@ class StudentAttempt(Base):
     Manages the lifecycle of a student taking an exam
     """
     __tablename__ = "student_attempts"
+    __table_args__ = (
+        # Existing-attempt checks: student + exam + status
+        Index("ix_student_attempts_student_exam_status", "student_id", "exam_id", "status"),
+        # Keyset-paginated listings (newest first), unfiltered and per exam / student
+        Index("ix_student_attempts_created_id", "created_at", "id"),
+        Index("ix_student_attempts_exam_created_id", "exam_id", "created_at", "id"),
+        Index("ix_student_attempts_student_created_id", "student_id", "created_at", "id"),
+    )
     
     id = Column(Integer, primary_key=True, index=True)
     student_id = Column(Integer, ForeignKey("users.id", ondelete="CASCADE"), nullable=False)
@@ -148,6 +156,10 @@ class StudentAnswer(Base):
     Supports multiple answer types and tracks answer history
     """
     __tablename__ = "student_answers"
+    __table_args__ = (
+        # One answer row per question per attempt (autosave upsert key)
+        Index("ix_student_answers_attempt_question", "attempt_id", "question_id", unique=True),
+    )
     
     id = Column(Integer, primary_key=True, index=True)
     attempt_id = Column(Integer, ForeignKey("student_attempts.id", ondelete="CASCADE"), nullable=False)
@@ -5,7 +5,7 @@ from datetime import datetime
 from typing import List
 from sqlalchemy import (
     Boolean, Column, Integer, String, Text, DateTime, 
-    ForeignKey, Enum, Float, JSON
+    ForeignKey, Enum, Float, JSON, Index
 )
 from sqlalchemy.orm import relationship
 import enum
@@ -188,6 +188,10 @@ class ExamQuestion(Base):
     Association table linking exams to questions with ordering
     """
     __tablename__ = "exam_questions"
+    __table_args__ = (
+        # A question appears at most once in an exam
+        Index("ix_exam_questions_exam_question", "exam_id", "question_id", unique=True),
+    )
     
     id = Column(Integer, primary_key=True, index=True)
     
@@ -2,7 +2,7 @@
 Proctoring and Anti-Cheating Models
 Tracks exam session events for integrity monitoring
 """
-from sqlalchemy import Column, Integer, String, DateTime, ForeignKey, JSON, Text
+from sqlalchemy import Column, Integer, String, DateTime, ForeignKey, JSON, Text, Index
 from sqlalchemy.orm import relationship
 from datetime import datetime
 from app.core.database import Base
@@ -14,6 +14,10 @@ class ProctoringEvent(Base):
     Used for detecting violations and suspicious activity
     """
     __tablename__ = "proctoring_events"
+    __table_args__ = (
+        # Per-attempt event timeline
+        Index("ix_proctoring_events_attempt_timestamp", "attempt_id", "event_timestamp"),
+    )
     
     id = Column(Integer, primary_key=True, index=True)
     attempt_id = Column(Integer, ForeignKey("student_attempts.id", ondelete="CASCADE"), nullable=False, index=True)
@@ -54,6 +58,10 @@ class QuestionTiming(Base):
     Helps identify rushing through answers or spending too much time
     """
     __tablename__ = "question_timings"
+    __table_args__ = (
+        # One timing row per question per attempt
+        Index("ix_question_timings_unique_attempt_question", "attempt_id", "question_id", unique=True),
+    )
     
     id = Column(Integer, primary_key=True, index=True)
     attempt_id = Column(Integer, ForeignKey("student_attempts.id", ondelete="CASCADE"), nullable=False, index=True)
@@ -63,6 +63,9 @@ class User(Base):
     is_active = Column(Boolean, default=True, nullable=False)
     is_verified = Column(Boolean, default=False, nullable=False)
     
+    # Bumped when a claim baked into access tokens changes; older tokens are rejected
+    token_version = Column(Integer, default=0, nullable=False)
+    
     # Foreign key to center (nullable for admin users)
     center_id = Column(Integer, ForeignKey('centers.id', ondelete='SET NULL'), nullable=True)
     
@@ -222,6 +222,20 @@ class AttemptAdminView(AttemptResponse):
         from_attributes = True
 
 
+class AttemptProvision(BaseModel):
+    """Pre-create NOT_STARTED attempts for an exam's candidates at a center"""
+    exam_id: int
+    center_id: int
+
+
+class AttemptProvisionResult(BaseModel):
+    """Outcome of provisioning attempts"""
+    exam_id: int
+    center_id: int
+    candidates: int  # Registered candidates of the exam at the center
+    created: int  # Attempts created now; the others already had one
+
+
 # ==================== Statistics Schemas ====================
 
 class AttemptStatistics(BaseModel):
@@ -125,6 +125,21 @@ class HallTicketLoginRequest(BaseModel):
     security_answer: str = Field(..., min_length=1, description="Answer to security question")
 
 
+class HallTicketScanRequest(BaseModel):
+    """Signed hall-ticket QR payload read by a hall authenticator's scanner"""
+    qr_payload: str = Field(..., min_length=10, max_length=512)
+
+
+class HallTicketQR(BaseModel):
+    """Signed QR payload to print on a hall ticket"""
+    hall_ticket_number: str
+    exam_id: int
+    center_id: Optional[int] = None
+    valid_from: datetime
+    valid_until: datetime
+    qr_payload: str
+
+
 class LoginResponse(BaseModel):
     """Login response"""
     access_token: str
@@ -136,3 +151,12 @@ class LoginResponse(BaseModel):
 class RefreshTokenRequest(BaseModel):
     """Refresh token request"""
     refresh_token: str
+
+
+# Admission queue schemas
+class AdmissionStatus(BaseModel):
+    """Place of a queued login in the admission queue"""
+    ticket: str
+    position: int  # 0 = will be admitted on the next attempt
+    eta_seconds: int
+    retry_after_seconds: int
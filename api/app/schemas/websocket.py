@@ -56,6 +56,7 @@ class CheckpointAck(WebSocketMessage):
     sequence: int
     saved_at: datetime
     time_remaining_seconds: int
+    change_sequence: Optional[int] = None  # Resume cursor for reconnects (see AnswerChangeLog)
 
 
 class CheckpointError(WebSocketMessage):
@@ -180,19 +181,49 @@ class ConnectionInfo(BaseModel):
     checkpoint_debounce: int = 2
 
 
+# Broadcast
+
+class BroadcastRequest(BaseModel):
+    """Notification to push to every candidate of an exam or center"""
+    title: str = Field(..., max_length=200)
+    message: str = Field(..., max_length=2000)
+    severity: Literal["info", "success", "warning", "error"] = "info"
+    action: Optional[str] = None
+    exam_id: Optional[int] = None  # Center broadcasts: only this exam's candidates
+
+
+class BroadcastResult(BaseModel):
+    """Delivery report of a broadcast on the node that received the request"""
+    targets: int
+    delivered: int  # Accepted into the socket's send queue
+    dropped: int  # Droppable and the socket's queue was full
+    failed: int  # Socket evicted as a slow consumer
+    duration_ms: float
+    p99_ms: float
+    nodes_notified: int  # Other nodes that received it through Redis
+
+
+class AttemptPresence(BaseModel):
+    """Cluster-wide presence of one attempt"""
+    attempt_id: int
+    connected: bool
+    workers: List[str]  # "node:pid" of each worker holding a socket
+
+
 # Batch Checkpoint
 
 class BatchCheckpointRequest(WebSocketMessage):
-    """Batch checkpoint request for multiple answers"""
-    type: Literal["checkpoint"] = "checkpoint"
+    """Batch checkpoint request for multiple answers (offline queue replay)"""
+    type: Literal["batch_checkpoint"] = "batch_checkpoint"
     answers: List[CheckpointRequest]
 
 
 class BatchCheckpointAck(WebSocketMessage):
     """Batch checkpoint acknowledgment"""
-    type: Literal["checkpoint_ack"] = "checkpoint_ack"
-    results: List[Dict[str, Any]]  # List of {question_id, success, error}
+    type: Literal["batch_checkpoint_ack"] = "batch_checkpoint_ack"
+    results: List[Dict[str, Any]]  # List of {question_id, success, sequence, error, error_code}
     time_remaining_seconds: int
+    change_sequence: Optional[int] = None  # Resume cursor for reconnects (see AnswerChangeLog)
 
 
 # Utility Functions
@@ -210,14 +241,29 @@ def create_pong() -> dict:
 def create_checkpoint_ack(
     question_id: int,
     sequence: int,
-    time_remaining_seconds: int
+    time_remaining_seconds: int,
+    change_sequence: Optional[int] = None
 ) -> dict:
     """Create a checkpoint acknowledgment"""
     return CheckpointAck(
         question_id=question_id,
         sequence=sequence,
         saved_at=datetime.utcnow(),
-        time_remaining_seconds=time_remaining_seconds
+        time_remaining_seconds=time_remaining_seconds,
+        change_sequence=change_sequence
+    ).model_dump(mode="json")
+
+
+def create_batch_checkpoint_ack(
+    results: List[Dict[str, Any]],
+    time_remaining_seconds: int,
+    change_sequence: Optional[int] = None
+) -> dict:
+    """Create a batch checkpoint acknowledgment"""
+    return BatchCheckpointAck(
+        results=results,
+        time_remaining_seconds=time_remaining_seconds,
+        change_sequence=change_sequence
     ).model_dump(mode="json")
 
 
@@ -0,0 +1,225 @@
+"""
+Admission Control
+Redis-backed FIFO ticket queue that caps cluster-wide concurrency of an
+expensive endpoint group (login) and tells waiting clients their position
+"""
+import math
+import time
+import uuid
+from typing import Optional
+import logging
+
+from redis.exceptions import WatchError
+
+from app.core.config import settings
+from app.core.metrics import ADMISSION_DECISIONS
+from app.services.redis import RedisService, redis_service
+
+logger = logging.getLogger(__name__)
+
+# Request/response header carrying a queued client's ticket
+TICKET_HEADER = "X-Admission-Ticket"
+
+# Optimistic-transaction attempts before a contended admission counts as "wait"
+_MAX_WATCH_RETRIES = 5
+
+
+class AdmissionDecision:
+    """Outcome of one admission attempt"""
+    
+    __slots__ = ("admitted", "lease", "ticket", "position", "eta_seconds")
+    
+    def __init__(
+        self,
+        admitted: bool,
+        lease: Optional[str] = None,
+        ticket: Optional[str] = None,
+        position: int = 0,
+        eta_seconds: int = 0
+    ):
+        self.admitted = admitted
+        self.lease = lease
+        self.ticket = ticket
+        self.position = position
+        self.eta_seconds = eta_seconds
+
+
+class AdmissionController:
+    """
+    Concurrency budget shared by every node, with a FIFO queue behind it
+    
+    Redis keys (all under admission:{name}):
+    - active: sorted set of in-flight leases scored by expiry, so slots
+      held by a crashed node come back after lease_seconds
+    - queue: sorted set of waiting tickets scored by arrival sequence
+    - seen: sorted set of waiting tickets scored by last poll; tickets not
+      polled for ticket_ttl_seconds are dropped
+    - seq: arrival counter
+    
+    Ticket ids are random, so a client cannot claim someone else's place.
+    If Redis is unavailable every request is admitted (fail open).
+    """
+    
+    def __init__(
+        self,
+        name: str,
+        redis: RedisService = redis_service,
+        concurrency: int = settings.ADMISSION_CONCURRENCY,
+        lease_seconds: int = settings.ADMISSION_LEASE_SECONDS,
+        ticket_ttl_seconds: int = settings.ADMISSION_TICKET_TTL_SECONDS
+    ):
+        self.name = name
+        self.redis = redis
+        self.concurrency = concurrency
+        self.lease_seconds = lease_seconds
+        self.ticket_ttl_seconds = ticket_ttl_seconds
+        self._active_key = f"admission:{name}:active"
+        self._queue_key = f"admission:{name}:queue"
+        self._seen_key = f"admission:{name}:seen"
+        self._seq_key = f"admission:{name}:seq"
+        # Moving average of admitted request time on this node, for ETAs
+        self._average_seconds = 0.5
+    
+    async def acquire(self, ticket: Optional[str] = None) -> AdmissionDecision:
+        """
+        Take a slot of the budget, or a place in the queue
+        
+        Args:
+            ticket: Ticket from an earlier queued attempt, if any
+        
+        Returns:
+            Admitted decision with a lease to release, or a queued decision
+            with the ticket, position (0 = next attempt) and estimated wait
+        """
+        client = self.redis.redis
+        if client is None:
+            ADMISSION_DECISIONS.labels(outcome="bypassed").inc()
+            return AdmissionDecision(admitted=True)
+        
+        try:
+            now = time.time()
+            await self._purge(client, now)
+            
+            if ticket is not None and await client.zscore(self._queue_key, ticket) is None:
+                ticket = None  # Unknown or expired: queue again at the back
+            
+            if ticket is None:
+                lease = uuid.uuid4().hex
+                if await self._try_enter(client, None, lease, now):
+                    ADMISSION_DECISIONS.labels(outcome="admitted").inc()
+                    return AdmissionDecision(admitted=True, lease=lease)
+                
+                ticket = uuid.uuid4().hex
+                sequence = await client.incr(self._seq_key)
+                await client.zadd(self._queue_key, {ticket: sequence})
+            elif await self._try_enter(client, ticket, ticket, now):
+                ADMISSION_DECISIONS.labels(outcome="admitted").inc()
+                return AdmissionDecision(admitted=True, lease=ticket)
+            
+            await client.zadd(self._seen_key, {ticket: now})
+            position = await self._position(client, ticket)
+        except Exception as e:
+            logger.error(f"Admission control for {self.name} unavailable, admitting: {e}")
+            ADMISSION_DECISIONS.labels(outcome="bypassed").inc()
+            return AdmissionDecision(admitted=True)
+        
+        ADMISSION_DECISIONS.labels(outcome="queued").inc()
+        return AdmissionDecision(
+            admitted=False,
+            ticket=ticket,
+            position=position,
+            eta_seconds=self.estimate_wait(position)
+        )
+    
+    async def release(self, lease: Optional[str], elapsed_seconds: float) -> None:
+        """Give back an admitted request's slot"""
+        self._average_seconds = 0.9 * self._average_seconds + 0.1 * elapsed_seconds
+        if lease is None or self.redis.redis is None:
+            return
+        
+        try:
+            await self.redis.redis.zrem(self._active_key, lease)
+        except Exception as e:
+            logger.error(f"Error releasing admission lease for {self.name}: {e}")
+    
+    async def status(self, ticket: str) -> Optional[AdmissionDecision]:
+        """
+        Current position of a waiting ticket (also keeps it alive)
+        
+        Returns:
+            Queued decision, or None if the ticket is unknown or expired
+        """
+        client = self.redis.redis
+        if client is None:
+            return None
+        
+        try:
+            now = time.time()
+            await self._purge(client, now)
+            if await client.zscore(self._queue_key, ticket) is None:
+                return None
+            
+            await client.zadd(self._seen_key, {ticket: now})
+            position = await self._position(client, ticket)
+        except Exception as e:
+            logger.error(f"Error reading admission status for {self.name}: {e}")
+            return None
+        
+        return AdmissionDecision(
+            admitted=False,
+            ticket=ticket,
+            position=position,
+            eta_seconds=self.estimate_wait(position)
+        )
+    
+    def estimate_wait(self, position: int) -> int:
+        """Seconds until a ticket at this position should be admitted"""
+        return max(1, math.ceil(position * self._average_seconds / max(self.concurrency, 1)))
+    
+    async def _position(self, client, ticket: str) -> int:
+        """Places until admission: 0 = would be admitted on the next attempt"""
+        rank = await client.zrank(self._queue_key, ticket)
+        in_flight = await client.zcard(self._active_key)
+        return max(0, rank - max(0, self.concurrency - in_flight) + 1)
+    
+    async def _purge(self, client, now: float) -> None:
+        """Drop expired leases and tickets whose client stopped polling"""
+        await client.zremrangebyscore(self._active_key, "-inf", now)
+        stale = await client.zrangebyscore(self._seen_key, "-inf", now - self.ticket_ttl_seconds)
+        if stale:
+            await client.zrem(self._queue_key, *stale)
+            await client.zrem(self._seen_key, *stale)
+    
+    async def _try_enter(self, client, ticket: Optional[str], lease: str, now: float) -> bool:
+        """
+        Move a ticket (or a new arrival) into the active set if a slot is free
+        and at most free-1 tickets are ahead of it
+        """
+        async with client.pipeline(transaction=True) as pipe:
+            for _ in range(_MAX_WATCH_RETRIES):
+                try:
+                    await pipe.watch(self._active_key, self._queue_key)
+                    free = self.concurrency - await pipe.zcard(self._active_key)
+                    if ticket is None:
+                        ahead = await pipe.zcard(self._queue_key)
+                    else:
+                        ahead = await pipe.zrank(self._queue_key, ticket)
+                    
+                    if ahead is None or free <= 0 or ahead >= free:
+                        await pipe.reset()
+                        return False
+                    
+                    pipe.multi()
+                    if ticket is not None:
+                        pipe.zrem(self._queue_key, ticket)
+                        pipe.zrem(self._seen_key, ticket)
+                    pipe.zadd(self._active_key, {lease: now + self.lease_seconds})
+                    await pipe.execute()
+                    return True
+                except WatchError:
+                    continue
+        return False
+
+
+# Login and hall-ticket login share one budget
+login_admission = AdmissionController("login")
@@ -0,0 +1,193 @@
+"""
+Answer Change Log
+Compact per-attempt log of saved answers in Redis, so a reconnecting
+client is sent only what changed since its last acknowledged save
+"""
+import json
+import time
+from typing import Any, Dict, List, Optional
+import logging
+
+from redis.exceptions import WatchError
+
+from app.core.config import settings
+from app.services.redis import RedisService, redis_service
+
+logger = logging.getLogger(__name__)
+
+# Optimistic-transaction attempts before a contended save goes unlogged
+_MAX_WATCH_RETRIES = 5
+
+
+class AnswerChangeLog:
+    """
+    Per-attempt change sequence plus the latest saved state of each answer
+    
+    Redis keys (all under answers:{attempt_id}:):
+    - meta: hash with seq (last change sequence) and base (sequence the
+      log started after)
+    - log: sorted set of question_id scored by the change sequence of its
+      latest save; a question saved again moves forward, so the log holds
+      at most one entry per question
+    - state: hash of question_id -> latest saved answer (JSON)
+    
+    Saves are numbered in one optimistic transaction per batch, so an
+    attempt's sequence only grows. A client that has seen change N is sent the
+    questions scored above N: O(changes since N), not O(answers).
+    
+    A new log starts at the current time in microseconds, so a cursor from
+    an expired or lost log (which advanced one per change) falls before
+    base and is refused instead of silently skipping answers. Refused cursors, and
+    every replay while Redis is unavailable, mean "fetch everything".
+    """
+    
+    def __init__(
+        self,
+        redis: RedisService = redis_service,
+        ttl_seconds: int = settings.ANSWER_LOG_TTL_SECONDS
+    ):
+        self.redis = redis
+        self.ttl_seconds = ttl_seconds
+    
+    async def record(self, attempt_id: int, changes: List[Dict[str, Any]]) -> Optional[int]:
+        """
+        Number and store saved answers of one attempt, in order
+        
+        Args:
+            attempt_id: Attempt the answers belong to
+            changes: Saved answers, each with question_id, answer,
+                is_flagged, sequence and saved_at
+        
+        Returns:
+            Change sequence of the last answer, or None if not logged
+        """
+        return (await self.record_many({attempt_id: changes})).get(attempt_id)
+    
+    async def record_many(self, changes: Dict[int, List[Dict[str, Any]]]) -> Dict[int, int]:
+        """
+        Number and store the saved answers of many attempts together
+        
+        Three round trips whatever the number of attempts (WATCH, read the
+        sequences, MULTI/EXEC), so a group commit logs its whole batch at once.
+        
+        Returns:
+            Change sequence of each attempt's last answer; attempts that
+            could not be logged are missing (and their logs are reset, so
+            the next replay reports them incomplete)
+        """
+        client = self.redis.redis
+        changes = {attempt_id: batch for attempt_id, batch in changes.items() if batch}
+        if client is None or not changes:
+            return {}
+        
+        attempt_ids = list(changes)
+        meta_keys = [_keys(attempt_id)[0] for attempt_id in attempt_ids]
+        try:
+            async with client.pipeline(transaction=True) as pipe:
+                for _ in range(_MAX_WATCH_RETRIES):
+                    try:
+                        await pipe.watch(*meta_keys)
+                        async with client.pipeline(transaction=False) as reader:
+                            for meta_key in meta_keys:
+                                reader.hget(meta_key, "seq")
+                            sequences = await reader.execute()
+                        
+                        pipe.multi()
+                        latest = {}
+                        for attempt_id, seq in zip(attempt_ids, sequences):
+                            latest[attempt_id] = self._queue_changes(
+                                pipe, attempt_id, seq, changes[attempt_id]
+                            )
+                        await pipe.execute()
+                        return latest
+                    except WatchError:
+                        continue
+        except Exception as e:
+            logger.error(f"Error logging answers of {len(changes)} attempts: {e}")
+            await self._invalidate(client, meta_keys)
+            return {}
+        
+        logger.warning(f"Answer log contended, saves of {len(changes)} attempts unlogged")
+        await self._invalidate(client, meta_keys)
+        return {}
+    
+    async def _invalidate(self, client, meta_keys: List[str]) -> None:
+        """
+        Drop the meta of logs that missed a save
+        
+        A log without meta refuses every cursor, and the next save starts a
+        new one past them, so clients fetch everything instead of missing
+        the unlogged answers.
+        """
+        try:
+            await client.delete(*meta_keys)
+        except Exception as e:
+            logger.error(f"Error resetting answer logs of {len(meta_keys)} attempts: {e}")
+    
+    def _queue_changes(self, pipe, attempt_id: int, seq: Optional[str], changes: List[Dict[str, Any]]) -> int:
+        """Queue one attempt's writes in a MULTI; returns its new last sequence"""
+        meta_key, log_key, state_key = _keys(attempt_id)
+        if seq is None:
+            # New (or expired) log: drop leftovers, start past any old cursor
+            seq = time.time_ns() // 1000
+            pipe.delete(log_key, state_key)
+            pipe.hset(meta_key, "base", seq)
+        last = int(seq)
+        
+        for change in changes:
+            last += 1
+            question_id = str(change["question_id"])
+            pipe.zadd(log_key, {question_id: last})
+            pipe.hset(
+                state_key, question_id,
+                json.dumps({**change, "change_sequence": last}, default=str)
+            )
+        pipe.hset(meta_key, "seq", last)
+        for key in (meta_key, log_key, state_key):
+            pipe.expire(key, self.ttl_seconds)
+        return last
+    
+    async def replay(self, attempt_id: int, since: int) -> Optional[Dict[str, Any]]:
+        """
+        Answers saved after a client's last seen change
+        
+        Args:
+            attempt_id: Attempt to replay
+            since: Highest change_sequence the client has seen
+        
+        Returns:
+            {"change_sequence": cursor, "answers": [...]} in change order,
+            or None if the log cannot prove it has every change since then
+        """
+        client = self.redis.redis
+        if client is None:
+            return None
+        
+        meta_key, log_key, state_key = _keys(attempt_id)
+        try:
+            async with client.pipeline(transaction=True) as pipe:
+                pipe.hmget(meta_key, "seq", "base")
+                pipe.zrangebyscore(log_key, f"({since}", "+inf")
+                (seq, base), question_ids = await pipe.execute()
+            
+            if seq is None or not int(base) <= since <= int(seq):
+                return None
+            
+            states = await client.hmget(state_key, question_ids) if question_ids else []
+        except Exception as e:
+            logger.error(f"Error replaying answers of attempt {attempt_id}: {e}")
+            return None
+        
+        return {
+            "change_sequence": int(seq),
+            "answers": [json.loads(state) for state in states if state is not None],
+        }
+
+
+def _keys(attempt_id: int):
+    prefix = f"answers:{attempt_id}"
+    return f"{prefix}:meta", f"{prefix}:log", f"{prefix}:state"
+
+
+# Singleton instance
+answer_change_log = AnswerChangeLog()
@@ -3,33 +3,1124 @@ Checkpoint Processing Service
 Handles real-time answer checkpointing with debouncing and validation
 """
 import asyncio
-from typing import Dict, Optional, Any
+import time
+from typing import Dict, Optional, Any, List, Callable, Tuple
 from datetime import datetime, timedelta
 from sqlalchemy.ext.asyncio import AsyncSession
-from sqlalchemy import select
+from sqlalchemy import select, insert, update, bindparam, func
+from sqlalchemy.orm.attributes import set_committed_value
 import logging
 
+from app.core.config import settings
+from app.core.database import UPSERT_INSERTS, AsyncSessionLocal, supports_native_upsert
+from app.core.metrics import CHECKPOINT_FLUSH_DURATION, CHECKPOINT_FLUSH_LAG
+from app.services.answer_log import AnswerChangeLog, answer_change_log
+from app.services.presence import get_worker_id
+from app.services.redis import RedisService, redis_service
 from app.models.attempt import StudentAttempt, StudentAnswer, AttemptStatus
-from app.models.exam import Question
+from app.models.exam import Question, ExamQuestion
 from app.schemas.websocket import CheckpointRequest
 
 logger = logging.getLogger(__name__)
 
 
+class _BufferedCheckpoint:
+    """Latest checkpoint for one (attempt_id, question_id) plus waiting acks"""
+    
+    __slots__ = ("checkpoint", "time_spent_seconds", "enqueued_at", "accepted_at", "waiters")
+    
+    def __init__(
+        self,
+        checkpoint: CheckpointRequest,
+        enqueued_at: float,
+        accepted_at: Optional[datetime] = None
+    ):
+        self.checkpoint = checkpoint
+        self.time_spent_seconds = checkpoint.time_spent_seconds
+        self.enqueued_at = enqueued_at
+        # When the client was acked, if earlier than the write (journaled checkpoints)
+        self.accepted_at = accepted_at
+        self.waiters: List[asyncio.Future] = []
+
+
+def _validate_checkpoint(
+    attempt: Optional[StudentAttempt],
+    question_id: int,
+    valid_pairs: set,
+    accepted_at: Optional[datetime] = None
+) -> Optional[Dict[str, Any]]:
+    """
+    Same checks as CheckpointService._save_checkpoint, on preloaded rows
+    
+    A checkpoint accepted at accepted_at is judged against the deadline as
+    of then, so one journaled just before time ran out is still written.
+    """
+    if not attempt:
+        return {
+            "success": False,
+            "error": "Attempt not found",
+            "error_code": "ATTEMPT_NOT_FOUND"
+        }
+    
+    if attempt.status != AttemptStatus.IN_PROGRESS:
+        return {
+            "success": False,
+            "error": f"Attempt is {attempt.status}, cannot save checkpoint",
+            "error_code": "ATTEMPT_NOT_ACTIVE"
+        }
+    
+    if accepted_at is None or not attempt.start_time:
+        expired = attempt.is_expired()
+    else:
+        elapsed = accepted_at - attempt.start_time.replace(tzinfo=None)
+        expired = elapsed.total_seconds() > attempt.duration_minutes * 60
+    if expired:
+        return {
+            "success": False,
+            "error": "Attempt time expired",
+            "error_code": "TIME_EXPIRED"
+        }
+    
+    if (attempt.exam_id, question_id) not in valid_pairs:
+        return {
+            "success": False,
+            "error": "Question not found in this exam",
+            "error_code": "INVALID_QUESTION"
+        }
+    
+    return None
+
+
+async def _apply_checkpoint_batch(
+    db: AsyncSession,
+    batch: Dict[Tuple[int, int], _BufferedCheckpoint]
+) -> Dict[Tuple[int, int], Dict[str, Any]]:
+    """
+    Validate and upsert checkpoints inside the caller's transaction
+    
+    One attempt SELECT, one exam-question SELECT, one multi-row
+    INSERT ... ON CONFLICT DO UPDATE and one questions_answered recount
+    regardless of batch size. Databases without ON CONFLICT ... RETURNING
+    take an existing-answer SELECT, a multi-row INSERT and a multi-row
+    UPDATE instead.
+    
+    Returns:
+        Result dictionary per (attempt_id, question_id)
+    """
+    now = datetime.utcnow()
+    attempt_ids = {attempt_id for attempt_id, _ in batch}
+    question_ids = {question_id for _, question_id in batch}
+    results: Dict[Tuple[int, int], Dict[str, Any]] = {}
+    
+    attempt_rows = await db.execute(
+        select(StudentAttempt).where(StudentAttempt.id.in_(attempt_ids))
+    )
+    attempts = {a.id: a for a in attempt_rows.scalars()}
+    
+    pair_rows = await db.execute(
+        select(ExamQuestion.exam_id, ExamQuestion.question_id).where(
+            ExamQuestion.exam_id.in_({a.exam_id for a in attempts.values()}),
+            ExamQuestion.question_id.in_(question_ids)
+        )
+    )
+    valid_pairs = set(pair_rows.all())
+    
+    rows = []
+    
+    for key, entry in batch.items():
+        attempt_id, question_id = key
+        checkpoint = entry.checkpoint
+        attempt = attempts.get(attempt_id)
+        
+        error = _validate_checkpoint(attempt, question_id, valid_pairs, entry.accepted_at)
+        if error:
+            results[key] = error
+            continue
+        
+        rows.append({
+            "attempt_id": attempt_id,
+            "question_id": question_id,
+            "answer": checkpoint.answer,
+            "is_flagged": checkpoint.is_flagged,
+            "time_spent_seconds": entry.time_spent_seconds,
+            "answer_sequence": checkpoint.sequence,
+            "first_answered_at": now,
+            "last_updated_at": now,
+        })
+        
+        # Attempt metadata (latest checkpoint in the batch wins)
+        attempt.last_activity_time = now
+        attempt.current_question_id = question_id
+        flagged = list(attempt.questions_flagged or [])
+        if checkpoint.is_flagged and question_id not in flagged:
+            flagged.append(question_id)
+        elif not checkpoint.is_flagged and question_id in flagged:
+            flagged.remove(question_id)
+        attempt.questions_flagged = flagged
+        
+        results[key] = {"success": True, "sequence": checkpoint.sequence}
+    
+    answer_ids: Dict[Tuple[int, int], int] = {}
+    if rows and supports_native_upsert(db):
+        answer_ids = await _upsert_answers(db, rows)
+        await _recount_answered(db, attempts, {row["attempt_id"] for row in rows})
+    elif rows:
+        answer_ids, inserted = await _insert_or_update_answers(db, rows)
+        for attempt_id, _ in inserted:
+            attempts[attempt_id].questions_answered = (attempts[attempt_id].questions_answered or 0) + 1
+    
+    for key, result in results.items():
+        if result["success"]:
+            attempt = attempts[key[0]]
+            result.update({
+                "answer_id": answer_ids.get(key),
+                "saved_at": now,
+                "time_remaining_seconds": attempt.get_time_remaining_seconds(),
+                "questions_answered": attempt.questions_answered
+            })
+    
+    return results
+
+
+async def _upsert_answers(db: AsyncSession, rows: List[Dict[str, Any]]) -> Dict[Tuple[int, int], int]:
+    """One INSERT ... ON CONFLICT DO UPDATE for every row; returns answer ids"""
+    answers = StudentAnswer.__table__
+    insert_stmt = UPSERT_INSERTS[db.bind.dialect.name](answers).values(rows)
+    upsert = insert_stmt.on_conflict_do_update(
+        index_elements=[answers.c.attempt_id, answers.c.question_id],
+        set_={
+            "answer": insert_stmt.excluded.answer,
+            "is_flagged": insert_stmt.excluded.is_flagged,
+            "time_spent_seconds": (
+                answers.c.time_spent_seconds + insert_stmt.excluded.time_spent_seconds
+            ),
+            "answer_sequence": insert_stmt.excluded.answer_sequence,
+            "first_answered_at": func.coalesce(
+                answers.c.first_answered_at, insert_stmt.excluded.first_answered_at
+            ),
+            "last_updated_at": insert_stmt.excluded.last_updated_at,
+        }
+    ).returning(answers.c.id, answers.c.attempt_id, answers.c.question_id)
+    
+    saved = await db.execute(upsert)
+    return {(row.attempt_id, row.question_id): row.id for row in saved}
+
+
+async def _recount_answered(
+    db: AsyncSession,
+    attempts: Dict[int, StudentAttempt],
+    attempt_ids: set
+) -> None:
+    """Recount questions_answered in one UPDATE (the upsert does not say which rows are new)"""
+    table = StudentAttempt.__table__
+    answered = (
+        select(func.count())
+        .select_from(StudentAnswer.__table__)
+        .where(StudentAnswer.__table__.c.attempt_id == table.c.id)
+        .scalar_subquery()
+    )
+    counted = await db.execute(
+        update(table)
+        .where(table.c.id.in_(attempt_ids))
+        .values(questions_answered=answered)
+        .returning(table.c.id, table.c.questions_answered)
+    )
+    for row in counted:
+        # Already written; keep the attempt's own flush from repeating it
+        set_committed_value(attempts[row.id], "questions_answered", row.questions_answered)
+
+
+async def _insert_or_update_answers(
+    db: AsyncSession,
+    rows: List[Dict[str, Any]]
+) -> Tuple[Dict[Tuple[int, int], int], List[Tuple[int, int]]]:
+    """
+    Read-then-write upsert for databases without ON CONFLICT ... RETURNING
+    
+    Returns:
+        (answer id per key, keys that were inserted)
+    """
+    table = StudentAnswer.__table__
+    existing = await _answer_ids(db, rows)
+    
+    inserts = [row for row in rows if (row["attempt_id"], row["question_id"]) not in existing]
+    updates = [
+        {
+            "b_id": existing[(row["attempt_id"], row["question_id"])],
+            "b_answer": row["answer"],
+            "b_is_flagged": row["is_flagged"],
+            "b_time_spent": row["time_spent_seconds"],
+            "b_sequence": row["answer_sequence"],
+            "b_now": row["last_updated_at"],
+        }
+        for row in rows if (row["attempt_id"], row["question_id"]) in existing
+    ]
+    
+    if inserts:
+        await db.execute(insert(table), inserts)
+        existing.update(await _answer_ids(db, inserts))
+    
+    if updates:
+        await db.execute(
+            update(table)
+            .where(table.c.id == bindparam("b_id"))
+            .values(
+                answer=bindparam("b_answer"),
+                is_flagged=bindparam("b_is_flagged"),
+                time_spent_seconds=table.c.time_spent_seconds + bindparam("b_time_spent"),
+                answer_sequence=bindparam("b_sequence"),
+                last_updated_at=bindparam("b_now"),
+                first_answered_at=func.coalesce(
+                    table.c.first_answered_at, bindparam("b_now")
+                ),
+            ),
+            updates
+        )
+    
+    return existing, [(row["attempt_id"], row["question_id"]) for row in inserts]
+
+
+async def _answer_ids(db: AsyncSession, rows: List[Dict[str, Any]]) -> Dict[Tuple[int, int], int]:
+    """Ids of the answers already stored for these rows' (attempt_id, question_id)"""
+    stored = await db.execute(
+        select(
+            StudentAnswer.id,
+            StudentAnswer.attempt_id,
+            StudentAnswer.question_id
+        ).where(
+            StudentAnswer.attempt_id.in_({row["attempt_id"] for row in rows}),
+            StudentAnswer.question_id.in_({row["question_id"] for row in rows})
+        )
+    )
+    return {(row.attempt_id, row.question_id): row.id for row in stored}
+
+
+def _change_entry(checkpoint: CheckpointRequest, saved_at: Optional[datetime]) -> Dict[str, Any]:
+    """Change-log record of a saved checkpoint (what a reconnecting client is sent)"""
+    return {
+        "question_id": checkpoint.question_id,
+        "answer": checkpoint.answer,
+        "is_flagged": checkpoint.is_flagged,
+        "sequence": checkpoint.sequence,
+        "saved_at": (saved_at or datetime.utcnow()).isoformat(),
+    }
+
+
+class CheckpointWriteBuffer:
+    """
+    Node-local write-behind buffer with group commit
+    
+    Keeps only the latest answer per (attempt_id, question_id) and flushes
+    everything buffered every `flush_interval_ms` in ONE transaction:
+    one attempt SELECT, one exam-question SELECT, one existing-answer
+    SELECT, one multi-row INSERT and one multi-row UPDATE, whatever the
+    number of candidates. Callers await `submit()`, which resolves only
+    after the flush that contains their checkpoint has committed.
+    """
+    
+    def __init__(
+        self,
+        session_factory: Callable[[], AsyncSession],
+        flush_interval_ms: int = 50,
+        max_batch_size: int = 500,
+        change_log: Optional[AnswerChangeLog] = None
+    ):
+        """
+        Initialize write buffer
+        
+        Args:
+            session_factory: Factory for the short-lived flush session
+            flush_interval_ms: Group-commit window in milliseconds
+            max_batch_size: Buffered keys that trigger an early flush
+            change_log: Optional change log; each committed flush is
+                logged in one batch and acks carry change_sequence
+        """
+        self.session_factory = session_factory
+        self.change_log = change_log
+        self.flush_interval = flush_interval_ms / 1000
+        self.max_batch_size = max_batch_size
+        
+        # Pending writes: {(attempt_id, question_id): _BufferedCheckpoint}
+        self._buffer: Dict[Tuple[int, int], _BufferedCheckpoint] = {}
+        
+        # Event-loop bound primitives, created on first use
+        self._loop: Optional[asyncio.AbstractEventLoop] = None
+        self._wakeup: Optional[asyncio.Event] = None
+        self._flush_lock: Optional[asyncio.Lock] = None
+        self._flusher_task: Optional[asyncio.Task] = None
+        
+        # Metrics
+        self._stats = {
+            "checkpoints_received": 0,
+            "checkpoints_coalesced": 0,
+            "flush_count": 0,
+            "flush_errors": 0,
+            "rows_flushed": 0,
+            "last_batch_size": 0,
+            "max_batch_size": 0,
+            "last_flush_lag_ms": 0.0,
+            "max_flush_lag_ms": 0.0,
+            "last_flush_duration_ms": 0.0,
+        }
+    
+    async def submit(
+        self,
+        attempt_id: int,
+        checkpoint: CheckpointRequest
+    ) -> Dict[str, Any]:
+        """
+        Buffer a checkpoint and wait until it is durable
+        
+        Returns:
+            Result dictionary, same shape as CheckpointService._save_checkpoint
+        """
+        self._bind_loop()
+        waiter = self._enqueue(attempt_id, checkpoint)
+        
+        self._ensure_flusher()
+        if len(self._buffer) >= self.max_batch_size:
+            self._wakeup.set()
+        
+        return await waiter
+    
+    async def submit_many(
+        self,
+        attempt_id: int,
+        checkpoints: List[CheckpointRequest]
+    ) -> List[Dict[str, Any]]:
+        """
+        Buffer several checkpoints of one attempt and wait until all are durable
+        
+        They supersede anything still buffered for the same questions and
+        are committed by the same flush.
+        
+        Returns:
+            One result dictionary per checkpoint, in order
+        """
+        self._bind_loop()
+        waiters = [self._enqueue(attempt_id, checkpoint) for checkpoint in checkpoints]
+        
+        self._ensure_flusher()
+        if len(self._buffer) >= self.max_batch_size:
+            self._wakeup.set()
+        
+        return list(await asyncio.gather(*waiters))
+    
+    def _enqueue(self, attempt_id: int, checkpoint: CheckpointRequest) -> asyncio.Future:
+        """Add a checkpoint to the buffer; the future resolves with its flush result"""
+        key = (attempt_id, checkpoint.question_id)
+        waiter = self._loop.create_future()
+        
+        entry = self._buffer.get(key)
+        if entry is None:
+            entry = _BufferedCheckpoint(checkpoint, time.perf_counter())
+            self._buffer[key] = entry
+        else:
+            # Coalesce: latest answer wins, time spent accumulates
+            entry.checkpoint = checkpoint
+            entry.time_spent_seconds += checkpoint.time_spent_seconds
+            self._stats["checkpoints_coalesced"] += 1
+        entry.waiters.append(waiter)
+        self._stats["checkpoints_received"] += 1
+        return waiter
+    
+    def _bind_loop(self) -> asyncio.AbstractEventLoop:
+        """(Re)create loop-bound primitives if the running loop changed"""
+        loop = asyncio.get_running_loop()
+        if loop is not self._loop:
+            # Futures from a previous loop can never be awaited again
+            for entry in self._buffer.values():
+                entry.waiters.clear()
+            self._loop = loop
+            self._wakeup = asyncio.Event()
+            self._flush_lock = asyncio.Lock()
+            self._flusher_task = None
+        return loop
+    
+    def _ensure_flusher(self) -> None:
+        """Start flusher task if not already running"""
+        if not self._flusher_task or self._flusher_task.done():
+            self._flusher_task = asyncio.create_task(self._flush_loop())
+    
+    async def _flush_loop(self) -> None:
+        """Background task flushing the buffer once per interval"""
+        try:
+            while True:
+                try:
+                    await asyncio.wait_for(self._wakeup.wait(), timeout=self.flush_interval)
+                except asyncio.TimeoutError:
+                    pass
+                self._wakeup.clear()
+                
+                if self._buffer:
+                    await self.flush()
+        except asyncio.CancelledError:
+            logger.debug("Checkpoint flusher cancelled")
+    
+    async def flush(self) -> int:
+        """
+        Write everything currently buffered in one transaction
+        
+        Returns:
+            Number of (attempt_id, question_id) rows flushed
+        """
+        self._bind_loop()
+        async with self._flush_lock:
+            if not self._buffer:
+                return 0
+            
+            batch = self._buffer
+            self._buffer = {}
+            started = time.perf_counter()
+            
+            try:
+                results = await self.write_batch(batch)
+            except Exception as e:
+                logger.error(f"Checkpoint flush of {len(batch)} rows failed: {e}")
+                self._stats["flush_errors"] += 1
+                error = {
+                    "success": False,
+                    "error": str(e),
+                    "error_code": "CHECKPOINT_SAVE_ERROR"
+                }
+                results = {key: error for key in batch}
+            
+            if self.change_log is not None:
+                await self._log_flush(batch, results)
+            
+            finished = time.perf_counter()
+            oldest = min(entry.enqueued_at for entry in batch.values())
+            lag_ms = (finished - oldest) * 1000
+            
+            self._stats["flush_count"] += 1
+            self._stats["rows_flushed"] += len(batch)
+            self._stats["last_batch_size"] = len(batch)
+            self._stats["max_batch_size"] = max(self._stats["max_batch_size"], len(batch))
+            self._stats["last_flush_lag_ms"] = round(lag_ms, 3)
+            self._stats["max_flush_lag_ms"] = max(self._stats["max_flush_lag_ms"], round(lag_ms, 3))
+            self._stats["last_flush_duration_ms"] = round((finished - started) * 1000, 3)
+            CHECKPOINT_FLUSH_LAG.observe(finished - oldest)
+            
+            for key, entry in batch.items():
+                for waiter in entry.waiters:
+                    if not waiter.done():
+                        waiter.set_result(results[key])
+            
+            return len(batch)
+    
+    async def _log_flush(
+        self,
+        batch: Dict[Tuple[int, int], _BufferedCheckpoint],
+        results: Dict[Tuple[int, int], Dict[str, Any]]
+    ) -> None:
+        """Number the committed answers (latest per key) in the change log"""
+        changes: Dict[int, List[Dict[str, Any]]] = {}
+        for key, entry in batch.items():
+            result = results[key]
+            if result["success"]:
+                changes.setdefault(key[0], []).append(
+                    _change_entry(entry.checkpoint, result["saved_at"])
+                )
+        
+        latest = await self.change_log.record_many(changes)
+        for key in batch:
+            if results[key]["success"]:
+                results[key]["change_sequence"] = latest.get(key[0])
+    
+    async def write_batch(
+        self,
+        batch: Dict[Tuple[int, int], _BufferedCheckpoint]
+    ) -> Dict[Tuple[int, int], Dict[str, Any]]:
+        """Validate and upsert a batch in its own transaction"""
+        with CHECKPOINT_FLUSH_DURATION.time():
+            async with self.session_factory() as db:
+                async with db.begin():
+                    return await _apply_checkpoint_batch(db, batch)
+    
+    async def close(self) -> int:
+        """Stop the flusher and write out anything still buffered"""
+        if self._flusher_task and self._loop is asyncio.get_running_loop():
+            self._flusher_task.cancel()
+            try:
+                await self._flusher_task
+            except asyncio.CancelledError:
+                pass
+        self._flusher_task = None
+        
+        return await self.flush()
+    
+    def get_pending_count(self) -> int:
+        """Get count of buffered (attempt_id, question_id) keys"""
+        return len(self._buffer)
+    
+    def get_stats(self) -> Dict[str, Any]:
+        """Flush-lag and batch-size metrics"""
+        stats = dict(self._stats)
+        stats["pending"] = len(self._buffer)
+        stats["flush_interval_ms"] = self.flush_interval * 1000
+        stats["average_batch_size"] = (
+            round(stats["rows_flushed"] / stats["flush_count"], 2)
+            if stats["flush_count"] else 0.0
+        )
+        return stats
+
+
+class CheckpointJournal:
+    """
+    Durable Redis Stream journal in front of student_answers
+    
+    `append()` XADDs the checkpoint to this worker's stream and acks the
+    client straight away. A consumer-group worker drains the stream in
+    bulk through CheckpointWriteBuffer.write_batch and XACKs entries only
+    after their transaction commits, so a database outage delays writes
+    instead of blocking candidates. Entries read but never acknowledged
+    (failed flush) stay in the group's pending list and are replayed
+    before any new entries.
+    
+    Every worker process has its own stream and is its only consumer, so
+    entries are written in the order they were journaled. A worker keeps
+    an owner key on its stream alive while it runs; the stream of a worker
+    that died (or restarted under a new pid) is adopted and drained by the
+    first live worker to see its owner key expire.
+    """
+    
+    def __init__(
+        self,
+        redis: RedisService,
+        writer: CheckpointWriteBuffer,
+        stream_prefix: str,
+        group: str,
+        worker_id: Optional[str] = None,
+        batch_size: int = 500,
+        block_ms: int = 1000,
+        retry_seconds: float = 1.0,
+        attempt_ttl_seconds: float = 5.0,
+        owner_ttl_seconds: int = 30
+    ):
+        """
+        Initialize journal
+        
+        Args:
+            redis: Redis service holding the stream
+            writer: Buffer whose batch upsert drains the journal; also the
+                write-through fallback when Redis is unavailable
+            stream_prefix: Stream key prefix; the stream is
+                {stream_prefix}:{worker_id}
+            group: Consumer group name
+            worker_id: Stream suffix and consumer name (defaults to
+                get_worker_id(), unique per worker process)
+            batch_size: Maximum entries drained per transaction
+            block_ms: How long the drainer blocks waiting for new entries
+            retry_seconds: Back-off after a failed read or write
+            attempt_ttl_seconds: How long an attempt's in-progress state
+                is trusted before it is re-read (a submit on another
+                worker is seen within this)
+            owner_ttl_seconds: Stream ownership lapses this long after
+                its worker stops renewing it
+        """
+        self.redis = redis
+        self.writer = writer
+        self.stream_prefix = stream_prefix
+        self.group = group
+        self._worker_id = worker_id
+        self.batch_size = batch_size
+        self.block_ms = block_ms
+        self.retry_seconds = retry_seconds
+        self.attempt_ttl_seconds = attempt_ttl_seconds
+        self.owner_ttl_seconds = owner_ttl_seconds
+        
+        # In-progress attempts: {attempt_id: (deadline, duration_seconds, cached_at)}
+        self._attempts: Dict[int, Tuple[Optional[datetime], int, float]] = {}
+        # Owner key set at least once; next renewal and orphan scan (time.monotonic())
+        self._owned = False
+        self._next_renewal = 0.0
+        
+        # Re-read our pending entries before consuming new ones
+        self._replaying = True
+        self._group_ready = False
+        self._drainer_task: Optional[asyncio.Task] = None
+        
+        # Serializes drains so a replay never re-reads entries in flight
+        self._drain_lock: Optional[asyncio.Lock] = None
+        self._lock_loop: Optional[asyncio.AbstractEventLoop] = None
+        
+        # Metrics
+        self._stats = {
+            "entries_appended": 0,
+            "entries_drained": 0,
+            "entries_rejected": 0,
+            "entries_adopted": 0,
+            "write_through": 0,
+            "drain_count": 0,
+            "drain_errors": 0,
+            "last_batch_size": 0,
+            "last_drain_lag_ms": 0.0,
+            "max_drain_lag_ms": 0.0,
+        }
+    
+    @property
+    def worker_id(self) -> str:
+        # Resolved lazily: a pre-forking server imports this module before forking
+        return self._worker_id or get_worker_id()
+    
+    @property
+    def stream(self) -> str:
+        return f"{self.stream_prefix}:{self.worker_id}"
+    
+    @property
+    def consumer(self) -> str:
+        return self.worker_id
+    
+    async def append(
+        self,
+        attempt_id: int,
+        checkpoint: CheckpointRequest
+    ) -> Dict[str, Any]:
+        """
+        Journal a checkpoint and ack without waiting for the database
+        
+        Returns:
+            Result dictionary, same shape as CheckpointService._save_checkpoint
+        """
+        try:
+            attempt = await self._get_attempt(attempt_id)
+        except Exception as e:
+            logger.warning(f"Attempt lookup failed for {attempt_id}, writing through: {e}")
+            return await self._write_through(attempt_id, checkpoint)
+        
+        if isinstance(attempt, dict):
+            return attempt
+        
+        deadline, duration_seconds, _ = attempt
+        now = datetime.utcnow()
+        if deadline and now > deadline:
+            return {
+                "success": False,
+                "error": "Attempt time expired",
+                "error_code": "TIME_EXPIRED"
+            }
+        
+        if not self._owned:
+            # Before the stream exists, so it is never mistaken for an orphan
+            await self._claim_ownership()
+        
+        entry_id = await self.redis.xadd(self.stream, {
+            "attempt_id": str(attempt_id),
+            "checkpoint": checkpoint.model_dump_json(),
+        })
+        if entry_id is None:
+            # Redis unavailable: fall back to a durable database write
+            return await self._write_through(attempt_id, checkpoint)
+        
+        self._stats["entries_appended"] += 1
+        self._ensure_drainer()
+        
+        return {
+            "success": True,
+            "journaled": True,
+            "entry_id": entry_id,
+            "sequence": checkpoint.sequence,
+            "saved_at": now,
+            "time_remaining_seconds": (
+                max(0, int((deadline - now).total_seconds())) if deadline else duration_seconds
+            )
+        }
+    
+    async def _write_through(
+        self,
+        attempt_id: int,
+        checkpoint: CheckpointRequest
+    ) -> Dict[str, Any]:
+        """Bypass the journal and wait for the group commit"""
+        self._stats["write_through"] += 1
+        return await self.writer.submit(attempt_id, checkpoint)
+    
+    async def _get_attempt(self, attempt_id: int):
+        """
+        Deadline of an in-progress attempt, cached for attempt_ttl_seconds
+        
+        Returns:
+            (deadline, duration_seconds, cached_at), or an error result dictionary
+        """
+        cached = self._attempts.get(attempt_id)
+        if cached and time.monotonic() - cached[2] < self.attempt_ttl_seconds:
+            return cached
+        
+        async with self.writer.session_factory() as db:
+            result = await db.execute(
+                select(
+                    StudentAttempt.status,
+                    StudentAttempt.start_time,
+                    StudentAttempt.duration_minutes
+                ).where(StudentAttempt.id == attempt_id)
+            )
+            row = result.one_or_none()
+        
+        if not row:
+            return {
+                "success": False,
+                "error": "Attempt not found",
+                "error_code": "ATTEMPT_NOT_FOUND"
+            }
+        
+        if row.status != AttemptStatus.IN_PROGRESS:
+            self._attempts.pop(attempt_id, None)
+            return {
+                "success": False,
+                "error": f"Attempt is {row.status}, cannot save checkpoint",
+                "error_code": "ATTEMPT_NOT_ACTIVE"
+            }
+        
+        duration_seconds = row.duration_minutes * 60
+        deadline = (
+            row.start_time.replace(tzinfo=None) + timedelta(seconds=duration_seconds)
+            if row.start_time else None
+        )
+        self._attempts[attempt_id] = (deadline, duration_seconds, time.monotonic())
+        return self._attempts[attempt_id]
+    
+    def forget_attempt(self, attempt_id: int) -> None:
+        """Drop a cached attempt (e.g. after submit)"""
+        self._attempts.pop(attempt_id, None)
+    
+    def start(self) -> None:
+        """Start draining, replaying entries left over from a failed drain"""
+        self._replaying = True
+        self._ensure_drainer()
+    
+    def _ensure_drainer(self) -> None:
+        """Start drainer task if not already running"""
+        loop = asyncio.get_running_loop()
+        if (
+            not self._drainer_task
+            or self._drainer_task.done()
+            or self._drainer_task.get_loop() is not loop
+        ):
+            self._drainer_task = asyncio.create_task(self._drain_loop())
+    
+    async def _drain_loop(self) -> None:
+        """Background task moving journal entries into student_answers"""
+        try:
+            while True:
+                if time.monotonic() >= self._next_renewal:
+                    await self._renew_ownership()
+                drained = await self.drain_once(block_ms=self.block_ms)
+                if drained is None:
+                    await asyncio.sleep(self.retry_seconds)
+        except asyncio.CancelledError:
+            logger.debug("Checkpoint journal drainer cancelled")
+    
+    async def _renew_ownership(self) -> None:
+        """Keep this worker's owner key alive and adopt streams whose owner is gone"""
+        self._next_renewal = time.monotonic() + self.owner_ttl_seconds / 3
+        if await self._claim_ownership():
+            await self.adopt_orphans()
+    
+    async def _claim_ownership(self) -> bool:
+        client = self.redis.redis
+        if client is None:
+            return False
+        try:
+            await client.set(_owner_key(self.stream), self.worker_id, ex=self.owner_ttl_seconds)
+        except Exception as e:
+            logger.error(f"Error renewing journal ownership of {self.stream}: {e}")
+            return False
+        self._owned = True
+        return True
+    
+    async def adopt_orphans(self) -> int:
+        """
+        Drain and delete the streams of workers that stopped renewing ownership
+        
+        Returns:
+            Number of adopted entries written
+        """
+        client = self.redis.redis
+        if client is None:
+            return 0
+        
+        adopted = 0
+        try:
+            streams = [
+                stream async for stream in client.scan_iter(
+                    match=f"{self.stream_prefix}:*", _type="STREAM"
+                )
+            ]
+            for stream in streams:
+                if stream == self.stream:
+                    continue
+                # Claimed by one adopter, and only once its owner key has expired
+                if not await client.set(
+                    _owner_key(stream), self.worker_id, nx=True, ex=self.owner_ttl_seconds
+                ):
+                    continue
+                logger.info(f"Adopting orphaned checkpoint journal {stream}")
+                adopted += await self._drain_orphan(stream)
+        except Exception as e:
+            logger.error(f"Error adopting orphaned checkpoint journals: {e}")
+        
+        self._stats["entries_adopted"] += adopted
+        return adopted
+    
+    async def _drain_orphan(self, stream: str) -> int:
+        """Write out an adopted stream, then delete it; stops at the first failure"""
+        if not await self.redis.xgroup_create(stream, self.group):
+            return 0
+        
+        drained = 0
+        replaying = True
+        while True:
+            entries = await self._read(stream, replaying, block_ms=None)
+            if entries is None:
+                return drained
+            if not entries:
+                if replaying:
+                    replaying = False
+                    continue
+                await self.redis.redis.delete(stream, _owner_key(stream))
+                return drained
+            
+            async with self._lock():
+                if not await self._write_entries(entries):
+                    # Ownership lapses and the next adopter retries
+                    return drained
+                drained += await self.redis.xack(
+                    stream, self.group, [entry_id for entry_id, _ in entries]
+                )
+            await self.redis.redis.expire(_owner_key(stream), self.owner_ttl_seconds)
+    
+    async def drain_once(self, block_ms: Optional[int] = None) -> Optional[int]:
+        """
+        Drain one batch: pending (replayed) entries first, then new ones
+        
+        Args:
+            block_ms: Block for new entries up to this long
+        
+        Returns:
+            Number of entries acknowledged, or None if Redis or the
+            database failed (entries stay pending for the next attempt)
+        """
+        async with self._lock():
+            return await self._drain_batch(block_ms)
+    
+    def _lock(self) -> asyncio.Lock:
+        """Drain lock of the running event loop"""
+        loop = asyncio.get_running_loop()
+        if loop is not self._lock_loop:
+            self._drain_lock = asyncio.Lock()
+            self._lock_loop = loop
+        return self._drain_lock
+    
+    async def _read(
+        self,
+        stream: str,
+        replaying: bool,
+        block_ms: Optional[int]
+    ) -> Optional[List[Tuple[str, Dict[str, str]]]]:
+        """Pending entries when replaying, else new ones"""
+        if replaying:
+            # Only this worker consumes the stream, so every pending entry is ours
+            return await self.redis.xautoclaim(
+                stream, self.group, self.consumer, count=self.batch_size
+            )
+        return await self.redis.xreadgroup(
+            self.group,
+            self.consumer,
+            stream,
+            count=self.batch_size,
+            block_ms=block_ms
+        )
+    
+    async def _drain_batch(self, block_ms: Optional[int]) -> Optional[int]:
+        """Read, write and acknowledge one batch"""
+        if not self._group_ready:
+            self._group_ready = await self.redis.xgroup_create(self.stream, self.group)
+            if not self._group_ready:
+                return None
+        
+        entries = await self._read(self.stream, self._replaying, block_ms)
+        if entries is None:
+            # Recreate the group next time in case the stream was deleted
+            self._group_ready = False
+            return None
+        
+        if not entries:
+            # Pending list is empty, switch to new entries
+            self._replaying = False
+            return 0
+        
+        if not await self._write_entries(entries):
+            self._replaying = True
+            return None
+        
+        return await self.redis.xack(
+            self.stream, self.group, [entry_id for entry_id, _ in entries]
+        )
+    
+    async def _write_entries(self, entries: List[Tuple[str, Dict[str, str]]]) -> bool:
+        """Coalesce entries and upsert them in one transaction"""
+        batch: Dict[Tuple[int, int], _BufferedCheckpoint] = {}
+        
+        for entry_id, fields in entries:
+            try:
+                attempt_id = int(fields["attempt_id"])
+                checkpoint = CheckpointRequest.model_validate_json(fields["checkpoint"])
+            except (KeyError, ValueError) as e:
+                logger.error(f"Skipping malformed journal entry {entry_id}: {e}")
+                self._stats["entries_rejected"] += 1
+                continue
+            
+            # Entry IDs start with the append time in milliseconds
+            accepted_at = datetime.utcfromtimestamp(int(entry_id.split("-")[0]) / 1000)
+            
+            # Stream order is arrival order: latest answer wins
+            key = (attempt_id, checkpoint.question_id)
+            entry = batch.get(key)
+            if entry is None:
+                batch[key] = _BufferedCheckpoint(checkpoint, 0.0, accepted_at)
+            else:
+                entry.checkpoint = checkpoint
+                entry.time_spent_seconds += checkpoint.time_spent_seconds
+                entry.accepted_at = accepted_at
+        
+        if batch:
+            try:
+                results = await self.writer.write_batch(batch)
+            except Exception as e:
+                logger.error(f"Checkpoint journal drain of {len(entries)} entries failed: {e}")
+                self._stats["drain_errors"] += 1
+                return False
+            
+            for (attempt_id, question_id), result in results.items():
+                if not result["success"]:
+                    # Already acked to the client; nothing to retry
+                    logger.warning(
+                        f"Dropped journaled checkpoint: attempt={attempt_id}, "
+                        f"question={question_id}, error={result.get('error_code')}"
+                    )
+                    self._stats["entries_rejected"] += 1
+                    if result.get("error_code") in ("ATTEMPT_NOT_ACTIVE", "TIME_EXPIRED"):
+                        self.forget_attempt(attempt_id)
+        
+        # Entry IDs start with the append time in milliseconds
+        oldest_ms = min(int(entry_id.split("-")[0]) for entry_id, _ in entries)
+        lag_ms = max(0.0, time.time() * 1000 - oldest_ms)
+        
+        self._stats["drain_count"] += 1
+        self._stats["entries_drained"] += len(entries)
+        self._stats["last_batch_size"] = len(entries)
+        self._stats["last_drain_lag_ms"] = round(lag_ms, 3)
+        self._stats["max_drain_lag_ms"] = max(self._stats["max_drain_lag_ms"], round(lag_ms, 3))
+        return True
+    
+    async def close(self) -> int:
+        """Stop the drainer and drain what the database will take now"""
+        if self._drainer_task and self._drainer_task.get_loop() is asyncio.get_running_loop():
+            self._drainer_task.cancel()
+            try:
+                await self._drainer_task
+            except asyncio.CancelledError:
+                pass
+        self._drainer_task = None
+        
+        # Anything left over is replayed on the next start
+        return await self.drain()
+    
+    async def drain(self) -> int:
+        """
+        Drain until the journal is empty or a write fails
+        
+        Returns:
+            Number of entries acknowledged
+        """
+        drained = 0
+        while True:
+            was_replaying = self._replaying
+            count = await self.drain_once()
+            if count is None or (count == 0 and not was_replaying):
+                break
+            drained += count
+        return drained
+    
+    async def oldest_entry_time(self) -> Optional[float]:
+        """
+        Append time (Unix seconds) of the oldest entry not yet written, in any worker's stream
+        
+        Acknowledged entries are deleted, so each stream's first entry is
+        its oldest undrained one.
+        
+        Returns:
+            Unix timestamp, or None if every stream is empty (or Redis is unavailable)
+        """
+        try:
+            return await self.backlog_since()
+        except Exception as e:
+            logger.error(f"Error reading checkpoint journal backlog: {e}")
+            return None
+    
+    async def backlog_since(self) -> Optional[float]:
+        """
+        Like oldest_entry_time(), but raises when Redis cannot be read
+        
+        Returns:
+            Unix timestamp, or None if every stream is empty
+        """
+        client = self.redis.redis
+        if client is None:
+            return None
+        
+        oldest_ms = None
+        async for stream in client.scan_iter(match=f"{self.stream_prefix}:*", _type="STREAM"):
+            first = await client.xrange(stream, count=1)
+            if first:
+                # Entry IDs start with the append time in milliseconds
+                entry_ms = int(first[0][0].split("-")[0])
+                oldest_ms = entry_ms if oldest_ms is None else min(oldest_ms, entry_ms)
+        
+        return oldest_ms / 1000 if oldest_ms is not None else None
+    
+    async def get_stats(self) -> Dict[str, Any]:
+        """Journal depth and drain-lag metrics"""
+        stats = dict(self._stats)
+        stats["stream"] = self.stream
+        stats["stream_length"] = await self.redis.xlen(self.stream)
+        return stats
+
+
 class CheckpointService:
     """
     Service for processing answer checkpoints
     Supports debouncing, validation, and atomic updates
     """
     
-    def __init__(self, debounce_seconds: int = 2):
+    def __init__(
+        self,
+        debounce_seconds: int = 2,
+        write_buffer: Optional[CheckpointWriteBuffer] = None,
+        journal: Optional[CheckpointJournal] = None,
+        session_factory: Callable[[], AsyncSession] = AsyncSessionLocal,
+        change_log: Optional[AnswerChangeLog] = None
+    ):
         """
         Initialize checkpoint service
         
         Args:
             debounce_seconds: Minimum time between saves for same question
+            write_buffer: Optional write-behind buffer; when set, checkpoints
+                are group-committed instead of saved one by one
+            journal: Optional Redis Stream journal; when set, checkpoints
+                are acked once journaled and drained in the background
+            session_factory: Factory for debounced saves, which outlive
+                the caller's session
+            change_log: Optional per-attempt change log; when set, every
+                acked save is numbered there and the ack carries its
+                change_sequence for delta resync on reconnect
         """
         self.debounce_seconds = debounce_seconds
+        self.write_buffer = write_buffer
+        self.journal = journal
+        self.session_factory = session_factory
+        self.change_log = change_log
         
         # Debounce tracking: {(attempt_id, question_id): last_save_time}
         self._last_save_times: Dict[tuple, datetime] = {}
@@ -54,6 +1145,19 @@ class CheckpointService:
         Returns:
             Result dictionary with success status and metadata
         """
+        if self.journal is not None:
+            # Durable in the Redis Stream; drained to the database in bulk
+            result = await self.journal.append(attempt_id, checkpoint)
+            if result.get("journaled"):
+                result["change_sequence"] = await self._log_changes(
+                    attempt_id, [checkpoint], result["saved_at"]
+                )
+            return result
+        
+        if self.write_buffer is not None:
+            # Coalesced and group-committed; resolves once durable
+            return await self.write_buffer.submit(attempt_id, checkpoint)
+        
         key = (attempt_id, checkpoint.question_id)
         
         # Check debounce
@@ -71,7 +1175,7 @@ class CheckpointService:
                 # Schedule debounced save
                 delay = self.debounce_seconds - time_since_last
                 task = asyncio.create_task(
-                    self._debounced_save(db, attempt_id, checkpoint, delay)
+                    self._debounced_save(attempt_id, checkpoint, delay)
                 )
                 self._pending_saves[key] = (task, checkpoint)
                 
@@ -84,21 +1188,141 @@ class CheckpointService:
         # Immediate save
         result = await self._save_checkpoint(db, attempt_id, checkpoint)
         self._last_save_times[key] = now
+        if result["success"]:
+            result["change_sequence"] = await self._log_changes(
+                attempt_id, [checkpoint], result["saved_at"]
+            )
         
         return result
     
-    async def _debounced_save(
+    async def process_batch(
         self,
         db: AsyncSession,
         attempt_id: int,
+        checkpoints: List[CheckpointRequest]
+    ) -> Dict[str, Any]:
+        """
+        Save a replayed queue of checkpoints
+        
+        Repeated saves of a question collapse to the latest. With a journal
+        or write buffer the collapsed answers take the same path as single
+        checkpoints, after (and so superseding) anything still pending for
+        those questions; otherwise the attempt is validated once and all
+        answers are upserted in one transaction.
+        
+        Args:
+            db: Database session
+            attempt_id: Student attempt ID
+            checkpoints: Checkpoints in the order the client queued them
+        
+        Returns:
+            Result dictionary with a per-question `results` list
+        """
+        batch: Dict[Tuple[int, int], _BufferedCheckpoint] = {}
+        for checkpoint in checkpoints:
+            key = (attempt_id, checkpoint.question_id)
+            
+            # A debounced save still pending would overwrite newer answers
+            if key in self._pending_saves:
+                task, _ = self._pending_saves.pop(key)
+                task.cancel()
+            
+            entry = batch.get(key)
+            if entry is None:
+                batch[key] = _BufferedCheckpoint(checkpoint, time.perf_counter())
+            else:
+                entry.checkpoint = checkpoint
+                entry.time_spent_seconds += checkpoint.time_spent_seconds
+        
+        if self.journal is not None or self.write_buffer is not None:
+            saved = await self._enqueue_batch(attempt_id, batch)
+            change_sequence = max(
+                (r["change_sequence"] for r in saved.values() if r.get("change_sequence") is not None),
+                default=None
+            )
+        else:
+            try:
+                saved = await _apply_checkpoint_batch(db, batch) if batch else {}
+                await db.commit()
+            except Exception as e:
+                await db.rollback()
+                logger.error(f"Error saving checkpoint batch for attempt {attempt_id}: {e}")
+                return {
+                    "success": False,
+                    "error": str(e),
+                    "error_code": "CHECKPOINT_SAVE_ERROR"
+                }
+            
+            change_sequence = await self._log_changes(
+                attempt_id,
+                [batch[key].checkpoint for key, result in saved.items() if result["success"]],
+                datetime.utcnow()
+            )
+        
+        results = []
+        time_remaining = None
+        for (_, question_id), result in saved.items():
+            item = {"question_id": question_id, "success": result["success"]}
+            if result["success"]:
+                item["sequence"] = result["sequence"]
+                time_remaining = result["time_remaining_seconds"]
+            else:
+                item["error"] = result["error"]
+                item["error_code"] = result["error_code"]
+            results.append(item)
+        
+        if time_remaining is None:
+            attempt = await db.get(StudentAttempt, attempt_id)
+            time_remaining = attempt.get_time_remaining_seconds() if attempt else 0
+        
+        return {
+            "success": True,
+            "results": results,
+            "saved_count": sum(1 for item in results if item["success"]),
+            "time_remaining_seconds": time_remaining,
+            "change_sequence": change_sequence
+        }
+    
+    async def _enqueue_batch(
+        self,
+        attempt_id: int,
+        batch: Dict[Tuple[int, int], _BufferedCheckpoint]
+    ) -> Dict[Tuple[int, int], Dict[str, Any]]:
+        """Hand a collapsed replay to the journal or write buffer"""
+        checkpoints = [
+            entry.checkpoint.model_copy(update={"time_spent_seconds": entry.time_spent_seconds})
+            for entry in batch.values()
+        ]
+        
+        if self.journal is None:
+            results = await self.write_buffer.submit_many(attempt_id, checkpoints)
+        else:
+            # Drained after the entries already in the stream, so the replay wins
+            results = [await self.journal.append(attempt_id, checkpoint) for checkpoint in checkpoints]
+            change_sequence = await self._log_changes(
+                attempt_id,
+                [c for c, r in zip(checkpoints, results) if r.get("journaled")],
+                datetime.utcnow()
+            )
+            for result in results:
+                if result.get("journaled"):
+                    result["change_sequence"] = change_sequence
+        
+        return {
+            (attempt_id, checkpoint.question_id): result
+            for checkpoint, result in zip(checkpoints, results)
+        }
+    
+    async def _debounced_save(
+        self,
+        attempt_id: int,
         checkpoint: CheckpointRequest,
         delay: float
     ) -> Dict[str, Any]:
         """
-        Execute a debounced save after delay
+        Execute a debounced save after delay, in its own session
         
         Args:
-            db: Database session
             attempt_id: Student attempt ID
             checkpoint: Checkpoint data
             delay: Delay in seconds
@@ -110,7 +1334,10 @@ class CheckpointService:
             await asyncio.sleep(delay)
             
             key = (attempt_id, checkpoint.question_id)
-            result = await self._save_checkpoint(db, attempt_id, checkpoint)
+            async with self.session_factory() as db:
+                result = await self._save_checkpoint(db, attempt_id, checkpoint)
+            if result["success"]:
+                await self._log_changes(attempt_id, [checkpoint], result["saved_at"])
             
             # Clean up
             self._last_save_times[key] = datetime.utcnow()
@@ -264,6 +1491,20 @@ class CheckpointService:
                 "error_code": "CHECKPOINT_SAVE_ERROR"
             }
     
+    async def _log_changes(
+        self,
+        attempt_id: int,
+        checkpoints: List[CheckpointRequest],
+        saved_at: Optional[datetime]
+    ) -> Optional[int]:
+        """Number saved checkpoints in the change log; returns the latest change_sequence"""
+        if self.change_log is None or not checkpoints:
+            return None
+        
+        return await self.change_log.record(attempt_id, [
+            _change_entry(checkpoint, saved_at) for checkpoint in checkpoints
+        ])
+    
     async def flush_pending(self) -> int:
         """
         Flush all pending checkpoint saves immediately
@@ -279,13 +1520,115 @@ class CheckpointService:
         
         self._pending_saves.clear()
         
+        if self.journal is not None:
+            pending_count += await self.journal.close()
+        
+        if self.write_buffer is not None:
+            pending_count += await self.write_buffer.close()
+        
         logger.info(f"Flushed {pending_count} pending checkpoint saves")
         return pending_count
     
     def get_pending_count(self) -> int:
         """Get count of pending saves"""
-        return len(self._pending_saves)
+        buffered = self.write_buffer.get_pending_count() if self.write_buffer else 0
+        return len(self._pending_saves) + buffered
+    
+    def forget_attempt(self, attempt_id: int) -> None:
+        """Stop journaling for an attempt that just left IN_PROGRESS"""
+        if self.journal is not None:
+            self.journal.forget_attempt(attempt_id)
+    
+    async def drain_journal(self) -> int:
+        """
+        Write out this node's journaled checkpoints now
+        
+        Returns:
+            Number of journal entries written
+        """
+        if self.journal is None:
+            return 0
+        return await self.journal.drain()
+    
+    async def settle_journal(self, before: float, timeout_seconds: float) -> bool:
+        """
+        Wait until every worker has written the checkpoints journaled before `before`
+        
+        This node's stream is drained here; other workers drain their own
+        continuously, so the cluster-wide backlog is polled until nothing
+        older than `before` is left.
+        
+        Args:
+            before: Unix timestamp; entries appended earlier must be written
+            timeout_seconds: How long to wait for other workers
+        
+        Returns:
+            True once settled, False on timeout, a failed drain (its entries
+            stay in the stream) or an unreadable journal
+        """
+        if self.journal is None:
+            return True
+        
+        deadline = time.monotonic() + timeout_seconds
+        while True:
+            await self.journal.drain()
+            try:
+                oldest = await self.journal.backlog_since()
+            except Exception as e:
+                logger.error(f"Error reading checkpoint journal backlog: {e}")
+                return False
+            
+            if oldest is None or oldest >= before:
+                return True
+            if time.monotonic() >= deadline:
+                return False
+            await asyncio.sleep(self.journal.retry_seconds)
+    
+    def start(self) -> None:
+        """Start background workers (replays any undrained journal entries)"""
+        if self.journal is not None:
+            self.journal.start()
+    
+    async def get_stats(self) -> Dict[str, Any]:
+        """Checkpoint pipeline metrics"""
+        if self.journal is not None:
+            mode = "journal"
+        elif self.write_buffer is not None:
+            mode = "write_behind"
+        else:
+            mode = "immediate"
+        
+        return {
+            "mode": mode,
+            "debounced_pending": len(self._pending_saves),
+            "write_buffer": self.write_buffer.get_stats() if self.write_buffer else None,
+            "journal": await self.journal.get_stats() if self.journal else None,
+        }
+
+
+def _owner_key(stream: str) -> str:
+    return f"{stream}:owner"
 
 
 # Singleton instance
-checkpoint_service = CheckpointService()
+_write_buffer = CheckpointWriteBuffer(
+    session_factory=AsyncSessionLocal,
+    flush_interval_ms=settings.CHECKPOINT_FLUSH_INTERVAL_MS,
+    max_batch_size=settings.CHECKPOINT_MAX_BATCH_SIZE,
+    change_log=answer_change_log
+) if settings.CHECKPOINT_WRITE_MODE in ("write_behind", "journal") else None
+
+checkpoint_service = CheckpointService(
+    debounce_seconds=settings.WS_CHECKPOINT_DEBOUNCE_SECONDS,
+    write_buffer=_write_buffer,
+    change_log=answer_change_log,
+    journal=CheckpointJournal(
+        redis=redis_service,
+        writer=_write_buffer,
+        stream_prefix=settings.CHECKPOINT_JOURNAL_STREAM,
+        group=settings.CHECKPOINT_JOURNAL_GROUP,
+        batch_size=settings.CHECKPOINT_JOURNAL_BATCH_SIZE,
+        block_ms=settings.CHECKPOINT_JOURNAL_BLOCK_MS,
+        attempt_ttl_seconds=settings.CHECKPOINT_JOURNAL_ATTEMPT_TTL_SECONDS
+    ) if settings.CHECKPOINT_WRITE_MODE == "journal" else None
+)
@@ -0,0 +1,414 @@
+"""
+Attempt Expiry
+Deadline priority queue that auto-submits and grades attempts whose time ran
+out, in batches, with one node at a time sweeping under a Redis lease
+"""
+import asyncio
+import heapq
+import time
+from collections import defaultdict
+from datetime import datetime, timedelta, timezone
+from typing import Callable, Dict, List, Optional, Tuple
+import logging
+
+from redis.exceptions import WatchError
+from sqlalchemy import select, update
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from app.core.config import settings
+from app.core.database import AsyncSessionLocal
+from app.core.metrics import ATTEMPTS_AUTO_SUBMITTED, EXPIRY_SWEEP_DURATION
+from app.models.attempt import StudentAttempt, AttemptStatus
+from app.services.checkpoint import CheckpointService, checkpoint_service
+from app.services.grading import GradingService
+from app.services.presence import get_worker_id
+from app.services.redis import RedisService, redis_service
+
+logger = logging.getLogger(__name__)
+
+# Optimistic-transaction attempts before a contended lease renewal gives up
+_MAX_WATCH_RETRIES = 5
+
+# Due attempts with checkpoints still journaled on another worker are retried this much later
+_JOURNAL_RETRY_SECONDS = 1.0
+
+LEASE_KEY = "expiry:lease"
+
+
+class ExpirySweeper:
+    """
+    Submits and grades IN_PROGRESS attempts once their deadline has passed
+    
+    Every node keeps a min-heap of (deadline, attempt_id): rebuilt from the
+    database at startup, fed by attempts started or begun on this node, and
+    topped up every refresh_seconds with attempts started elsewhere. The
+    sweeper task sleeps until the earliest deadline plus grace_seconds (time
+    for buffered checkpoints to reach the database) or the next refresh.
+    Like ExamClock, only attempts whose clock runs from start_time are
+    queued; paused or transferred ones (frozen time_remaining_seconds) are
+    never auto-submitted.
+    
+    In journal mode, acked checkpoints may still sit in a Redis Stream. The
+    sweeper drains its own worker's stream first, and holds back attempts
+    whose deadline is not older than the oldest entry still undrained in
+    any worker's stream.
+    
+    Due attempts are submitted with one UPDATE per distinct duration,
+    conditional on the attempt still being IN_PROGRESS, unfrozen and really
+    past its deadline, and RETURNING the rows it changed; exactly those are
+    graded together (GradingService.grade_attempts). batch_size attempts
+    share a transaction.
+    
+    Only the node holding the Redis lease sweeps. The others drop their due
+    entries, and rebuild from the database if they later take the lease
+    over. The conditional UPDATE keeps overlapping sweeps, or a candidate
+    submitting at the deadline, from submitting or grading an attempt
+    twice, so if Redis is unavailable every node sweeps (fail open).
+    """
+    
+    def __init__(
+        self,
+        session_factory: Callable[[], AsyncSession] = AsyncSessionLocal,
+        redis: RedisService = redis_service,
+        grace_seconds: float = settings.EXPIRY_GRACE_SECONDS,
+        batch_size: int = settings.EXPIRY_BATCH_SIZE,
+        refresh_seconds: float = settings.EXPIRY_REFRESH_SECONDS,
+        lease_seconds: int = settings.EXPIRY_LEASE_SECONDS,
+        worker_id: Optional[str] = None,
+        checkpoints: CheckpointService = checkpoint_service
+    ):
+        self.session_factory = session_factory
+        self.redis = redis
+        self.grace_seconds = grace_seconds
+        self.batch_size = batch_size
+        self.refresh_seconds = refresh_seconds
+        self.lease_seconds = lease_seconds
+        self._worker_id = worker_id
+        self.checkpoints = checkpoints
+        
+        # Deadline index: {attempt_id: (deadline, duration_minutes)}
+        self._deadlines: Dict[int, Tuple[float, int]] = {}
+        # Min-heap of (deadline, attempt_id); entries no longer in the index are skipped
+        self._heap: List[Tuple[float, int]] = []
+        
+        self._refreshed_at: Optional[datetime] = None
+        self._next_refresh = 0.0
+        self._leading = False
+        self._dropped = False  # Due entries left to another lease holder
+        self._task: Optional[asyncio.Task] = None
+    
+    @property
+    def worker_id(self) -> str:
+        # Resolved lazily: a pre-forking server imports this module before forking
+        return self._worker_id or get_worker_id()
+    
+    def schedule(self, attempt: StudentAttempt) -> None:
+        """Queue a just started (or begun) attempt's deadline"""
+        if (
+            attempt.status == AttemptStatus.IN_PROGRESS
+            and attempt.start_time is not None
+            and attempt.time_remaining_seconds is None
+        ):
+            self._push(attempt.id, attempt.start_time, attempt.duration_minutes)
+    
+    def pending(self) -> int:
+        """Attempts queued on this node"""
+        return len(self._deadlines)
+    
+    async def rebuild(self) -> int:
+        """
+        Reload every IN_PROGRESS attempt from the database
+        
+        Returns:
+            Number of attempts queued
+        """
+        now = datetime.utcnow()
+        rows = await self._load(StudentAttempt.start_time.isnot(None))
+        
+        self._deadlines.clear()
+        self._heap.clear()
+        for attempt_id, start_time, duration_minutes in rows:
+            self._push(attempt_id, start_time, duration_minutes)
+        self._refreshed(now)
+        self._dropped = False
+        return len(rows)
+    
+    async def refresh(self) -> int:
+        """
+        Queue attempts started since the last refresh, wherever they started
+        
+        Returns:
+            Number of attempts newly queued
+        """
+        if self._refreshed_at is None:
+            return await self.rebuild()
+        
+        now = datetime.utcnow()
+        # Overlap the previous window to absorb commit delays and clock skew
+        since = self._refreshed_at - timedelta(seconds=self.refresh_seconds)
+        rows = await self._load(StudentAttempt.start_time >= since)
+        
+        queued = sum(
+            self._push(attempt_id, start_time, duration_minutes)
+            for attempt_id, start_time, duration_minutes in rows
+        )
+        self._refreshed(now)
+        return queued
+    
+    async def sweep(self, now: Optional[float] = None) -> int:
+        """
+        Submit and grade every queued attempt past its deadline and grace
+        
+        Returns:
+            Number of attempts this sweep submitted
+        """
+        now = time.time() if now is None else now
+        due = await self._settle_journal(self._pop_due(now), now)
+        submitted = 0
+        
+        for start in range(0, len(due), self.batch_size):
+            batch = {
+                attempt_id: duration_minutes
+                for attempt_id, duration_minutes, _ in due[start:start + self.batch_size]
+            }
+            started = time.perf_counter()
+            try:
+                submitted += len(await self._expire_batch(batch))
+            except Exception as e:
+                logger.error(f"Expiry sweep of {len(batch)} attempts failed: {e}", exc_info=True)
+                # Retry the rest at the next refresh
+                for attempt_id, duration_minutes, _ in due[start:]:
+                    self._retry(attempt_id, duration_minutes, now + self.refresh_seconds)
+                break
+            finally:
+                EXPIRY_SWEEP_DURATION.observe(time.perf_counter() - started)
+        
+        return submitted
+    
+    def start(self) -> None:
+        """Start the sweeper task (startup)"""
+        if self._task is None or self._task.done():
+            self._task = asyncio.create_task(self._run())
+    
+    async def close(self) -> None:
+        """Stop sweeping and hand the lease on (shutdown)"""
+        if self._task is not None and not self._task.done():
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+        self._task = None
+        
+        if self._leading:
+            await self._release_lease()
+        self._leading = False
+    
+    async def _settle_journal(
+        self,
+        due: List[Tuple[int, int, float]],
+        now: float
+    ) -> List[Tuple[int, int, float]]:
+        """Write out journaled checkpoints; returns the due attempts none are left for"""
+        journal = self.checkpoints.journal
+        if journal is None or not due:
+            return due
+        
+        await self.checkpoints.drain_journal()
+        oldest = await journal.oldest_entry_time()
+        if oldest is None:
+            return due
+        
+        # Checkpoints are only journaled before the deadline (later ones are refused)
+        ready = []
+        for attempt_id, duration_minutes, deadline in due:
+            if deadline < oldest:
+                ready.append((attempt_id, duration_minutes, deadline))
+            else:
+                self._retry(attempt_id, duration_minutes, now + _JOURNAL_RETRY_SECONDS)
+        return ready
+    
+    def _retry(self, attempt_id: int, duration_minutes: int, retry_at: float) -> None:
+        """Queue a due attempt again, to be swept at retry_at"""
+        deadline = retry_at - self.grace_seconds
+        self._deadlines[attempt_id] = (deadline, duration_minutes)
+        heapq.heappush(self._heap, (deadline, attempt_id))
+    
+    async def _expire_batch(self, batch: Dict[int, int]) -> List[int]:
+        """Submit a batch of due attempts ({attempt_id: duration_minutes}) and grade them"""
+        by_duration: Dict[int, List[int]] = defaultdict(list)
+        for attempt_id, duration_minutes in batch.items():
+            by_duration[duration_minutes].append(attempt_id)
+        
+        now = datetime.utcnow()
+        submitted: List[int] = []
+        async with self.session_factory() as db:
+            for duration_minutes, attempt_ids in by_duration.items():
+                result = await db.execute(
+                    update(StudentAttempt)
+                    .where(
+                        StudentAttempt.id.in_(attempt_ids),
+                        StudentAttempt.status == AttemptStatus.IN_PROGRESS,
+                        StudentAttempt.time_remaining_seconds.is_(None),
+                        StudentAttempt.duration_minutes == duration_minutes,
+                        StudentAttempt.start_time <= now - timedelta(minutes=duration_minutes)
+                    )
+                    .values(
+                        status=AttemptStatus.SUBMITTED,
+                        submit_time=now,
+                        end_time=now,
+                        time_remaining_seconds=0
+                    )
+                    .returning(StudentAttempt.id)
+                    .execution_options(synchronize_session=False)
+                )
+                submitted.extend(result.scalars().all())
+            await db.commit()
+            
+            if not submitted:
+                return submitted
+            ATTEMPTS_AUTO_SUBMITTED.inc(len(submitted))
+            logger.info(f"Auto-submitted {len(submitted)} expired attempts")
+            
+            # Submitted stays committed if grading fails, as with a manual submit
+            try:
+                await db.run_sync(
+                    lambda session: GradingService(session).grade_attempts(submitted)
+                )
+            except Exception as e:
+                logger.error(f"Grading {len(submitted)} expired attempts failed: {e}", exc_info=True)
+        
+        return submitted
+    
+    async def _load(self, *criteria) -> List[Tuple[int, datetime, int]]:
+        async with self.session_factory() as db:
+            result = await db.execute(
+                select(
+                    StudentAttempt.id,
+                    StudentAttempt.start_time,
+                    StudentAttempt.duration_minutes
+                ).where(
+                    StudentAttempt.status == AttemptStatus.IN_PROGRESS,
+                    StudentAttempt.time_remaining_seconds.is_(None),
+                    *criteria
+                )
+            )
+            return result.all()
+    
+    def _push(self, attempt_id: int, start_time: datetime, duration_minutes: int) -> bool:
+        """Queue a deadline unless it is already queued; True if queued"""
+        started_at = start_time.replace(tzinfo=timezone.utc).timestamp()
+        entry = (started_at + duration_minutes * 60, duration_minutes)
+        if self._deadlines.get(attempt_id) == entry:
+            return False
+        self._deadlines[attempt_id] = entry
+        heapq.heappush(self._heap, (entry[0], attempt_id))
+        return True
+    
+    def _pop_due(self, now: float) -> List[Tuple[int, int, float]]:
+        """Remove and return (attempt_id, duration_minutes, deadline) of every due attempt"""
+        due = []
+        while self._heap and self._heap[0][0] + self.grace_seconds <= now:
+            deadline, attempt_id = heapq.heappop(self._heap)
+            entry = self._deadlines.get(attempt_id)
+            if entry is None or entry[0] != deadline:
+                continue
+            del self._deadlines[attempt_id]
+            due.append((attempt_id, entry[1], deadline))
+        return due
+    
+    def _refreshed(self, now: datetime) -> None:
+        self._refreshed_at = now
+        self._next_refresh = time.time() + self.refresh_seconds
+    
+    def _next_wake(self) -> float:
+        # Stale heap entries only cause an early, empty wake-up
+        if self._heap:
+            return min(self._heap[0][0] + self.grace_seconds, self._next_refresh)
+        return self._next_refresh
+    
+    async def _run(self) -> None:
+        """Background task: refresh, and sweep at each deadline while holding the lease"""
+        try:
+            while True:
+                await asyncio.sleep(max(0.0, self._next_wake() - time.time()))
+                now = time.time()
+                try:
+                    await self._tick(now)
+                except Exception as e:
+                    logger.error(f"Expiry sweeper error: {e}", exc_info=True)
+                    self._next_refresh = max(self._next_refresh, now + self.refresh_seconds)
+        except asyncio.CancelledError:
+            logger.debug("Expiry sweeper cancelled")
+            raise
+    
+    async def _tick(self, now: float) -> None:
+        if now >= self._next_refresh:
+            await self.refresh()
+        
+        due = bool(self._heap) and self._heap[0][0] + self.grace_seconds <= now
+        if not due and not self._dropped:
+            return
+        
+        if not await self._acquire_lease():
+            # The lease holder sweeps these
+            self._leading = False
+            self._dropped = bool(self._pop_due(now)) or self._dropped
+            return
+        
+        if not self._leading:
+            if self._dropped:
+                # Taking over: pick up whatever the last holder left unswept
+                await self.rebuild()
+            self._leading = True
+        await self.sweep(now)
+    
+    async def _acquire_lease(self) -> bool:
+        """Take or renew the sweeping lease; True if this node may sweep"""
+        client = self.redis.redis
+        if client is None:
+            return True
+        
+        worker_id = self.worker_id
+        try:
+            if await client.set(LEASE_KEY, worker_id, nx=True, ex=self.lease_seconds):
+                return True
+            
+            async with client.pipeline(transaction=True) as pipe:
+                for _ in range(_MAX_WATCH_RETRIES):
+                    try:
+                        await pipe.watch(LEASE_KEY)
+                        if await pipe.get(LEASE_KEY) != worker_id:
+                            await pipe.reset()
+                            return False
+                        pipe.multi()
+                        pipe.expire(LEASE_KEY, self.lease_seconds)
+                        await pipe.execute()
+                        return True
+                    except WatchError:
+                        continue
+        except Exception as e:
+            logger.error(f"Expiry lease unavailable, sweeping anyway: {e}")
+            return True
+        return False
+    
+    async def _release_lease(self) -> None:
+        client = self.redis.redis
+        if client is None:
+            return
+        
+        try:
+            async with client.pipeline(transaction=True) as pipe:
+                await pipe.watch(LEASE_KEY)
+                if await pipe.get(LEASE_KEY) == self.worker_id:
+                    pipe.multi()
+                    pipe.delete(LEASE_KEY)
+                    await pipe.execute()
+                else:
+                    await pipe.reset()
+        except Exception as e:
+            logger.error(f"Error releasing expiry lease: {e}")
+
+
+# Singleton instance
+expiry_sweeper = ExpirySweeper()
@@ -4,9 +4,10 @@ Handles automated grading for MCQ, true/false, fill-in-blank, and numeric questi
 Supports partial credit, fuzzy matching, and configurable grading strategies
 """
 from typing import List, Dict, Any, Tuple, Optional
-from sqlalchemy.orm import Session
+from collections import defaultdict
+from sqlalchemy.orm import Session, joinedload, selectinload
 from app.models.attempt import StudentAttempt, StudentAnswer, AttemptStatus
-from app.models.exam import Question, QuestionType
+from app.models.exam import Exam, Question, QuestionType
 from app.services.decryption import decrypt_attempt_answers, DecryptionError
 import logging
 import re
@@ -57,6 +58,52 @@ class GradingService:
             StudentAnswer.attempt_id == attempt.id
         ).all()
         
+        result = self._score(attempt, answers)
+        self.db.commit()
+        return result
+    
+    def grade_attempts(self, attempt_ids: List[int]) -> Dict[int, Dict[str, Any]]:
+        """
+        Grade many submitted attempts together (e.g. auto-submitted on expiry)
+        
+        Attempts, their exams and all their answers are loaded with one query
+        each and committed once, instead of a query and a commit per attempt.
+        Attempts with encrypted final answers go through grade_attempt.
+        
+        Returns:
+            Grading results by attempt id; attempts that are not (or no
+            longer) submitted are skipped
+        """
+        if not attempt_ids:
+            return {}
+        
+        attempts = self.db.query(StudentAttempt).options(
+            selectinload(StudentAttempt.exam).selectinload(Exam.exam_questions)
+        ).filter(
+            StudentAttempt.id.in_(attempt_ids),
+            StudentAttempt.status == AttemptStatus.SUBMITTED
+        ).all()
+        
+        plain = [attempt for attempt in attempts if not attempt.encrypted_final_answers]
+        answers: Dict[int, List[StudentAnswer]] = defaultdict(list)
+        if plain:
+            for answer in self.db.query(StudentAnswer).options(
+                joinedload(StudentAnswer.question)
+            ).filter(
+                StudentAnswer.attempt_id.in_([attempt.id for attempt in plain])
+            ):
+                answers[answer.attempt_id].append(answer)
+        
+        results = {attempt.id: self._score(attempt, answers[attempt.id]) for attempt in plain}
+        self.db.commit()
+        
+        for attempt in attempts:
+            if attempt.encrypted_final_answers:
+                results[attempt.id] = self.grade_attempt(attempt)
+        return results
+    
+    def _score(self, attempt: StudentAttempt, answers: List[StudentAnswer]) -> Dict[str, Any]:
+        """Grade answers and mark the attempt graded (caller commits)"""
         total_marks = 0.0
         marks_obtained = 0.0
         correct_count = 0
@@ -64,6 +111,11 @@ class GradingService:
         unattempted_count = 0
         auto_gradable_count = 0
         
+        # Per-exam mark overrides live on the exam's question links
+        marks_overrides = {
+            eq.question_id: eq.marks_override for eq in attempt.exam.exam_questions
+        }
+        
         # Grade each answer
         for answer in answers:
             question = answer.question
@@ -86,8 +138,8 @@ class GradingService:
                     incorrect_count += 1
             
             # Accumulate total marks
-            if answer.marks_override:
-                total_marks += answer.marks_override
+            if marks_overrides.get(answer.question_id):
+                total_marks += marks_overrides[answer.question_id]
             else:
                 total_marks += question.marks
         
@@ -110,8 +162,6 @@ class GradingService:
         attempt.auto_graded = True
         attempt.status = AttemptStatus.GRADED
         
-        self.db.commit()
-        
         return {
             "attempt_id": attempt.id,
             "total_marks": total_marks,
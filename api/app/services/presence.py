@@ -0,0 +1,298 @@
+"""
+WebSocket Presence
+Cluster-wide Redis registry of which worker holds each attempt's sockets,
+so connection limits, "is this candidate online" checks and targeted
+messages see every node instead of one process's dicts
+"""
+import asyncio
+import os
+import time
+from typing import Dict, Iterable, Optional, Set, Tuple
+import logging
+
+from redis.exceptions import WatchError
+
+from app.core.config import settings
+from app.core.metrics import WS_PRESENCE_CLAIMS
+from app.services.redis import RedisService, redis_service
+
+logger = logging.getLogger(__name__)
+
+# Optimistic-transaction attempts before a contended claim is rejected
+_MAX_WATCH_RETRIES = 5
+
+# Idle user/attempt hashes are garbage-collected after this; every claim renews it
+_KEY_TTL_SECONDS = 24 * 60 * 60
+
+
+def get_worker_id() -> str:
+    """Identity of this worker process: node plus pid, since workers on a node share NODE_ID"""
+    return f"{settings.NODE_ID}:{os.getpid()}"
+
+
+class PresenceRegistry:
+    """
+    Which worker holds which WebSocket connection, shared by every node
+    
+    Redis keys (all under presence:):
+    - user:{user_id}: hash of connection_id -> "worker|attempt_id", the
+      set the per-user connection limit is checked against
+    - attempt:{attempt_id}: hash of connection_id -> worker, for routing
+      messages only to the workers that hold the attempt's sockets
+    - worker:{worker_id}: liveness key with a ttl_seconds TTL, renewed
+      every refresh_seconds while the worker has connections
+    
+    An entry only counts while its worker's liveness key exists, so the
+    sockets of a crashed worker stop counting after ttl_seconds without
+    any per-connection TTL traffic; dead entries are pruned on the next
+    claim for that user. Claims are checked and written in one optimistic
+    transaction; releases are batched and flushed every flush_interval_ms
+    together with the liveness renewal. A worker's own unflushed releases
+    never count against a claim, so a reload is not refused.
+    
+    If Redis is unavailable every claim is allowed (fail open) and only
+    the local per-process limit applies.
+    """
+    
+    def __init__(
+        self,
+        redis: RedisService = redis_service,
+        worker_id: Optional[str] = None,
+        ttl_seconds: int = settings.WS_PRESENCE_TTL_SECONDS,
+        refresh_seconds: int = settings.WS_PRESENCE_REFRESH_SECONDS,
+        flush_interval_ms: int = settings.WS_PRESENCE_FLUSH_MS
+    ):
+        self.redis = redis
+        self._worker_id = worker_id
+        self.ttl_seconds = ttl_seconds
+        self.refresh_seconds = refresh_seconds
+        self.flush_interval = flush_interval_ms / 1000
+        
+        # Connections claimed by this worker: {connection_id: (user_id, attempt_id)}
+        self._local: Dict[str, Tuple[int, int]] = {}
+        # Released but not yet removed from Redis, same shape
+        self._pending: Dict[str, Tuple[int, int]] = {}
+        self._refreshed_at: Optional[float] = None
+        self._flusher_task: Optional[asyncio.Task] = None
+    
+    @property
+    def worker_id(self) -> str:
+        # Resolved lazily: a pre-forking server imports this module before forking
+        return self._worker_id or get_worker_id()
+    
+    async def claim(self, user_id: int, attempt_id: int, connection_id: str, limit: int) -> bool:
+        """
+        Register a new connection unless the user already has limit live ones
+        
+        Args:
+            user_id: Connecting user
+            attempt_id: Attempt the socket is for
+            connection_id: Unique connection identifier
+            limit: Maximum live connections per user across the cluster
+        
+        Returns:
+            True if the connection may proceed (also when Redis is down)
+        """
+        client = self.redis.redis
+        if client is None:
+            return self._claim_locally(connection_id, user_id, attempt_id, "bypassed")
+        
+        worker_id = self.worker_id
+        user_key = _user_key(user_id)
+        released = {cid for cid, (uid, _) in self._pending.items() if uid == user_id}
+        
+        try:
+            await self._renew(client)
+            claimed = False
+            async with client.pipeline(transaction=True) as pipe:
+                for _ in range(_MAX_WATCH_RETRIES):
+                    try:
+                        await pipe.watch(user_key)
+                        entries = await pipe.hgetall(user_key)
+                        owners = {cid: value.split("|", 1)[0] for cid, value in entries.items()}
+                        alive = await self._alive(pipe, set(owners.values()))
+                        stale = {cid for cid, owner in owners.items() if owner not in alive}
+                        stale |= released & owners.keys()
+                        
+                        if len(entries) - len(stale) >= limit:
+                            await pipe.reset()
+                            break
+                        
+                        pipe.multi()
+                        if stale:
+                            pipe.hdel(user_key, *stale)
+                        pipe.hset(user_key, connection_id, f"{worker_id}|{attempt_id}")
+                        pipe.expire(user_key, _KEY_TTL_SECONDS)
+                        pipe.hset(_attempt_key(attempt_id), connection_id, worker_id)
+                        pipe.expire(_attempt_key(attempt_id), _KEY_TTL_SECONDS)
+                        await pipe.execute()
+                        claimed = True
+                        break
+                    except WatchError:
+                        continue
+        except Exception as e:
+            logger.error(f"Presence registry unavailable, allowing connection {connection_id}: {e}")
+            return self._claim_locally(connection_id, user_id, attempt_id, "bypassed")
+        
+        if not claimed:
+            WS_PRESENCE_CLAIMS.labels(outcome="rejected").inc()
+            return False
+        return self._claim_locally(connection_id, user_id, attempt_id, "claimed")
+    
+    def release(self, connection_id: str) -> None:
+        """Forget a connection; Redis is updated with the next batch"""
+        entry = self._local.pop(connection_id, None)
+        if entry is None:
+            return
+        self._pending[connection_id] = entry
+        self._ensure_flusher()
+    
+    async def get_attempt_workers(self, attempt_id: int) -> Set[str]:
+        """Live workers holding at least one socket of an attempt"""
+        client = self.redis.redis
+        if client is None:
+            return {self.worker_id} if self._holds(attempt_id) else set()
+        
+        try:
+            entries = await client.hgetall(_attempt_key(attempt_id))
+            workers = {
+                worker for cid, worker in entries.items() if cid not in self._pending
+            }
+            return await self._alive(client, workers)
+        except Exception as e:
+            logger.error(f"Error reading presence of attempt {attempt_id}: {e}")
+            return {self.worker_id} if self._holds(attempt_id) else set()
+    
+    async def is_attempt_connected(self, attempt_id: int) -> bool:
+        """Whether any worker in the cluster holds a socket of the attempt"""
+        return bool(await self.get_attempt_workers(attempt_id))
+    
+    async def count_user_connections(self, user_id: int) -> int:
+        """Live connections of a user across the cluster"""
+        client = self.redis.redis
+        if client is None:
+            return sum(1 for uid, _ in self._local.values() if uid == user_id)
+        
+        try:
+            entries = await client.hgetall(_user_key(user_id))
+            owners = {
+                cid: value.split("|", 1)[0]
+                for cid, value in entries.items()
+                if cid not in self._pending
+            }
+            alive = await self._alive(client, set(owners.values()))
+        except Exception as e:
+            logger.error(f"Error reading presence of user {user_id}: {e}")
+            return sum(1 for uid, _ in self._local.values() if uid == user_id)
+        return sum(1 for owner in owners.values() if owner in alive)
+    
+    async def flush(self) -> int:
+        """
+        Write batched releases and renew this worker's liveness key if due
+        
+        Returns:
+            Number of releases written
+        """
+        client = self.redis.redis
+        batch, self._pending = self._pending, {}
+        if client is None:
+            return 0
+        
+        renew = bool(self._local) and self._renewal_due()
+        if not batch and not renew:
+            return 0
+        
+        try:
+            async with client.pipeline(transaction=False) as pipe:
+                for connection_id, (user_id, attempt_id) in batch.items():
+                    pipe.hdel(_user_key(user_id), connection_id)
+                    pipe.hdel(_attempt_key(attempt_id), connection_id)
+                if renew:
+                    pipe.set(_worker_key(self.worker_id), "1", ex=self.ttl_seconds)
+                await pipe.execute()
+        except Exception as e:
+            logger.error(f"Presence flush of {len(batch)} releases failed: {e}")
+            # Keep them for the next batch, behind anything released meanwhile
+            self._pending = {**batch, **self._pending}
+            return 0
+        
+        if renew:
+            self._refreshed_at = time.monotonic()
+        return len(batch)
+    
+    async def close(self) -> None:
+        """Release every local connection and retire this worker (shutdown)"""
+        for connection_id in list(self._local):
+            self.release(connection_id)
+        
+        if self._flusher_task is not None and not self._flusher_task.done():
+            self._flusher_task.cancel()
+        await self.flush()
+        
+        if self.redis.redis is not None:
+            try:
+                await self.redis.redis.delete(_worker_key(self.worker_id))
+            except Exception as e:
+                logger.error(f"Error retiring presence of worker {self.worker_id}: {e}")
+        self._refreshed_at = None
+    
+    def _claim_locally(self, connection_id: str, user_id: int, attempt_id: int, outcome: str) -> bool:
+        self._local[connection_id] = (user_id, attempt_id)
+        self._ensure_flusher()
+        WS_PRESENCE_CLAIMS.labels(outcome=outcome).inc()
+        return True
+    
+    def _holds(self, attempt_id: int) -> bool:
+        return any(aid == attempt_id for _, aid in self._local.values())
+    
+    def _renewal_due(self) -> bool:
+        return (
+            self._refreshed_at is None
+            or time.monotonic() - self._refreshed_at >= self.refresh_seconds
+        )
+    
+    async def _renew(self, client) -> None:
+        """Make sure this worker's liveness key exists before it claims anything"""
+        if self._renewal_due():
+            await client.set(_worker_key(self.worker_id), "1", ex=self.ttl_seconds)
+            self._refreshed_at = time.monotonic()
+    
+    async def _alive(self, client, workers: Iterable[str]) -> Set[str]:
+        """Subset of workers whose liveness key has not expired"""
+        workers = list(workers)
+        if not workers:
+            return set()
+        values = await client.mget([_worker_key(worker) for worker in workers])
+        return {worker for worker, value in zip(workers, values) if value is not None}
+    
+    def _ensure_flusher(self) -> None:
+        """Start flusher task unless it is already running on this loop"""
+        task = self._flusher_task
+        if task is not None and not task.done() and task.get_loop() is asyncio.get_running_loop():
+            return
+        self._flusher_task = asyncio.create_task(self._flush_loop())
+    
+    async def _flush_loop(self) -> None:
+        """Background task batching releases and renewals; exits when idle"""
+        try:
+            while self._local or self._pending:
+                await asyncio.sleep(self.flush_interval)
+                await self.flush()
+        except asyncio.CancelledError:
+            logger.debug("Presence flusher cancelled")
+
+
+def _user_key(user_id: int) -> str:
+    return f"presence:user:{user_id}"
+
+
+def _attempt_key(attempt_id: int) -> str:
+    return f"presence:attempt:{attempt_id}"
+
+
+def _worker_key(worker_id: str) -> str:
+    return f"presence:worker:{worker_id}"
+
+
+# Singleton instance
+presence_registry = PresenceRegistry()
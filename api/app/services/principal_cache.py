@@ -0,0 +1,375 @@
+"""
+Principal Cache
+Two-tier cache (in-process LRU + Redis) of the per-user facts that every
+authenticated request needs: active flag, role names, center and trade.
+Also holds the Redis token-version map used to revoke access tokens that
+carry these facts as claims.
+"""
+import asyncio
+import itertools
+import json
+import time
+from collections import OrderedDict
+from typing import Any, Dict, Iterable, List, Optional, Set, Tuple
+import logging
+
+from sqlalchemy import event, inspect, select
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.orm import Session
+
+from app.core.config import settings
+from app.core.metrics import PRINCIPAL_CACHE_LOOKUPS
+from app.models.user import Role, User, user_roles
+from app.services.redis import RedisService, redis_service
+
+logger = logging.getLogger(__name__)
+
+# Pub/sub channel carrying {"user_ids": [...]} invalidations between nodes
+INVALIDATION_CHANNEL = "principal:invalidate"
+
+# Sorted set of user id -> current token version (scores only ever increase)
+TOKEN_VERSIONS_KEY = "principal:token_versions"
+
+# User attributes baked into access tokens; a change to any of them revokes the tokens
+_CLAIM_ATTRIBUTES = ("is_active", "center_id", "trade_id", "roles")
+
+# User attributes copied into the principal; a change to any of them invalidates it
+_CACHED_USER_ATTRIBUTES = _CLAIM_ATTRIBUTES + ("token_version",)
+
+# session.info key collecting changed user ids until the transaction commits
+_PENDING_KEY = "principal_cache_pending"
+
+
+class Principal:
+    """
+    Authorization facts for one user, detached from any session
+    
+    Exposes the same has_role/get_role_names API as User, so role checks
+    work unchanged on either.
+    """
+    
+    __slots__ = ("id", "is_active", "role_names", "center_id", "trade_id", "token_version")
+    
+    def __init__(
+        self,
+        id: int,
+        is_active: bool,
+        role_names: Iterable[str],
+        center_id: Optional[int] = None,
+        trade_id: Optional[int] = None,
+        token_version: int = 0
+    ):
+        self.id = id
+        self.is_active = is_active
+        self.role_names = tuple(sorted(role_names))
+        self.center_id = center_id
+        self.trade_id = trade_id
+        self.token_version = token_version
+    
+    @classmethod
+    def from_user(cls, user: User) -> "Principal":
+        """Principal of a loaded user (roles must be loaded)"""
+        return cls(
+            id=user.id,
+            is_active=user.is_active,
+            role_names=user.get_role_names(),
+            center_id=user.center_id,
+            trade_id=user.trade_id,
+            token_version=user.token_version or 0
+        )
+    
+    @classmethod
+    def from_claims(cls, payload: Dict[str, Any]) -> Optional["Principal"]:
+        """
+        Principal carried by a verified access token
+        
+        Returns:
+            Principal, or None for tokens issued without claims
+        """
+        if "ver" not in payload or "roles" not in payload:
+            return None
+        
+        return cls(
+            id=int(payload["sub"]),
+            is_active=True,  # Deactivation bumps the token version
+            role_names=payload["roles"],
+            center_id=payload.get("center_id"),
+            trade_id=payload.get("trade_id"),
+            token_version=int(payload["ver"])
+        )
+    
+    def to_claims(self) -> Dict[str, Any]:
+        """Access-token claims that let requests be authorized without a lookup"""
+        return {
+            "sub": str(self.id),
+            "roles": list(self.role_names),
+            "center_id": self.center_id,
+            "trade_id": self.trade_id,
+            "ver": self.token_version,
+        }
+    
+    def has_role(self, role_name: str) -> bool:
+        """Check if user has a specific role"""
+        return role_name in self.role_names
+    
+    def get_role_names(self) -> List[str]:
+        """Get list of role names for this user"""
+        return list(self.role_names)
+    
+    def to_json(self) -> str:
+        return json.dumps({
+            "id": self.id,
+            "is_active": self.is_active,
+            "role_names": self.role_names,
+            "center_id": self.center_id,
+            "trade_id": self.trade_id,
+            "token_version": self.token_version,
+        })
+    
+    @classmethod
+    def from_json(cls, data: str) -> "Principal":
+        return cls(**json.loads(data))
+    
+    def __eq__(self, other) -> bool:
+        return isinstance(other, Principal) and all(
+            getattr(self, name) == getattr(other, name) for name in self.__slots__
+        )
+    
+    def __repr__(self):
+        return f"<Principal {self.id} roles={list(self.role_names)}>"
+
+
+def get_principal_key(user_id: int) -> str:
+    """Get Redis key for a cached principal"""
+    return f"principal:{user_id}"
+
+
+async def load_principal(db: AsyncSession, user_id: int) -> Optional[Principal]:
+    """Read a principal from the database: one row per role, in one query"""
+    result = await db.execute(
+        select(User.is_active, User.center_id, User.trade_id, User.token_version, Role.name)
+        .outerjoin(user_roles, user_roles.c.user_id == User.id)
+        .outerjoin(Role, Role.id == user_roles.c.role_id)
+        .where(User.id == user_id)
+    )
+    rows = result.all()
+    if not rows:
+        return None
+    
+    first = rows[0]
+    return Principal(
+        id=user_id,
+        is_active=first.is_active,
+        role_names=[row.name for row in rows if row.name is not None],
+        center_id=first.center_id,
+        trade_id=first.trade_id,
+        token_version=first.token_version
+    )
+
+
+class PrincipalCache:
+    """
+    In-process LRU in front of Redis in front of the database
+    
+    Entries are dropped on every node when a user's cached attributes or
+    role assignments are committed (see the session hooks below). The TTLs
+    bound staleness for changes made outside the ORM, and for a database
+    read on one node that races a commit on another and re-stores the old
+    value in Redis.
+    """
+    
+    def __init__(
+        self,
+        redis: RedisService = redis_service,
+        max_size: int = settings.PRINCIPAL_CACHE_SIZE,
+        local_ttl_seconds: float = settings.PRINCIPAL_CACHE_LOCAL_TTL_SECONDS,
+        redis_ttl_seconds: int = settings.PRINCIPAL_CACHE_REDIS_TTL_SECONDS
+    ):
+        self.redis = redis
+        self.max_size = max_size
+        self.local_ttl_seconds = local_ttl_seconds
+        self.redis_ttl_seconds = redis_ttl_seconds
+        self._entries: "OrderedDict[int, Tuple[Principal, float]]" = OrderedDict()
+        # Bumped on every invalidation; a lookup that raced one does not store its result
+        self._generation = 0
+        self._loop: Optional[asyncio.AbstractEventLoop] = None
+        self._tasks: Set[asyncio.Task] = set()
+    
+    async def start(self) -> None:
+        """Listen for invalidations published by other nodes"""
+        self._loop = asyncio.get_running_loop()
+        await self.redis.subscribe(INVALIDATION_CHANNEL, self._on_invalidation)
+    
+    async def get(self, db: AsyncSession, user_id: int) -> Optional[Principal]:
+        """
+        Look up a principal: local LRU, then Redis, then the database
+        
+        Returns:
+            Principal, or None if the user does not exist
+        """
+        principal = self._get_local(user_id)
+        if principal is not None:
+            PRINCIPAL_CACHE_LOOKUPS.labels(tier="local").inc()
+            return principal
+        
+        generation = self._generation
+        cached = await self.redis.get(get_principal_key(user_id))
+        if cached is not None:
+            principal = Principal.from_json(cached)
+            PRINCIPAL_CACHE_LOOKUPS.labels(tier="redis").inc()
+        else:
+            principal = await load_principal(db, user_id)
+            if principal is None:
+                return None
+            PRINCIPAL_CACHE_LOOKUPS.labels(tier="database").inc()
+            if generation == self._generation:
+                await self.redis.set(
+                    get_principal_key(user_id), principal.to_json(),
+                    expire=self.redis_ttl_seconds
+                )
+        
+        if generation == self._generation:
+            self._put_local(principal)
+        return principal
+    
+    async def get_token_version(self, user_id: int) -> Optional[int]:
+        """Current token version from Redis, or None if unknown there"""
+        version = await self.redis.zscore(TOKEN_VERSIONS_KEY, str(user_id))
+        return None if version is None else int(version)
+    
+    async def record_token_version(self, user_id: int, version: int) -> None:
+        """Publish a user's token version (ignored if Redis already has a newer one)"""
+        await self.redis.zadd_gt(TOKEN_VERSIONS_KEY, {str(user_id): version})
+    
+    def drop_local(self, user_ids: Iterable[int]) -> None:
+        """Forget users in this process only"""
+        self._generation += 1
+        for user_id in user_ids:
+            self._entries.pop(user_id, None)
+    
+    def clear(self) -> None:
+        """Forget every user in this process"""
+        self._generation += 1
+        self._entries.clear()
+    
+    async def invalidate(
+        self,
+        user_ids: Iterable[int],
+        token_versions: Optional[Dict[int, int]] = None
+    ) -> None:
+        """Forget users on every node, publishing any new token versions first"""
+        user_ids = sorted(set(user_ids))
+        self.drop_local(user_ids)
+        await self._publish_invalidation(user_ids, token_versions or {})
+    
+    def invalidate_soon(
+        self,
+        user_ids: Iterable[int],
+        token_versions: Optional[Dict[int, int]] = None
+    ) -> None:
+        """
+        Forget users here now and on other nodes shortly
+        
+        Callable from synchronous code, including worker threads.
+        """
+        user_ids = sorted(set(user_ids))
+        self.drop_local(user_ids)
+        publish = self._publish_invalidation(user_ids, token_versions or {})
+        
+        try:
+            loop = asyncio.get_running_loop()
+        except RuntimeError:
+            loop = None
+        
+        if loop is not None:
+            task = loop.create_task(publish)
+            self._tasks.add(task)
+            task.add_done_callback(self._tasks.discard)
+        elif self._loop is not None and self._loop.is_running():
+            asyncio.run_coroutine_threadsafe(publish, self._loop)
+        else:
+            publish.close()
+    
+    def _get_local(self, user_id: int) -> Optional[Principal]:
+        entry = self._entries.get(user_id)
+        if entry is None:
+            return None
+        
+        principal, expires_at = entry
+        if time.monotonic() >= expires_at:
+            del self._entries[user_id]
+            return None
+        
+        self._entries.move_to_end(user_id)
+        return principal
+    
+    def _put_local(self, principal: Principal) -> None:
+        self._entries[principal.id] = (principal, time.monotonic() + self.local_ttl_seconds)
+        self._entries.move_to_end(principal.id)
+        while len(self._entries) > self.max_size:
+            self._entries.popitem(last=False)
+    
+    async def _publish_invalidation(
+        self,
+        user_ids: List[int],
+        token_versions: Dict[int, int]
+    ) -> None:
+        # Revoke older tokens before anything can re-cache the user
+        if token_versions:
+            await self.redis.zadd_gt(
+                TOKEN_VERSIONS_KEY,
+                {str(user_id): version for user_id, version in token_versions.items()}
+            )
+        for user_id in user_ids:
+            await self.redis.delete(get_principal_key(user_id))
+        await self.redis.publish(INVALIDATION_CHANNEL, {"user_ids": user_ids})
+    
+    async def _on_invalidation(self, channel: str, message: dict) -> None:
+        self.drop_local(message.get("user_ids", []))
+
+
+# Singleton instance
+principal_cache = PrincipalCache()
+
+
+# Revoke and invalidate on commit, for every session (sync or async) that changes a user
+
+def _attributes_changed(user: User, names: Tuple[str, ...]) -> bool:
+    state = inspect(user)
+    return any(state.attrs[name].history.has_changes() for name in names)
+
+
+@event.listens_for(Session, "before_flush")
+def _bump_token_versions(session: Session, flush_context, instances) -> None:
+    for obj in session.dirty:
+        if isinstance(obj, User) and _attributes_changed(obj, _CLAIM_ATTRIBUTES):
+            obj.token_version = (obj.token_version or 0) + 1
+
+
+@event.listens_for(Session, "after_flush")
+def _collect_changed_users(session: Session, flush_context) -> None:
+    changed = {
+        obj.id: inspect(obj).dict.get("token_version")
+        for obj in itertools.chain(session.new, session.dirty, session.deleted)
+        if isinstance(obj, User) and (
+            obj in session.new or obj in session.deleted
+            or _attributes_changed(obj, _CACHED_USER_ATTRIBUTES)
+        )
+    }
+    if changed:
+        session.info.setdefault(_PENDING_KEY, {}).update(changed)
+
+
+@event.listens_for(Session, "after_commit")
+def _invalidate_changed_users(session: Session) -> None:
+    changed = session.info.pop(_PENDING_KEY, None)
+    if changed:
+        principal_cache.invalidate_soon(
+            changed,
+            {user_id: version for user_id, version in changed.items() if version is not None}
+        )
+
+
+@event.listens_for(Session, "after_rollback")
+def _discard_changed_users(session: Session) -> None:
+    session.info.pop(_PENDING_KEY, None)
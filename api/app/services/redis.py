@@ -3,16 +3,21 @@ Redis Service
 Provides pub/sub messaging for real-time features and caching
 """
 import json
+import time
 import asyncio
-from typing import Optional, Callable, Dict, Any
+from typing import Optional, Callable, Dict, Any, List, Tuple
 import redis.asyncio as aioredis
 from redis.asyncio.client import PubSub
 import logging
 
 from app.core.config import settings
+from app.core.metrics import REDIS_PUBSUB_HANDLER_LAG, channel_label
 
 logger = logging.getLogger(__name__)
 
+# Envelope field carrying the publish time; stripped before handlers see the message
+PUBLISHED_AT_FIELD = "_published_at"
+
 
 class RedisService:
     """
@@ -24,7 +29,11 @@ class RedisService:
         """Initialize Redis service"""
         self.redis: Optional[aioredis.Redis] = None
         self.pubsub: Optional[PubSub] = None
-        self._subscribers: Dict[str, Callable] = {}
+        # Node-level subscription registry: {channel or pattern: {handler: refs}}.
+        # Redis is subscribed while any handler holds a reference, and each
+        # message is decoded once and passed to every handler registered for it.
+        self._subscribers: Dict[str, Dict[Callable, int]] = {}
+        self._pattern_subscribers: Dict[str, Dict[Callable, int]] = {}
         self._listener_task: Optional[asyncio.Task] = None
     
     async def connect(self) -> None:
@@ -52,6 +61,8 @@ class RedisService:
         
         if self.pubsub:
             await self.pubsub.close()
+        self._subscribers.clear()
+        self._pattern_subscribers.clear()
         
         if self.redis:
             await self.redis.close()
@@ -74,7 +85,7 @@ class RedisService:
             return 0
         
         try:
-            message_json = json.dumps(message)
+            message_json = json.dumps({**message, PUBLISHED_AT_FIELD: time.time()})
             result = await self.redis.publish(channel, message_json)
             logger.debug(f"Published to {channel}: {message} (reached {result} subscribers)")
             return result
@@ -82,71 +93,174 @@ class RedisService:
             logger.error(f"Error publishing to {channel}: {e}")
             return 0
     
-    async def subscribe(self, channel: str, handler: Callable) -> None:
+    async def subscribe(self, channel: str, handler: Callable) -> bool:
         """
         Subscribe to a Redis channel
         
+        Subscriptions are reference-counted per handler: subscribing the same
+        handler twice needs two unsubscribes, and different handlers on one
+        channel all receive every message.
+        
         Args:
             channel: Channel name
             handler: Async function to handle messages
+        
+        Returns:
+            True if a reference is now held (and must be released), False
+            if the subscription failed
+        """
+        return await self._add_subscription(self._subscribers, channel, handler, pattern=False)
+    
+    async def unsubscribe(self, channel: str, handler: Optional[Callable] = None) -> None:
+        """
+        Unsubscribe from a Redis channel
+        
+        Args:
+            channel: Channel name
+            handler: Handler whose reference to drop; None drops every handler
         """
+        await self._remove_subscription(self._subscribers, channel, handler, pattern=False)
+    
+    async def psubscribe(self, pattern: str, handler: Callable) -> bool:
+        """
+        Subscribe to every channel matching a glob pattern (e.g. "attempt:*")
+        
+        Reference-counted like subscribe(); the handler receives the concrete
+        channel name of each message.
+        
+        Args:
+            pattern: Channel pattern
+            handler: Async function to handle messages
+        
+        Returns:
+            True if a reference is now held, False if the subscription failed
+        """
+        return await self._add_subscription(self._pattern_subscribers, pattern, handler, pattern=True)
+    
+    async def punsubscribe(self, pattern: str, handler: Optional[Callable] = None) -> None:
+        """
+        Drop a pattern subscription
+        
+        Args:
+            pattern: Channel pattern
+            handler: Handler whose reference to drop; None drops every handler
+        """
+        await self._remove_subscription(self._pattern_subscribers, pattern, handler, pattern=True)
+    
+    def get_subscription_refs(self, name: str, pattern: bool = False) -> int:
+        """Number of references held on a channel (or pattern) on this node"""
+        registry = self._pattern_subscribers if pattern else self._subscribers
+        return sum(registry.get(name, {}).values())
+    
+    async def _add_subscription(
+        self,
+        registry: Dict[str, Dict[Callable, int]],
+        name: str,
+        handler: Callable,
+        pattern: bool
+    ) -> bool:
         if not self.pubsub:
             logger.error("PubSub not initialized")
-            return
+            return False
         
-        try:
-            await self.pubsub.subscribe(channel)
-            self._subscribers[channel] = handler
+        handlers = registry.get(name)
+        if not handlers:
+            # Counted only once subscribed, so a failure leaves no reference
+            # behind and the next subscriber tries again
+            try:
+                if pattern:
+                    await self.pubsub.psubscribe(name)
+                else:
+                    await self.pubsub.subscribe(name)
+            except Exception as e:
+                logger.error(f"Error subscribing to {name}: {e}")
+                return False
             
             # Start listener task if not already running
             if not self._listener_task or self._listener_task.done():
                 self._listener_task = asyncio.create_task(self._listen())
             
-            logger.info(f"Subscribed to channel: {channel}")
-        except Exception as e:
-            logger.error(f"Error subscribing to {channel}: {e}")
+            logger.info(f"Subscribed to {'pattern' if pattern else 'channel'}: {name}")
+            # Another first subscriber may have registered while this one waited
+            handlers = registry.setdefault(name, {})
     
-    async def unsubscribe(self, channel: str) -> None:
-        """
-        Unsubscribe from a Redis channel
+        handlers[handler] = handlers.get(handler, 0) + 1
+        return True
         
-        Args:
-            channel: Channel name
-        """
+    async def _remove_subscription(
+        self,
+        registry: Dict[str, Dict[Callable, int]],
+        name: str,
+        handler: Optional[Callable],
+        pattern: bool
+    ) -> None:
         if not self.pubsub:
             return
         
+        handlers = registry.get(name)
+        if handlers is None:
+            return
+        
+        if handler is None:
+            handlers.clear()
+        elif handler in handlers:
+            handlers[handler] -= 1
+            if handlers[handler] <= 0:
+                del handlers[handler]
+        
+        if handlers:
+            return
+        
+        del registry[name]
         try:
-            await self.pubsub.unsubscribe(channel)
-            if channel in self._subscribers:
-                del self._subscribers[channel]
-            logger.info(f"Unsubscribed from channel: {channel}")
+            if pattern:
+                await self.pubsub.punsubscribe(name)
+            else:
+                await self.pubsub.unsubscribe(name)
+            logger.info(f"Unsubscribed from {'pattern' if pattern else 'channel'}: {name}")
         except Exception as e:
-            logger.error(f"Error unsubscribing from {channel}: {e}")
+            logger.error(f"Error unsubscribing from {name}: {e}")
     
     async def _listen(self) -> None:
         """Background task to listen for messages"""
         try:
             async for message in self.pubsub.listen():
                 if message['type'] == 'message':
-                    channel = message['channel']
-                    data = message['data']
+                    handlers = self._subscribers.get(message['channel'])
+                elif message['type'] == 'pmessage':
+                    handlers = self._pattern_subscribers.get(message['pattern'])
+                else:
+                    continue
                     
-                    handler = self._subscribers.get(channel)
-                    if handler:
-                        try:
-                            # Parse JSON message
-                            message_dict = json.loads(data)
-                            await handler(channel, message_dict)
-                        except json.JSONDecodeError:
-                            logger.error(f"Invalid JSON from {channel}: {data}")
-                        except Exception as e:
-                            logger.error(f"Error in handler for {channel}: {e}")
+                if handlers:
+                    await self._dispatch(message['channel'], message['data'], list(handlers))
         except asyncio.CancelledError:
             logger.debug("Redis listener cancelled")
         except Exception as e:
             logger.error(f"Redis listener error: {e}")
     
+    async def _dispatch(self, channel: str, data: str, handlers: List[Callable]) -> None:
+        """Decode one message and pass it to each handler"""
+        try:
+            # Parse JSON message
+            message_dict = json.loads(data)
+        except json.JSONDecodeError:
+            logger.error(f"Invalid JSON from {channel}: {data}")
+            return
+        
+        published_at = message_dict.pop(PUBLISHED_AT_FIELD, None)
+        if published_at is not None:
+            # Wall clocks across nodes: lag includes any clock skew
+            REDIS_PUBSUB_HANDLER_LAG.labels(
+                channel=channel_label(channel)
+            ).observe(max(time.time() - published_at, 0.0))
+        
+        for handler in handlers:
+            try:
+                await handler(channel, message_dict)
+            except Exception as e:
+                logger.error(f"Error in handler for {channel}: {e}")
+    
     # Cache operations
     
     async def get(self, key: str) -> Optional[str]:
@@ -237,6 +351,186 @@ class RedisService:
             return False
 
 
+    # Sorted set operations
+    
+    async def zadd_gt(self, key: str, mapping: Dict[str, float]) -> bool:
+        """
+        Add members or raise their scores; never lowers an existing score
+        
+        Args:
+            key: Sorted set key
+            mapping: Member to score
+        
+        Returns:
+            True if successful
+        """
+        if not self.redis:
+            return False
+        
+        try:
+            await self.redis.zadd(key, mapping, gt=True)
+            return True
+        except Exception as e:
+            logger.error(f"Error adding to sorted set {key}: {e}")
+            return False
+    
+    async def zscore(self, key: str, member: str) -> Optional[float]:
+        """Get a member's score, or None if absent (or Redis is unavailable)"""
+        if not self.redis:
+            return None
+        
+        try:
+            return await self.redis.zscore(key, member)
+        except Exception as e:
+            logger.error(f"Error reading score of {member} in {key}: {e}")
+            return None
+    
+    # Stream operations
+    
+    async def xadd(self, stream: str, fields: Dict[str, str]) -> Optional[str]:
+        """
+        Append an entry to a Redis Stream
+        
+        Args:
+            stream: Stream key
+            fields: Flat string field/value mapping
+        
+        Returns:
+            Entry ID, or None if the append failed
+        """
+        if not self.redis:
+            return None
+        
+        try:
+            return await self.redis.xadd(stream, fields)
+        except Exception as e:
+            logger.error(f"Error appending to stream {stream}: {e}")
+            return None
+    
+    async def xgroup_create(self, stream: str, group: str, start_id: str = "0") -> bool:
+        """
+        Create a consumer group (and the stream) if it does not exist yet
+        
+        Args:
+            stream: Stream key
+            group: Consumer group name
+            start_id: First entry the group delivers ("0" = whole stream)
+        
+        Returns:
+            True if the group exists afterwards
+        """
+        if not self.redis:
+            return False
+        
+        try:
+            await self.redis.xgroup_create(stream, group, id=start_id, mkstream=True)
+            return True
+        except Exception as e:
+            if "BUSYGROUP" in str(e):
+                return True
+            logger.error(f"Error creating group {group} on {stream}: {e}")
+            return False
+    
+    async def xreadgroup(
+        self,
+        group: str,
+        consumer: str,
+        stream: str,
+        count: int = 100,
+        block_ms: Optional[int] = None,
+        start_id: str = ">"
+    ) -> Optional[List[Tuple[str, Dict[str, str]]]]:
+        """
+        Read entries from one stream as a consumer group member
+        
+        Args:
+            group: Consumer group name
+            consumer: Consumer name within the group
+            stream: Stream key
+            count: Maximum entries to return
+            block_ms: Block for new entries up to this long (None = no blocking)
+            start_id: ">" for new entries
+        
+        Returns:
+            List of (entry_id, fields), or None if the read failed
+        """
+        if not self.redis:
+            return None
+        
+        try:
+            response = await self.redis.xreadgroup(
+                group, consumer, {stream: start_id}, count=count, block=block_ms
+            )
+        except Exception as e:
+            logger.error(f"Error reading group {group} from {stream}: {e}")
+            return None
+        
+        entries = []
+        for _, stream_entries in response or []:
+            entries.extend(
+                (entry_id, fields) for entry_id, fields in stream_entries if fields is not None
+            )
+        return entries
+    
+    async def xautoclaim(
+        self,
+        stream: str,
+        group: str,
+        consumer: str,
+        min_idle_ms: int = 0,
+        count: int = 100
+    ) -> Optional[List[Tuple[str, Dict[str, str]]]]:
+        """
+        Take over delivered but unacknowledged entries of a consumer group
+        
+        Args:
+            stream: Stream key
+            group: Consumer group name
+            consumer: Consumer that takes ownership
+            min_idle_ms: Only claim entries idle at least this long
+            count: Maximum entries to claim
+        
+        Returns:
+            List of (entry_id, fields), or None if the claim failed
+        """
+        if not self.redis:
+            return None
+        
+        try:
+            response = await self.redis.xautoclaim(
+                stream, group, consumer, min_idle_ms, start_id="0-0", count=count
+            )
+        except Exception as e:
+            logger.error(f"Error claiming pending entries on {stream}: {e}")
+            return None
+        
+        return [(entry_id, fields) for entry_id, fields in response[1] if fields is not None]
+    
+    async def xack(self, stream: str, group: str, entry_ids: List[str]) -> int:
+        """Acknowledge processed entries and remove them from the stream"""
+        if not self.redis or not entry_ids:
+            return 0
+        
+        try:
+            acked = await self.redis.xack(stream, group, *entry_ids)
+            await self.redis.xdel(stream, *entry_ids)
+            return acked
+        except Exception as e:
+            logger.error(f"Error acknowledging entries on {stream}: {e}")
+            return 0
+    
+    async def xlen(self, stream: str) -> int:
+        """Get number of entries in a stream"""
+        if not self.redis:
+            return 0
+        
+        try:
+            return await self.redis.xlen(stream)
+        except Exception as e:
+            logger.error(f"Error getting length of {stream}: {e}")
+            return 0
+
+
 # Singleton instance
 redis_service = RedisService()
 
@@ -252,6 +546,36 @@ def get_exam_channel(exam_id: int) -> str:
     return f"exam:{exam_id}"
 
 
+def get_center_channel(center_id: int) -> str:
+    """Get Redis channel name for an exam center"""
+    return f"center:{center_id}"
+
+
+def get_worker_channel(worker_id: str) -> str:
+    """Get Redis channel name for messages routed to one worker process"""
+    return f"worker:{worker_id}"
+
+
+def get_attempt_channel_pattern() -> str:
+    """Get Redis pattern matching every attempt channel"""
+    return "attempt:*"
+
+
+def get_exam_channel_pattern() -> str:
+    """Get Redis pattern matching every exam channel"""
+    return "exam:*"
+
+
+def get_center_channel_pattern() -> str:
+    """Get Redis pattern matching every center channel"""
+    return "center:*"
+
+
+def parse_channel_id(channel: str) -> int:
+    """Get the numeric id from an `attempt:42` style channel name"""
+    return int(channel.split(":", 1)[1])
+
+
 def get_user_channel(user_id: int) -> str:
     """Get Redis channel name for a user"""
     return f"user:{user_id}"
@@ -449,6 +449,9 @@ class TransferService:
         
         # Broadcast transfer completed event
         if connection_manager:
+            # Time is frozen at the snapshot until the attempt resumes
+            await connection_manager.forget_clock(attempt.id)
+            
             message = create_transfer_completed(
                 transfer_id=transfer.id,
                 attempt_id=attempt.id,
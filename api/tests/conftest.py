@@ -1,14 +1,32 @@
 """
 Test configuration and fixtures
 """
+import asyncio
+import json
 import pytest
+import fakeredis
+import fakeredis.aioredis
+from contextlib import contextmanager
 from fastapi.testclient import TestClient
 from sqlalchemy import create_engine
-from sqlalchemy.orm import sessionmaker
+from sqlalchemy.orm import Session, sessionmaker
+from sqlalchemy.pool import NullPool
+from sqlalchemy.ext.asyncio import create_async_engine, async_sessionmaker
 from app.main import app
-from app.core.database import Base, get_db
+from app.core.database import (
+    Base, get_db, get_async_db, get_async_read_db, get_async_session_factory,
+    get_async_database_url
+)
 from app.core.security import get_password_hash
+from app.core.query_budget import capture_queries
+from app.services.checkpoint import checkpoint_service
+from app.services.expiry import expiry_sweeper
+from app.services.principal_cache import principal_cache
+from app.services.redis import RedisService
+from datetime import datetime
 from app.models.user import User, Role, Center
+from app.models.exam import Exam, Question, QuestionBank, Trade, ExamQuestion, QuestionType, ExamStatus
+from app.models.attempt import StudentAttempt, AttemptStatus
 
 # Create test database
 SQLALCHEMY_DATABASE_URL = "sqlite:///./test.db"
@@ -17,6 +35,15 @@ engine = create_engine(
 )
 TestingSessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=engine)
 
+# Async engine on the same SQLite file for routers using get_async_db
+# NullPool: TestClient runs each client on its own event loop
+async_engine = create_async_engine(
+    get_async_database_url(SQLALCHEMY_DATABASE_URL), poolclass=NullPool
+)
+AsyncTestingSessionLocal = async_sessionmaker(
+    bind=async_engine, autoflush=False, expire_on_commit=False
+)
+
 
 @pytest.fixture(scope="function")
 def db_session():
@@ -39,12 +66,36 @@ def client(db_session):
         finally:
             pass
     
+    async def override_get_async_db():
+        async with AsyncTestingSessionLocal() as session:
+            yield session
+    
     app.dependency_overrides[get_db] = override_get_db
+    app.dependency_overrides[get_async_db] = override_get_async_db
+    app.dependency_overrides[get_async_read_db] = override_get_async_db
+    app.dependency_overrides[get_async_session_factory] = lambda: AsyncTestingSessionLocal
+    
+    # User ids restart at 1 in every test database
+    principal_cache.clear()
+    
+    # Background writers open their own sessions
+    checkpoint_service.session_factory = AsyncTestingSessionLocal
+    write_buffer = checkpoint_service.write_buffer
+    if write_buffer is not None:
+        write_buffer.session_factory = AsyncTestingSessionLocal
+    expiry_sweeper.session_factory = AsyncTestingSessionLocal
+    
     with TestClient(app) as test_client:
         yield test_client
     app.dependency_overrides.clear()
 
 
+@pytest.fixture
+def async_session_factory(db_session):
+    """Async session factory bound to the test database"""
+    return AsyncTestingSessionLocal
+
+
 @pytest.fixture
 def test_roles(db_session):
     """Create test roles"""
@@ -145,3 +196,151 @@ def auth_headers_admin(client, test_admin):
     token = response.json()["access_token"]
     return {"Authorization": f"Bearer {token}"}
 
+
+@pytest.fixture
+def published_exam(db_session: Session):
+    """Create a published exam with three single-answer questions"""
+    trade = Trade(name="Electrician", code="ELEC")
+    db_session.add(trade)
+    db_session.commit()
+    
+    bank = QuestionBank(name="Electrician Bank", trade_id=trade.id)
+    db_session.add(bank)
+    db_session.commit()
+    
+    exam = Exam(
+        title="Checkpoint Exam",
+        trade_id=trade.id,
+        duration_minutes=60,
+        total_marks=3.0,
+        passing_marks=1.0,
+        total_questions=3,
+        status=ExamStatus.PUBLISHED
+    )
+    db_session.add(exam)
+    db_session.commit()
+    
+    for i in range(3):
+        question = Question(
+            question_bank_id=bank.id,
+            question_text=f"Question {i + 1}?",
+            question_type=QuestionType.MULTIPLE_CHOICE,
+            options={"A": "Yes", "B": "No"},
+            correct_answer=["A"],
+            marks=1.0
+        )
+        db_session.add(question)
+        db_session.commit()
+        db_session.add(ExamQuestion(exam_id=exam.id, question_id=question.id, order_number=i + 1))
+    
+    db_session.commit()
+    db_session.refresh(exam)
+    return exam
+
+
+@pytest.fixture
+def active_attempt(db_session: Session, test_user: User, published_exam: Exam):
+    """Create an in-progress attempt on published_exam for test_user"""
+    attempt = StudentAttempt(
+        student_id=test_user.id,
+        exam_id=published_exam.id,
+        status=AttemptStatus.IN_PROGRESS,
+        start_time=datetime.utcnow(),
+        duration_minutes=published_exam.duration_minutes,
+        total_marks=published_exam.total_marks,
+        questions_answered=0
+    )
+    db_session.add(attempt)
+    db_session.commit()
+    db_session.refresh(attempt)
+    return attempt
+
+
+@pytest.fixture
+def assert_max_queries():
+    """
+    Fail the test when a block issues more SQL statements than allowed
+    
+    Usage:
+        with assert_max_queries(5):
+            client.get("/api/v1/attempts/me", headers=auth_headers_student)
+    """
+    @contextmanager
+    def _assert_max_queries(max_queries: int):
+        with capture_queries() as tracker:
+            yield tracker
+        assert tracker.count <= max_queries, (
+            f"Expected at most {max_queries} queries, got {tracker.summary()}"
+        )
+    
+    return _assert_max_queries
+
+
+@pytest.fixture
+def fake_server():
+    """In-process Redis server shared by every fake_redis_service() node"""
+    return fakeredis.FakeServer()
+
+
+@pytest.fixture
+def fake_redis_service(fake_server):
+    """
+    Build RedisService instances backed by fake_server
+    
+    Each call is a separate node with its own connection and pub/sub, so
+    cross-node behaviour can be tested in one process.
+    """
+    def _fake_redis_service() -> RedisService:
+        service = RedisService()
+        service.redis = fakeredis.aioredis.FakeRedis(server=fake_server, decode_responses=True)
+        service.pubsub = service.redis.pubsub()
+        return service
+    
+    return _fake_redis_service
+
+
+class RecordingWebSocket:
+    """
+    WebSocket stand-in that accepts and records sent messages
+    
+    Optionally fails every send, or stalls sends until `released` is set.
+    """
+    
+    def __init__(self, fail_sends: bool = False, stalled: bool = False):
+        self.fail_sends = fail_sends
+        self.sent = []
+        self.released = asyncio.Event()
+        if not stalled:
+            self.released.set()
+        self.close_code = None
+    
+    async def accept(self):
+        pass
+    
+    async def close(self, code: int = 1000, reason: str = ""):
+        self.close_code = code
+    
+    async def send_json(self, message: dict):
+        if self.fail_sends:
+            raise RuntimeError("socket gone")
+        self.sent.append(message)
+    
+    async def send_text(self, data: str):
+        await self.released.wait()
+        await self.send_json(json.loads(data))
+
+
+@pytest.fixture
+def recording_websocket():
+    """Factory for RecordingWebSocket instances"""
+    return RecordingWebSocket
+
+
+@pytest.fixture
+def settle():
+    """Let background tasks (outbox writers, pub/sub listeners) run"""
+    async def _settle(rounds: int = 20):
+        for _ in range(rounds):
+            await asyncio.sleep(0.01)
+    
+    return _settle
@@ -0,0 +1,134 @@
+"""
+Admission Control Tests
+Tests for the Redis-backed login admission queue
+"""
+import pytest
+import fakeredis
+import fakeredis.aioredis
+from fastapi import status
+
+from app.services import admission
+from app.services.admission import TICKET_HEADER, AdmissionController, login_admission
+from app.services.redis import RedisService
+
+
+@pytest.fixture
+def fake_redis_service():
+    """RedisService backed by an in-memory fake server"""
+    service = RedisService()
+    service.redis = fakeredis.aioredis.FakeRedis(
+        server=fakeredis.FakeServer(), decode_responses=True
+    )
+    return service
+
+
+class TestAdmissionController:
+    """Budget, FIFO order and expiry"""
+    
+    @pytest.mark.asyncio
+    async def test_admits_within_budget(self, fake_redis_service):
+        controller = AdmissionController("test", redis=fake_redis_service, concurrency=2)
+        
+        first = await controller.acquire()
+        second = await controller.acquire()
+        third = await controller.acquire()
+        
+        assert first.admitted and second.admitted
+        assert not third.admitted
+        assert third.position == 1
+        
+        await controller.release(first.lease, 0.1)
+        assert (await controller.acquire(third.ticket)).admitted
+    
+    @pytest.mark.asyncio
+    async def test_queue_is_fifo(self, fake_redis_service):
+        controller = AdmissionController("test", redis=fake_redis_service, concurrency=1)
+        
+        running = await controller.acquire()
+        early = await controller.acquire()
+        late = await controller.acquire()
+        assert (early.position, late.position) == (1, 2)
+        
+        await controller.release(running.lease, 0.1)
+        assert (await controller.status(early.ticket)).position == 0
+        
+        # A later ticket (or a newcomer) cannot overtake the head of the queue
+        assert not (await controller.acquire(late.ticket)).admitted
+        assert not (await controller.acquire()).admitted
+        assert (await controller.acquire(early.ticket)).admitted
+        assert (await controller.status(late.ticket)).position == 1
+    
+    @pytest.mark.asyncio
+    async def test_unpolled_tickets_expire(self, fake_redis_service, monkeypatch):
+        controller = AdmissionController(
+            "test", redis=fake_redis_service, concurrency=1, ticket_ttl_seconds=10
+        )
+        now = 1000.0
+        monkeypatch.setattr(admission.time, "time", lambda: now)
+        
+        running = await controller.acquire()
+        abandoned = await controller.acquire()
+        waiting = await controller.acquire()
+        
+        now += 8
+        assert (await controller.status(waiting.ticket)).position == 2
+        now += 5
+        assert await controller.status(abandoned.ticket) is None
+        assert (await controller.status(waiting.ticket)).position == 1
+        
+        await controller.release(running.lease, 0.1)
+        assert (await controller.acquire(waiting.ticket)).admitted
+    
+    @pytest.mark.asyncio
+    async def test_expired_lease_is_reclaimed(self, fake_redis_service, monkeypatch):
+        controller = AdmissionController(
+            "test", redis=fake_redis_service, concurrency=1, lease_seconds=30
+        )
+        now = 1000.0
+        monkeypatch.setattr(admission.time, "time", lambda: now)
+        
+        assert (await controller.acquire()).admitted  # Never released
+        queued = await controller.acquire()
+        assert not queued.admitted
+        
+        now += 31
+        assert (await controller.acquire(queued.ticket)).admitted
+    
+    @pytest.mark.asyncio
+    async def test_fails_open_without_redis(self):
+        controller = AdmissionController("test", redis=RedisService(), concurrency=0)
+        
+        decision = await controller.acquire()
+        
+        assert decision.admitted
+        await controller.release(decision.lease, 0.1)
+
+
+class TestLoginAdmission:
+    """Login endpoints queue behind the shared budget"""
+    
+    def test_login_queues_over_budget(self, client, test_user, fake_redis_service, monkeypatch):
+        monkeypatch.setattr(login_admission, "redis", fake_redis_service)
+        monkeypatch.setattr(login_admission, "concurrency", 0)
+        credentials = {"username": "student001", "password": "password123"}
+        
+        response = client.post("/api/v1/auth/login", json=credentials)
+        assert response.status_code == status.HTTP_429_TOO_MANY_REQUESTS
+        ticket = response.headers[TICKET_HEADER]
+        assert int(response.headers["Retry-After"]) >= 1
+        assert response.json()["detail"]["position"] == 1
+        
+        polled = client.get(f"/api/v1/auth/queue/{ticket}")
+        assert polled.status_code == status.HTTP_200_OK
+        assert polled.json()["ticket"] == ticket
+        assert polled.json()["eta_seconds"] >= 1
+        
+        monkeypatch.setattr(login_admission, "concurrency", 1)
+        response = client.post(
+            "/api/v1/auth/login", json=credentials, headers={TICKET_HEADER: ticket}
+        )
+        assert response.status_code == status.HTTP_200_OK
+        
+        # Admitted tickets leave the queue, and the slot is released afterwards
+        assert client.get(f"/api/v1/auth/queue/{ticket}").status_code == 404
+        assert client.post("/api/v1/auth/login", json=credentials).status_code == 200
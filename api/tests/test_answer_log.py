@@ -0,0 +1,135 @@
+"""
+Answer Change Log Tests
+Tests for per-attempt change sequences and delta resync on reconnect
+"""
+import pytest
+import fakeredis
+import fakeredis.aioredis
+from redis.exceptions import WatchError
+
+from app.api import ws_attempts
+from app.schemas.websocket import CheckpointRequest
+from app.services.answer_log import AnswerChangeLog
+from app.services.checkpoint import CheckpointWriteBuffer
+from app.services.redis import RedisService
+
+
+def _change(question_id: int, answer: str, sequence: int = 1) -> dict:
+    return {
+        "question_id": question_id,
+        "answer": [answer],
+        "is_flagged": False,
+        "sequence": sequence,
+        "saved_at": "2026-01-01T00:00:00",
+    }
+
+
+@pytest.fixture
+def change_log():
+    service = RedisService()
+    service.redis = fakeredis.aioredis.FakeRedis(
+        server=fakeredis.FakeServer(), decode_responses=True
+    )
+    return AnswerChangeLog(redis=service)
+
+
+class TestAnswerChangeLog:
+    """Numbering and replay"""
+    
+    @pytest.mark.asyncio
+    async def test_replay_returns_only_later_changes(self, change_log):
+        first = await change_log.record(1, [_change(10, "A"), _change(11, "B")])
+        await change_log.record(1, [_change(12, "C")])
+        last = await change_log.record(1, [_change(10, "D", sequence=2)])
+        
+        delta = await change_log.replay(1, first)
+        
+        assert delta["change_sequence"] == last
+        assert [(a["question_id"], a["answer"]) for a in delta["answers"]] == [
+            (12, ["C"]), (10, ["D"])
+        ]
+        assert await change_log.replay(1, last) == {"change_sequence": last, "answers": []}
+    
+    @pytest.mark.asyncio
+    async def test_unknown_cursor_is_refused(self, change_log):
+        last = await change_log.record(1, [_change(10, "A")])
+        
+        assert await change_log.replay(1, 0) is None
+        assert await change_log.replay(1, last + 1) is None
+        assert await change_log.replay(2, last) is None
+    
+    @pytest.mark.asyncio
+    async def test_restarted_log_refuses_old_cursor(self, change_log):
+        old = await change_log.record(1, [_change(10, "A")])
+        await change_log.redis.redis.delete("answers:1:meta")
+        
+        await change_log.record(1, [_change(11, "B")])
+        
+        assert await change_log.replay(1, old) is None
+    
+    @pytest.mark.asyncio
+    async def test_record_many_numbers_each_attempt(self, change_log):
+        latest = await change_log.record_many({
+            1: [_change(10, "A"), _change(11, "B")],
+            2: [_change(20, "C")],
+            3: [],
+        })
+        
+        assert set(latest) == {1, 2}
+        delta = await change_log.replay(1, latest[1] - 2)
+        assert [a["question_id"] for a in delta["answers"]] == [10, 11]
+    
+    @pytest.mark.asyncio
+    @pytest.mark.parametrize("error", [WatchError, ConnectionError], ids=["contended", "redis_error"])
+    async def test_unlogged_save_invalidates_cursor(self, change_log, monkeypatch, error):
+        """A save the log missed must not be skipped by the next delta resync"""
+        last = await change_log.record(1, [_change(10, "A")])
+        
+        def fail(*args):
+            raise error("unlogged")
+        monkeypatch.setattr(change_log, "_queue_changes", fail)
+        
+        assert await change_log.record(1, [_change(11, "B")]) is None
+        assert await change_log.replay(1, last) is None
+    
+    @pytest.mark.asyncio
+    async def test_without_redis_nothing_is_logged(self):
+        change_log = AnswerChangeLog(redis=RedisService())
+        
+        assert await change_log.record(1, [_change(10, "A")]) is None
+        assert await change_log.replay(1, 0) is None
+
+
+@pytest.mark.asyncio
+async def test_write_buffer_acks_carry_change_sequence(
+    async_session_factory, published_exam, active_attempt, change_log
+):
+    """A group commit is logged once and every ack gets the attempt's cursor"""
+    buffer = CheckpointWriteBuffer(
+        async_session_factory, flush_interval_ms=20, change_log=change_log
+    )
+    q1, q2, _ = [eq.question_id for eq in published_exam.exam_questions]
+    
+    results = [
+        await buffer.submit(active_attempt.id, CheckpointRequest(
+            question_id=question_id, answer=["A"], sequence=1
+        ))
+        for question_id in (q1, q2)
+    ]
+    await buffer.close()
+    
+    assert all(r["change_sequence"] is not None for r in results)
+    delta = await change_log.replay(active_attempt.id, results[0]["change_sequence"] - 1)
+    assert {a["question_id"] for a in delta["answers"]} == {q1, q2}
+
+
+@pytest.mark.asyncio
+async def test_stale_cursor_reports_incomplete_resync(change_log, monkeypatch):
+    monkeypatch.setattr(ws_attempts, "answer_change_log", change_log)
+    last = await change_log.record(1, [_change(10, "A")])
+    
+    resync = await ws_attempts._answers_since(1, last - 1)
+    assert resync["complete"] and resync["change_sequence"] == last
+    
+    stale = await ws_attempts._answers_since(1, 5)
+    assert stale == {"since": 5, "complete": False, "change_sequence": None, "answers": []}
@@ -228,6 +228,68 @@ def test_list_my_attempts_filtered_by_status(client, auth_headers_student, db_se
     assert data[0]["status"] == "in_progress"
 
 
+def test_list_my_attempts_cursor_pagination(client, auth_headers_student, db_session, test_user):
+    """Cursor pages cover every attempt once, newest first, even with equal created_at"""
+    trade = Trade(name="Electrician", code="ELEC")
+    db_session.add(trade)
+    db_session.commit()
+
+    exam = Exam(
+        title="Paged Exam",
+        trade_id=trade.id,
+        duration_minutes=60,
+        total_marks=10.0,
+        passing_marks=4.0,
+        total_questions=1,
+        status=ExamStatus.PUBLISHED,
+        created_by=1
+    )
+    db_session.add(exam)
+    db_session.commit()
+
+    # Inserted in one statement, so created_at ties and id breaks them
+    db_session.add_all([
+        StudentAttempt(
+            student_id=test_user.id,
+            exam_id=exam.id,
+            status=AttemptStatus.SUBMITTED,
+            start_time=datetime.utcnow(),
+            duration_minutes=60,
+            total_marks=10.0
+        )
+        for _ in range(5)
+    ])
+    db_session.commit()
+
+    pages = []
+    cursor = None
+    while True:
+        params = {"limit": 2, **({"cursor": cursor} if cursor else {})}
+        response = client.get("/api/v1/attempts/me", params=params, headers=auth_headers_student)
+        assert response.status_code == status.HTTP_200_OK
+        pages.append(response.json())
+        cursor = response.headers.get("X-Next-Cursor")
+        if cursor is None:
+            break
+
+    assert [len(page) for page in pages] == [2, 2, 1]
+    ids = [item["id"] for page in pages for item in page]
+    assert ids == sorted(ids, reverse=True)
+    assert len(set(ids)) == 5
+    assert all(item["exam_title"] == "Paged Exam" for page in pages for item in page)
+    assert all(item["exam_duration_minutes"] == 60 for page in pages for item in page)
+
+
+def test_list_my_attempts_invalid_cursor(client, auth_headers_student):
+    """A tampered cursor is rejected"""
+    response = client.get(
+        "/api/v1/attempts/me?cursor=not-a-cursor",
+        headers=auth_headers_student
+    )
+
+    assert response.status_code == status.HTTP_400_BAD_REQUEST
+
+
 # ==================== Get Attempt Tests ====================
 
 def test_get_attempt_with_progress(client, auth_headers_student, db_session, test_user):
@@ -666,6 +728,85 @@ def test_save_answer_for_wrong_exam_question(client, auth_headers_student, db_se
     assert response.status_code == status.HTTP_400_BAD_REQUEST
 
 
+def _save(client, headers, attempt_id, question_id, **fields):
+    return client.post(
+        f"/api/v1/attempts/{attempt_id}/answers",
+        json={"question_id": question_id, "answer": ["A"], "time_spent_seconds": 10, **fields},
+        headers=headers
+    )
+
+
+@pytest.mark.parametrize("native_upsert", [True, False], ids=["upsert", "fallback"])
+def test_save_answer_counts_by_delta(
+    client, auth_headers_student, db_session, published_exam, active_attempt, monkeypatch, native_upsert
+):
+    """Insert bumps questions_answered, re-saving the same question does not"""
+    if not native_upsert:
+        monkeypatch.setattr("app.api.attempts.supports_native_upsert", lambda db: False)
+    first, second = [eq.question_id for eq in published_exam.exam_questions][:2]
+
+    response = _save(client, auth_headers_student, active_attempt.id, first, is_flagged=True)
+    assert response.status_code == status.HTTP_200_OK
+    assert response.json()["question_id"] == first
+    assert response.json()["is_flagged"] is True
+
+    response = _save(client, auth_headers_student, active_attempt.id, first, answer=["B"])
+    assert response.status_code == status.HTTP_200_OK
+    assert response.json()["answer"] == ["B"]
+    assert response.json()["time_spent_seconds"] == 20
+
+    _save(client, auth_headers_student, active_attempt.id, second)
+
+    db_session.expire_all()
+    attempt = db_session.get(StudentAttempt, active_attempt.id)
+    assert attempt.questions_answered == 2
+    assert attempt.questions_flagged == []
+    assert attempt.last_activity_time is not None
+
+    answer = db_session.query(StudentAnswer).filter_by(
+        attempt_id=active_attempt.id, question_id=first
+    ).one()
+    assert answer.answer_sequence == 2
+    assert answer.first_answered_at is not None
+
+
+def test_save_answer_rejections_write_nothing(
+    client, auth_headers_student, db_session, published_exam, active_attempt
+):
+    """Foreign question, unknown attempt and expired attempt leave no answer row"""
+    question_id = published_exam.exam_questions[0].question_id
+
+    response = _save(client, auth_headers_student, active_attempt.id, 999999)
+    assert response.status_code == status.HTTP_400_BAD_REQUEST
+    assert response.json()["detail"] == "Question does not belong to this exam"
+
+    response = _save(client, auth_headers_student, 999999, question_id)
+    assert response.status_code == status.HTTP_404_NOT_FOUND
+
+    active_attempt.start_time = datetime.utcnow() - timedelta(hours=2)
+    db_session.commit()
+    response = _save(client, auth_headers_student, active_attempt.id, question_id)
+    assert response.status_code == status.HTTP_400_BAD_REQUEST
+    assert response.json()["detail"] == "Attempt time has expired"
+
+    db_session.expire_all()
+    assert db_session.query(StudentAnswer).count() == 0
+    assert db_session.get(StudentAttempt, active_attempt.id).questions_answered == 0
+
+
+def test_save_answer_statement_count(
+    client, auth_headers_student, published_exam, active_attempt, assert_max_queries
+):
+    """Autosave is auth (3) + upsert + counter update"""
+    question_id = published_exam.exam_questions[0].question_id
+    _save(client, auth_headers_student, active_attempt.id, question_id)
+
+    with assert_max_queries(5):
+        response = _save(client, auth_headers_student, active_attempt.id, question_id)
+
+    assert response.status_code == status.HTTP_200_OK
+
+
 # ==================== Submit Attempt Tests ====================
 
 def test_submit_attempt_success(client, auth_headers_student, db_session, test_user):
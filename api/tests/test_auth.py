@@ -1,9 +1,21 @@
 """
 Authentication endpoint tests
 """
+import asyncio
+import threading
+import time
 import pytest
+import fakeredis
+import fakeredis.aioredis
 from fastapi import status
 
+from app.core.query_budget import capture_queries
+from app.core.security import (
+    HashingOverloadedError, PasswordHashExecutor, decode_token
+)
+from app.services.principal_cache import principal_cache
+from app.services.redis import RedisService
+
 
 class TestLogin:
     """Test login endpoint"""
@@ -187,6 +199,158 @@ class TestGetMe:
         assert response.status_code == status.HTTP_401_UNAUTHORIZED
 
 
+class TestTokenClaims:
+    """Access tokens carry authorization claims, revoked by token version"""
+    
+    @pytest.fixture
+    def fake_redis(self, client, monkeypatch):
+        service = RedisService()
+        service.redis = fakeredis.aioredis.FakeRedis(
+            server=fakeredis.FakeServer(), decode_responses=True
+        )
+        monkeypatch.setattr(principal_cache, "redis", service)
+        return service
+    
+    def _login(self, client) -> dict:
+        response = client.post(
+            "/api/v1/auth/login",
+            json={"username": "student001", "password": "password123"}
+        )
+        return {"Authorization": f"Bearer {response.json()['access_token']}"}
+    
+    def test_access_token_claims(self, client, test_user):
+        """Roles, center, trade and token version are in the access token"""
+        headers = self._login(client)
+        payload = decode_token(headers["Authorization"].split()[1])
+        
+        assert payload["sub"] == str(test_user.id)
+        assert payload["roles"] == ["student"]
+        assert payload["center_id"] == test_user.center_id
+        assert payload["trade_id"] is None
+        assert payload["ver"] == 0
+    
+    def test_claims_authorize_without_user_queries(self, client, test_user, fake_redis):
+        """With the version in Redis only the endpoint's own query runs"""
+        headers = self._login(client)
+        principal_cache.clear()
+        
+        with capture_queries() as tracker:
+            response = client.get("/api/v1/attempts/me", headers=headers)
+        
+        assert response.status_code == status.HTTP_200_OK
+        assert tracker.count == 1
+    
+    def test_role_change_revokes_token(
+        self, client, db_session, test_user, test_roles, fake_redis
+    ):
+        """Committing a role change bumps the version and rejects older tokens"""
+        headers = self._login(client)
+        assert client.get("/api/v1/attempts/me", headers=headers).status_code == 200
+        
+        test_user.roles.append(next(r for r in test_roles if r.name == "admin"))
+        db_session.commit()
+        assert test_user.token_version == 1
+        
+        # Redis is updated on the app's event loop
+        deadline = time.monotonic() + 2
+        while True:
+            response = client.get("/api/v1/attempts/me", headers=headers)
+            if response.status_code != 200 or time.monotonic() > deadline:
+                break
+            time.sleep(0.01)
+        
+        assert response.status_code == status.HTTP_401_UNAUTHORIZED
+        assert response.json()["detail"] == "Token has been revoked"
+        
+        fresh = self._login(client)
+        payload = decode_token(fresh["Authorization"].split()[1])
+        assert payload["ver"] == 1
+        assert payload["roles"] == ["admin", "student"]
+        assert client.get("/api/v1/attempts/", headers=fresh).status_code == 200
+    
+    def test_revoked_without_redis_entry(self, client, db_session, test_user):
+        """Without Redis the cached principal's version still rejects old tokens"""
+        headers = self._login(client)
+        
+        test_user.is_active = False
+        db_session.commit()
+        
+        response = client.get("/api/v1/attempts/me", headers=headers)
+        assert response.status_code == status.HTTP_401_UNAUTHORIZED
+
+
+class TestPasswordHashExecutor:
+    """Password verification runs on a bounded pool, off the event loop"""
+    
+    @pytest.mark.asyncio
+    async def test_event_loop_keeps_running(self):
+        executor = PasswordHashExecutor(max_workers=1, max_queue=4)
+        ticks = 0
+        
+        async def ticker():
+            nonlocal ticks
+            while True:
+                await asyncio.sleep(0.01)
+                ticks += 1
+        
+        task = asyncio.create_task(ticker())
+        assert await executor.run(lambda: time.sleep(0.2) or True) is True
+        task.cancel()
+        
+        assert ticks >= 5
+        assert executor.queue_depth == 0
+    
+    @pytest.mark.asyncio
+    async def test_full_queue_is_rejected(self):
+        executor = PasswordHashExecutor(max_workers=1, max_queue=1)
+        release = threading.Event()
+        
+        running = asyncio.create_task(executor.run(release.wait))
+        waiting = asyncio.create_task(executor.run(lambda: "done"))
+        await asyncio.sleep(0.05)
+        assert executor.queue_depth == 1
+        
+        with pytest.raises(HashingOverloadedError) as exc_info:
+            await executor.run(lambda: "rejected")
+        assert exc_info.value.retry_after >= 1
+        
+        release.set()
+        assert await running is True
+        assert await waiting == "done"
+        assert executor.queue_depth == 0
+    
+    @pytest.mark.asyncio
+    async def test_cancelled_waiter_leaves_queue(self):
+        executor = PasswordHashExecutor(max_workers=1, max_queue=4)
+        release = threading.Event()
+        calls = []
+        
+        running = asyncio.create_task(executor.run(release.wait))
+        waiting = asyncio.create_task(executor.run(lambda: calls.append(1)))
+        await asyncio.sleep(0.05)
+        waiting.cancel()
+        await asyncio.sleep(0)
+        
+        release.set()
+        await running
+        await asyncio.sleep(0.05)
+        
+        assert executor.queue_depth == 0
+        assert calls == []
+    
+    def test_login_returns_503_when_saturated(self, client, test_user, monkeypatch):
+        from app.core import security
+        monkeypatch.setattr(security.password_hash_executor, "max_queue", 0)
+        
+        response = client.post(
+            "/api/v1/auth/login",
+            json={"username": "student001", "password": "password123"}
+        )
+        
+        assert response.status_code == status.HTTP_503_SERVICE_UNAVAILABLE
+        assert int(response.headers["Retry-After"]) >= 1
+
+
 class TestRBAC:
     """Test role-based access control"""
     
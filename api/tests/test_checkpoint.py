@@ -0,0 +1,539 @@
+"""
+Checkpoint Service Tests
+Tests for the write-behind checkpoint buffer and group commit
+"""
+import asyncio
+import pytest
+import fakeredis
+import fakeredis.aioredis
+from datetime import datetime, timedelta
+from fastapi import HTTPException
+
+from app.api import attempts
+from app.models.exam import Exam
+from app.models.attempt import StudentAttempt, StudentAnswer, AttemptStatus
+from app.schemas.attempt import AttemptSubmit
+from app.schemas.websocket import CheckpointRequest
+from app.services.checkpoint import CheckpointService, CheckpointWriteBuffer, CheckpointJournal
+from app.core.security import create_access_token
+from app.services.principal_cache import Principal
+from app.services.redis import RedisService
+
+
+def _question_ids(exam: Exam) -> list:
+    return [eq.question_id for eq in sorted(exam.exam_questions, key=lambda eq: eq.order_number)]
+
+
+class TestCheckpointWriteBuffer:
+    """Write-behind buffer behaviour"""
+    
+    @pytest.mark.asyncio
+    async def test_coalesces_latest_answer_per_question(
+        self, db_session, async_session_factory, published_exam, active_attempt
+    ):
+        """Rapid saves for one question become one row with the latest answer"""
+        buffer = CheckpointWriteBuffer(async_session_factory, flush_interval_ms=20)
+        question_id = _question_ids(published_exam)[0]
+        
+        results = await asyncio.gather(*(
+            buffer.submit(
+                active_attempt.id,
+                CheckpointRequest(
+                    question_id=question_id,
+                    answer=[answer],
+                    time_spent_seconds=5,
+                    sequence=sequence
+                )
+            )
+            for sequence, answer in enumerate(["A", "B", "A", "B"], start=1)
+        ))
+        await buffer.close()
+        
+        assert all(r["success"] for r in results)
+        assert {r["sequence"] for r in results} == {4}
+        
+        answers = db_session.query(StudentAnswer).filter(
+            StudentAnswer.attempt_id == active_attempt.id
+        ).all()
+        assert len(answers) == 1
+        assert answers[0].answer == ["B"]
+        assert answers[0].answer_sequence == 4
+        assert answers[0].time_spent_seconds == 20
+        
+        stats = buffer.get_stats()
+        assert stats["checkpoints_received"] == 4
+        assert stats["checkpoints_coalesced"] == 3
+        assert stats["flush_count"] == 1
+        assert stats["last_batch_size"] == 1
+    
+    @pytest.mark.asyncio
+    async def test_group_commit_inserts_and_updates(
+        self, db_session, async_session_factory, published_exam, active_attempt
+    ):
+        """One flush inserts new answers, updates existing ones and counts new ones"""
+        q1, q2, q3 = _question_ids(published_exam)
+        db_session.add(StudentAnswer(
+            attempt_id=active_attempt.id,
+            question_id=q1,
+            answer=["B"],
+            time_spent_seconds=10
+        ))
+        active_attempt.questions_answered = 1
+        db_session.commit()
+        
+        buffer = CheckpointWriteBuffer(async_session_factory, flush_interval_ms=20)
+        results = await asyncio.gather(
+            buffer.submit(active_attempt.id, CheckpointRequest(
+                question_id=q1, answer=["A"], time_spent_seconds=5, sequence=2
+            )),
+            buffer.submit(active_attempt.id, CheckpointRequest(
+                question_id=q2, answer=["A"], sequence=1
+            )),
+            buffer.submit(active_attempt.id, CheckpointRequest(
+                question_id=q3, answer=["B"], is_flagged=True, sequence=1
+            )),
+        )
+        await buffer.close()
+        
+        assert all(r["success"] for r in results)
+        assert results[-1]["questions_answered"] == 3
+        assert buffer.get_stats()["flush_count"] == 1
+        
+        db_session.expire_all()
+        answers = {
+            a.question_id: a for a in db_session.query(StudentAnswer).filter(
+                StudentAnswer.attempt_id == active_attempt.id
+            )
+        }
+        assert answers[q1].answer == ["A"]
+        assert answers[q1].time_spent_seconds == 15
+        assert answers[q1].first_answered_at is not None
+        assert answers[q3].is_flagged is True
+        
+        attempt = db_session.get(StudentAttempt, active_attempt.id)
+        assert attempt.questions_answered == 3
+        assert attempt.questions_flagged == [q3]
+    
+    @pytest.mark.asyncio
+    async def test_invalid_entries_fail_without_blocking_batch(
+        self, db_session, async_session_factory, published_exam, active_attempt
+    ):
+        """Per-entry validation errors do not abort the rest of the batch"""
+        q1 = _question_ids(published_exam)[0]
+        buffer = CheckpointWriteBuffer(async_session_factory, flush_interval_ms=20)
+        
+        ok, bad_question, bad_attempt = await asyncio.gather(
+            buffer.submit(active_attempt.id, CheckpointRequest(question_id=q1, answer=["A"])),
+            buffer.submit(active_attempt.id, CheckpointRequest(question_id=99999, answer=["A"])),
+            buffer.submit(99999, CheckpointRequest(question_id=q1, answer=["A"])),
+        )
+        await buffer.close()
+        
+        assert ok["success"] is True
+        assert bad_question["error_code"] == "INVALID_QUESTION"
+        assert bad_attempt["error_code"] == "ATTEMPT_NOT_FOUND"
+        assert db_session.query(StudentAnswer).count() == 1
+    
+    @pytest.mark.asyncio
+    @pytest.mark.parametrize("native_upsert", [True, False], ids=["upsert", "fallback"])
+    async def test_results_carry_answer_id(
+        self, db_session, async_session_factory, published_exam, active_attempt, monkeypatch, native_upsert
+    ):
+        """Inserts and updates both report the stored row and keep the count right"""
+        if not native_upsert:
+            monkeypatch.setattr("app.services.checkpoint.supports_native_upsert", lambda db: False)
+        buffer = CheckpointWriteBuffer(async_session_factory, flush_interval_ms=10)
+        question_id = _question_ids(published_exam)[0]
+        
+        first = await buffer.submit(active_attempt.id, CheckpointRequest(
+            question_id=question_id, answer=["B"], time_spent_seconds=4, sequence=1
+        ))
+        second = await buffer.submit(active_attempt.id, CheckpointRequest(
+            question_id=question_id, answer=["A"], time_spent_seconds=6, sequence=2
+        ))
+        await buffer.close()
+        
+        answer = db_session.query(StudentAnswer).one()
+        assert first["answer_id"] == second["answer_id"] == answer.id
+        assert (answer.answer, answer.answer_sequence, answer.time_spent_seconds) == (["A"], 2, 10)
+        assert second["questions_answered"] == 1
+        db_session.expire_all()
+        assert db_session.get(StudentAttempt, active_attempt.id).questions_answered == 1
+    
+    @pytest.mark.asyncio
+    async def test_expired_attempt_rejected(
+        self, db_session, async_session_factory, published_exam, active_attempt
+    ):
+        """Checkpoints for an expired attempt are not written"""
+        active_attempt.start_time = datetime.utcnow() - timedelta(minutes=61)
+        db_session.commit()
+        
+        buffer = CheckpointWriteBuffer(async_session_factory, flush_interval_ms=20)
+        result = await buffer.submit(
+            active_attempt.id,
+            CheckpointRequest(question_id=_question_ids(published_exam)[0], answer=["A"])
+        )
+        await buffer.close()
+        
+        assert result["success"] is False
+        assert result["error_code"] == "TIME_EXPIRED"
+
+
+@pytest.fixture
+def fake_redis_service():
+    """RedisService backed by an in-memory fake server"""
+    service = RedisService()
+    service.redis = fakeredis.aioredis.FakeRedis(
+        server=fakeredis.FakeServer(), decode_responses=True
+    )
+    return service
+
+
+def _journal(redis_service, writer, worker_id="node-1:100", **overrides) -> CheckpointJournal:
+    return CheckpointJournal(
+        redis=redis_service,
+        writer=writer,
+        stream_prefix="checkpoints",
+        group="checkpoint-writers",
+        worker_id=worker_id,
+        retry_seconds=0.01,
+        **overrides
+    )
+
+
+class _FailingWriter(CheckpointWriteBuffer):
+    """Writer whose database is down"""
+    
+    async def write_batch(self, batch):
+        raise ConnectionError("database unavailable")
+
+
+class TestCheckpointJournal:
+    """Redis Stream journal mode"""
+    
+    @pytest.mark.asyncio
+    async def test_append_acks_before_database_write(
+        self, db_session, async_session_factory, fake_redis_service,
+        published_exam, active_attempt
+    ):
+        """Client is acked once journaled; the drain writes it later"""
+        journal = _journal(fake_redis_service, CheckpointWriteBuffer(async_session_factory))
+        q1, q2, _ = _question_ids(published_exam)
+        
+        first = await journal.append(active_attempt.id, CheckpointRequest(
+            question_id=q1, answer=["B"], time_spent_seconds=4, sequence=1
+        ))
+        await journal.append(active_attempt.id, CheckpointRequest(
+            question_id=q1, answer=["A"], time_spent_seconds=6, sequence=2
+        ))
+        await journal.append(active_attempt.id, CheckpointRequest(
+            question_id=q2, answer=["B"], sequence=1
+        ))
+        
+        assert first["success"] is True
+        assert first["journaled"] is True
+        assert 0 < first["time_remaining_seconds"] <= 3600
+        assert db_session.query(StudentAnswer).count() == 0
+        
+        assert await journal.close() == 3
+        
+        answers = {
+            a.question_id: a for a in db_session.query(StudentAnswer).filter(
+                StudentAnswer.attempt_id == active_attempt.id
+            )
+        }
+        assert answers[q1].answer == ["A"]
+        assert answers[q1].time_spent_seconds == 10
+        assert answers[q2].answer == ["B"]
+        assert await fake_redis_service.xlen(journal.stream) == 0
+    
+    @pytest.mark.asyncio
+    async def test_undrained_entries_replayed_after_database_failure(
+        self, db_session, async_session_factory, fake_redis_service,
+        published_exam, active_attempt
+    ):
+        """Entries survive a failed drain and a restart, then are written"""
+        q1 = _question_ids(published_exam)[0]
+        
+        journal = _journal(fake_redis_service, _FailingWriter(async_session_factory))
+        result = await journal.append(active_attempt.id, CheckpointRequest(
+            question_id=q1, answer=["A"], sequence=1
+        ))
+        assert result["success"] is True
+        
+        assert await journal.close() == 0
+        assert (await journal.get_stats())["drain_errors"] >= 1
+        assert await fake_redis_service.xlen(journal.stream) == 1
+        assert db_session.query(StudentAnswer).count() == 0
+        
+        # The worker restarts under a new pid; its old stream is still owned
+        restarted = _journal(
+            fake_redis_service, CheckpointWriteBuffer(async_session_factory), "node-1:101"
+        )
+        assert await restarted.adopt_orphans() == 0
+        
+        # Once the old owner key lapses the stream is adopted and removed
+        await fake_redis_service.redis.delete(f"{journal.stream}:owner")
+        assert await restarted.adopt_orphans() == 1
+        
+        answer = db_session.query(StudentAnswer).one()
+        assert answer.answer == ["A"]
+        assert not await fake_redis_service.redis.exists(journal.stream)
+    
+    @pytest.mark.asyncio
+    async def test_submitted_attempt_seen_after_cache_ttl(
+        self, db_session, async_session_factory, fake_redis_service,
+        published_exam, active_attempt
+    ):
+        """A submit on another worker stops journaling once the cached state expires"""
+        journal = _journal(
+            fake_redis_service, CheckpointWriteBuffer(async_session_factory),
+            attempt_ttl_seconds=0
+        )
+        checkpoint = CheckpointRequest(question_id=_question_ids(published_exam)[0], answer=["A"])
+        assert (await journal.append(active_attempt.id, checkpoint))["success"] is True
+        
+        active_attempt.status = AttemptStatus.SUBMITTED
+        db_session.commit()
+        
+        result = await journal.append(active_attempt.id, checkpoint)
+        assert result["error_code"] == "ATTEMPT_NOT_ACTIVE"
+        await journal.close()
+    
+    @pytest.mark.asyncio
+    async def test_rejects_inactive_attempt_without_journaling(
+        self, db_session, async_session_factory, fake_redis_service,
+        published_exam, active_attempt
+    ):
+        """Attempts that cannot take answers are refused up front"""
+        active_attempt.status = AttemptStatus.SUBMITTED
+        db_session.commit()
+        
+        journal = _journal(fake_redis_service, CheckpointWriteBuffer(async_session_factory))
+        result = await journal.append(active_attempt.id, CheckpointRequest(
+            question_id=_question_ids(published_exam)[0], answer=["A"]
+        ))
+        
+        assert result["error_code"] == "ATTEMPT_NOT_ACTIVE"
+        assert await fake_redis_service.xlen(journal.stream) == 0
+    
+    @pytest.mark.asyncio
+    async def test_writes_through_when_redis_unavailable(
+        self, db_session, async_session_factory, published_exam, active_attempt
+    ):
+        """Without Redis the checkpoint is group-committed directly"""
+        writer = CheckpointWriteBuffer(async_session_factory, flush_interval_ms=10)
+        journal = _journal(RedisService(), writer)
+        
+        result = await journal.append(active_attempt.id, CheckpointRequest(
+            question_id=_question_ids(published_exam)[0], answer=["A"]
+        ))
+        await writer.close()
+        
+        assert result["success"] is True
+        assert "journaled" not in result
+        assert db_session.query(StudentAnswer).count() == 1
+        assert (await journal.get_stats())["write_through"] == 1
+
+
+class TestJournaledSubmit:
+    """Submit waits for checkpoints journaled on any worker"""
+    
+    @staticmethod
+    async def _submit(session_factory, attempt: StudentAttempt):
+        student = Principal(id=attempt.student_id, is_active=True, role_names=["student"])
+        async with session_factory() as db:
+            return await attempts.submit_attempt(attempt.id, AttemptSubmit(confirm=True), db, student)
+    
+    @pytest.mark.asyncio
+    async def test_answer_journaled_on_socket_worker_is_graded(
+        self, db_session, async_session_factory, fake_redis_service,
+        published_exam, active_attempt, monkeypatch
+    ):
+        """The HTTP submit lands on a worker that does not hold the journal entry"""
+        q1 = _question_ids(published_exam)[0]
+        socket_worker = _journal(
+            fake_redis_service, CheckpointWriteBuffer(async_session_factory), "node-a:1"
+        )
+        await socket_worker.append(active_attempt.id, CheckpointRequest(question_id=q1, answer=["A"]))
+        socket_worker._drainer_task.cancel()
+        
+        http_worker = _journal(
+            fake_redis_service, CheckpointWriteBuffer(async_session_factory), "node-b:1"
+        )
+        monkeypatch.setattr(attempts, "checkpoint_service", CheckpointService(journal=http_worker))
+        
+        async def drain_later():
+            await asyncio.sleep(0.1)
+            await socket_worker.drain()
+        
+        drainer = asyncio.create_task(drain_later())
+        result = await self._submit(async_session_factory, active_attempt)
+        await drainer
+        
+        assert result.marks_obtained == 1.0
+        answer = db_session.query(StudentAnswer).filter_by(attempt_id=active_attempt.id).one()
+        assert answer.answer == ["A"]
+    
+    @pytest.mark.asyncio
+    async def test_submit_refused_while_journal_cannot_drain(
+        self, db_session, async_session_factory, fake_redis_service,
+        published_exam, active_attempt, monkeypatch
+    ):
+        """The database is down for the journal: submit asks the client to retry"""
+        stalled = _journal(fake_redis_service, _FailingWriter(async_session_factory), "node-a:1")
+        await stalled.append(
+            active_attempt.id, CheckpointRequest(question_id=_question_ids(published_exam)[0], answer=["A"])
+        )
+        await stalled.close()
+        monkeypatch.setattr(attempts, "checkpoint_service", CheckpointService(journal=stalled))
+        monkeypatch.setattr(attempts.settings, "CHECKPOINT_JOURNAL_SUBMIT_WAIT_SECONDS", 0)
+        
+        with pytest.raises(HTTPException) as exc:
+            await self._submit(async_session_factory, active_attempt)
+        
+        assert exc.value.status_code == 503
+        assert "Retry-After" in exc.value.headers
+        db_session.expire_all()
+        assert active_attempt.status == AttemptStatus.IN_PROGRESS
+
+
+class TestBatchCheckpoint:
+    """batch_checkpoint message (offline queue replay)"""
+    
+    @pytest.mark.asyncio
+    async def test_process_batch_reports_per_question_results(
+        self, db_session, async_session_factory, published_exam, active_attempt
+    ):
+        """All answers land in one transaction with one result per question"""
+        q1, q2, _ = _question_ids(published_exam)
+        service = CheckpointService()
+        
+        async with async_session_factory() as db:
+            result = await service.process_batch(db, active_attempt.id, [
+                CheckpointRequest(question_id=q1, answer=["B"], time_spent_seconds=3, sequence=1),
+                CheckpointRequest(question_id=q2, answer=["A"], sequence=1),
+                CheckpointRequest(question_id=99999, answer=["A"], sequence=1),
+                CheckpointRequest(question_id=q1, answer=["A"], time_spent_seconds=2, sequence=2),
+            ])
+        
+        assert result["success"] is True
+        assert result["saved_count"] == 2
+        assert result["time_remaining_seconds"] > 0
+        by_question = {item["question_id"]: item for item in result["results"]}
+        assert by_question[q1] == {"question_id": q1, "success": True, "sequence": 2}
+        assert by_question[99999]["error_code"] == "INVALID_QUESTION"
+        
+        answers = {
+            a.question_id: a for a in db_session.query(StudentAnswer).filter(
+                StudentAnswer.attempt_id == active_attempt.id
+            )
+        }
+        assert answers[q1].answer == ["A"]
+        assert answers[q1].time_spent_seconds == 5
+        db_session.expire_all()
+        assert db_session.get(StudentAttempt, active_attempt.id).questions_answered == 2
+    
+    @pytest.mark.asyncio
+    async def test_process_batch_rejects_submitted_attempt(
+        self, db_session, async_session_factory, published_exam, active_attempt
+    ):
+        """Attempt state is checked once and applies to every answer"""
+        active_attempt.status = AttemptStatus.SUBMITTED
+        db_session.commit()
+        
+        async with async_session_factory() as db:
+            result = await CheckpointService().process_batch(
+                db,
+                active_attempt.id,
+                [CheckpointRequest(question_id=q, answer=["A"]) for q in _question_ids(published_exam)]
+            )
+        
+        assert result["saved_count"] == 0
+        assert {item["error_code"] for item in result["results"]} == {"ATTEMPT_NOT_ACTIVE"}
+        assert db_session.query(StudentAnswer).count() == 0
+    
+    @pytest.mark.asyncio
+    async def test_process_batch_supersedes_buffered_answer(
+        self, db_session, async_session_factory, published_exam, active_attempt
+    ):
+        """A replay joins the write buffer instead of racing the pending flush"""
+        q1, q2, _ = _question_ids(published_exam)
+        buffer = CheckpointWriteBuffer(async_session_factory, flush_interval_ms=1000)
+        service = CheckpointService(write_buffer=buffer)
+        stale = asyncio.create_task(buffer.submit(
+            active_attempt.id, CheckpointRequest(question_id=q1, answer=["B"], sequence=1)
+        ))
+        await asyncio.sleep(0)
+        
+        async with async_session_factory() as db:
+            replay = asyncio.create_task(service.process_batch(db, active_attempt.id, [
+                CheckpointRequest(question_id=q1, answer=["A"], sequence=2),
+                CheckpointRequest(question_id=q2, answer=["A"], sequence=1),
+            ]))
+            await asyncio.sleep(0)
+            assert buffer.get_pending_count() == 2
+            await buffer.flush()
+            result = await replay
+        
+        assert (await stale)["sequence"] == 2
+        assert result["saved_count"] == 2
+        answers = {a.question_id: a for a in db_session.query(StudentAnswer)}
+        assert answers[q1].answer == ["A"]
+        assert answers[q1].answer_sequence == 2
+        assert buffer.get_stats()["flush_count"] == 1
+        await buffer.close()
+    
+    @pytest.mark.asyncio
+    async def test_process_batch_appends_after_journaled_answers(
+        self, db_session, async_session_factory, fake_redis_service, published_exam, active_attempt
+    ):
+        """The replay is journaled, not written inline after a full drain"""
+        q1, q2, _ = _question_ids(published_exam)
+        writer = CheckpointWriteBuffer(async_session_factory)
+        journal = _journal(fake_redis_service, writer)
+        service = CheckpointService(write_buffer=writer, journal=journal)
+        await journal.append(active_attempt.id, CheckpointRequest(question_id=q1, answer=["B"], sequence=1))
+        journal._drainer_task.cancel()
+        
+        async with async_session_factory() as db:
+            result = await service.process_batch(db, active_attempt.id, [
+                CheckpointRequest(question_id=q1, answer=["A"], sequence=2),
+                CheckpointRequest(question_id=q2, answer=["A"], sequence=1),
+            ])
+        
+        assert result["saved_count"] == 2
+        assert db_session.query(StudentAnswer).count() == 0
+        assert await fake_redis_service.xlen(journal.stream) == 3
+        
+        await journal.close()
+        answers = {a.question_id: a for a in db_session.query(StudentAnswer)}
+        assert answers[q1].answer == ["A"]
+        assert answers[q1].answer_sequence == 2
+    
+    def test_websocket_batch_checkpoint(
+        self, client, db_session, test_user, published_exam, active_attempt
+    ):
+        """One batch_checkpoint message gets one batch_checkpoint_ack"""
+        q1, q2, q3 = _question_ids(published_exam)
+        token = create_access_token({"sub": str(test_user.id)})
+        
+        with client.websocket_connect(
+            f"/api/v1/ws/attempts/{active_attempt.id}?token={token}"
+        ) as websocket:
+            assert websocket.receive_json()["type"] == "connected"
+            
+            websocket.send_json({
+                "type": "batch_checkpoint",
+                "answers": [
+                    {"type": "checkpoint", "question_id": q, "answer": ["A"], "sequence": 1}
+                    for q in (q1, q2, q3)
+                ]
+            })
+            message = websocket.receive_json()
+        
+        assert message["type"] == "batch_checkpoint_ack"
+        assert [item["question_id"] for item in message["results"]] == [q1, q2, q3]
+        assert all(item["success"] for item in message["results"])
+        assert message["time_remaining_seconds"] > 0
+        assert db_session.query(StudentAnswer).count() == 3
@@ -0,0 +1,138 @@
+"""
+Exam Clock Tests
+Tests for the in-memory deadline index and the pushed time updates
+"""
+import asyncio
+import pytest
+from datetime import datetime, timedelta
+
+from app.api import ws_attempts
+from app.core.exam_clock import ExamClock
+from app.core.websocket import ConnectionManager
+from app.models.attempt import StudentAttempt, AttemptStatus
+
+
+def _attempt(attempt_id: int, seconds_left: float, duration_minutes: int = 60, **overrides) -> StudentAttempt:
+    """Unsaved running attempt with seconds_left until its deadline"""
+    elapsed = timedelta(minutes=duration_minutes) - timedelta(seconds=seconds_left)
+    fields = {
+        "id": attempt_id,
+        "status": AttemptStatus.IN_PROGRESS,
+        "start_time": datetime.utcnow() - elapsed,
+        "duration_minutes": duration_minutes,
+        "time_remaining_seconds": None,
+    }
+    fields.update(overrides)
+    return StudentAttempt(**fields)
+
+
+async def _connect(manager: ConnectionManager, websocket, attempt_id: int):
+    await manager.connect(
+        websocket, attempt_id=attempt_id, user_id=attempt_id, connection_id=f"c{attempt_id}"
+    )
+    return websocket
+
+
+class TestExamClock:
+    """Deadline index and ticker"""
+    
+    @pytest.mark.asyncio
+    async def test_push_reaches_connected_attempts_only(self, recording_websocket, settle):
+        manager = ConnectionManager(heartbeat_interval=3600)
+        clock = ExamClock(manager, interval_seconds=3600)
+        sockets = [await _connect(manager, recording_websocket(), attempt_id) for attempt_id in (1, 2)]
+        for attempt_id in (1, 2, 3):
+            clock.track(_attempt(attempt_id, seconds_left=600))
+        
+        assert await clock.push() == 2
+        await settle()
+        
+        for websocket in sockets:
+            update = websocket.sent[-1]
+            assert update["type"] == "time_update"
+            assert 599 <= update["time_remaining_seconds"] <= 600
+            assert update["elapsed_seconds"] == 3600 - update["time_remaining_seconds"]
+        # Attempt 3 has no socket on this node and leaves the index
+        assert clock.time_update(3) is None
+        
+        await clock.close()
+        for attempt_id in (1, 2):
+            await manager.disconnect(f"c{attempt_id}")
+    
+    @pytest.mark.asyncio
+    async def test_time_expired_sent_at_deadline(self, recording_websocket, settle):
+        manager = ConnectionManager(heartbeat_interval=3600)
+        clock = ExamClock(manager, interval_seconds=3600)
+        websocket = await _connect(manager, recording_websocket(), 1)
+        
+        clock.track(_attempt(1, seconds_left=0.1))
+        await settle(rounds=5)
+        assert not websocket.sent
+        
+        await asyncio.sleep(0.15)
+        await settle()
+        
+        final, event = websocket.sent[-2:]
+        assert final["type"] == "time_update" and final["is_expired"]
+        assert final["time_remaining_seconds"] == 0
+        assert (event["type"], event["event"]) == ("exam_event", "time_expired")
+        assert clock.time_update(1) is None
+        
+        await clock.close()
+        await manager.disconnect("c1")
+    
+    @pytest.mark.asyncio
+    async def test_paused_attempt_is_not_indexed(self):
+        clock = ExamClock(ConnectionManager(heartbeat_interval=3600))
+        
+        clock.track(_attempt(1, seconds_left=600))
+        assert clock.time_update(1) is not None
+        
+        clock.track(_attempt(1, seconds_left=600, time_remaining_seconds=900))
+        assert clock.time_update(1) is None
+        clock.track(_attempt(2, seconds_left=600, status=AttemptStatus.SUBMITTED))
+        assert clock.time_update(2) is None
+        await clock.close()
+
+
+@pytest.mark.asyncio
+async def test_relayed_forget_stops_pushes(monkeypatch, recording_websocket, settle):
+    """A state change made on another worker drops the attempt from this clock"""
+    manager = ConnectionManager(heartbeat_interval=3600)
+    clock = ExamClock(manager, interval_seconds=3600)
+    monkeypatch.setattr(ws_attempts, "exam_clock", clock)
+    monkeypatch.setattr(ws_attempts, "manager", manager)
+    websocket = await _connect(manager, recording_websocket(), 1)
+    clock.track(_attempt(1, seconds_left=600))
+    
+    await ws_attempts._relay_worker_message("worker:node-a:1", {"attempt_id": 1, "forget_clock": True})
+    
+    assert clock.time_update(1) is None
+    assert await clock.push() == 0
+    await settle()
+    assert not websocket.sent
+    await clock.close()
+    await manager.disconnect("c1")
+
+
+@pytest.mark.asyncio
+async def test_time_sync_answered_without_database(monkeypatch, recording_websocket, settle):
+    manager = ConnectionManager(heartbeat_interval=3600)
+    clock = ExamClock(manager)
+    clock.track(_attempt(1, seconds_left=120))
+    monkeypatch.setattr(ws_attempts, "exam_clock", clock)
+    monkeypatch.setattr(ws_attempts, "manager", manager)
+    websocket = await _connect(manager, recording_websocket(), 1)
+    
+    def no_database():
+        raise AssertionError("time_sync opened a database session")
+    
+    await ws_attempts._handle_time_sync(1, "c1", no_database)
+    # Queued on the connection's outbox, written by its writer task
+    assert not websocket.sent
+    await settle()
+    
+    assert [m["type"] for m in websocket.sent] == ["time_update"]
+    assert 119 <= websocket.sent[0]["time_remaining_seconds"] <= 120
+    await clock.close()
+    await manager.disconnect("c1")
@@ -0,0 +1,221 @@
+"""
+Expiry Sweeper Tests
+Tests for batched auto-submission and grading of expired attempts
+"""
+import pytest
+from datetime import datetime, timedelta
+
+from app.models.attempt import StudentAttempt, StudentAnswer, AttemptStatus
+from app.schemas.websocket import CheckpointRequest
+from app.services.checkpoint import CheckpointJournal, CheckpointService, CheckpointWriteBuffer
+from app.services.expiry import ExpirySweeper
+from app.services.redis import RedisService
+
+
+def _sweeper(
+    session_factory,
+    redis: RedisService = None,
+    worker_id: str = "node-a:1",
+    checkpoints: CheckpointService = None
+) -> ExpirySweeper:
+    return ExpirySweeper(
+        session_factory=session_factory,
+        redis=redis or RedisService(),
+        grace_seconds=0,
+        worker_id=worker_id,
+        checkpoints=checkpoints or CheckpointService()
+    )
+
+
+def _expire(db_session, attempt: StudentAttempt, seconds_ago: int = 1) -> None:
+    attempt.start_time = datetime.utcnow() - timedelta(minutes=attempt.duration_minutes, seconds=seconds_ago)
+    db_session.commit()
+
+
+def _running_attempt(db_session, attempt: StudentAttempt) -> StudentAttempt:
+    """Another in-progress attempt like `attempt`, with its full time left"""
+    other = StudentAttempt(
+        student_id=attempt.student_id,
+        exam_id=attempt.exam_id,
+        status=AttemptStatus.IN_PROGRESS,
+        start_time=datetime.utcnow(),
+        duration_minutes=attempt.duration_minutes,
+        total_marks=attempt.total_marks,
+        questions_answered=0
+    )
+    db_session.add(other)
+    db_session.commit()
+    return other
+
+
+class TestExpirySweeper:
+    """Batched submission and grading"""
+    
+    @pytest.mark.asyncio
+    async def test_sweep_submits_and_grades_expired_attempts(
+        self, db_session, async_session_factory, published_exam, active_attempt
+    ):
+        question_id = published_exam.exam_questions[0].question_id
+        db_session.add(StudentAnswer(
+            attempt_id=active_attempt.id, question_id=question_id, answer=["A"]
+        ))
+        _expire(db_session, active_attempt)
+        running = _running_attempt(db_session, active_attempt)
+        sweeper = _sweeper(async_session_factory)
+        
+        assert await sweeper.rebuild() == 2
+        assert await sweeper.sweep() == 1
+        
+        db_session.expire_all()
+        assert active_attempt.status == AttemptStatus.GRADED
+        assert active_attempt.submit_time is not None
+        assert active_attempt.marks_obtained == 1.0
+        assert running.status == AttemptStatus.IN_PROGRESS
+        assert sweeper.pending() == 1
+    
+    @pytest.mark.asyncio
+    async def test_candidate_submit_is_not_overwritten(
+        self, db_session, async_session_factory, active_attempt
+    ):
+        """An attempt submitted at the deadline is neither re-submitted nor re-graded"""
+        _expire(db_session, active_attempt)
+        sweeper = _sweeper(async_session_factory)
+        await sweeper.rebuild()
+        
+        active_attempt.status = AttemptStatus.SUBMITTED
+        db_session.commit()
+        
+        assert await sweeper.sweep() == 0
+        db_session.expire_all()
+        assert active_attempt.status == AttemptStatus.SUBMITTED
+        assert sweeper.pending() == 0
+    
+    
+    @pytest.mark.asyncio
+    async def test_frozen_attempt_is_not_submitted(
+        self, db_session, async_session_factory, active_attempt
+    ):
+        """A transferred attempt keeps its snapshot time past the original deadline"""
+        _expire(db_session, active_attempt)
+        sweeper = _sweeper(async_session_factory)
+        sweeper.schedule(active_attempt)
+        
+        active_attempt.time_remaining_seconds = 900
+        db_session.commit()
+        
+        assert await sweeper.sweep() == 0
+        assert await sweeper.rebuild() == 0
+        db_session.expire_all()
+        assert active_attempt.status == AttemptStatus.IN_PROGRESS
+        assert active_attempt.time_remaining_seconds == 900
+
+
+class _FailingWriter(CheckpointWriteBuffer):
+    """Writer whose database is down"""
+    
+    async def write_batch(self, batch):
+        raise ConnectionError("database unavailable")
+
+
+def _journal(redis: RedisService, writer: CheckpointWriteBuffer, worker_id: str) -> CheckpointJournal:
+    return CheckpointJournal(
+        redis=redis,
+        writer=writer,
+        stream_prefix="checkpoints",
+        group="checkpoint-writers",
+        worker_id=worker_id,
+        retry_seconds=0.05
+    )
+
+
+class TestExpiryJournal:
+    """Journaled checkpoints land before the attempt is submitted"""
+    
+    @pytest.mark.asyncio
+    async def test_own_journal_drained_before_submit(
+        self, db_session, async_session_factory, published_exam, active_attempt, fake_redis_service
+    ):
+        redis = fake_redis_service()
+        journal = _journal(redis, CheckpointWriteBuffer(async_session_factory), "node-a:1")
+        question_id = published_exam.exam_questions[0].question_id
+        await journal.append(active_attempt.id, CheckpointRequest(question_id=question_id, answer=["A"]))
+        journal._drainer_task.cancel()
+        
+        # Time runs out just after the checkpoint was journaled
+        _expire(db_session, active_attempt, seconds_ago=0)
+        sweeper = _sweeper(async_session_factory, checkpoints=CheckpointService(journal=journal))
+        sweeper.schedule(active_attempt)
+        
+        assert await sweeper.sweep() == 1
+        db_session.expire_all()
+        assert active_attempt.status == AttemptStatus.GRADED
+        assert active_attempt.marks_obtained == 1.0
+    
+    @pytest.mark.asyncio
+    async def test_waits_for_other_workers_journal(
+        self, db_session, async_session_factory, published_exam, active_attempt, fake_redis_service
+    ):
+        redis = fake_redis_service()
+        stalled = _journal(redis, _FailingWriter(async_session_factory), "node-b:1")
+        question_id = published_exam.exam_questions[0].question_id
+        await stalled.append(active_attempt.id, CheckpointRequest(question_id=question_id, answer=["A"]))
+        await stalled.close()
+        
+        _expire(db_session, active_attempt, seconds_ago=0)
+        own = _journal(redis, CheckpointWriteBuffer(async_session_factory), "node-a:1")
+        sweeper = _sweeper(async_session_factory, checkpoints=CheckpointService(journal=own))
+        sweeper.schedule(active_attempt)
+        
+        assert await sweeper.sweep() == 0
+        assert sweeper.pending() == 1
+        
+        # Drained elsewhere: swept on the retry
+        await redis.redis.delete(stalled.stream)
+        assert await sweeper.sweep(datetime.utcnow().timestamp() + 2) == 1
+        db_session.expire_all()
+        assert active_attempt.status == AttemptStatus.GRADED
+
+
+class TestExpiryLease:
+    """One node sweeps at a time"""
+    
+    @pytest.mark.asyncio
+    async def test_only_lease_holder_sweeps(
+        self, db_session, async_session_factory, active_attempt, fake_redis_service
+    ):
+        _expire(db_session, active_attempt)
+        leader = _sweeper(async_session_factory, fake_redis_service(), "node-a:1")
+        standby = _sweeper(async_session_factory, fake_redis_service(), "node-b:1")
+        for sweeper in (leader, standby):
+            await sweeper.rebuild()
+        
+        assert await leader._acquire_lease()
+        await standby._tick(datetime.utcnow().timestamp() + 1)
+        
+        # The standby leaves its due attempts to the lease holder
+        db_session.expire_all()
+        assert active_attempt.status == AttemptStatus.IN_PROGRESS
+        assert standby.pending() == 0
+        
+        # Taking the lease over, it reloads from the database and sweeps
+        leader._leading = True
+        await leader.close()
+        await standby._tick(datetime.utcnow().timestamp() + 1)
+        
+        db_session.expire_all()
+        assert active_attempt.status == AttemptStatus.GRADED
+    
+    @pytest.mark.asyncio
+    async def test_lease_is_renewed_by_holder_only(self, fake_redis_service):
+        first = _sweeper(None, fake_redis_service(), "node-a:1")
+        second = _sweeper(None, fake_redis_service(), "node-b:1")
+        
+        assert await first._acquire_lease()
+        assert not await second._acquire_lease()
+        assert await first._acquire_lease()
+        
+        await second._release_lease()
+        assert not await second._acquire_lease()
+        
+        await first._release_lease()
+        assert await second._acquire_lease()
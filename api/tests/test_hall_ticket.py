@@ -0,0 +1,228 @@
+"""
+Hall Ticket QR Tests
+Tests for signed hall-ticket QR payloads and the scanner login fast path
+"""
+from datetime import datetime, timedelta
+import pytest
+
+from app.core.hall_ticket import sign_hall_ticket, verify_hall_ticket
+from app.core.security import get_password_hash
+from app.models.attempt import AttemptStatus, StudentAttempt
+from app.models.user import Center, User
+
+
+@pytest.fixture
+def hall_ticket_student(db_session, test_user, published_exam):
+    """test_user with a hall ticket number and a provisioned attempt of published_exam"""
+    test_user.hall_ticket_number = "HT2025001"
+    db_session.add(StudentAttempt(
+        student_id=test_user.id,
+        exam_id=published_exam.id,
+        status=AttemptStatus.NOT_STARTED,
+        duration_minutes=published_exam.duration_minutes,
+        total_marks=published_exam.total_marks,
+        questions_answered=0
+    ))
+    db_session.commit()
+    return test_user
+
+
+def _staff_headers(client, db_session, test_roles, role_name: str, center_id: int) -> dict:
+    """Create a staff user with the role at the center and log them in"""
+    role = next(r for r in test_roles if r.name == role_name)
+    user = User(
+        email=f"{role_name}@example.com",
+        username=role_name,
+        hashed_password=get_password_hash("staff123"),
+        full_name=role_name,
+        center_id=center_id,
+        is_active=True,
+        is_verified=True
+    )
+    user.roles.append(role)
+    db_session.add(user)
+    db_session.commit()
+    
+    response = client.post(
+        "/api/v1/auth/login",
+        json={"username": role_name, "password": "staff123"}
+    )
+    return {"Authorization": f"Bearer {response.json()['access_token']}"}
+
+
+@pytest.fixture
+def auth_headers_hall_auth(client, db_session, test_roles, test_center):
+    """Get authentication headers for a hall authenticator at test_center"""
+    return _staff_headers(client, db_session, test_roles, "hall_auth", test_center.id)
+
+
+def _current_payload(hall_ticket_number: str, center_id: int, exam_id: int) -> str:
+    now = datetime.utcnow()
+    return sign_hall_ticket(
+        hall_ticket_number, exam_id, center_id, now - timedelta(minutes=5), now + timedelta(hours=1)
+    )
+
+
+class TestSignature:
+    """Payload signing and verification"""
+    
+    def test_roundtrip(self):
+        payload = _current_payload("HT2025001", 7, 1)
+        claims = verify_hall_ticket(payload)
+        
+        assert claims.hall_ticket_number == "HT2025001"
+        assert claims.exam_id == 1
+        assert claims.center_id == 7
+    
+    def test_tampered_claims_rejected(self):
+        prefix, body, signature = _current_payload("HT2025001", 7, 1).split(".")
+        forged = _current_payload("HT2025999", 7, 1).split(".")[1]
+        
+        with pytest.raises(ValueError, match="signature"):
+            verify_hall_ticket(f"{prefix}.{forged}.{signature}")
+    
+    def test_garbage_rejected(self):
+        with pytest.raises(ValueError):
+            verify_hall_ticket("not-a-hall-ticket")
+    
+    def test_validity_window(self):
+        start = datetime(2025, 3, 1, 8, 0)
+        payload = sign_hall_ticket("HT2025001", 1, 7, start, start + timedelta(hours=3))
+        
+        with pytest.raises(ValueError, match="not valid yet"):
+            verify_hall_ticket(payload, now=start - timedelta(minutes=1))
+        with pytest.raises(ValueError, match="expired"):
+            verify_hall_ticket(payload, now=start + timedelta(hours=4))
+        assert verify_hall_ticket(payload, now=start + timedelta(hours=1)).exam_id == 1
+
+
+class TestScan:
+    """POST /auth/hall-ticket-scan"""
+    
+    def test_scan_logs_candidate_in(
+        self, client, hall_ticket_student, published_exam, auth_headers_hall_auth
+    ):
+        payload = _current_payload("HT2025001", hall_ticket_student.center_id, published_exam.id)
+        
+        response = client.post(
+            "/api/v1/auth/hall-ticket-scan",
+            json={"qr_payload": payload},
+            headers=auth_headers_hall_auth
+        )
+        
+        assert response.status_code == 200
+        data = response.json()
+        assert data["user"]["id"] == hall_ticket_student.id
+        
+        me = client.get(
+            "/api/v1/auth/me",
+            headers={"Authorization": f"Bearer {data['access_token']}"}
+        )
+        assert me.status_code == 200
+    
+    def test_other_center_rejected(
+        self, client, hall_ticket_student, published_exam, auth_headers_hall_auth
+    ):
+        payload = _current_payload("HT2025001", hall_ticket_student.center_id + 1, published_exam.id)
+        
+        response = client.post(
+            "/api/v1/auth/hall-ticket-scan",
+            json={"qr_payload": payload},
+            headers=auth_headers_hall_auth
+        )
+        
+        assert response.status_code == 403
+    
+    @pytest.mark.parametrize("attempt_status", [None, AttemptStatus.SUBMITTED])
+    def test_ticket_for_no_current_exam_rejected(
+        self, client, db_session, hall_ticket_student, published_exam, auth_headers_hall_auth,
+        attempt_status
+    ):
+        exam_id = published_exam.id
+        if attempt_status is None:
+            # Signed for an exam the candidate holds no attempt of
+            exam_id += 1
+        else:
+            attempt = db_session.query(StudentAttempt).filter_by(student_id=hall_ticket_student.id).one()
+            attempt.status = attempt_status
+            db_session.commit()
+        payload = _current_payload("HT2025001", hall_ticket_student.center_id, exam_id)
+        
+        response = client.post(
+            "/api/v1/auth/hall-ticket-scan",
+            json={"qr_payload": payload},
+            headers=auth_headers_hall_auth
+        )
+        
+        assert response.status_code == 403
+    
+    def test_invalid_signature_rejected(
+        self, client, hall_ticket_student, published_exam, auth_headers_hall_auth
+    ):
+        payload = _current_payload("HT2025001", hall_ticket_student.center_id, published_exam.id)
+        
+        response = client.post(
+            "/api/v1/auth/hall-ticket-scan",
+            json={"qr_payload": payload[:-4] + "AAAA"},
+            headers=auth_headers_hall_auth
+        )
+        
+        assert response.status_code == 401
+    
+    def test_students_cannot_scan(
+        self, client, hall_ticket_student, published_exam, auth_headers_student
+    ):
+        payload = _current_payload("HT2025001", hall_ticket_student.center_id, published_exam.id)
+        
+        response = client.post(
+            "/api/v1/auth/hall-ticket-scan",
+            json={"qr_payload": payload},
+            headers=auth_headers_student
+        )
+        
+        assert response.status_code == 403
+
+
+class TestIssue:
+    """GET /auth/hall-tickets/{number}/qr"""
+    
+    def test_issue_payload_scans(
+        self, client, hall_ticket_student, published_exam, auth_headers_admin
+    ):
+        response = client.get(
+            "/api/v1/auth/hall-tickets/HT2025001/qr",
+            params={"exam_id": published_exam.id},
+            headers=auth_headers_admin
+        )
+        
+        assert response.status_code == 200
+        claims = verify_hall_ticket(response.json()["qr_payload"])
+        assert claims.exam_id == published_exam.id
+        assert claims.center_id == hall_ticket_student.center_id
+    
+    def test_issue_png(self, client, hall_ticket_student, published_exam, auth_headers_admin):
+        response = client.get(
+            "/api/v1/auth/hall-tickets/HT2025001/qr",
+            params={"exam_id": published_exam.id, "format": "png"},
+            headers=auth_headers_admin
+        )
+        
+        assert response.status_code == 200
+        assert response.headers["content-type"] == "image/png"
+        assert response.content.startswith(b"\x89PNG")
+    
+    def test_hall_in_charge_limited_to_own_center(
+        self, client, db_session, test_roles, hall_ticket_student, published_exam
+    ):
+        other_center = Center(name="Test Center 2", code="TC002", city="Pune", state="Maharashtra")
+        db_session.add(other_center)
+        db_session.commit()
+        headers = _staff_headers(client, db_session, test_roles, "hall_in_charge", other_center.id)
+        
+        response = client.get(
+            "/api/v1/auth/hall-tickets/HT2025001/qr",
+            params={"exam_id": published_exam.id},
+            headers=headers
+        )
+        
+        assert response.status_code == 403
@@ -0,0 +1,148 @@
+"""
+Prometheus Metrics Tests
+Tests for /metrics and the route, pool, WebSocket, checkpoint and pub/sub instrumentation
+"""
+import asyncio
+import pytest
+import fakeredis
+import fakeredis.aioredis
+from prometheus_client import REGISTRY
+from sqlalchemy import create_engine, text
+from sqlalchemy.pool import QueuePool
+
+from app.core.metrics import instrument_engine
+from app.core.websocket import ConnectionManager
+from app.schemas.websocket import CheckpointRequest
+from app.services.checkpoint import CheckpointWriteBuffer
+from app.services.redis import RedisService
+
+
+def _sample(name: str, **labels) -> float:
+    return REGISTRY.get_sample_value(name, labels) or 0.0
+
+
+class _FakeWebSocket:
+    """Accepts, then optionally fails every send"""
+    
+    def __init__(self, fail_sends: bool = False):
+        self.fail_sends = fail_sends
+    
+    async def accept(self):
+        pass
+    
+    async def close(self, code: int = 1000, reason: str = ""):
+        pass
+    
+    async def send_json(self, message: dict):
+        if self.fail_sends:
+            raise RuntimeError("socket gone")
+    
+    async def send_text(self, data: str):
+        if self.fail_sends:
+            raise RuntimeError("socket gone")
+
+
+def test_metrics_endpoint_exposes_route_latency(client):
+    """Latency is labelled by route template, not the raw path"""
+    route = "/api/v1/attempts/{attempt_id}"
+    before = _sample(
+        "http_request_duration_seconds_count", method="GET", route=route, status="403"
+    )
+    
+    client.get("/api/v1/attempts/12345")
+    
+    response = client.get("/metrics")
+    assert response.status_code == 200
+    assert response.headers["content-type"].startswith("text/plain")
+    assert "http_request_duration_seconds_bucket" in response.text
+    assert "/api/v1/attempts/12345" not in response.text
+    assert _sample(
+        "http_request_duration_seconds_count", method="GET", route=route, status="403"
+    ) == before + 1
+
+
+def test_pool_in_use_and_checkout_wait(tmp_path):
+    """Checkout/checkin move the gauge; every checkout is timed, also after dispose()"""
+    engine = create_engine(f"sqlite:///{tmp_path / 'pool.db'}", poolclass=QueuePool)
+    instrument_engine(engine, "test-pool")
+    
+    with engine.connect() as conn:
+        conn.execute(text("SELECT 1"))
+        assert _sample("db_pool_connections_in_use", engine="test-pool") == 1
+    assert _sample("db_pool_connections_in_use", engine="test-pool") == 0
+    
+    engine.dispose()
+    with engine.connect() as conn:
+        conn.execute(text("SELECT 1"))
+    
+    assert _sample("db_pool_checkout_wait_seconds_count", engine="test-pool") == 2
+    engine.dispose()
+
+
+@pytest.mark.asyncio
+async def test_connection_manager_counts_connections_and_send_failures():
+    """Active gauge follows connect/disconnect; a failed queued send is counted"""
+    manager = ConnectionManager(heartbeat_interval=3600)
+    active = _sample("ws_active_connections")
+    failures = _sample("ws_send_failures_total", kind="message")
+    
+    await manager.connect(_FakeWebSocket(), attempt_id=1, user_id=1, connection_id="ok")
+    await manager.connect(
+        _FakeWebSocket(fail_sends=True), attempt_id=2, user_id=2, connection_id="broken"
+    )
+    assert _sample("ws_active_connections") == active + 2
+    
+    assert await manager.send_personal_message({"type": "ping"}, "broken") is True
+    await asyncio.sleep(0)
+    assert _sample("ws_send_failures_total", kind="message") == failures + 1
+    assert _sample("ws_active_connections") == active + 1
+    
+    await manager.disconnect("ok")
+    assert _sample("ws_active_connections") == active
+
+
+@pytest.mark.asyncio
+async def test_checkpoint_flush_latency(async_session_factory, published_exam, active_attempt):
+    """Each buffer flush observes its write duration and oldest-entry lag"""
+    duration = _sample("checkpoint_flush_duration_seconds_count")
+    lag = _sample("checkpoint_flush_lag_seconds_count")
+    
+    buffer = CheckpointWriteBuffer(async_session_factory, flush_interval_ms=10)
+    result = await buffer.submit(
+        active_attempt.id,
+        CheckpointRequest(
+            question_id=published_exam.exam_questions[0].question_id,
+            answer=["A"],
+            time_spent_seconds=5,
+            sequence=1
+        )
+    )
+    await buffer.close()
+    
+    assert result["success"] is True
+    assert _sample("checkpoint_flush_duration_seconds_count") == duration + 1
+    assert _sample("checkpoint_flush_lag_seconds_count") == lag + 1
+
+
+@pytest.mark.asyncio
+async def test_pubsub_handler_lag():
+    """Publish time is stamped, measured per channel prefix and stripped for handlers"""
+    service = RedisService()
+    service.redis = fakeredis.aioredis.FakeRedis(
+        server=fakeredis.FakeServer(), decode_responses=True
+    )
+    service.pubsub = service.redis.pubsub()
+    observed = _sample("redis_pubsub_handler_lag_seconds_count", channel="attempt")
+    
+    received = asyncio.Queue()
+    
+    async def handler(channel, message):
+        await received.put(message)
+    
+    await service.subscribe("attempt:7", handler)
+    await service.publish("attempt:7", {"type": "time_update"})
+    message = await asyncio.wait_for(received.get(), timeout=2)
+    await service.disconnect()
+    
+    assert message == {"type": "time_update"}
+    assert _sample("redis_pubsub_handler_lag_seconds_count", channel="attempt") == observed + 1
@@ -0,0 +1,153 @@
+"""
+WebSocket Presence Tests
+Tests for the cluster-wide connection registry and per-worker routing
+"""
+import asyncio
+import pytest
+
+from app.api import ws_attempts
+from app.core.websocket import ConnectionManager
+from app.services.presence import PresenceRegistry
+from app.services.redis import RedisService, get_worker_channel
+
+
+def _worker(redis: RedisService, worker_id: str) -> PresenceRegistry:
+    """Registry for one simulated worker process sharing the fake Redis"""
+    return PresenceRegistry(
+        redis=redis,
+        worker_id=worker_id,
+        flush_interval_ms=10
+    )
+
+
+async def _hlen(registry: PresenceRegistry, key: str) -> int:
+    return await registry.redis.redis.hlen(key)
+
+
+class TestPresenceRegistry:
+    """Limits, batching and liveness across workers"""
+    
+    @pytest.mark.asyncio
+    async def test_limit_spans_workers(self, fake_redis_service):
+        first = _worker(fake_redis_service(), "node-a:1")
+        second = _worker(fake_redis_service(), "node-b:1")
+        
+        assert await first.claim(user_id=1, attempt_id=10, connection_id="a", limit=2)
+        assert await second.claim(user_id=1, attempt_id=10, connection_id="b", limit=2)
+        assert not await second.claim(user_id=1, attempt_id=10, connection_id="c", limit=2)
+        
+        # Other users are unaffected
+        assert await second.claim(user_id=2, attempt_id=20, connection_id="d", limit=2)
+        assert await first.count_user_connections(1) == 2
+        
+        await first.close()
+        await second.close()
+    
+    @pytest.mark.asyncio
+    async def test_releases_are_batched(self, fake_redis_service):
+        registry = _worker(fake_redis_service(), "node-a:1")
+        await registry.claim(user_id=1, attempt_id=10, connection_id="a", limit=1)
+        
+        registry.release("a")
+        assert await _hlen(registry, "presence:user:1") == 1
+        
+        # The releasing worker already ignores it, so a reload is not refused
+        assert await registry.claim(user_id=1, attempt_id=10, connection_id="b", limit=1)
+        
+        await asyncio.sleep(0.05)
+        assert await _hlen(registry, "presence:attempt:10") == 1
+        assert await registry.get_attempt_workers(10) == {"node-a:1"}
+        await registry.close()
+    
+    @pytest.mark.asyncio
+    async def test_dead_worker_stops_counting(self, fake_redis_service):
+        crashed = _worker(fake_redis_service(), "node-a:1")
+        survivor = _worker(fake_redis_service(), "node-b:1")
+        await crashed.claim(user_id=1, attempt_id=10, connection_id="a", limit=1)
+        assert await survivor.is_attempt_connected(10)
+        
+        # Liveness key expired: the crashed worker never released its socket
+        await crashed.redis.redis.delete("presence:worker:node-a:1")
+        
+        assert not await survivor.is_attempt_connected(10)
+        assert await survivor.claim(user_id=1, attempt_id=10, connection_id="b", limit=1)
+        assert await _hlen(survivor, "presence:user:1") == 1
+        await survivor.close()
+    
+    @pytest.mark.asyncio
+    async def test_without_redis_allows_connection(self):
+        registry = PresenceRegistry(redis=RedisService(), worker_id="node-a:1")
+        
+        assert await registry.claim(user_id=1, attempt_id=10, connection_id="a", limit=1)
+        assert await registry.claim(user_id=1, attempt_id=10, connection_id="b", limit=1)
+        assert await registry.get_attempt_workers(10) == {"node-a:1"}
+        await registry.close()
+
+
+@pytest.mark.asyncio
+async def test_send_to_attempt_publishes_only_to_holders(fake_redis_service, monkeypatch):
+    """Workers without a socket of the attempt are not sent its messages"""
+    local = _worker(fake_redis_service(), "node-a:1")
+    holder = _worker(fake_redis_service(), "node-b:1")
+    bystander = _worker(fake_redis_service(), "node-c:1")
+    await holder.claim(user_id=1, attempt_id=10, connection_id="x", limit=3)
+    await bystander.claim(user_id=2, attempt_id=20, connection_id="y", limit=3)
+    
+    published = []
+    
+    async def publish(channel, message):
+        published.append((channel, message))
+        return 1
+    
+    monkeypatch.setattr(ws_attempts, "presence_registry", local)
+    monkeypatch.setattr(ws_attempts, "manager", ConnectionManager(heartbeat_interval=3600))
+    monkeypatch.setattr(ws_attempts.redis_service, "publish", publish)
+    
+    await ws_attempts.send_to_attempt({"type": "notification"}, 10)
+    
+    assert [channel for channel, _ in published] == [get_worker_channel("node-b:1")]
+    assert published[0][1]["message"] == {"type": "notification"}
+    for registry in (local, holder, bystander):
+        await registry.close()
+
+
+@pytest.mark.asyncio
+async def test_forget_clock_reaches_holders(fake_redis_service, monkeypatch):
+    """A submit on one worker stops time pushes on the worker holding the socket"""
+    local = _worker(fake_redis_service(), "node-a:1")
+    holder = _worker(fake_redis_service(), "node-b:1")
+    await holder.claim(user_id=1, attempt_id=10, connection_id="x", limit=3)
+    
+    published = []
+    
+    async def publish(channel, message):
+        published.append((channel, message))
+        return 1
+    
+    monkeypatch.setattr(ws_attempts, "presence_registry", local)
+    monkeypatch.setattr(ws_attempts.redis_service, "publish", publish)
+    
+    await ws_attempts.forget_attempt_clock(10)
+    
+    assert published == [(get_worker_channel("node-b:1"), {"attempt_id": 10, "forget_clock": True})]
+    for registry in (local, holder):
+        await registry.close()
+
+
+@pytest.mark.asyncio
+async def test_relay_honours_excluded_connection(monkeypatch, recording_websocket):
+    manager = ConnectionManager(heartbeat_interval=3600)
+    monkeypatch.setattr(ws_attempts, "manager", manager)
+    tabs = {"a": recording_websocket(), "b": recording_websocket()}
+    for connection_id, websocket in tabs.items():
+        await manager.connect(websocket, attempt_id=1, user_id=1, connection_id=connection_id)
+    
+    await ws_attempts._relay_worker_message(
+        get_worker_channel("node-a:1"),
+        {"attempt_id": 1, "exclude_connection": "a", "message": {"type": "notification"}}
+    )
+    await asyncio.sleep(0.01)
+    
+    assert (len(tabs["a"].sent), len(tabs["b"].sent)) == (0, 1)
+    for connection_id in tabs:
+        await manager.disconnect(connection_id)
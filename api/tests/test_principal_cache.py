@@ -0,0 +1,184 @@
+"""
+Principal Cache Tests
+Tests for the LRU + Redis principal cache and its invalidation
+"""
+import asyncio
+import pytest
+
+from app.core.query_budget import capture_queries, track_queries
+from app.core.security import create_access_token
+from app.services.principal_cache import PrincipalCache, get_principal_key, principal_cache
+from app.services.redis import RedisService
+
+
+class TestLookupTiers:
+    """Local LRU, then Redis, then the database"""
+    
+    @pytest.mark.asyncio
+    async def test_database_then_local(self, async_session_factory, test_user, fake_redis_service):
+        cache = PrincipalCache(redis=fake_redis_service())
+        
+        async with async_session_factory() as db:
+            with track_queries() as tracker:
+                first = await cache.get(db, test_user.id)
+                second = await cache.get(db, test_user.id)
+        
+        assert tracker.count == 1
+        assert first == second
+        assert first.role_names == ("student",)
+        assert first.center_id == test_user.center_id
+        assert first.is_active is True
+    
+    @pytest.mark.asyncio
+    async def test_other_node_reads_redis(self, async_session_factory, test_user, fake_redis_service):
+        node_a = PrincipalCache(redis=fake_redis_service())
+        node_b = PrincipalCache(redis=fake_redis_service())
+        
+        async with async_session_factory() as db:
+            loaded = await node_a.get(db, test_user.id)
+            with track_queries() as tracker:
+                shared = await node_b.get(db, test_user.id)
+        
+        assert tracker.count == 0
+        assert shared == loaded
+    
+    @pytest.mark.asyncio
+    async def test_unknown_user_is_not_cached(self, async_session_factory, db_session, fake_redis_service):
+        redis = fake_redis_service()
+        cache = PrincipalCache(redis=redis)
+        
+        async with async_session_factory() as db:
+            assert await cache.get(db, 999) is None
+        
+        assert await redis.get(get_principal_key(999)) is None
+    
+    @pytest.mark.asyncio
+    async def test_lru_evicts_least_recently_used(self, async_session_factory, test_user, test_admin):
+        cache = PrincipalCache(redis=RedisService(), max_size=1)
+        
+        async with async_session_factory() as db:
+            await cache.get(db, test_user.id)
+            await cache.get(db, test_admin.id)
+            with track_queries() as tracker:
+                await cache.get(db, test_user.id)
+        
+        assert tracker.count == 1
+
+
+class TestInvalidation:
+    """Committed user and role changes drop cached principals"""
+    
+    @pytest.mark.asyncio
+    async def test_commit_drops_changed_user(self, async_session_factory, db_session, test_user):
+        principal_cache.clear()
+        async with async_session_factory() as db:
+            assert (await principal_cache.get(db, test_user.id)).is_active is True
+            
+            test_user.is_active = False
+            db_session.commit()
+            
+            assert (await principal_cache.get(db, test_user.id)).is_active is False
+    
+    @pytest.mark.asyncio
+    async def test_role_assignment_drops_user(
+        self, async_session_factory, db_session, test_user, test_roles
+    ):
+        principal_cache.clear()
+        admin_role = next(r for r in test_roles if r.name == "admin")
+        async with async_session_factory() as db:
+            assert not (await principal_cache.get(db, test_user.id)).has_role("admin")
+            
+            test_user.roles.append(admin_role)
+            db_session.commit()
+            
+            assert (await principal_cache.get(db, test_user.id)).has_role("admin")
+    
+    @pytest.mark.asyncio
+    async def test_rollback_keeps_entry(self, async_session_factory, db_session, test_user):
+        principal_cache.clear()
+        user_id = test_user.id
+        async with async_session_factory() as db:
+            cached = await principal_cache.get(db, user_id)
+            
+            test_user.is_active = False
+            db_session.flush()
+            db_session.rollback()
+            
+            with track_queries() as tracker:
+                assert await principal_cache.get(db, user_id) is cached
+        
+        assert tracker.count == 0
+    
+    @pytest.mark.asyncio
+    async def test_invalidation_reaches_other_nodes(
+        self, async_session_factory, test_user, fake_redis_service
+    ):
+        node_a = PrincipalCache(redis=fake_redis_service())
+        node_b = PrincipalCache(redis=fake_redis_service())
+        await node_b.start()
+        
+        async with async_session_factory() as db:
+            await node_b.get(db, test_user.id)
+            await node_a.invalidate([test_user.id])
+            
+            for _ in range(100):
+                if test_user.id not in node_b._entries:
+                    break
+                await asyncio.sleep(0.01)
+            
+            assert test_user.id not in node_b._entries
+            assert await node_a.redis.get(get_principal_key(test_user.id)) is None
+        
+        await node_b.redis.disconnect()
+    
+    @pytest.mark.asyncio
+    async def test_lookup_racing_invalidation_is_not_stored(
+        self, async_session_factory, test_user
+    ):
+        cache = PrincipalCache(redis=RedisService())
+        
+        class _RacingSession:
+            """Commits a change elsewhere while the lookup reads the database"""
+            def __init__(self, db):
+                self.db = db
+            
+            async def execute(self, statement):
+                result = await self.db.execute(statement)
+                cache.drop_local([test_user.id])
+                return result
+        
+        async with async_session_factory() as db:
+            assert await cache.get(_RacingSession(db), test_user.id) is not None
+        
+        assert test_user.id not in cache._entries
+
+
+class TestDependencies:
+    """Authenticated endpoints resolve the principal from the cache"""
+    
+    def test_warm_cache_skips_user_queries(self, client, auth_headers_student):
+        principal_cache.clear()
+        with capture_queries() as cold:
+            client.get("/api/v1/attempts/me", headers=auth_headers_student)
+        with capture_queries() as warm:
+            response = client.get("/api/v1/attempts/me", headers=auth_headers_student)
+        
+        assert response.status_code == 200
+        assert warm.count == cold.count - 1
+    
+    def test_deactivation_applies_to_next_request(self, client, db_session, test_user):
+        headers = {"Authorization": f"Bearer {create_access_token({'sub': str(test_user.id)})}"}
+        response = client.get("/api/v1/attempts/me", headers=headers)
+        assert response.status_code == 200
+        
+        test_user.is_active = False
+        db_session.commit()
+        
+        response = client.get("/api/v1/attempts/me", headers=headers)
+        assert response.status_code == 403
+        assert response.json()["detail"] == "Inactive user"
+    
+    def test_role_checker_uses_cached_roles(self, client, auth_headers_student):
+        response = client.get("/api/v1/attempts/", headers=auth_headers_student)
+        
+        assert response.status_code == 403
@@ -0,0 +1,198 @@
+"""
+Attempt Provisioning Tests
+Tests for pre-created attempts and their single-UPDATE start and begin
+"""
+import pytest
+from types import SimpleNamespace
+from fastapi import HTTPException
+from sqlalchemy import select
+
+from app.api import attempts
+from app.core.exam_clock import ExamClock
+from app.core.websocket import ConnectionManager
+from app.models.attempt import StudentAttempt, AttemptStatus
+from app.models.exam import ExamStatus
+from app.models.user import User, Center
+from app.schemas.attempt import AttemptProvision, AttemptStart
+from app.services.expiry import ExpirySweeper
+from app.services.principal_cache import Principal
+
+
+ADMIN = Principal(id=0, is_active=True, role_names=["admin"])
+
+
+def _student(db_session, role, center_id, trade_id, username, is_active=True) -> User:
+    user = User(
+        email=f"{username}@example.com",
+        username=username,
+        hashed_password="x",
+        full_name=username,
+        center_id=center_id,
+        trade_id=trade_id,
+        is_active=is_active
+    )
+    user.roles.append(role)
+    db_session.add(user)
+    db_session.commit()
+    return user
+
+
+@pytest.fixture
+def candidates(db_session, test_roles, test_center, test_user, published_exam):
+    """test_user plus one more candidate, and students who are not candidates"""
+    student_role = next(r for r in test_roles if r.name == "student")
+    other_center = Center(name="Test Center 2", code="TC002", city="Pune", state="Maharashtra")
+    db_session.add(other_center)
+    test_user.trade_id = published_exam.trade_id
+    db_session.commit()
+    
+    trade_id = published_exam.trade_id
+    second = _student(db_session, student_role, test_center.id, trade_id, "student002")
+    _student(db_session, student_role, other_center.id, trade_id, "elsewhere")
+    _student(db_session, student_role, test_center.id, None, "other_trade")
+    _student(db_session, student_role, test_center.id, trade_id, "inactive", is_active=False)
+    return [test_user, second]
+
+
+@pytest.fixture(autouse=True)
+def fresh_deadline_indexes(monkeypatch, async_session_factory):
+    monkeypatch.setattr(attempts, "exam_clock", ExamClock(ConnectionManager(heartbeat_interval=3600)))
+    monkeypatch.setattr(attempts, "expiry_sweeper", ExpirySweeper(session_factory=async_session_factory))
+
+
+async def _provision(session_factory, exam_id: int, center_id: int, principal: Principal = ADMIN):
+    async with session_factory() as db:
+        return await attempts.provision_attempts(
+            AttemptProvision(exam_id=exam_id, center_id=center_id), db, principal
+        )
+
+
+def _principal(user: User) -> Principal:
+    return Principal(id=user.id, is_active=True, role_names=["student"], center_id=user.center_id)
+
+
+class TestProvisionAttempts:
+    """Bulk creation of NOT_STARTED attempts"""
+    
+    @pytest.mark.asyncio
+    async def test_creates_attempts_for_candidates_only(
+        self, db_session, async_session_factory, test_center, published_exam, candidates
+    ):
+        result = await _provision(async_session_factory, published_exam.id, test_center.id)
+        
+        assert (result.candidates, result.created) == (2, 2)
+        provisioned = db_session.scalars(select(StudentAttempt)).all()
+        assert {a.student_id for a in provisioned} == {c.id for c in candidates}
+        assert all(a.status == AttemptStatus.NOT_STARTED for a in provisioned)
+        assert all(a.duration_minutes == published_exam.duration_minutes for a in provisioned)
+        assert len({a.encryption_salt for a in provisioned}) == 2
+    
+    @pytest.mark.asyncio
+    async def test_provisioning_again_only_adds_newcomers(
+        self, db_session, async_session_factory, test_roles, test_center, published_exam, candidates
+    ):
+        await _provision(async_session_factory, published_exam.id, test_center.id)
+        student_role = next(r for r in test_roles if r.name == "student")
+        _student(db_session, student_role, test_center.id, published_exam.trade_id, "late")
+        
+        result = await _provision(async_session_factory, published_exam.id, test_center.id)
+        
+        assert (result.candidates, result.created) == (3, 1)
+        assert len(db_session.scalars(select(StudentAttempt)).all()) == 3
+    
+    @pytest.mark.asyncio
+    async def test_hall_in_charge_limited_to_own_center(
+        self, async_session_factory, test_center, published_exam
+    ):
+        hall_in_charge = Principal(
+            id=0, is_active=True, role_names=["hall_in_charge"], center_id=test_center.id + 1
+        )
+        
+        with pytest.raises(HTTPException) as exc:
+            await _provision(async_session_factory, published_exam.id, test_center.id, hall_in_charge)
+        assert exc.value.status_code == 403
+
+
+class TestProvisionedStart:
+    """Start and begin as one conditional UPDATE"""
+    
+    @pytest.mark.asyncio
+    async def test_start_takes_over_provisioned_attempt(
+        self, db_session, async_session_factory, test_center, published_exam, candidates
+    ):
+        await _provision(async_session_factory, published_exam.id, test_center.id)
+        student = candidates[0]
+        provisioned = db_session.scalar(select(StudentAttempt).where(StudentAttempt.student_id == student.id))
+        request = SimpleNamespace(client=SimpleNamespace(host="10.0.0.7"))
+        start = AttemptStart(exam_id=published_exam.id, workstation_id="WS-01")
+        
+        async with async_session_factory() as db:
+            started = await attempts.start_attempt(start, request, db, _principal(student))
+        
+        assert started.id == provisioned.id
+        assert started.status == AttemptStatus.IN_PROGRESS
+        assert started.encryption_salt == provisioned.encryption_salt
+        assert started.initial_workstation_id == "WS-01"
+        assert attempts.exam_clock.time_update(started.id) is not None
+        assert attempts.expiry_sweeper.pending() == 1
+        
+        # A second start finds nothing to take over and is refused by the full path
+        with pytest.raises(HTTPException) as exc:
+            async with async_session_factory() as db:
+                await attempts.start_attempt(start, request, db, _principal(student))
+        assert exc.value.status_code == 400
+        await attempts.exam_clock.close()
+    
+    @pytest.mark.asyncio
+    async def test_start_without_update_returning_keeps_one_attempt(
+        self, db_session, async_session_factory, test_center, published_exam, candidates, monkeypatch
+    ):
+        await _provision(async_session_factory, published_exam.id, test_center.id)
+        student = candidates[0]
+        provisioned = db_session.scalar(select(StudentAttempt).where(StudentAttempt.student_id == student.id))
+        request = SimpleNamespace(client=SimpleNamespace(host="10.0.0.7"))
+        start = AttemptStart(exam_id=published_exam.id, workstation_id="WS-01")
+        
+        async with async_session_factory() as db:
+            monkeypatch.setattr(db.bind.dialect, "update_returning", False)
+            started = await attempts.start_attempt(start, request, db, _principal(student))
+        
+        assert started.id == provisioned.id
+        assert started.status == AttemptStatus.IN_PROGRESS
+        assert started.initial_workstation_id == "WS-01"
+        mine = db_session.scalars(select(StudentAttempt).where(StudentAttempt.student_id == student.id)).all()
+        assert len(mine) == 1
+        await attempts.exam_clock.close()
+    
+    @pytest.mark.asyncio
+    async def test_begin_provisioned_attempt(
+        self, db_session, async_session_factory, test_center, published_exam, candidates
+    ):
+        await _provision(async_session_factory, published_exam.id, test_center.id)
+        student = candidates[0]
+        provisioned = db_session.scalar(select(StudentAttempt).where(StudentAttempt.student_id == student.id))
+        
+        async with async_session_factory() as db:
+            begun = await attempts.begin_attempt(provisioned.id, db, _principal(student))
+        
+        assert begun.status == AttemptStatus.IN_PROGRESS
+        assert begun.start_time is not None
+        assert 3590 <= begun.time_remaining_seconds <= 3600
+        await attempts.exam_clock.close()
+    
+    @pytest.mark.asyncio
+    async def test_begin_refused_when_exam_unavailable(
+        self, db_session, async_session_factory, test_center, published_exam, candidates
+    ):
+        await _provision(async_session_factory, published_exam.id, test_center.id)
+        student = candidates[0]
+        provisioned = db_session.scalar(select(StudentAttempt).where(StudentAttempt.student_id == student.id))
+        published_exam.status = ExamStatus.COMPLETED
+        db_session.commit()
+        
+        with pytest.raises(HTTPException) as exc:
+            async with async_session_factory() as db:
+                await attempts.begin_attempt(provisioned.id, db, _principal(student))
+        assert exc.value.status_code == 400
+        db_session.expire_all()
+        assert provisioned.status == AttemptStatus.NOT_STARTED
@@ -0,0 +1,148 @@
+"""
+Query Budget Tests
+Tests for per-request statement counting, N+1 detection and endpoint query budgets
+"""
+import logging
+import pytest
+from datetime import datetime
+from fastapi.testclient import TestClient
+from starlette.applications import Starlette
+from starlette.responses import PlainTextResponse
+from starlette.routing import Route
+from sqlalchemy import create_engine, text
+
+from app.core.query_budget import (
+    QueryBudgetMiddleware, capture_queries, statement_shape, track_queries
+)
+from app.models.exam import Exam, ExamStatus
+from app.models.attempt import StudentAttempt, AttemptStatus
+
+# Statement counting is engine-agnostic; an in-memory database keeps it isolated
+engine = create_engine("sqlite://")
+
+
+def _add_attempts(db_session, student_id: int, count: int) -> None:
+    """One submitted attempt per freshly created exam"""
+    for i in range(count):
+        exam = Exam(
+            title=f"Budget Exam {i}",
+            trade_id=1,
+            duration_minutes=60,
+            total_marks=10.0,
+            passing_marks=4.0,
+            total_questions=1,
+            status=ExamStatus.PUBLISHED
+        )
+        db_session.add(exam)
+        db_session.commit()
+        db_session.add(StudentAttempt(
+            student_id=student_id,
+            exam_id=exam.id,
+            status=AttemptStatus.SUBMITTED,
+            start_time=datetime.utcnow(),
+            duration_minutes=60,
+            total_marks=10.0
+        ))
+    db_session.commit()
+
+
+class TestStatementShape:
+    """Normalization of SQL text into comparable shapes"""
+    
+    def test_expanded_in_lists_share_a_shape(self):
+        one = statement_shape("SELECT * FROM exams WHERE exams.id IN (?)")
+        three = statement_shape("SELECT *\n  FROM exams WHERE exams.id IN (?, ?, ?)")
+        assert one == three
+    
+    def test_literals_are_normalized(self):
+        assert statement_shape("SELECT 1 WHERE name = 'a'") == statement_shape(
+            "SELECT 2 WHERE name = 'bb'"
+        )
+
+
+class TestTracking:
+    """Context-scoped and global statement counting"""
+    
+    def test_track_queries_counts_current_context(self):
+        with track_queries() as tracker:
+            with engine.connect() as conn:
+                for _ in range(3):
+                    conn.execute(text("SELECT 1"))
+        
+        assert tracker.count == 3
+        assert tracker.repeated() == [("SELECT ?", 3)]
+    
+    def test_statements_are_normalized_when_reported(self):
+        with track_queries() as tracker:
+            with engine.connect() as conn:
+                for i in range(3):
+                    conn.execute(text(f"SELECT {i}"))
+        
+        assert tracker.statements == {"SELECT 0": 1, "SELECT 1": 1, "SELECT 2": 1}
+        assert tracker.repeated() == [("SELECT ?", 3)]
+    
+    @pytest.mark.asyncio
+    async def test_track_queries_follows_async_sessions(self, async_session_factory):
+        with track_queries() as tracker:
+            async with async_session_factory() as db:
+                await db.execute(text("SELECT 1"))
+        
+        assert tracker.count == 1
+    
+    def test_capture_queries_stops_at_block_exit(self):
+        with capture_queries() as tracker:
+            with engine.connect() as conn:
+                conn.execute(text("SELECT 1"))
+        with engine.connect() as conn:
+            conn.execute(text("SELECT 1"))
+        
+        assert tracker.count == 1
+
+
+def test_middleware_logs_repeated_statements(caplog):
+    """A loop of identical queries is reported with its statement shape"""
+    def n_plus_one(request):
+        with engine.connect() as conn:
+            for i in range(6):
+                conn.execute(text("SELECT :id"), {"id": i})
+        return PlainTextResponse("ok")
+    
+    app = Starlette(routes=[Route("/loop", n_plus_one)])
+    app.add_middleware(QueryBudgetMiddleware, max_queries=30, repeat_threshold=5)
+    
+    with caplog.at_level(logging.WARNING, logger="app.core.query_budget"):
+        response = TestClient(app).get("/loop")
+    
+    assert response.status_code == 200
+    assert "GET /loop: repeated statements (possible N+1), 6 queries" in caplog.text
+    assert "6x SELECT ?" in caplog.text
+
+
+class TestEndpointBudgets:
+    """Listing endpoints issue a constant number of statements"""
+    
+    def test_list_my_attempts(
+        self, client, db_session, test_user, auth_headers_student, assert_max_queries
+    ):
+        """Ten attempts cost no more statements than one"""
+        _add_attempts(db_session, test_user.id, 1)
+        with capture_queries() as single:
+            client.get("/api/v1/attempts/me", headers=auth_headers_student)
+        
+        _add_attempts(db_session, test_user.id, 9)
+        with assert_max_queries(single.count):
+            response = client.get("/api/v1/attempts/me", headers=auth_headers_student)
+        
+        assert response.status_code == 200
+        assert len(response.json()) == 10
+    
+    def test_list_all_attempts(
+        self, client, db_session, test_user, auth_headers_admin, assert_max_queries
+    ):
+        """Principal lookup plus one joined listing query"""
+        _add_attempts(db_session, test_user.id, 10)
+        with assert_max_queries(2):
+            response = client.get("/api/v1/attempts/", headers=auth_headers_admin)
+        
+        assert response.status_code == 200
+        assert len(response.json()) == 10
@@ -0,0 +1,139 @@
+"""
+Query Plan Regression Tests
+Runs EXPLAIN (QUERY PLAN) for each hot-path query and fails on full table scans
+"""
+import re
+import pytest
+from sqlalchemy import select
+
+from app.models.attempt import StudentAttempt, StudentAnswer, AttemptStatus
+from app.models.exam import ExamQuestion
+from app.models.proctoring import ProctoringEvent, QuestionTiming
+
+
+def _query_plan(engine, statement) -> list:
+    """Plan lines for a statement on the test database"""
+    sql = str(statement.compile(dialect=engine.dialect, compile_kwargs={"literal_binds": True}))
+    with engine.connect() as conn:
+        if engine.dialect.name == "postgresql":
+            # Tiny test tables make a sequential scan the cheapest plan
+            conn.exec_driver_sql("SET enable_seqscan = off")
+            return [row[0] for row in conn.exec_driver_sql(f"EXPLAIN {sql}")]
+        return [row[-1] for row in conn.exec_driver_sql(f"EXPLAIN QUERY PLAN {sql}")]
+
+
+def _assert_index_scan(engine, statement, table: str, index: str) -> None:
+    plan = _query_plan(engine, statement)
+    text = "\n".join(plan)
+    
+    full_scans = [
+        line for line in plan
+        if line.startswith(f"SCAN {table}") or f"Seq Scan on {table}" in line
+    ]
+    assert not full_scans, f"Full scan of {table}:\n{text}"
+    assert index in text, f"{index} not used:\n{text}"
+
+
+HOT_QUERIES = [
+    pytest.param(
+        select(StudentAnswer).where(
+            StudentAnswer.attempt_id == 1, StudentAnswer.question_id == 2
+        ),
+        "student_answers",
+        "ix_student_answers_attempt_question",
+        id="answer-by-attempt-question",
+    ),
+    pytest.param(
+        select(StudentAnswer).where(StudentAnswer.attempt_id == 1),
+        "student_answers",
+        "ix_student_answers_attempt_question",
+        id="answers-by-attempt",
+    ),
+    pytest.param(
+        select(StudentAttempt).where(
+            StudentAttempt.student_id == 1,
+            StudentAttempt.exam_id == 2,
+            StudentAttempt.status == AttemptStatus.IN_PROGRESS
+        ),
+        "student_attempts",
+        "ix_student_attempts_student_exam_status",
+        id="attempt-by-student-exam-status",
+    ),
+    pytest.param(
+        select(ExamQuestion.question_id).where(
+            ExamQuestion.exam_id == 1, ExamQuestion.question_id.in_([2, 3])
+        ),
+        "exam_questions",
+        "ix_exam_questions_exam_question",
+        id="exam-question-membership",
+    ),
+    pytest.param(
+        select(QuestionTiming).where(
+            QuestionTiming.attempt_id == 1, QuestionTiming.question_id == 2
+        ),
+        "question_timings",
+        "ix_question_timings_unique_attempt_question",
+        id="timing-by-attempt-question",
+    ),
+    pytest.param(
+        select(ProctoringEvent)
+        .where(ProctoringEvent.attempt_id == 1)
+        .order_by(ProctoringEvent.event_timestamp),
+        "proctoring_events",
+        "ix_proctoring_events_attempt_timestamp",
+        id="events-by-attempt-in-order",
+    ),
+]
+
+
+def _attempt_page(*filters):
+    """First page of an attempt listing, newest first (as _list_attempt_page)"""
+    return (
+        select(StudentAttempt.id)
+        .where(*filters)
+        .order_by(StudentAttempt.created_at.desc(), StudentAttempt.id.desc())
+        .limit(51)
+    )
+
+
+PAGED_QUERIES = [
+    pytest.param(_attempt_page(), "ix_student_attempts_created_id", id="attempts-page"),
+    pytest.param(
+        _attempt_page(StudentAttempt.exam_id == 1),
+        "ix_student_attempts_exam_created_id",
+        id="attempts-page-by-exam",
+    ),
+    pytest.param(
+        _attempt_page(StudentAttempt.student_id == 1),
+        "ix_student_attempts_student_created_id",
+        id="attempts-page-by-student",
+    ),
+]
+
+
+@pytest.mark.parametrize("statement, table, index", HOT_QUERIES)
+def test_hot_query_uses_index(db_session, statement, table, index):
+    """Each hot lookup is an index search, never a full scan"""
+    _assert_index_scan(db_session.get_bind(), statement, table, index)
+
+
+@pytest.mark.parametrize("statement, index", PAGED_QUERIES)
+def test_listing_page_walks_index_in_order(db_session, statement, index):
+    """A page reads rows in index order and stops at the limit: no sort of the whole table"""
+    plan = _query_plan(db_session.get_bind(), statement)
+    text = "\n".join(plan)
+    
+    assert index in text, f"{index} not used:\n{text}"
+    assert not any("TEMP B-TREE" in line or re.search(r"\bSort\b", line) for line in plan), (
+        f"Listing sorted instead of read in index order:\n{text}"
+    )
+
+
+def test_full_scan_is_detected(db_session):
+    """The check itself fails on an unindexed filter"""
+    statement = select(StudentAnswer).where(StudentAnswer.time_spent_seconds > 10)
+    with pytest.raises(AssertionError, match="Full scan of student_answers"):
+        _assert_index_scan(
+            db_session.get_bind(), statement, "student_answers",
+            "ix_student_answers_attempt_question"
+        )
@@ -0,0 +1,179 @@
+"""
+Read Replica Routing Tests
+Two SQLite files stand in for the primary and the replica
+"""
+import os
+import pytest
+from datetime import datetime
+from sqlalchemy import create_engine
+from sqlalchemy.orm import sessionmaker
+from sqlalchemy.pool import NullPool
+from sqlalchemy.ext.asyncio import create_async_engine, async_sessionmaker
+from starlette.requests import Request
+
+from app.core.database import (
+    Base, ReplicaRouter, READ_CONSISTENCY_HEADER, get_async_database_url,
+    get_async_read_db, replica_router
+)
+from app.main import app
+from app.models.exam import Exam, ExamStatus
+from app.models.attempt import StudentAttempt, AttemptStatus
+
+REPLICA_DATABASE_URL = "sqlite:///./test_replica.db"
+
+
+@pytest.fixture
+def replica_engine():
+    """Separate database file playing the read replica"""
+    engine = create_engine(REPLICA_DATABASE_URL, connect_args={"check_same_thread": False})
+    Base.metadata.create_all(bind=engine)
+    yield engine
+    Base.metadata.drop_all(bind=engine)
+    engine.dispose()
+    if os.path.exists("./test_replica.db"):
+        os.remove("./test_replica.db")
+
+
+@pytest.fixture
+def replica_factory(replica_engine):
+    """Async session factory for the replica file"""
+    engine = create_async_engine(get_async_database_url(REPLICA_DATABASE_URL), poolclass=NullPool)
+    return async_sessionmaker(bind=engine, autoflush=False, expire_on_commit=False)
+
+
+def _request(headers: dict = None) -> Request:
+    raw = [(k.lower().encode(), v.encode()) for k, v in (headers or {}).items()]
+    return Request({"type": "http", "headers": raw})
+
+
+def _lag(seconds):
+    async def probe(db):
+        if isinstance(seconds, Exception):
+            raise seconds
+        return seconds
+    return probe
+
+
+class TestReplicaRouter:
+    """Session factory selection"""
+    
+    @pytest.mark.asyncio
+    async def test_without_replica_uses_primary(self, async_session_factory):
+        router = ReplicaRouter(primary_factory=async_session_factory)
+        assert await router.choose(_request()) is async_session_factory
+    
+    @pytest.mark.asyncio
+    async def test_fresh_replica_serves_reads(self, async_session_factory, replica_factory):
+        router = ReplicaRouter(async_session_factory, replica_factory, lag_probe=_lag(0.5))
+        
+        assert await router.choose(_request()) is replica_factory
+        assert router.get_stats()["replica_reads"] == 1
+    
+    @pytest.mark.asyncio
+    async def test_read_your_writes_header_uses_primary(self, async_session_factory, replica_factory):
+        router = ReplicaRouter(async_session_factory, replica_factory, lag_probe=_lag(0.0))
+        
+        request = _request({READ_CONSISTENCY_HEADER: "primary"})
+        assert await router.choose(request) is async_session_factory
+    
+    @pytest.mark.asyncio
+    async def test_lagging_replica_falls_back_to_primary(self, async_session_factory, replica_factory):
+        router = ReplicaRouter(
+            async_session_factory, replica_factory, max_lag_seconds=2.0, lag_probe=_lag(30.0)
+        )
+        
+        assert await router.choose(_request()) is async_session_factory
+        assert router.get_stats()["lag_fallbacks"] == 1
+        assert router.get_stats()["last_lag_seconds"] == 30.0
+    
+    @pytest.mark.asyncio
+    async def test_unmeasurable_lag_falls_back_to_primary(self, async_session_factory, replica_factory):
+        router = ReplicaRouter(
+            async_session_factory, replica_factory, lag_probe=_lag(ConnectionError("replica down"))
+        )
+        assert await router.choose(_request()) is async_session_factory
+    
+    @pytest.mark.asyncio
+    async def test_lag_measurement_is_cached(self, async_session_factory, replica_factory):
+        calls = []
+        
+        async def probe(db):
+            calls.append(1)
+            return 0.0
+        
+        router = ReplicaRouter(
+            async_session_factory, replica_factory, lag_check_seconds=60, lag_probe=probe
+        )
+        for _ in range(5):
+            await router.choose(_request())
+        
+        assert len(calls) == 1
+    
+    @pytest.mark.asyncio
+    async def test_sqlite_reports_no_lag(self, async_session_factory, replica_factory):
+        router = ReplicaRouter(async_session_factory, replica_factory)
+        assert await router.get_lag_seconds() == 0.0
+
+
+def test_list_all_attempts_reads_from_replica(
+    client, auth_headers_admin, async_session_factory, replica_engine, replica_factory, monkeypatch
+):
+    """Admin listing is served by the replica unless read-your-writes is requested"""
+    ReplicaSession = sessionmaker(bind=replica_engine)
+    replica = ReplicaSession()
+    exam = Exam(
+        title="Replica Exam",
+        trade_id=1,
+        duration_minutes=60,
+        total_marks=10.0,
+        passing_marks=4.0,
+        total_questions=1,
+        status=ExamStatus.PUBLISHED
+    )
+    replica.add(exam)
+    replica.commit()
+    replica.add(StudentAttempt(
+        student_id=1,
+        exam_id=exam.id,
+        status=AttemptStatus.IN_PROGRESS,
+        start_time=datetime.utcnow(),
+        duration_minutes=60,
+        total_marks=10.0
+    ))
+    replica.commit()
+    replica.close()
+    
+    del app.dependency_overrides[get_async_read_db]
+    monkeypatch.setattr(replica_router, "primary_factory", async_session_factory)
+    monkeypatch.setattr(replica_router, "replica_factory", replica_factory)
+    monkeypatch.setattr(replica_router, "_lag_checked_at", None)
+    
+    response = client.get("/api/v1/attempts/", headers=auth_headers_admin)
+    assert response.status_code == 200
+    assert [item["exam_title"] for item in response.json()] == ["Replica Exam"]
+    
+    response = client.get(
+        "/api/v1/attempts/",
+        headers={**auth_headers_admin, READ_CONSISTENCY_HEADER: "primary"}
+    )
+    assert response.status_code == 200
+    assert response.json() == []
+
+
+def test_result_reads_from_primary(
+    client, auth_headers_student, db_session, active_attempt,
+    async_session_factory, replica_factory, monkeypatch
+):
+    """A result is readable straight after submit even while the replica has not caught up"""
+    active_attempt.status = AttemptStatus.SUBMITTED
+    active_attempt.submit_time = datetime.utcnow()
+    db_session.commit()
+    
+    del app.dependency_overrides[get_async_read_db]
+    monkeypatch.setattr(replica_router, "primary_factory", async_session_factory)
+    monkeypatch.setattr(replica_router, "replica_factory", replica_factory)
+    monkeypatch.setattr(replica_router, "_lag_checked_at", None)
+    
+    response = client.get(f"/api/v1/attempts/{active_attempt.id}/result", headers=auth_headers_student)
+    assert response.status_code == 200
+    assert response.json()["status"] == AttemptStatus.SUBMITTED.value
@@ -0,0 +1,126 @@
+"""
+Redis Pub/Sub Tests
+Tests for the node-level, reference-counted subscription registry
+"""
+import pytest
+
+from app.api import ws_attempts
+from app.core.websocket import ConnectionManager
+from app.services.redis import (
+    get_attempt_channel,
+    get_exam_channel,
+    get_worker_channel
+)
+
+
+class _RecordingHandler:
+    """Async handler that collects (channel, message) pairs"""
+    
+    def __init__(self):
+        self.received = []
+    
+    async def __call__(self, channel: str, message: dict):
+        self.received.append((channel, message))
+
+
+class TestSubscriptionRegistry:
+    """Reference counting and fan-out"""
+    
+    @pytest.mark.asyncio
+    async def test_handlers_on_one_channel_all_receive(self, fake_redis_service, settle):
+        service = fake_redis_service()
+        first, second = _RecordingHandler(), _RecordingHandler()
+        
+        await service.subscribe("attempt:1", first)
+        await service.subscribe("attempt:1", second)
+        await service.publish("attempt:1", {"type": "notification"})
+        await settle()
+        
+        assert first.received == [("attempt:1", {"type": "notification"})]
+        assert second.received == first.received
+        await service.disconnect()
+    
+    @pytest.mark.asyncio
+    async def test_unsubscribe_keeps_other_references(self, fake_redis_service, settle):
+        service = fake_redis_service()
+        handler = _RecordingHandler()
+        
+        await service.subscribe("attempt:1", handler)
+        await service.subscribe("attempt:1", handler)
+        await service.unsubscribe("attempt:1", handler)
+        assert service.get_subscription_refs("attempt:1") == 1
+        
+        await service.publish("attempt:1", {"type": "notification"})
+        await settle()
+        assert len(handler.received) == 1
+        
+        await service.unsubscribe("attempt:1", handler)
+        assert service.get_subscription_refs("attempt:1") == 0
+        await settle()
+        assert not service.pubsub.channels
+        await service.disconnect()
+    
+    @pytest.mark.asyncio
+    async def test_pattern_is_one_redis_subscription(self, fake_redis_service, settle):
+        service = fake_redis_service()
+        handler = _RecordingHandler()
+        
+        for _ in range(100):
+            await service.psubscribe("attempt:*", handler)
+        await service.publish(get_attempt_channel(7), {"type": "time_update"})
+        await settle()
+        
+        assert list(service.pubsub.patterns) == ["attempt:*"]
+        assert service.get_subscription_refs("attempt:*", pattern=True) == 100
+        assert handler.received == [("attempt:7", {"type": "time_update"})]
+        await service.disconnect()
+    
+    @pytest.mark.asyncio
+    async def test_failed_subscribe_holds_no_reference(self, fake_redis_service, settle, monkeypatch):
+        service = fake_redis_service()
+        handler = _RecordingHandler()
+        real_subscribe = service.pubsub.subscribe
+        
+        async def unavailable(*channels):
+            raise ConnectionError("redis unavailable")
+        
+        monkeypatch.setattr(service.pubsub, "subscribe", unavailable)
+        assert await service.subscribe("attempt:1", handler) is False
+        assert service.get_subscription_refs("attempt:1") == 0
+        
+        # The next subscriber retries rather than counting on the failed one
+        monkeypatch.setattr(service.pubsub, "subscribe", real_subscribe)
+        assert await service.subscribe("attempt:1", handler) is True
+        await service.publish("attempt:1", {"type": "notification"})
+        await settle()
+        
+        assert service.get_subscription_refs("attempt:1") == 1
+        assert handler.received == [("attempt:1", {"type": "notification"})]
+        await service.disconnect()
+
+
+@pytest.mark.asyncio
+async def test_relay_fans_out_to_local_sockets(monkeypatch, recording_websocket, settle):
+    """A routed message reaches every tab of the attempt, an exam message every attempt of the exam"""
+    manager = ConnectionManager(heartbeat_interval=3600)
+    monkeypatch.setattr(ws_attempts, "manager", manager)
+    tabs = [recording_websocket(), recording_websocket()]
+    other = recording_websocket()
+    
+    await manager.connect(tabs[0], attempt_id=1, user_id=1, connection_id="a", exam_id=9)
+    await manager.connect(tabs[1], attempt_id=1, user_id=1, connection_id="b", exam_id=9)
+    await manager.connect(other, attempt_id=2, user_id=2, connection_id="c", exam_id=9)
+    
+    await ws_attempts._relay_worker_message(
+        get_worker_channel("node-a:1"), {"attempt_id": 1, "message": {"type": "notification"}}
+    )
+    await settle()
+    assert [len(ws.sent) for ws in (*tabs, other)] == [1, 1, 0]
+    
+    await ws_attempts._relay_exam_message(get_exam_channel(9), {"type": "exam_event"})
+    await settle()
+    assert [len(ws.sent) for ws in (*tabs, other)] == [2, 2, 1]
+    
+    for connection_id in ("a", "b", "c"):
+        await manager.disconnect(connection_id)
+    assert not manager.exam_attempts
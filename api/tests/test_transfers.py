@@ -339,6 +339,8 @@ class TestTransferApproval:
         
         # Verify WebSocket broadcasts (approved + completed)
         assert mock_connection_manager.broadcast_to_attempt.call_count == 2
+        # Frozen time: no worker keeps pushing the old deadline
+        mock_connection_manager.forget_clock.assert_awaited_once_with(test_attempt.id)
     
     @pytest.mark.asyncio
     async def test_reject_transfer_success(self, db_session, test_user, test_exam, test_attempt, test_hall_in_charge):
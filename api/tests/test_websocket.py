@@ -5,6 +5,7 @@ Tests for real-time exam attempt WebSocket functionality
 import pytest
 import json
 import asyncio
+from contextlib import asynccontextmanager
 from datetime import datetime, timedelta
 from fastapi.testclient import TestClient
 from sqlalchemy.orm import Session
@@ -13,6 +14,9 @@ from app.models.user import User
 from app.models.exam import Exam, Question, QuestionType, ExamQuestion
 from app.models.attempt import StudentAttempt, AttemptStatus, StudentAnswer
 from app.core.security import create_access_token
+from app.core.database import get_async_session_factory
+from app.core.websocket import ConnectionManager
+from app.main import app
 
 
 @pytest.fixture
@@ -493,3 +497,263 @@ def test_websocket_checkpoint_after_expiry(
         response = websocket.receive_json()
         assert response["type"] == "checkpoint_error"
         assert response["error_code"] == "TIME_EXPIRED"
+
+
+def test_websocket_holds_no_session_between_messages(
+    client: TestClient,
+    test_user: User,
+    active_attempt: StudentAttempt,
+    async_session_factory
+):
+    """Each message opens and closes its own session; idle sockets hold none"""
+    counter = {"open": 0, "opened": 0}
+    
+    @asynccontextmanager
+    async def counting_session():
+        counter["open"] += 1
+        counter["opened"] += 1
+        try:
+            async with async_session_factory() as session:
+                yield session
+        finally:
+            counter["open"] -= 1
+    
+    app.dependency_overrides[get_async_session_factory] = lambda: counting_session
+    token = create_access_token({"sub": str(test_user.id), "type": "access"})
+    
+    with client.websocket_connect(f"/api/v1/ws/attempts/{active_attempt.id}?token={token}") as websocket:
+        assert websocket.receive_json()["type"] == "connected"
+        assert counter == {"open": 0, "opened": 1}
+        
+        # Running attempts are timed from the in-memory deadline index
+        websocket.send_json({"type": "time_sync"})
+        assert websocket.receive_json()["type"] == "time_update"
+        assert counter == {"open": 0, "opened": 1}
+        
+        websocket.send_json({"type": "flag", "question_id": 1})
+        assert websocket.receive_json()["type"] == "notification"
+        assert counter == {"open": 0, "opened": 2}
+
+
+async def _drain_writers():
+    """Let connection writer tasks empty their queues"""
+    for _ in range(5):
+        await asyncio.sleep(0)
+
+
+@pytest.mark.asyncio
+async def test_heartbeat_wheel_uses_one_task_and_pings_in_batches(recording_websocket):
+    """All connections share one scheduler task; each is pinged once per interval"""
+    manager = ConnectionManager(heartbeat_interval=0.2, heartbeat_timeout=60, heartbeat_slots=4)
+    sockets = [recording_websocket() for _ in range(50)]
+    tasks_before = len(asyncio.all_tasks())
+    
+    for i, websocket in enumerate(sockets):
+        await manager.connect(websocket, attempt_id=i + 1, user_id=i + 1, connection_id=f"c{i}")
+    
+    assert len(asyncio.all_tasks()) == tasks_before + 1
+    
+    await asyncio.sleep(0.25)
+    assert all(
+        [message["type"] for message in websocket.sent] == ["ping"] for websocket in sockets
+    )
+    
+    for i in range(len(sockets)):
+        await manager.disconnect(f"c{i}")
+    await asyncio.sleep(0.1)
+    assert manager._heartbeat_task is None
+
+
+@pytest.mark.asyncio
+async def test_heartbeat_wheel_drops_stale_and_failed_connections(recording_websocket):
+    """A sweep disconnects idle connections and connections whose ping fails"""
+    manager = ConnectionManager(heartbeat_interval=0.1, heartbeat_timeout=60, heartbeat_slots=2)
+    await manager.connect(recording_websocket(), attempt_id=1, user_id=1, connection_id="idle")
+    await manager.connect(
+        recording_websocket(fail_sends=True), attempt_id=2, user_id=2, connection_id="broken"
+    )
+    await manager.connect(recording_websocket(), attempt_id=3, user_id=3, connection_id="live")
+    
+    manager.active_connections[1]["idle"].last_activity = datetime.utcnow() - timedelta(minutes=5)
+    await asyncio.sleep(0.15)
+    
+    assert set(manager.connection_to_attempt) == {"live"}
+    assert not any("idle" in slot or "broken" in slot for slot in manager._wheel)
+    
+    await manager.disconnect("live")
+
+
+@pytest.mark.asyncio
+async def test_exam_broadcast_serializes_once_and_reports_delivery(monkeypatch, recording_websocket):
+    """Every socket gets the same frame; failed sockets are counted and dropped"""
+    import app.core.websocket as websocket_module
+    
+    manager = ConnectionManager(heartbeat_interval=3600)
+    encodes = []
+    encode_frame = websocket_module.encode_frame
+    
+    def counting_encode_frame(message: dict) -> str:
+        encodes.append(message)
+        return encode_frame(message)
+    
+    monkeypatch.setattr(websocket_module, "encode_frame", counting_encode_frame)
+    sockets = [recording_websocket() for _ in range(100)]
+    broken = recording_websocket(fail_sends=True)
+    
+    for i, websocket in enumerate(sockets):
+        await manager.connect(
+            websocket, attempt_id=i + 1, user_id=i + 1, connection_id=f"c{i}", exam_id=5
+        )
+    await manager.connect(broken, attempt_id=999, user_id=999, connection_id="broken", exam_id=5)
+    
+    notice = {"type": "notification", "title": "10 minutes left"}
+    report = await manager.broadcast_to_exam(notice, 5)
+    
+    assert len(encodes) == 1
+    assert (report.targets, report.delivered, report.failed) == (101, 101, 0)
+    assert 0 <= report.p99_seconds <= report.duration_seconds
+    
+    await _drain_writers()
+    assert all(websocket.sent == [notice] for websocket in sockets)
+    assert "broken" not in manager.connection_to_attempt
+    
+    for i in range(len(sockets)):
+        await manager.disconnect(f"c{i}")
+
+
+@pytest.mark.asyncio
+async def test_center_broadcast_can_be_limited_to_one_exam(recording_websocket):
+    """Center-wide broadcasts reach the center's sockets, optionally for one exam"""
+    manager = ConnectionManager(heartbeat_interval=3600)
+    exam_a, exam_b, elsewhere = (recording_websocket() for _ in range(3))
+    for connection_id, websocket, exam_id, center_id in (
+        ("a", exam_a, 1, 7), ("b", exam_b, 2, 7), ("c", elsewhere, 1, 8)
+    ):
+        await manager.connect(
+            websocket, attempt_id=ord(connection_id), user_id=ord(connection_id),
+            connection_id=connection_id, exam_id=exam_id, center_id=center_id
+        )
+    
+    assert (await manager.broadcast_to_center({"type": "notification"}, 7)).delivered == 2
+    await _drain_writers()
+    assert (await manager.broadcast_to_center({"type": "notification"}, 7, exam_id=1)).delivered == 1
+    await _drain_writers()
+    assert [len(ws.sent) for ws in (exam_a, exam_b, elsewhere)] == [2, 1, 0]
+    
+    for connection_id in ("a", "b", "c"):
+        await manager.disconnect(connection_id)
+    assert not manager.center_attempts
+
+
+def test_broadcast_endpoints_require_staff(
+    client: TestClient,
+    auth_headers_admin,
+    auth_headers_student
+):
+    """Admins get a delivery report; candidates cannot broadcast"""
+    body = {"title": "Notice", "message": "10 minutes remaining", "severity": "warning"}
+    
+    response = client.post("/api/v1/ws/broadcast/exams/1", json=body, headers=auth_headers_admin)
+    assert response.status_code == 200
+    assert response.json()["targets"] == 0
+    
+    response = client.post("/api/v1/ws/broadcast/centers/1", json=body, headers=auth_headers_student)
+    assert response.status_code == 403
+
+
+@pytest.mark.asyncio
+async def test_stalled_socket_does_not_block_broadcasts(recording_websocket):
+    """Producers only queue: a stalled socket delays nobody else"""
+    manager = ConnectionManager(heartbeat_interval=3600)
+    stalled, healthy = recording_websocket(stalled=True), recording_websocket()
+    await manager.connect(stalled, attempt_id=1, user_id=1, connection_id="stalled", exam_id=1)
+    await manager.connect(healthy, attempt_id=2, user_id=2, connection_id="healthy", exam_id=1)
+    
+    report = await asyncio.wait_for(
+        manager.broadcast_to_exam({"type": "exam_event", "event": "paused"}, 1), timeout=1
+    )
+    await _drain_writers()
+    
+    assert report.delivered == 2
+    assert healthy.sent == [{"type": "exam_event", "event": "paused"}]
+    assert stalled.sent == []
+    
+    stalled.released.set()
+    await _drain_writers()
+    assert stalled.sent == [{"type": "exam_event", "event": "paused"}]
+    
+    for connection_id in ("stalled", "healthy"):
+        await manager.disconnect(connection_id)
+
+
+@pytest.mark.asyncio
+async def test_droppable_messages_are_coalesced(recording_websocket):
+    """Only the latest pending time update is sent; events are kept in order"""
+    manager = ConnectionManager(heartbeat_interval=3600)
+    websocket = recording_websocket(stalled=True)
+    await manager.connect(websocket, attempt_id=1, user_id=1, connection_id="c")
+    
+    await manager.send_personal_message({"type": "exam_event", "event": "first"}, "c")
+    await _drain_writers()  # Writer is now stuck on the first frame
+    for remaining in (300, 299, 298):
+        await manager.send_personal_message({"type": "time_update", "remaining": remaining}, "c")
+    await manager.send_personal_message({"type": "exam_event", "event": "second"}, "c")
+    
+    websocket.released.set()
+    await _drain_writers()
+    
+    assert websocket.sent == [
+        {"type": "exam_event", "event": "first"},
+        {"type": "time_update", "remaining": 298},
+        {"type": "exam_event", "event": "second"},
+    ]
+    await manager.disconnect("c")
+
+
+@pytest.mark.asyncio
+async def test_slow_consumer_is_evicted_on_overflow(recording_websocket):
+    """A full queue sheds droppable frames first, then evicts the connection"""
+    manager = ConnectionManager(heartbeat_interval=3600, send_queue_size=2)
+    websocket = recording_websocket(stalled=True)
+    await manager.connect(websocket, attempt_id=1, user_id=1, connection_id="slow")
+    
+    await manager.send_personal_message({"type": "exam_event", "event": "0"}, "slow")
+    await _drain_writers()
+    assert await manager.send_personal_message({"type": "time_update"}, "slow") is True
+    assert await manager.send_personal_message({"type": "exam_event", "event": "1"}, "slow") is True
+    
+    # Queue full of events: the time update was shed, now there is nothing left to shed
+    assert await manager.send_personal_message({"type": "exam_event", "event": "2"}, "slow") is True
+    assert await manager.send_personal_message({"type": "exam_event", "event": "3"}, "slow") is False
+    await _drain_writers()
+    
+    assert "slow" not in manager.connection_to_attempt
+    assert websocket.close_code == 1013
+
+
+@pytest.mark.asyncio
+async def test_lagging_consumer_is_evicted(recording_websocket):
+    """A connection whose oldest unsent frame is too old is evicted on the next send"""
+    manager = ConnectionManager(heartbeat_interval=3600, max_send_lag=0.05)
+    websocket = recording_websocket(stalled=True)
+    await manager.connect(websocket, attempt_id=1, user_id=1, connection_id="lagging")
+    
+    await manager.send_personal_message({"type": "exam_event", "event": "0"}, "lagging")
+    await asyncio.sleep(0.1)
+    
+    assert await manager.send_personal_message({"type": "exam_event", "event": "1"}, "lagging") is False
+    assert "lagging" not in manager.connection_to_attempt
+
+
+@pytest.mark.asyncio
+async def test_closing_one_tab_keeps_user_tracking(recording_websocket):
+    """The user's attempt stays tracked until its last tab disconnects"""
+    manager = ConnectionManager(heartbeat_interval=3600)
+    for connection_id in ("tab1", "tab2"):
+        await manager.connect(recording_websocket(), attempt_id=1, user_id=1, connection_id=connection_id)
+    
+    await manager.disconnect("tab1")
+    assert manager.get_active_connections_for_user(1) == ["tab2"]
+    
+    await manager.disconnect("tab2")
+    assert not manager.user_attempts
@@ -0,0 +1,130 @@
+"""
+Benchmark: concurrent request throughput, sync Session vs AsyncSession
+
+Runs both patterns on ONE event loop (one uvicorn worker equivalent):
+- sync:  `async def` handler calling a blocking `Session.execute`
+         (what every router did before get_async_db)
+- async: `async def` handler awaiting `AsyncSession.execute`
+
+Each request runs one query that takes --query-ms on the database side.
+By default it uses a throwaway SQLite file with a registered sleep()
+function; pass --database-url postgresql://... to use pg_sleep instead.
+
+Usage (from api/):
+    python ../tests/load/bench_async_db.py --requests 300 --concurrency 100
+"""
+import argparse
+import asyncio
+import os
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), "..", "..", "api"))
+
+import httpx
+from fastapi import Depends, FastAPI
+from sqlalchemy import create_engine, event, text
+from sqlalchemy.ext.asyncio import async_sessionmaker, create_async_engine
+from sqlalchemy.orm import sessionmaker
+from sqlalchemy.pool import AsyncAdaptedQueuePool
+
+from app.core.database import get_async_database_url
+
+
+def _register_sqlite_sleep(engine) -> None:
+    """Give SQLite a sleep(seconds) function so both drivers can stall server-side"""
+
+    @event.listens_for(engine, "connect")
+    def _connect(dbapi_connection, _record):
+        dbapi_connection.create_function("sleep", 1, lambda s: time.sleep(s) or 0)
+
+
+def build_app(database_url: str, query_ms: int) -> FastAPI:
+    is_sqlite = database_url.startswith("sqlite")
+    sleep_sql = text("SELECT sleep(:s)" if is_sqlite else "SELECT pg_sleep(:s)")
+    seconds = query_ms / 1000
+
+    connect_args = {"check_same_thread": False} if is_sqlite else {}
+    pool_args = {"poolclass": AsyncAdaptedQueuePool} if is_sqlite else {}
+    sync_engine = create_engine(
+        database_url, pool_size=10, max_overflow=20, connect_args=connect_args
+    )
+    async_engine = create_async_engine(
+        get_async_database_url(database_url), pool_size=10, max_overflow=20, **pool_args
+    )
+    if is_sqlite:
+        _register_sqlite_sleep(sync_engine)
+        _register_sqlite_sleep(async_engine.sync_engine)
+
+    SyncSession = sessionmaker(bind=sync_engine)
+    AsyncSession = async_sessionmaker(bind=async_engine)
+
+    def get_db():
+        db = SyncSession()
+        try:
+            yield db
+        finally:
+            db.close()
+
+    async def get_async_db():
+        async with AsyncSession() as db:
+            yield db
+
+    app = FastAPI()
+
+    @app.get("/sync")
+    async def sync_route(db=Depends(get_db)):
+        db.execute(sleep_sql, {"s": seconds})
+        db.commit()  # release the pooled connection, as the routers do
+        return {"ok": True}
+
+    @app.get("/async")
+    async def async_route(db=Depends(get_async_db)):
+        await db.execute(sleep_sql, {"s": seconds})
+        await db.commit()
+        return {"ok": True}
+
+    return app
+
+
+async def run(app: FastAPI, path: str, total: int, concurrency: int) -> float:
+    """Fire `total` requests with at most `concurrency` in flight; return req/s"""
+    semaphore = asyncio.Semaphore(concurrency)
+    transport = httpx.ASGITransport(app=app)
+
+    async with httpx.AsyncClient(transport=transport, base_url="http://bench") as client:
+        async def one():
+            async with semaphore:
+                response = await client.get(path)
+                response.raise_for_status()
+
+        started = time.perf_counter()
+        await asyncio.gather(*(one() for _ in range(total)))
+        return total / (time.perf_counter() - started)
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.split("\n")[1])
+    parser.add_argument("--database-url", default=None)
+    parser.add_argument("--requests", type=int, default=300)
+    parser.add_argument("--concurrency", type=int, default=100)
+    parser.add_argument("--query-ms", type=int, default=20)
+    args = parser.parse_args()
+
+    database_url = args.database_url
+    if database_url is None:
+        database_url = f"sqlite:///{tempfile.mkstemp(suffix='.db')[1]}"
+
+    app = build_app(database_url, args.query_ms)
+    print(
+        f"{args.requests} requests, concurrency {args.concurrency}, "
+        f"{args.query_ms} ms query, one event loop"
+    )
+    for label, path in (("sync Session ", "/sync"), ("AsyncSession ", "/async")):
+        rps = asyncio.run(run(app, path, args.requests, args.concurrency))
+        print(f"  {label}: {rps:8.1f} req/s")
+
+
+if __name__ == "__main__":
+    main()
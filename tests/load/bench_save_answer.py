@@ -0,0 +1,233 @@
+"""
+Benchmark: autosave latency, native upsert vs read-then-write
+
+--savers candidates each POST --saves answers to /attempts/{id}/answers,
+all concurrently, on the real app (one event loop, driven through ASGI).
+Runs the same workload twice:
+- upsert:   INSERT ... ON CONFLICT DO UPDATE ... RETURNING + counter delta
+- fallback: SELECT attempt, SELECT exam question, SELECT answer, write
+
+The async engine uses the production pool sizing (pool_size=10,
+max_overflow=20). By default it uses a throwaway SQLite file; pass
+--database-url postgresql://... to run against Postgres (schema is
+created, not dropped; use an empty database).
+
+Usage (from api/):
+    python ../tests/load/bench_save_answer.py --savers 2000 --saves 3
+"""
+import argparse
+import asyncio
+import logging
+import os
+import sys
+import tempfile
+import time
+from datetime import datetime
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), "..", "..", "api"))
+
+import httpx
+from sqlalchemy import create_engine, delete, insert, update
+from sqlalchemy.ext.asyncio import async_sessionmaker, create_async_engine
+from sqlalchemy.pool import AsyncAdaptedQueuePool
+
+from app.api import attempts as attempts_api
+from app.core.database import Base, get_async_database_url, get_async_db
+from app.core.security import create_access_token
+from app.main import app
+from app.models.attempt import AttemptStatus, StudentAnswer, StudentAttempt
+from app.models.exam import (
+    Exam, ExamQuestion, ExamStatus, Question, QuestionBank, QuestionType, Trade
+)
+from app.models.user import Role, User, user_roles
+
+POOL_SIZE = 10
+MAX_OVERFLOW = 20
+QUESTIONS = 5
+
+
+def seed(database_url: str, savers: int) -> tuple:
+    """Create one exam and one in-progress attempt per candidate"""
+    engine = create_engine(database_url)
+    Base.metadata.create_all(bind=engine)
+    now = datetime.utcnow()
+
+    with engine.begin() as conn:
+        trade_id = conn.execute(
+            insert(Trade).values(name="Bench", code="BENCH").returning(Trade.id)
+        ).scalar_one()
+        bank_id = conn.execute(
+            insert(QuestionBank).values(name="Bench", trade_id=trade_id).returning(QuestionBank.id)
+        ).scalar_one()
+        exam_id = conn.execute(
+            insert(Exam).values(
+                title="Bench Exam", trade_id=trade_id, duration_minutes=180,
+                total_marks=float(QUESTIONS), passing_marks=1.0, total_questions=QUESTIONS,
+                status=ExamStatus.PUBLISHED
+            ).returning(Exam.id)
+        ).scalar_one()
+
+        question_ids = []
+        for i in range(QUESTIONS):
+            question_id = conn.execute(
+                insert(Question).values(
+                    question_bank_id=bank_id, question_text=f"Q{i + 1}",
+                    question_type=QuestionType.MULTIPLE_CHOICE,
+                    options={"A": "Yes", "B": "No"}, correct_answer=["A"], marks=1.0
+                ).returning(Question.id)
+            ).scalar_one()
+            conn.execute(insert(ExamQuestion).values(
+                exam_id=exam_id, question_id=question_id, order_number=i + 1
+            ))
+            question_ids.append(question_id)
+
+        role_id = conn.execute(
+            insert(Role).values(name="student", description="Student").returning(Role.id)
+        ).scalar_one()
+        conn.execute(insert(User), [
+            {
+                "email": f"bench{i}@example.com", "username": f"bench{i}",
+                "hashed_password": "x", "full_name": f"Bench {i}",
+                "is_active": True, "is_verified": True,
+                "created_at": now, "updated_at": now,
+            }
+            for i in range(savers)
+        ])
+        user_ids = [row.id for row in conn.execute(
+            User.__table__.select().where(User.username.like("bench%")).order_by(User.id)
+        )]
+        conn.execute(
+            insert(user_roles),
+            [{"user_id": user_id, "role_id": role_id} for user_id in user_ids]
+        )
+        conn.execute(insert(StudentAttempt), [
+            {
+                "student_id": user_id, "exam_id": exam_id,
+                "status": AttemptStatus.IN_PROGRESS, "start_time": now,
+                "duration_minutes": 180, "total_marks": float(QUESTIONS),
+                "questions_answered": 0,
+            }
+            for user_id in user_ids
+        ])
+        attempts = [
+            (row.student_id, row.id) for row in conn.execute(
+                StudentAttempt.__table__.select().where(StudentAttempt.exam_id == exam_id)
+            )
+        ]
+
+    engine.dispose()
+    return attempts, question_ids
+
+
+def reset(database_url: str) -> None:
+    """Clear answers and counters between runs"""
+    engine = create_engine(database_url)
+    with engine.begin() as conn:
+        conn.execute(delete(StudentAnswer))
+        conn.execute(update(StudentAttempt).values(questions_answered=0, questions_flagged=None))
+    engine.dispose()
+
+
+async def run_mode(
+    client: httpx.AsyncClient,
+    attempts: list,
+    question_ids: list,
+    saves: int
+) -> dict:
+    latencies = []
+    errors = 0
+
+    async def autosave(user_id: int, attempt_id: int) -> None:
+        nonlocal errors
+        headers = {"Authorization": f"Bearer {create_access_token({'sub': str(user_id)})}"}
+        for i in range(saves):
+            sent = time.perf_counter()
+            response = await client.post(
+                f"/api/v1/attempts/{attempt_id}/answers",
+                json={
+                    "question_id": question_ids[i % len(question_ids)],
+                    "answer": ["A"],
+                    "time_spent_seconds": 15,
+                },
+                headers=headers
+            )
+            latencies.append(time.perf_counter() - sent)
+            if response.status_code != 200:
+                errors += 1
+
+    started = time.perf_counter()
+    await asyncio.gather(*(autosave(user_id, attempt_id) for user_id, attempt_id in attempts))
+    elapsed = time.perf_counter() - started
+
+    latencies.sort()
+    return {
+        "saves": len(latencies),
+        "errors": errors,
+        "seconds": elapsed,
+        "p50_ms": latencies[len(latencies) // 2] * 1000,
+        "p99_ms": latencies[int(len(latencies) * 0.99) - 1] * 1000,
+    }
+
+
+async def run(database_url: str, savers: int, saves: int) -> bool:
+    is_sqlite = database_url.startswith("sqlite")
+    engine = create_async_engine(
+        get_async_database_url(database_url),
+        pool_size=POOL_SIZE,
+        max_overflow=MAX_OVERFLOW,
+        pool_timeout=120,
+        **({"poolclass": AsyncAdaptedQueuePool, "connect_args": {"timeout": 60}} if is_sqlite else {}),
+    )
+    factory = async_sessionmaker(bind=engine, autoflush=False, expire_on_commit=False)
+
+    async def get_bench_db():
+        async with factory() as db:
+            yield db
+
+    app.dependency_overrides[get_async_db] = get_bench_db
+
+    attempts, question_ids = seed(database_url, savers)
+    native = attempts_api._supports_native_upsert
+    transport = httpx.ASGITransport(app=app)
+    results = {}
+
+    async with httpx.AsyncClient(transport=transport, base_url="http://bench") as client:
+        for mode in ("upsert", "fallback"):
+            attempts_api._supports_native_upsert = native if mode == "upsert" else (lambda db: False)
+            reset(database_url)
+            results[mode] = await run_mode(client, attempts, question_ids, saves)
+
+    attempts_api._supports_native_upsert = native
+    await engine.dispose()
+
+    print(f"{savers} concurrent autosavers x {saves} saves, pool {POOL_SIZE}+{MAX_OVERFLOW}")
+    for mode, r in results.items():
+        print(
+            f"  {mode:<9} {r['saves'] / r['seconds']:8.0f} saves/s   "
+            f"p50 {r['p50_ms']:8.1f} ms   p99 {r['p99_ms']:8.1f} ms   errors {r['errors']}"
+        )
+
+    ok = all(r["errors"] == 0 for r in results.values())
+    print("PASS" if ok else "FAIL")
+    return ok
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.split("\n")[1])
+    parser.add_argument("--database-url", default=None)
+    parser.add_argument("--savers", type=int, default=2000)
+    parser.add_argument("--saves", type=int, default=3)
+    args = parser.parse_args()
+
+    database_url = args.database_url
+    if database_url is None:
+        database_url = f"sqlite:///{tempfile.mkstemp(suffix='.db')[1]}"
+
+    logging.disable(logging.WARNING)
+
+    ok = asyncio.run(run(database_url, args.savers, args.saves))
+    sys.exit(0 if ok else 1)
+
+
+if __name__ == "__main__":
+    main()
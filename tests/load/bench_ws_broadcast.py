@@ -0,0 +1,146 @@
+"""
+Benchmark: exam-wide broadcast fan-out, concurrent pre-serialized vs sequential
+
+Registers --sockets simulated candidate sockets for one exam and pushes a
+"10 minutes remaining" notification to all of them --rounds times:
+- fanout:     ConnectionManager.broadcast_to_exam (serialize once, queue
+              the frame per socket; each socket's writer sends it)
+- sequential: the previous loop, send_json (encode + write) per socket,
+              one socket at a time
+
+Writes cost no I/O except for --slow-percent of sockets, which take
+--slow-ms per write (candidates on poor links). Reports delivery counts,
+time until every socket was written, p99 time until a socket was written,
+and how long the broadcasting coroutine itself was blocked.
+
+Usage (from api/):
+    python ../tests/load/bench_ws_broadcast.py --sockets 8000
+"""
+import argparse
+import asyncio
+import json
+import logging
+import os
+import random
+import sys
+import time
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), "..", "..", "api"))
+
+from app.core.websocket import ConnectionManager
+from app.schemas.websocket import create_notification
+
+
+class SimulatedWebSocket:
+    """Encodes like Starlette's send_json; slow sockets wait on every write"""
+
+    __slots__ = ("delay", "received", "received_at")
+
+    def __init__(self, delay: float):
+        self.delay = delay
+        self.received = 0
+        self.received_at = 0.0
+
+    async def accept(self):
+        pass
+
+    async def close(self, code: int = 1000, reason: str = ""):
+        pass
+
+    async def send_json(self, message: dict):
+        await self.send_text(json.dumps(message, separators=(",", ":"), ensure_ascii=False))
+
+    async def send_text(self, data: str):
+        if self.delay:
+            await asyncio.sleep(self.delay)
+        self.received += 1
+        self.received_at = time.perf_counter()
+
+
+async def sequential_broadcast(manager: ConnectionManager, message: dict, exam_id: int) -> None:
+    """The pre-fan-out broadcast: one send_json at a time"""
+    for attempt_id in list(manager.exam_attempts.get(exam_id, ())):
+        for conn_info in list(manager.active_connections.get(attempt_id, {}).values()):
+            await conn_info.websocket.send_json(message)
+            conn_info.update_last_activity()
+
+
+async def fanout_broadcast(manager: ConnectionManager, message: dict, exam_id: int) -> None:
+    await manager.broadcast_to_exam(message, exam_id)
+
+
+async def measure(broadcast, manager: ConnectionManager, sockets: list, message: dict) -> dict:
+    """Time one broadcast until every socket has been written"""
+    expected = sockets[0].received + 1
+    started = time.perf_counter()
+    await broadcast(manager, message, 1)
+    blocked = time.perf_counter() - started
+    while any(websocket.received < expected for websocket in sockets):
+        await asyncio.sleep(0.001)
+
+    latencies = sorted(websocket.received_at - started for websocket in sockets)
+    return {
+        "delivered": sum(websocket.received == expected for websocket in sockets),
+        "blocked": blocked,
+        "seconds": latencies[-1],
+        "p99": latencies[int(len(latencies) * 0.99) - 1],
+    }
+
+
+async def run(sockets: int, rounds: int, slow_percent: float, slow_ms: float) -> bool:
+    rng = random.Random(42)
+    manager = ConnectionManager(heartbeat_interval=3600, max_connections_per_user=1)
+    simulated = [
+        SimulatedWebSocket(slow_ms / 1000 if rng.random() * 100 < slow_percent else 0.0)
+        for _ in range(sockets)
+    ]
+    for i, websocket in enumerate(simulated):
+        await manager.connect(
+            websocket, attempt_id=i + 1, user_id=i + 1, connection_id=f"c{i}", exam_id=1
+        )
+
+    message = create_notification(
+        "10 minutes remaining", "Your exam ends in 10 minutes.", severity="warning"
+    )
+    results = {}
+    for mode, broadcast in (("fanout", fanout_broadcast), ("sequential", sequential_broadcast)):
+        runs = [await measure(broadcast, manager, simulated, message) for _ in range(rounds)]
+        results[mode] = {
+            "delivered": min(r["delivered"] for r in runs),
+            "blocked": sorted(r["blocked"] for r in runs)[len(runs) // 2],
+            "seconds": sorted(r["seconds"] for r in runs)[len(runs) // 2],
+            "p99": sorted(r["p99"] for r in runs)[len(runs) // 2],
+        }
+
+    print(
+        f"{sockets} sockets, {slow_percent}% slow ({slow_ms:.0f} ms/write), "
+        f"median of {rounds} broadcasts"
+    )
+    for mode, r in results.items():
+        print(
+            f"  {mode:<10} delivered {r['delivered']}/{sockets}   "
+            f"all sockets {r['seconds'] * 1000:8.1f} ms   p99 {r['p99'] * 1000:8.1f} ms   "
+            f"caller blocked {r['blocked'] * 1000:8.1f} ms"
+        )
+
+    ok = all(r["delivered"] == sockets for r in results.values())
+    print("PASS" if ok else "FAIL")
+    return ok
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.split("\n")[1])
+    parser.add_argument("--sockets", type=int, default=8000)
+    parser.add_argument("--rounds", type=int, default=5)
+    parser.add_argument("--slow-percent", type=float, default=1.0)
+    parser.add_argument("--slow-ms", type=float, default=20.0)
+    args = parser.parse_args()
+
+    logging.disable(logging.WARNING)
+
+    ok = asyncio.run(run(args.sockets, args.rounds, args.slow_percent, args.slow_ms))
+    sys.exit(0 if ok else 1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,169 @@
+"""
+Benchmark: WebSocket heartbeat CPU and memory, timer wheel vs task per socket
+
+Registers --connections simulated sockets on a ConnectionManager and lets
+heartbeats run for --intervals heartbeat intervals. Runs two schedulers:
+- wheel: ConnectionManager's single scheduler task sweeping one timer-wheel
+         slot per tick and pinging that slot as a batch
+- tasks: the previous design, one sleeping asyncio task per socket
+
+Sockets serialize each ping like a real send but do no I/O, so the numbers
+are scheduler and bookkeeping cost only. Each run is a fresh process;
+RSS is the resident-set growth from registering the sockets, CPU is
+process time over the heartbeat window. --interval shortens the heartbeat
+interval (production: 30s) to compress time; CPU per interval does not
+depend on it. Passes when the wheel delivers every ping; pings the task
+design misses are pings that fell behind the event loop.
+
+Usage (from api/):
+    python ../tests/load/bench_ws_heartbeat.py --connections 10000 50000
+"""
+import argparse
+import asyncio
+import json
+import logging
+import os
+import subprocess
+import sys
+import time
+from datetime import datetime
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), "..", "..", "api"))
+
+from app.core.websocket import ConnectionManager
+
+
+class SimulatedWebSocket:
+    """Serializes what it is sent, like a real socket, without any I/O"""
+
+    __slots__ = ("sent",)
+
+    def __init__(self):
+        self.sent = 0
+
+    async def accept(self):
+        pass
+
+    async def close(self, code: int = 1000, reason: str = ""):
+        pass
+
+    async def send_json(self, message: dict):
+        json.dumps(message)
+        self.sent += 1
+
+    async def send_text(self, data: str):
+        self.sent += 1
+
+
+class TaskPerConnectionManager(ConnectionManager):
+    """The pre-wheel scheduler: one heartbeat task per connection"""
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self._heartbeat_tasks = {}
+
+    def _ensure_heartbeat_scheduler(self) -> None:
+        pass
+
+    async def connect(self, websocket, attempt_id, user_id, connection_id) -> bool:
+        connected = await super().connect(websocket, attempt_id, user_id, connection_id)
+        self._heartbeat_tasks[connection_id] = asyncio.create_task(
+            self._heartbeat_monitor(connection_id)
+        )
+        return connected
+
+    async def _heartbeat_monitor(self, connection_id: str) -> None:
+        while True:
+            await asyncio.sleep(self.heartbeat_interval)
+            attempt_id = self.connection_to_attempt.get(connection_id)
+            conn_info = self.active_connections.get(attempt_id, {}).get(connection_id)
+            if conn_info is None:
+                break
+            idle = (datetime.utcnow() - conn_info.last_activity).total_seconds()
+            if idle > self.heartbeat_timeout:
+                await self.disconnect(connection_id)
+                break
+            await conn_info.websocket.send_json({
+                "type": "ping",
+                "timestamp": datetime.utcnow().isoformat()
+            })
+
+
+def rss_bytes() -> int:
+    with open("/proc/self/statm") as f:
+        return int(f.read().split()[1]) * os.sysconf("SC_PAGE_SIZE")
+
+
+async def measure(mode: str, connections: int, interval: float, intervals: int) -> dict:
+    manager_class = ConnectionManager if mode == "wheel" else TaskPerConnectionManager
+    manager = manager_class(
+        heartbeat_interval=interval,
+        heartbeat_timeout=3600,
+        max_connections_per_user=1
+    )
+    sockets = [SimulatedWebSocket() for _ in range(connections)]
+
+    rss_before = rss_bytes()
+    for i, websocket in enumerate(sockets):
+        await manager.connect(websocket, attempt_id=i + 1, user_id=i + 1, connection_id=f"c{i}")
+    rss_after = rss_bytes()
+
+    cpu_started = time.process_time()
+    await asyncio.sleep(interval * intervals + interval / 2)
+    cpu_seconds = time.process_time() - cpu_started
+
+    return {
+        "pings": sum(websocket.sent for websocket in sockets),
+        "tasks": len(asyncio.all_tasks()) - 1,
+        "rss_mb": (rss_after - rss_before) / 2 ** 20,
+        "cpu_per_interval": cpu_seconds / intervals,
+    }
+
+
+def run_child(args) -> None:
+    logging.disable(logging.WARNING)
+    result = asyncio.run(measure(args.mode, args.connections[0], args.interval, args.intervals))
+    print(json.dumps(result))
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.split("\n")[1])
+    parser.add_argument("--connections", type=int, nargs="+", default=[10000, 50000])
+    parser.add_argument("--interval", type=float, default=2.0)
+    parser.add_argument("--intervals", type=int, default=3)
+    parser.add_argument("--mode", choices=("wheel", "tasks"), help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.mode:
+        run_child(args)
+        return
+
+    print(f"heartbeat every {args.interval}s for {args.intervals} intervals, no socket I/O")
+    ok = True
+    for connections in args.connections:
+        for mode in ("wheel", "tasks"):
+            output = subprocess.run(
+                [
+                    sys.executable, __file__, "--mode", mode,
+                    "--connections", str(connections),
+                    "--interval", str(args.interval),
+                    "--intervals", str(args.intervals),
+                ],
+                check=True, capture_output=True, text=True
+            ).stdout
+            r = json.loads(output)
+            expected = connections * args.intervals
+            if mode == "wheel":
+                ok = ok and r["pings"] == expected
+            print(
+                f"  {connections:>6} sockets  {mode:<5}  tasks {r['tasks']:>6}   "
+                f"RSS +{r['rss_mb']:7.1f} MB   CPU {r['cpu_per_interval'] * 1000:8.1f} ms/interval   "
+                f"pings {r['pings']}/{expected}"
+            )
+
+    print("PASS" if ok else "FAIL")
+    sys.exit(0 if ok else 1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,277 @@
+"""
+Stress test: thousands of exam WebSockets against a 30-connection pool
+
+Opens --sockets concurrent attempt WebSockets on the real app (one event
+loop, driven straight through ASGI), keeps them all open, then has every
+candidate send --checkpoints answer checkpoints and wait for the ack.
+Handshakes are ramped (--connect-concurrency in flight) the way a hall
+logs in, so the connect burst does not hit the pool's checkout timeout.
+
+The async engine uses the production pool sizing (pool_size=10,
+max_overflow=20). Passes when:
+- every socket connects and every checkpoint is acked
+- no connection is checked out while all sockets sit idle
+- peak checked-out connections never exceed the pool
+
+By default it uses a throwaway SQLite file; pass --database-url
+postgresql://... to run against Postgres (schema is created, not dropped).
+
+Usage (from api/):
+    python ../tests/load/stress_ws_sessions.py --sockets 5000 --checkpoints 3
+"""
+import argparse
+import asyncio
+import json
+import logging
+import os
+import sys
+import tempfile
+import time
+from datetime import datetime
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), "..", "..", "api"))
+
+from sqlalchemy import create_engine, event, insert
+from sqlalchemy.ext.asyncio import async_sessionmaker, create_async_engine
+from sqlalchemy.pool import AsyncAdaptedQueuePool
+
+from app.core.database import Base, get_async_database_url, get_async_session_factory
+from app.core.security import create_access_token
+from app.main import app
+from app.models.attempt import AttemptStatus, StudentAttempt
+from app.models.exam import (
+    Exam, ExamQuestion, ExamStatus, Question, QuestionBank, QuestionType, Trade
+)
+from app.models.user import User
+from app.services.checkpoint import checkpoint_service
+
+POOL_SIZE = 10
+MAX_OVERFLOW = 20
+
+
+def seed(database_url: str, sockets: int) -> tuple:
+    """Create one exam and one in-progress attempt per candidate"""
+    engine = create_engine(database_url)
+    Base.metadata.create_all(bind=engine)
+    now = datetime.utcnow()
+
+    with engine.begin() as conn:
+        trade_id = conn.execute(
+            insert(Trade).values(name="Stress", code="STRESS").returning(Trade.id)
+        ).scalar_one()
+        bank_id = conn.execute(
+            insert(QuestionBank).values(name="Stress", trade_id=trade_id).returning(QuestionBank.id)
+        ).scalar_one()
+        exam_id = conn.execute(
+            insert(Exam).values(
+                title="Stress Exam", trade_id=trade_id, duration_minutes=180,
+                total_marks=3.0, passing_marks=1.0, total_questions=3,
+                status=ExamStatus.PUBLISHED
+            ).returning(Exam.id)
+        ).scalar_one()
+
+        question_ids = []
+        for i in range(3):
+            question_id = conn.execute(
+                insert(Question).values(
+                    question_bank_id=bank_id, question_text=f"Q{i + 1}",
+                    question_type=QuestionType.MULTIPLE_CHOICE,
+                    options={"A": "Yes", "B": "No"}, correct_answer=["A"], marks=1.0
+                ).returning(Question.id)
+            ).scalar_one()
+            conn.execute(insert(ExamQuestion).values(
+                exam_id=exam_id, question_id=question_id, order_number=i + 1
+            ))
+            question_ids.append(question_id)
+
+        conn.execute(insert(User), [
+            {
+                "email": f"stress{i}@example.com", "username": f"stress{i}",
+                "hashed_password": "x", "full_name": f"Stress {i}",
+                "is_active": True, "is_verified": True,
+                "created_at": now, "updated_at": now,
+            }
+            for i in range(sockets)
+        ])
+        user_ids = [row.id for row in conn.execute(
+            User.__table__.select().where(User.username.like("stress%")).order_by(User.id)
+        )]
+        conn.execute(insert(StudentAttempt), [
+            {
+                "student_id": user_id, "exam_id": exam_id,
+                "status": AttemptStatus.IN_PROGRESS, "start_time": now,
+                "duration_minutes": 180, "total_marks": 3.0, "questions_answered": 0,
+            }
+            for user_id in user_ids
+        ])
+        attempts = [
+            (row.student_id, row.id) for row in conn.execute(
+                StudentAttempt.__table__.select().where(StudentAttempt.exam_id == exam_id)
+            )
+        ]
+
+    engine.dispose()
+    return attempts, question_ids
+
+
+class Candidate:
+    """Minimal ASGI WebSocket client for one attempt"""
+
+    def __init__(self, index: int, user_id: int, attempt_id: int):
+        self.inbox: asyncio.Queue = asyncio.Queue()
+        self.outbox: asyncio.Queue = asyncio.Queue()
+        token = create_access_token({"sub": str(user_id)})
+        path = f"/api/v1/ws/attempts/{attempt_id}"
+        self.scope = {
+            "type": "websocket", "asgi": {"version": "3.0"}, "scheme": "ws",
+            "path": path, "raw_path": path.encode(), "root_path": "",
+            "query_string": f"token={token}".encode(), "headers": [],
+            "client": ("127.0.0.1", 10000 + index), "server": ("stress", 80),
+            "subprotocols": [],
+        }
+        self.task = None
+
+    async def connect(self) -> dict:
+        await self.inbox.put({"type": "websocket.connect"})
+        self.task = asyncio.create_task(app(self.scope, self.inbox.get, self.outbox.put))
+        accept = await self.outbox.get()
+        if accept["type"] != "websocket.accept":
+            raise RuntimeError(f"Rejected: {accept}")
+        return await self.receive()
+
+    async def send(self, message: dict) -> None:
+        await self.inbox.put({"type": "websocket.receive", "text": json.dumps(message)})
+
+    async def receive(self) -> dict:
+        while True:
+            event = await self.outbox.get()
+            if event["type"] != "websocket.send":
+                raise RuntimeError(f"Socket closed: {event}")
+            message = json.loads(event["text"])
+            if message.get("type") != "ping":
+                return message
+            # Answer heartbeats like the web client does
+            await self.send({"type": "pong"})
+
+    async def close(self) -> None:
+        await self.inbox.put({"type": "websocket.disconnect", "code": 1000})
+        await self.task
+
+
+async def run(
+    database_url: str,
+    sockets: int,
+    checkpoints: int,
+    connect_concurrency: int
+) -> bool:
+    is_sqlite = database_url.startswith("sqlite")
+    engine = create_async_engine(
+        get_async_database_url(database_url),
+        pool_size=POOL_SIZE,
+        max_overflow=MAX_OVERFLOW,
+        **({"poolclass": AsyncAdaptedQueuePool} if is_sqlite else {}),
+    )
+    factory = async_sessionmaker(bind=engine, autoflush=False, expire_on_commit=False)
+
+    pool_state = {"checked_out": 0, "peak": 0}
+
+    @event.listens_for(engine.sync_engine, "checkout")
+    def _checkout(*_):
+        pool_state["checked_out"] += 1
+        pool_state["peak"] = max(pool_state["peak"], pool_state["checked_out"])
+
+    @event.listens_for(engine.sync_engine, "checkin")
+    def _checkin(*_):
+        pool_state["checked_out"] -= 1
+
+    app.dependency_overrides[get_async_session_factory] = lambda: factory
+    checkpoint_service.session_factory = factory
+    if checkpoint_service.write_buffer is not None:
+        checkpoint_service.write_buffer.session_factory = factory
+
+    attempts, question_ids = seed(database_url, sockets)
+    candidates = [
+        Candidate(i, user_id, attempt_id) for i, (user_id, attempt_id) in enumerate(attempts)
+    ]
+
+    ramp = asyncio.Semaphore(connect_concurrency)
+
+    async def connect(candidate: Candidate) -> dict:
+        async with ramp:
+            return await candidate.connect()
+
+    started = time.perf_counter()
+    connected = await asyncio.gather(*(connect(c) for c in candidates))
+    connect_seconds = time.perf_counter() - started
+    ok = all(message["type"] == "connected" for message in connected)
+
+    # Every socket is open and idle: nothing may be holding a connection
+    await asyncio.sleep(0.5)
+    idle_checked_out = pool_state["checked_out"]
+
+    latencies = []
+
+    async def autosave(candidate: Candidate) -> bool:
+        for sequence in range(1, checkpoints + 1):
+            sent = time.perf_counter()
+            await candidate.send({
+                "type": "checkpoint",
+                "question_id": question_ids[sequence % len(question_ids)],
+                "answer": ["A"],
+                "time_spent_seconds": 5,
+                "sequence": sequence,
+            })
+            ack = await candidate.receive()
+            latencies.append(time.perf_counter() - sent)
+            if ack["type"] != "checkpoint_ack":
+                return False
+        return True
+
+    started = time.perf_counter()
+    acked = await asyncio.gather(*(autosave(c) for c in candidates))
+    save_seconds = time.perf_counter() - started
+    ok = ok and all(acked)
+
+    await asyncio.gather(*(c.close() for c in candidates))
+    await checkpoint_service.flush_pending()
+    await engine.dispose()
+
+    latencies.sort()
+    p50 = latencies[len(latencies) // 2] * 1000 if latencies else 0.0
+    p99 = latencies[int(len(latencies) * 0.99) - 1] * 1000 if latencies else 0.0
+
+    print(f"{sockets} sockets, {checkpoints} checkpoints each, pool {POOL_SIZE}+{MAX_OVERFLOW}")
+    print(f"  connected:              {sum(m['type'] == 'connected' for m in connected)} in {connect_seconds:.1f}s")
+    print(f"  acked checkpoints:      {len(latencies)} in {save_seconds:.1f}s")
+    print(f"  ack latency p50 / p99:  {p50:.1f} / {p99:.1f} ms")
+    print(f"  checked out while idle: {idle_checked_out}")
+    print(f"  peak checked out:       {pool_state['peak']}")
+
+    ok = ok and idle_checked_out == 0 and pool_state["peak"] <= POOL_SIZE + MAX_OVERFLOW
+    print("PASS" if ok else "FAIL")
+    return ok
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.split("\n")[1])
+    parser.add_argument("--database-url", default=None)
+    parser.add_argument("--sockets", type=int, default=5000)
+    parser.add_argument("--checkpoints", type=int, default=3)
+    parser.add_argument("--connect-concurrency", type=int, default=200)
+    args = parser.parse_args()
+
+    database_url = args.database_url
+    if database_url is None:
+        database_url = f"sqlite:///{tempfile.mkstemp(suffix='.db')[1]}"
+
+    # Redis is not running here; silence the per-socket subscribe errors
+    logging.disable(logging.ERROR)
+
+    ok = asyncio.run(run(
+        database_url, args.sockets, args.checkpoints, args.connect_concurrency
+    ))
+    sys.exit(0 if ok else 1)
+
+
+if __name__ == "__main__":
+    main()
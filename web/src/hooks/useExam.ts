@@ -36,6 +36,17 @@ export function useWebSocket(attemptId: number | null, token: string | null) {
             if (msg.time_remaining_seconds !== undefined) {
               useExamStore.getState().setTimeRemaining(msg.time_remaining_seconds);
             }
+
+            // Reconnected: apply answers saved elsewhere since our last ack
+            if (msg.resync?.complete) {
+              const store = useExamStore.getState();
+              msg.resync.answers.forEach((saved: any) => {
+                store.setAnswer(saved.question_id, saved.answer);
+                store.flagQuestion(saved.question_id, saved.is_flagged);
+              });
+            } else if (msg.resync) {
+              console.warn('[Hook] Resync incomplete, keeping local answers');
+            }
           }),
 
           websocketService.on('checkpoint_ack', (msg: WebSocketMessage) => {
@@ -223,20 +234,14 @@ export function useExamTimer() {
     };
   }, [decrementTime]);
 
-  // Sync with server periodically
+  // Sync with server once per connection; the server pushes time_update
+  // frames (and time_expired at the deadline) from then on
   useEffect(() => {
     if (!isConnected) {
       return;
     }
 
-    // Sync every 60 seconds
-    const syncInterval = window.setInterval(() => {
-      websocketService.syncTime();
-    }, 60000);
-
-    return () => {
-      clearInterval(syncInterval);
-    };
+    websocketService.syncTime();
   }, [isConnected]);
 
   // Format time as HH:MM:SS
@@ -2,24 +2,43 @@ import { useState } from 'react';
 import { useNavigate } from 'react-router-dom';
 import './LoginPage.css';
 
+const API_BASE = 'http://localhost:8000/api/v1';
+const TICKET_HEADER = 'X-Admission-Ticket';
+
+interface AdmissionStatus {
+  ticket: string;
+  position: number;
+  eta_seconds: number;
+  retry_after_seconds: number;
+}
+
+const sleep = (seconds: number) => new Promise((resolve) => setTimeout(resolve, seconds * 1000));
+
+// Retry-After header when present, else the wait the body suggests
+function retryAfter(response: Response, fallback: number): number {
+  const header = Number(response.headers.get('Retry-After'));
+  return header > 0 ? header : Math.max(1, fallback);
+}
+
 export function LoginPage() {
   const [hallTicket, setHallTicket] = useState('');
   const [dob, setDob] = useState('');
   const [securityAnswer, setSecurityAnswer] = useState('');
   const [error, setError] = useState('');
+  const [queued, setQueued] = useState<AdmissionStatus | null>(null);
   const [loading, setLoading] = useState(false);
   const navigate = useNavigate();
 
-  const handleSubmit = async (e: React.FormEvent) => {
-    e.preventDefault();
-    setError('');
-    setLoading(true);
+  // Sign in, waiting in the admission queue (429) while too many candidates log in at once
+  const requestLogin = async (): Promise<Response> => {
+    let ticket: string | null = null;
 
-    try {
-      const response = await fetch('http://localhost:8000/api/v1/auth/hall-ticket-login', {
+    for (;;) {
+      const response = await fetch(`${API_BASE}/auth/hall-ticket-login`, {
         method: 'POST',
         headers: {
           'Content-Type': 'application/json',
+          ...(ticket ? { [TICKET_HEADER]: ticket } : {}),
         },
         body: JSON.stringify({
           hall_ticket_number: hallTicket,
@@ -28,9 +47,49 @@ export function LoginPage() {
         }),
       });
 
+      if (response.status !== 429) {
+        return response;
+      }
+
+      let status: AdmissionStatus = (await response.json()).detail;
+      ticket = status.ticket || response.headers.get(TICKET_HEADER);
+      let wait = retryAfter(response, status.retry_after_seconds);
+
+      // Keep our place: poll until we are next, then retry with the ticket
+      while (ticket) {
+        setQueued(status);
+        await sleep(wait);
+        if (status.position === 0) {
+          break;
+        }
+
+        const poll = await fetch(`${API_BASE}/auth/queue/${encodeURIComponent(ticket)}`);
+        if (!poll.ok) {
+          // Expired or already admitted: queue again from the back
+          ticket = null;
+          break;
+        }
+        status = await poll.json();
+        wait = retryAfter(poll, status.retry_after_seconds);
+      }
+    }
+  };
+
+  const handleSubmit = async (e: React.FormEvent) => {
+    e.preventDefault();
+    setError('');
+    setLoading(true);
+
+    try {
+      const response = await requestLogin();
+      setQueued(null);
+
       if (!response.ok) {
         const errorData = await response.json();
-        throw new Error(errorData.detail || 'Login failed');
+        const detail = errorData.detail;
+        throw new Error(
+          (typeof detail === 'string' ? detail : detail?.message) || 'Login failed'
+        );
       }
 
       const data = await response.json();
@@ -41,7 +100,7 @@ export function LoginPage() {
       localStorage.setItem('user', JSON.stringify(data.user));
 
       // Get student's assigned exam attempt
-      const attemptsResponse = await fetch('http://localhost:8000/api/v1/attempts/me', {
+      const attemptsResponse = await fetch(`${API_BASE}/attempts/me`, {
         headers: {
           'Authorization': `Bearer ${data.access_token}`,
         },
@@ -62,6 +121,7 @@ export function LoginPage() {
     } catch (err) {
       setError(err instanceof Error ? err.message : 'An error occurred');
     } finally {
+      setQueued(null);
       setLoading(false);
     }
   };
@@ -74,6 +134,12 @@ export function LoginPage() {
         
         <form onSubmit={handleSubmit} className="login-form">
           {error && <div className="error-message">{error}</div>}
+          {queued && (
+            <div className="queue-message">
+              Many candidates are signing in. You are number {queued.position + 1} in the queue
+              (about {queued.eta_seconds}s); please keep this page open.
+            </div>
+          )}
           
           <div className="form-group">
             <label htmlFor="hallTicket">Hall Ticket Number</label>
@@ -115,7 +181,7 @@ export function LoginPage() {
           </div>
 
           <button type="submit" disabled={loading} className="login-button">
-            {loading ? 'Verifying...' : 'Start Exam'}
+            {loading ? (queued ? 'Waiting...' : 'Verifying...') : 'Start Exam'}
           </button>
         </form>
 
@@ -105,8 +105,11 @@ class BackgroundSyncService {
         inProgress: true,
       });
 
-      // Sync checkpoints one by one (to maintain order)
-      for (const checkpoint of checkpoints) {
+      // Replay the current attempt's queue in one round trip
+      const remaining = await this.syncBatch(checkpoints);
+
+      // Sync the rest one by one (to maintain order)
+      for (const checkpoint of remaining) {
         if (!offlineService.isOnline()) {
           console.log('Connection lost during sync, pausing...');
           break;
@@ -131,6 +134,59 @@ class BackgroundSyncService {
     }
   }
 
+  /**
+   * Sync the connected attempt's checkpoints with one batch message
+   * Returns the checkpoints that still need syncing individually
+   */
+  private async syncBatch(checkpoints: any[]): Promise<any[]> {
+    const attemptId = websocketService.getAttemptId();
+    if (!websocketService.isConnected() || attemptId === null) {
+      return checkpoints;
+    }
+
+    // Queue order is preserved; the server keeps the last answer per question
+    const batch = checkpoints.filter((checkpoint) => checkpoint.attemptId === attemptId);
+    const others = checkpoints.filter((checkpoint) => checkpoint.attemptId !== attemptId);
+    if (batch.length === 0) {
+      return others;
+    }
+
+    try {
+      const ack = await websocketService.sendBatchCheckpoint(
+        batch.map((checkpoint) => ({
+          type: 'checkpoint' as const,
+          question_id: checkpoint.questionId,
+          answer: checkpoint.answer,
+          is_flagged: checkpoint.isFlagged,
+          time_spent_seconds: checkpoint.timeSpentSeconds,
+          sequence: checkpoint.sequence,
+        }))
+      );
+
+      // Rejections (expired attempt, unknown question) will not succeed on retry
+      const rejected = new Set(
+        ack.results.filter((result) => !result.success).map((result) => result.question_id)
+      );
+
+      for (const checkpoint of batch) {
+        await idbService.removeCheckpointFromQueue(checkpoint.key);
+      }
+
+      const failed = batch.filter((checkpoint) => rejected.has(checkpoint.questionId)).length;
+      this.updateProgress({
+        ...this.progress,
+        synced: this.progress.synced + batch.length - failed,
+        failed: this.progress.failed + failed,
+      });
+
+      console.log(`Synced ${batch.length} checkpoints in one batch (${failed} rejected)`);
+      return others;
+    } catch (error) {
+      console.error('Batch sync failed, falling back to single checkpoints:', error);
+      return checkpoints;
+    }
+  }
+
   /**
    * Sync a single checkpoint
    */
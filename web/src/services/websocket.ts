@@ -8,6 +8,8 @@ import type {
   WebSocketMessage,
   CheckpointRequest,
   CheckpointAck,
+  BatchCheckpointRequest,
+  BatchCheckpointAck,
   TimeUpdate,
   Notification,
 } from '../types';
@@ -39,17 +41,23 @@ export class WebSocketService {
   private errorHandlers: Set<ErrorHandler> = new Set();
   private isManualDisconnect = false;
   private sequenceNumbers: Map<number, number> = new Map(); // questionId -> sequence
+  private changeSequence: number | null = null; // last acked change of the attempt, for resync
 
   /**
    * Connect to WebSocket server for an exam attempt
    */
   connect(attemptId: number, token: string): Promise<void> {
     return new Promise((resolve, reject) => {
+      if (this.attemptId !== attemptId) {
+        this.changeSequence = null;
+      }
       this.attemptId = attemptId;
       this.token = token;
       this.isManualDisconnect = false;
 
-      const wsUrl = `${WS_BASE_URL}${WS_PREFIX}/attempts/${attemptId}?token=${token}`;
+      // On reconnect, ask only for the answers saved since the last acked change
+      const since = this.changeSequence !== null ? `&since=${this.changeSequence}` : '';
+      const wsUrl = `${WS_BASE_URL}${WS_PREFIX}/attempts/${attemptId}?token=${token}${since}`;
 
       try {
         this.ws = new WebSocket(wsUrl);
@@ -173,6 +181,39 @@ export class WebSocketService {
     }
   }
 
+  /**
+   * Send several checkpoints in one batch_checkpoint message
+   * Resolves with the server's per-question results
+   */
+  sendBatchCheckpoint(
+    checkpoints: CheckpointRequest[],
+    timeout: number = 10000
+  ): Promise<BatchCheckpointAck> {
+    return new Promise((resolve, reject) => {
+      if (!this.isConnected()) {
+        reject(new Error('WebSocket not connected'));
+        return;
+      }
+
+      const unsubscribe = this.on('batch_checkpoint_ack', (message) => {
+        window.clearTimeout(timeoutId);
+        unsubscribe();
+        resolve(message as unknown as BatchCheckpointAck);
+      });
+
+      const timeoutId = window.setTimeout(() => {
+        unsubscribe();
+        reject(new Error('Acknowledgment timeout'));
+      }, timeout);
+
+      const batch: BatchCheckpointRequest = {
+        type: 'batch_checkpoint',
+        answers: checkpoints,
+      };
+      this.send(batch);
+    });
+  }
+
   /**
    * Request time synchronization
    */
@@ -232,6 +273,8 @@ export class WebSocketService {
       return;
     }
 
+    this.trackChangeSequence(message);
+
     // Notify registered handlers
     const handlers = this.messageHandlers.get(message.type);
     if (handlers) {
@@ -257,6 +300,17 @@ export class WebSocketService {
     }
   }
 
+  /**
+   * Remember the attempt's latest change sequence from acks and resyncs
+   */
+  private trackChangeSequence(message: WebSocketMessage): void {
+    const changeSequence =
+      message.type === 'connected' ? message.resync?.change_sequence : message.change_sequence;
+    if (typeof changeSequence === 'number' && changeSequence > (this.changeSequence ?? -1)) {
+      this.changeSequence = changeSequence;
+    }
+  }
+
   /**
    * Register a message handler for a specific message type
    */
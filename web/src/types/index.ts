@@ -105,6 +105,8 @@ export type MessageType =
   | 'checkpoint'
   | 'checkpoint_ack'
   | 'checkpoint_error'
+  | 'batch_checkpoint'
+  | 'batch_checkpoint_ack'
   | 'time_sync'
   | 'time_update'
   | 'notification'
@@ -134,6 +136,27 @@ export interface CheckpointAck {
   sequence: number;
   saved_at: string;
   time_remaining_seconds: number;
+  change_sequence?: number;
+}
+
+export interface BatchCheckpointRequest {
+  type: 'batch_checkpoint';
+  answers: CheckpointRequest[];
+}
+
+export interface BatchCheckpointResult {
+  question_id: number;
+  success: boolean;
+  sequence?: number;
+  error?: string;
+  error_code?: string;
+}
+
+export interface BatchCheckpointAck {
+  type: 'batch_checkpoint_ack';
+  results: BatchCheckpointResult[];
+  time_remaining_seconds: number;
+  change_sequence?: number;
 }
 
 export interface TimeUpdate {